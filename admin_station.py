@@ -1,10 +1,10 @@
 """
 עמדת ניהול - עדכון נקודות ושיוך כרטיסים
 """
+import startup_profile
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, colorchooser, scrolledtext, simpledialog
 from database import Database
-from excel_import import ExcelImporter
 from PIL import Image, ImageTk, ImageDraw, ImageFont
 import os
 import json
@@ -25,6 +25,8 @@ from datetime import datetime
 import csv
 from datetime import date, timedelta
 from jewish_calendar import hebrew_date_from_gregorian_str
+from student_table_model import StudentTableModel
+from student_search import StudentSearchIndex
 
 try:
     from ui_icons import normalize_ui_icons
@@ -276,7 +278,8 @@ class AdminStation:
         except Exception as e:
             print(f"שגיאה בהמרת נתונים: {e}")
         
-        self.importer = ExcelImporter(self.db)
+        # ExcelImporter (pandas) נטען בשימוש הראשון – ראה importer
+        self._importer = None
         
         # מורה מחובר (None = טרם התחבר, teacher_dict = מורה רגיל, {'is_admin': 1} = מנהל)
         self.current_teacher = None
@@ -494,20 +497,27 @@ class AdminStation:
     def _apply_points_changes(self, changes: list, direction: str):
         if direction not in ('undo', 'redo'):
             return 0
-        applied = 0
+        batch = []
         for ch in (changes or []):
             try:
                 sid = int(ch.get('student_id'))
                 oldp = int(ch.get('old_points'))
                 newp = int(ch.get('new_points'))
                 target = oldp if direction == 'undo' else newp
-                actor_name = self._get_points_actor_name()
-                ok = self.db.update_student_points(sid, max(0, int(target)), f"{direction.upper()}", actor_name)
-                if ok:
-                    applied += 1
+                batch.append({'student_id': sid, 'set': max(0, int(target))})
             except Exception:
                 pass
-        return applied
+        if not batch:
+            return 0
+        # טרנזקציה אחת לכל הפעולה; שחזור מצב קודם לא נחסם ע"י מקסימום יומי
+        res = self.db.apply_points_batch(
+            batch, self._get_points_actor_name(), f"{direction.upper()}",
+            action_type=direction, enforce_max=False
+        )
+        if not res.get('ok'):
+            safe_print(f"[POINTS] {direction} failed: {res.get('error')}")
+            return 0
+        return sum(1 for r in (res.get('results') or []) if r.get('status') in ('ok', 'unchanged'))
 
     def undo_last_points_action(self, *_):
         try:
@@ -1439,6 +1449,10 @@ class AdminStation:
         # צבעים לשורות לסירוגין
         self.tree.tag_configure('oddrow', background='#ecf0f1')
         self.tree.tag_configure('evenrow', background='#ffffff')
+
+        # מודל הטבלה – עדכון לפי הפרשים במקום בנייה מחדש בכל רענון
+        self.student_table = StudentTableModel(self.tree, self.student_ids)
+        self._private_msg_display_cache = {}
         
         self.tree.pack(fill=tk.BOTH, expand=True, side=tk.RIGHT)
         
@@ -2108,11 +2122,7 @@ class AdminStation:
             if selection:
                 selected_student_id = self.student_ids.get(selection[0])
         
-        # ניקוי הטבלה
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        self.student_ids.clear()
+        # הטבלה לא מתרוקנת – המודל מחיל רק את ההפרשים (ובכך נשמרים גם בחירה וגלילה)
         
         # טעינת תלמידים - מסונן לפי הרשאות (עם שימוש ב-cache!)
         if self.current_teacher and self.current_teacher['is_admin'] == 0:
@@ -2149,6 +2159,17 @@ class AdminStation:
             # מנהל - כל התלמידים
             students = self.db.get_all_students()
 
+        # עדכון אינדקס החיפוש מהרשימה שכבר נטענה (רק שורות שהשתנו מחושבות מחדש)
+        index = getattr(self, 'student_search_index', None)
+        if index is not None:
+            try:
+                if self.current_teacher and self.current_teacher['is_admin'] == 0:
+                    index.update_many(students)
+                else:
+                    index.replace_all(students)
+            except Exception:
+                pass
+
         if not students:
             try:
                 db_path = getattr(self.db, 'db_path', None)
@@ -2161,91 +2182,97 @@ class AdminStation:
             except Exception:
                 pass
 
-        # סטטיסטיקות תיקופים עבור כל התלמידים בטבלה
+        # סטטיסטיקות תיקופים עבור כל התלמידים בטבלה (קריאה מהסיכום היומי swipe_daily)
         student_ids_list = [s['id'] for s in students]
+        swipe_totals = self.db.get_swipe_totals_for_students(student_ids_list)
+        total_days = self.db.get_total_school_days()
+
+        rows = [
+            (student['id'], self._student_row_values(student, idx, swipe_totals, total_days, strip_private=True))
+            for idx, student in enumerate(students)
+        ]
+        self.student_table.apply(rows, select_student_id=selected_student_id)
+
         try:
-            import time
-            now = time.time()
-            cache = getattr(self, '_swipe_stats_cache', None)
-            cache_ts = float(cache.get('ts', 0.0)) if isinstance(cache, dict) else 0.0
-            cache_key = cache.get('key') if isinstance(cache, dict) else None
-            cur_key = (len(student_ids_list), student_ids_list[0] if student_ids_list else None, student_ids_list[-1] if student_ids_list else None)
-            if isinstance(cache, dict) and cache_key == cur_key and (now - cache_ts) < 60.0:
-                swipe_totals = cache.get('swipe_totals') or {}
-                total_days = int(cache.get('total_days') or 0)
-            else:
-                swipe_totals = self.db.get_swipe_totals_for_students(student_ids_list)
-                total_days = self.db.get_total_school_days()
-                self._swipe_stats_cache = {
-                    'ts': now,
-                    'key': cur_key,
-                    'swipe_totals': swipe_totals,
-                    'total_days': total_days,
-                }
+            self._update_teacher_topbar_stats()
         except Exception:
-            swipe_totals = self.db.get_swipe_totals_for_students(student_ids_list)
-            total_days = self.db.get_total_school_days()
-
-        item_to_select = None
-        
-        for idx, student in enumerate(students):
-            # שורות לסירוגין
-            tag = 'evenrow' if idx % 2 == 0 else 'oddrow'
-            
-            # קיצור הודעה פרטית אם ארוכה
-            private_msg = _strip_asterisk_annotations(student.get('private_message', '') or '')
+            pass
+    
+    def _student_row_values(self, student, idx, swipe_totals, total_days,
+                            strip_private=False, strip_names=False) -> tuple:
+        """ערכי שורה בטבלה לתלמיד (תיקון RTL להודעה נשמר בזיכרון לפי הטקסט)"""
+        # קיצור הודעה פרטית אם ארוכה + תיקון RTL (מהזיכרון אם כבר חושב)
+        raw_msg = student.get('private_message', '') or ''
+        cache = getattr(self, '_private_msg_display_cache', None)
+        if cache is None:
+            cache = self._private_msg_display_cache = {}
+        cache_key = (raw_msg, bool(strip_private))
+        private_msg = cache.get(cache_key)
+        if private_msg is None:
+            private_msg = _strip_asterisk_annotations(raw_msg) if strip_private else raw_msg
             if len(private_msg) > 30:
                 private_msg = private_msg[:27] + '...'
-            
-            # תיקון RTL להודעה פרטית
             if private_msg:
                 private_msg = fix_rtl_text(private_msg)
+            if len(cache) > 20000:
+                cache.clear()
+            cache[cache_key] = private_msg
 
-            # אייקון תמונה
-            photo_icon = "📷" if student.get('photo_number') else "✗"
+        # אייקון תמונה
+        photo_icon = "📷" if student.get('photo_number') else "✗"
 
-            # מס' סידורי: אם קיים ב-DB השתמש בו, אחרת מספר רץ לפי הסדר
-            serial_val = student.get('serial_number')
-            serial_display = serial_val if serial_val not in (None, 0) else (idx + 1)
+        # מס' סידורי: אם קיים ב-DB השתמש בו, אחרת מספר רץ לפי הסדר
+        serial_val = student.get('serial_number')
+        serial_display = serial_val if serial_val not in (None, 0) else (idx + 1)
 
-            # סטטיסטיקת תיקופים לתלמיד
-            total_swipes = swipe_totals.get(student['id'], 0)
-            if total_days > 0 and total_swipes > 0:
-                avg_swipes = round(total_swipes / total_days, 2)
-            else:
-                avg_swipes = 0
-
-            item_id = self.tree.insert('', tk.END, values=(
-                student['points'],
-                private_msg,
-                student['card_number'] if student['card_number'] else '',
-                str(student.get('class_name', '') or ''),
-                student['id_number'],
-                str(student.get('first_name', '') or ''),
-                str(student.get('last_name', '') or ''),
-                photo_icon,
-                serial_display,
-                total_swipes,
-                avg_swipes
-            ), tags=(tag,))
-            
-            # שמירת מיפוי item_id -> student_id
-            self.student_ids[item_id] = student['id']
-            
-            # שמירת ה-item שצריך לבחור
-            if selected_student_id and student['id'] == selected_student_id:
-                item_to_select = item_id
-        
-        # בחירה מחדש של התלמיד
-        if item_to_select:
-            self.tree.selection_set(item_to_select)
-            self.tree.see(item_to_select)
+        # סטטיסטיקת תיקופים לתלמיד
+        total_swipes = swipe_totals.get(student['id'], 0)
+        if total_days > 0 and total_swipes > 0:
+            avg_swipes = round(total_swipes / total_days, 2)
+        else:
+            avg_swipes = 0
+
+        clean = _strip_asterisk_annotations if strip_names else (lambda v: v)
+        return (
+            student['points'],
+            private_msg,
+            student['card_number'] if student['card_number'] else '',
+            clean(str(student.get('class_name', '') or '')),
+            student['id_number'],
+            clean(str(student.get('first_name', '') or '')),
+            clean(str(student.get('last_name', '') or '')),
+            photo_icon,
+            serial_display,
+            total_swipes,
+            avg_swipes
+        )
+
+    def _get_student_search_index(self):
+        """אינדקס חיפוש בזיכרון – נבנה בשימוש הראשון"""
+        index = getattr(self, 'student_search_index', None)
+        if index is None:
+            index = StudentSearchIndex(self.db)
+            try:
+                index.load()
+            except Exception as e:
+                safe_print(f"⚠️ שגיאה בבניית אינדקס חיפוש: {e}")
+            self.student_search_index = index
+        return index
 
+    def _search_students_in_memory(self, search_term):
         try:
-            self._update_teacher_topbar_stats()
+            return self._get_student_search_index().search(search_term)
+        except Exception as e:
+            safe_print(f"⚠️ חיפוש בזיכרון נכשל, חוזר ל-DB: {e}")
+            return self.db.search_students(search_term)
+
+    def _invalidate_student_row(self, student_id=None):
+        """שורה שנכתבה ישירות לעץ – הרענון הבא יכתוב אותה מחדש מה-DB"""
+        try:
+            self.student_table.invalidate(student_id)
         except Exception:
             pass
-    
+
     def on_search_var_changed(self, *args):
         """תגובה לשינוי בטקסט החיפוש – הפעלה מושהית של החיפוש"""
         try:
@@ -2338,14 +2365,8 @@ class AdminStation:
         except Exception:
             pass
         
-        # ניקוי הטבלה
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        
-        self.student_ids.clear()
-        
-        # חיפוש
-        students = self.db.search_students(search_term)
+        # חיפוש (מהאינדקס בזיכרון)
+        students = self._search_students_in_memory(search_term)
         if self.current_teacher and self.current_teacher['is_admin'] == 0:
             if not self.teacher_classes_cache:
                 self.teacher_classes_cache = self.db.get_teacher_classes(self.current_teacher['id'])
@@ -2360,47 +2381,11 @@ class AdminStation:
         swipe_totals = self.db.get_swipe_totals_for_students(student_ids_list)
         total_days = self.db.get_total_school_days()
 
-        for idx, student in enumerate(students):
-            tag = 'evenrow' if idx % 2 == 0 else 'oddrow'
-            
-            # קיצור הודעה פרטית אם ארוכה
-            private_msg = student.get('private_message', '') or ''
-            if len(private_msg) > 30:
-                private_msg = private_msg[:27] + '...'
-            
-            # תיקון RTL להודעה פרטית
-            if private_msg:
-                private_msg = fix_rtl_text(private_msg)
-
-            # אייקון תמונה
-            photo_icon = "📷" if student.get('photo_number') else "✗"
-
-            # מס' סידורי: אם קיים ב-DB השתמש בו, אחרת מספר רץ לפי הסדר
-            serial_val = student.get('serial_number')
-            serial_display = serial_val if serial_val not in (None, 0) else (idx + 1)
-
-            # סטטיסטיקת תיקופים לתלמיד
-            total_swipes = swipe_totals.get(student['id'], 0)
-            if total_days > 0 and total_swipes > 0:
-                avg_swipes = round(total_swipes / total_days, 2)
-            else:
-                avg_swipes = 0
-
-            item_id = self.tree.insert('', tk.END, values=(
-                student['points'],
-                private_msg,
-                student['card_number'] if student['card_number'] else '',
-                _strip_asterisk_annotations(student.get('class_name', '') or ''),
-                student['id_number'],
-                _strip_asterisk_annotations(student.get('first_name', '') or ''),
-                _strip_asterisk_annotations(student.get('last_name', '') or ''),
-                photo_icon,
-                serial_display,
-                total_swipes,
-                avg_swipes
-            ), tags=(tag,))
-
-            self.student_ids[item_id] = student['id']
+        rows = [
+            (student['id'], self._student_row_values(student, idx, swipe_totals, total_days, strip_names=True))
+            for idx, student in enumerate(students)
+        ]
+        self.student_table.apply(rows)
         
         # ניקוי שדה החיפוש לאחר השהייה קצרה, כדי שתוכל לראות לרגע את הטקסט שהוקלד
         def _clear_search_entry():
@@ -2653,6 +2638,7 @@ class AdminStation:
             values = list(self.tree.item(item_id, 'values'))
             values[0] = new_points
             self.tree.item(item_id, values=tuple(values))
+            self._invalidate_student_row(student_id)
 
             try:
                 if old_points is not None:
@@ -2672,6 +2658,7 @@ class AdminStation:
             values = list(self.tree.item(item_id, 'values'))
             values[1] = display_msg
             self.tree.item(item_id, values=tuple(values))
+            self._invalidate_student_row(student_id)
         # סימון שינוי וייצוא לאקסל
         self.has_changes = True
         self.export_to_excel_now()
@@ -2887,11 +2874,25 @@ class AdminStation:
             shutil.copy2(file_path, dest)
         except Exception:
             return ''
+        self._update_shared_sounds_manifest()
         try:
             return os.path.splitext(os.path.basename(dest))[0]
         except Exception:
             return ''
 
+    def _update_shared_sounds_manifest(self) -> None:
+        """עדכון sounds_manifest.json בשיתוף ברקע – העמדות יעתיקו רק את מה שהשתנה"""
+        sounds_dir = self._get_shared_sounds_dir()
+
+        def _worker():
+            try:
+                from sounds_sync import write_manifest
+                write_manifest(sounds_dir)
+            except Exception as e:
+                print(f"[SOUNDS] manifest update failed: {e}")
+
+        threading.Thread(target=_worker, daemon=True).start()
+
     def _admin_play_sound_key(self, sound_key: str) -> None:
         try:
             if not SoundManager:
@@ -3594,9 +3595,23 @@ class AdminStation:
             "הפעולה תאפס גם את כל התיקופים והיסטוריית הנקודות."
         )
 
-        try:
-            imported, errors = self.importer.import_from_excel(file_path, clear)
+        def _progress(done, total, stage):
+            # נקרא מתהליכון הייבוא – עדכון התווית דרך לולאת האירועים
+            label = "קורא קובץ" if stage == 'normalize' else "כותב למסד"
+            text = f"ייבוא: {label} {done}/{total}" if total else f"ייבוא: {label}..."
+            try:
+                self.root.after(0, lambda: self.sync_label.config(text=text, fg='#2980b9'))
+            except Exception:
+                pass
 
+        def _finish(imported, errors, exc):
+            try:
+                self.sync_label.config(text="סטטוס: מוכן", fg='#27ae60')
+            except Exception:
+                pass
+            if exc is not None:
+                messagebox.showerror("שגיאה", f"שגיאה בייבוא הקובץ:\n{str(exc)}")
+                return
             if errors:
                 error_msg = "\n".join(errors[:10])
                 messagebox.showwarning(
@@ -3612,8 +3627,20 @@ class AdminStation:
             self.has_changes = True
             self.load_students()
 
-        except Exception as e:
-            messagebox.showerror("שגיאה", f"שגיאה בייבוא הקובץ:\n{str(e)}")
+        def _worker():
+            imported, errors, exc = 0, [], None
+            try:
+                imported, errors = self.importer.import_from_excel(file_path, clear, progress=_progress)
+            except Exception as e:
+                exc = e
+            try:
+                self.root.after(0, lambda: _finish(imported, errors, exc))
+            except Exception:
+                pass
+
+        # הייבוא רץ ברקע כדי שהממשק יישאר זמין
+        self.show_status_message("ייבוא מ-Excel...", '#2980b9')
+        threading.Thread(target=_worker, name='excel-import', daemon=True).start()
     
     def ask_export_options(self):
         return self._ask_export_options_impl()
@@ -5016,6 +5043,48 @@ class AdminStation:
         except Exception:
             pass
 
+    @property
+    def importer(self):
+        """ExcelImporter – pandas נטען רק בפעולת אקסל הראשונה ולא בעליית העמדה"""
+        if getattr(self, '_importer', None) is None:
+            from excel_import import ExcelImporter
+            self._importer = ExcelImporter(self.db)
+        return self._importer
+
+    def _get_excel_exporter(self):
+        """עובד הייצוא ברקע (נוצר בפעם הראשונה שצריך אותו)"""
+        exporter = getattr(self, '_excel_exporter', None)
+        if exporter is None:
+            from excel_auto_export import ExcelAutoExporter
+
+            def _on_done(changed, mtime):
+                def _apply():
+                    try:
+                        if mtime is not None:
+                            self.last_excel_mod_time = mtime
+                    except Exception:
+                        pass
+                    try:
+                        # שינוי שהגיע בזמן הכתיבה כבר סימן סבב נוסף
+                        if not exporter.is_pending():
+                            self.has_changes = False
+                    except Exception:
+                        pass
+                try:
+                    self.root.after(0, _apply)
+                except Exception:
+                    pass
+
+            exporter = ExcelAutoExporter(
+                self.db, self.excel_path,
+                delay_sec=float(getattr(self, '_excel_export_interval_sec', 300.0) or 300.0),
+                min_gap_sec=float(getattr(self, '_excel_export_min_gap_sec', 3.0) or 3.0),
+                on_done=_on_done,
+            )
+            self._excel_exporter = exporter
+        exporter.excel_path = self.excel_path
+        return exporter
+
     def _schedule_excel_export(self, force: bool = False):
         try:
             if not bool(getattr(self, '_excel_auto_export_enabled', True)):
@@ -5035,147 +5104,12 @@ class AdminStation:
         except Exception:
             return
 
+        # הכתיבה עצמה (קריאת החוברת, עדכון תאים, החלפה אטומית) רצה בתהליכון רקע
         try:
-            self._excel_export_pending = True
-        except Exception:
-            pass
-
-        try:
-            if getattr(self, '_excel_export_job', None) is not None:
-                if force:
-                    try:
-                        self.root.after_cancel(self._excel_export_job)
-                    except Exception:
-                        pass
-                    self._excel_export_job = None
-                else:
-                    return
-        except Exception:
-            pass
-
-        delay_sec = float(getattr(self, '_excel_export_interval_sec', 300.0) or 300.0)
-        if force:
-            delay_sec = 0.05
-        delay_ms = int(max(50, int(delay_sec * 1000)))
-        try:
-            self._excel_export_job = self.root.after(delay_ms, self._export_to_excel_flush)
-        except Exception:
-            self._excel_export_job = None
-
-    def _export_to_excel_flush(self):
-        try:
-            self._excel_export_job = None
-        except Exception:
-            pass
-
-        try:
-            if not getattr(self, 'has_changes', False):
-                self._excel_export_pending = False
-                return
-        except Exception:
-            return
-
-        # Run export in background to avoid freezing the Tk UI (openpyxl + network Excel can be slow).
-        try:
-            if bool(getattr(self, '_excel_export_thread_running', False)):
-                try:
-                    self._schedule_excel_export()
-                except Exception:
-                    pass
-                return
-        except Exception:
-            pass
-
-        try:
-            import time
-            now = float(time.time())
-            min_gap = float(getattr(self, '_excel_export_min_gap_sec', 3.0) or 3.0)
-            last_done = float(getattr(self, '_excel_export_last_done_ts', 0.0) or 0.0)
-            if (now - last_done) < min_gap:
-                wait_ms = int(max(50, (min_gap - (now - last_done)) * 1000.0))
-                try:
-                    self._excel_export_job = self.root.after(wait_ms, self._export_to_excel_flush)
-                except Exception:
-                    self._excel_export_job = None
-                return
-        except Exception:
-            pass
-
-        def _do_export():
-            try:
-                self.importer.export_columns_only(self.excel_path)
-
-                try:
-                    mtime = os.path.getmtime(self.excel_path)
-                except Exception:
-                    mtime = None
-
-                try:
-                    import time
-                    last_done = float(time.time())
-                except Exception:
-                    last_done = None
-
-                def _on_ok():
-                    try:
-                        if mtime is not None:
-                            self.last_excel_mod_time = mtime
-                    except Exception:
-                        pass
-                    try:
-                        self.has_changes = False
-                    except Exception:
-                        pass
-                    try:
-                        if last_done is not None:
-                            self._excel_export_last_done_ts = last_done
-                    except Exception:
-                        pass
-                    try:
-                        self._excel_export_pending = False
-                    except Exception:
-                        pass
-
-                try:
-                    self.root.after(0, _on_ok)
-                except Exception:
-                    _on_ok()
-            except Exception:
-                # Silent fail like before; just allow future retries.
-                def _on_err():
-                    try:
-                        self._excel_export_pending = False
-                    except Exception:
-                        pass
-                try:
-                    self.root.after(0, _on_err)
-                except Exception:
-                    _on_err()
-            finally:
-                try:
-                    self._excel_export_thread_running = False
-                except Exception:
-                    pass
-
-        try:
-            self._excel_export_thread_running = True
-        except Exception:
-            pass
+            self._get_excel_exporter().mark_dirty(force=force)
+        except Exception as e:
+            print(f"[EXCEL-EXPORT] schedule failed: {e}")
 
-        try:
-            import threading
-            t = threading.Thread(target=_do_export, daemon=True)
-            t.start()
-        except Exception:
-            try:
-                self._excel_export_thread_running = False
-            except Exception:
-                pass
-            try:
-                _do_export()
-            except Exception:
-                pass
-    
     def sync_to_excel(self):
         """סינכרון מכוון מ-DB אל Excel (רק G,H,I) ללא קריאה מאקסל"""
         if not self.ensure_can_modify():
@@ -5184,14 +5118,23 @@ class AdminStation:
             self.sync_label.config(text="סטטוס: קובץ Excel לא נמצא", fg='#e74c3c')
             messagebox.showwarning("שגיאה", "קובץ Excel לא נמצא")
             return
+        self.sync_label.config(text="📤 מסנכרן ל-Excel...", fg='#3498db')
+
+        def _finish(changed, err):
+            def _show():
+                if err is not None:
+                    self.sync_label.config(text="✗ שגיאה בסינכרון ל-Excel", fg='#e74c3c')
+                    messagebox.showerror("שגיאה", f"שגיאה בסינכרון ל-Excel:\n{err}")
+                    return
+                self.sync_label.config(text="✓ סונכרנו נתונים ל-Excel", fg='#27ae60')
+                messagebox.showinfo("הצלחה", "הנתונים סונכרנו בהצלחה אל קובץ ה-Excel!")
+            try:
+                self.root.after(0, _show)
+            except Exception:
+                pass
+
         try:
-            self.sync_label.config(text="📤 מסנכרן ל-Excel...", fg='#3498db')
-            self.root.update()
-            self.importer.export_columns_only(self.excel_path)
-            self.last_excel_mod_time = os.path.getmtime(self.excel_path)
-            self.has_changes = False
-            self.sync_label.config(text="✓ סונכרנו נתונים ל-Excel", fg='#27ae60')
-            messagebox.showinfo("הצלחה", "הנתונים סונכרנו בהצלחה אל קובץ ה-Excel!")
+            self._get_excel_exporter().flush_now(on_complete=_finish)
         except Exception as e:
             self.sync_label.config(text="✗ שגיאה בסינכרון ל-Excel", fg='#e74c3c')
             messagebox.showerror("שגיאה", f"שגיאה בסינכרון ל-Excel:\n{e}")
@@ -5204,6 +5147,8 @@ class AdminStation:
             df = pd.read_excel(self.excel_path, dtype={'מס\' כרטיס': str})
             
             updates_count = 0
+            search_index = self._get_student_search_index()
+            search_index.ensure_fresh(force=True)
             
             # עבור על כל שורה ועדכן רק אם יש שינויים
             for index, row in df.iterrows():
@@ -5213,10 +5158,14 @@ class AdminStation:
                 if not last_name or not first_name or last_name == 'nan' or first_name == 'nan':
                     continue
                 
-                # חיפוש התלמיד במסד הנתונים
-                students = self.db.search_students(f"{first_name} {last_name}")
+                # חיפוש התלמיד באינדקס (בזיכרון – בלי שאילתה לכל שורה)
+                students = search_index.find_by_name(first_name, last_name)
+                if len(students) > 1:
+                    # כמה תלמידים באותו שם – לא מנחשים איזה לעדכן
+                    safe_print(f"  ⚠️ שם כפול, דילוג: {first_name} {last_name}")
+                    continue
                 if students:
-                    student = students[0]  # קח את הראשון
+                    student = students[0]
                     student_id = student['id']
                     
                     # עדכון כרטיס אם השתנה
@@ -5230,6 +5179,7 @@ class AdminStation:
                             safe_print(f"  🔄 עדכון כרטיס: {first_name} {last_name}")
                             safe_print(f"     מ: {current_card} ← ל: {card_number}")
                             self.db.update_card_number(student_id, card_number)
+                            search_index.update_fields(student_id, card_number=card_number)
                             updates_count += 1
                     
                     # עדכון נקודות אם השתנו
@@ -5240,6 +5190,7 @@ class AdminStation:
                                 safe_print(f"  🔄 עדכון נקודות: {first_name} {last_name}")
                                 safe_print(f"     מ: {student['points']} ← ל: {new_points}")
                                 self.db.update_student_points(student_id, new_points, "סינכרון מ-Excel", "מערכת")
+                                search_index.update_fields(student_id, points=new_points)
                                 updates_count += 1
                         except Exception as ex:
                             safe_print(f"  ⚠️ שגיאה בעדכון נקודות: {ex}")
@@ -6541,44 +6492,34 @@ class AdminStation:
             except Exception:
                 pass
 
-        # ביצוע עדכון נקודות לכל תלמיד
-        updated = 0
-        changes = []
-        actor_name = self._get_points_actor_name()
-        for sid in students:
+        # ביצוע עדכון נקודות לכל התלמידים – טרנזקציה אחת
+        if operation == 'add':
+            batch = [{'student_id': int(sid), 'delta': int(points)} for sid in students]
+            reason = f"עדכון מהיר +{points}"
+        elif operation == 'subtract':
+            batch = [{'student_id': int(sid), 'delta': -abs(int(points))} for sid in students]
+            reason = f"עדכון מהיר -{abs(points)}"
+        else:
+            batch = [{'student_id': int(sid), 'set': max(0, int(points))} for sid in students]
+            reason = f"עדכון מהיר = {max(0, int(points))}"
+        res = self.db.apply_points_batch(batch, self._get_points_actor_name(), reason, action_type=operation)
+        if not res.get('ok'):
+            raise RuntimeError(res.get('error') or 'שגיאה בעדכון נקודות')
+        results = res.get('results') or []
+        updated = sum(1 for r in results if r.get('status') in ('ok', 'unchanged'))
+        changes = [
+            {'student_id': r['student_id'], 'old_points': r['old_points'], 'new_points': r['new_points']}
+            for r in results if r.get('status') == 'ok'
+        ]
+        if int(res.get('blocked') or 0) > 0:
             try:
-                old_points = None
-                try:
-                    st = self.db.get_student_by_id(int(sid))
-                    if st is not None and st.get('points') is not None:
-                        old_points = int(st.get('points') or 0)
-                except Exception:
-                    old_points = None
-
-                ok = False
-                if operation == 'add':
-                    ok = self.db.add_points(int(sid), points, f"עדכון מהיר +{points}", actor_name)
-                    try:
-                        if old_points is not None:
-                            changes.append({'student_id': int(sid), 'old_points': int(old_points), 'new_points': int(old_points) + int(points)})
-                    except Exception:
-                        pass
-                elif operation == 'subtract':
-                    ok = self.db.subtract_points(int(sid), abs(points), f"עדכון מהיר -{abs(points)}", actor_name)
-                    try:
-                        if old_points is not None:
-                            changes.append({'student_id': int(sid), 'old_points': int(old_points), 'new_points': int(old_points) - int(abs(points))})
-                    except Exception:
-                        pass
-                elif operation == 'set':
-                    ok = self.db.update_student_points(int(sid), max(0, int(points)), f"עדכון מהיר = {max(0, int(points))}", actor_name)
-                    try:
-                        if old_points is not None:
-                            changes.append({'student_id': int(sid), 'old_points': int(old_points), 'new_points': int(max(0, int(points)))})
-                    except Exception:
-                        pass
-                if ok:
-                    updated += 1
+                messagebox.showwarning(
+                    'חריגה ממקסימום נקודות',
+                    fix_rtl_text(
+                        f"{int(res.get('blocked'))} תלמידים לא עודכנו כי הניקוד היה עובר את המקסימום המותר כיום "
+                        f"({int(res.get('max_allowed') or 0)})."
+                    )
+                )
             except Exception:
                 pass
 
@@ -8172,6 +8113,7 @@ class AdminStation:
                 pass
             if not os.path.isdir(src_root):
                 return
+            copied = 0
             for root, _, files in os.walk(src_root):
                 rel = os.path.relpath(root, src_root)
                 if rel == '.':
@@ -8191,10 +8133,18 @@ class AdminStation:
                             continue
                         try:
                             shutil.copy2(sp, dp)
+                            copied += 1
                         except Exception:
                             pass
                     except Exception:
                         continue
+            # העמדות מסתנכרנות לפי המניפסט – מעדכנים אותו כשנוספו קבצים (או כשהוא חסר)
+            try:
+                from sounds_sync import MANIFEST_NAME, write_manifest
+                if copied or not os.path.exists(os.path.join(dst_root, MANIFEST_NAME)):
+                    write_manifest(dst_root)
+            except Exception as e:
+                print(f"[SOUNDS] manifest update failed: {e}")
         except Exception:
             return
 
@@ -18478,6 +18428,7 @@ class AdminStation:
             if not data:
                 messagebox.showwarning('אין נתונים', 'אין אתגרים פעילים לייצוא')
                 return
+            import pandas as pd
             df = pd.DataFrame(data, columns=['שם אתגר', 'נקודות', 'משך (דקות)', 'קיבולת'])
             if user_choice.get('action') == 'preview':
                 try:
@@ -18486,18 +18437,9 @@ class AdminStation:
                     messagebox.showerror('שגיאה', f'שגיאה בהצגת תצוגה:\n{str(e)}')
                 return
 
-            df.to_excel(fp, index=False, engine='openpyxl')
-            
-            # Apply RTL and alternating colors styling
-            try:
-                from openpyxl import load_workbook
-                from excel_styling import apply_rtl_and_alternating_colors
-                wb = load_workbook(fp)
-                ws = wb.active
-                apply_rtl_and_alternating_colors(ws, has_header=True)
-                wb.save(fp)
-            except Exception:
-                pass
+            # כתיבה זורמת עם עיצוב RTL וצבעים מתחלפים (בלי פתיחה מחדש של הקובץ)
+            from excel_styling import write_dataframe_styled
+            write_dataframe_styled(df, fp)
             
             messagebox.showinfo('נשמר', f'נשמר קובץ:\n{fp}')
             try:
@@ -21284,10 +21226,6 @@ class AdminStation:
             self.teacher_classes_cache = []
         except Exception:
             pass
-        try:
-            self._swipe_stats_cache = None
-        except Exception:
-            pass
         try:
             # לאחר החלפת משתמש/התחברות נרצה טעינה מיידית של הטבלה
             self._suppress_auto_refresh_until = 0.0
@@ -21389,9 +21327,7 @@ class AdminStation:
         self.has_changes = False
 
         # ייצוא אקסל אוטומטי (batch) כדי למנוע כתיבה על כל שינוי
-        self._excel_export_job = None
-        self._excel_export_pending = False
-        self._excel_export_last_done_ts = 0.0
+        self._excel_exporter = None
         self._excel_export_interval_sec = 300.0
         self._excel_export_min_gap_sec = 3.0
         self._excel_auto_export_enabled = True
@@ -21436,6 +21372,7 @@ class AdminStation:
         try:
             if int(self.current_teacher.get('is_admin', 0) or 0) == 1:
                 self._schedule_update_checks()
+                self._maybe_start_retention()
         except Exception:
             pass
 
@@ -21654,6 +21591,30 @@ class AdminStation:
                 pass
         return download_path
 
+    def _maybe_start_retention(self) -> None:
+        """ניקוי/ארכוב יומי של טבלאות הלוג ברקע (retention.py)"""
+        if bool(getattr(self, '_retention_started', False)):
+            return
+        self._retention_started = True
+        try:
+            cfg = self.load_app_config() or {}
+        except Exception:
+            cfg = {}
+
+        def _worker():
+            try:
+                import retention
+                report = retention.run_if_due(self.db, cfg)
+                if report:
+                    print("[RETENTION]\n" + retention.format_report(report))
+            except Exception as e:
+                print(f"[RETENTION] failed: {e}")
+
+        try:
+            threading.Thread(target=_worker, daemon=True).start()
+        except Exception:
+            pass
+
     def _schedule_update_checks(self):
         try:
             self._check_for_updates_async(show_no_update=False)
@@ -21832,21 +21793,17 @@ class AdminStation:
     
     def on_closing(self):
         """טיפול בסגירת החלון"""
-        try:
-            if getattr(self, '_excel_export_job', None) is not None:
-                try:
-                    self.root.after_cancel(self._excel_export_job)
-                except Exception:
-                    pass
-                self._excel_export_job = None
-        except Exception:
-            pass
         # ייצוא רק אם היו שינויים
         if self.has_changes:
             safe_print("📤 ייצוא שינויים לפני סגירה (רק G, H, I)...")
             try:
-                self.importer.export_columns_only(self.excel_path)
-                safe_print("✅ ייצוא הסתיים")
+                import threading
+                done = threading.Event()
+                exporter = self._get_excel_exporter()
+                exporter.flush_now(on_complete=lambda changed, err: done.set())
+                if done.wait(20.0):
+                    safe_print("✅ ייצוא הסתיים")
+                exporter.stop()
             except:
                 pass
         else:
@@ -21856,8 +21813,10 @@ class AdminStation:
 
 def main():
     """הפעלה רגילה - ללא splash (גורם לבעיות)"""
+    startup_profile.phase('imports')
     _set_windows_dpi_awareness()
     root = tk.Tk()
+    startup_profile.phase('tk.Tk()')
     try:
         import sys
         base_dir = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
@@ -21873,6 +21832,9 @@ def main():
         pass
     _apply_tk_scaling(root)
     app = AdminStation(root)
+    startup_profile.phase('AdminStation.__init__')
+    if startup_profile.ENABLED:
+        root.after_idle(lambda: root.after(1, lambda: startup_profile.report('admin_station')))
     root.mainloop()
 
 
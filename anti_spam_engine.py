@@ -0,0 +1,381 @@
+# -*- coding: utf-8 -*-
+"""
+מנוע אנטי-ספאם בזיכרון לעמדה הציבורית
+
+שומר לכל תלמיד חלון נע של זמני תיקוף אחרונים וחסימות פעילות, כך שבדיקת
+הכללים בזמן תיקוף לא דורשת גישה ל-DB. הכתיבה ל-DB (card_validations,
+card_blocks, anti_spam_events) נעשית ברקע במנות.
+"""
+
+import bisect
+import calendar
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def _utc_str(ts: float) -> str:
+    """epoch -> מחרוזת UTC בפורמט של CURRENT_TIMESTAMP ב-SQLite"""
+    return datetime.fromtimestamp(float(ts), timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _parse_utc(value) -> Optional[float]:
+    """מחרוזת UTC של SQLite -> epoch (או None אם לא ניתן לפענח)"""
+    try:
+        s = str(value or '').strip().replace('T', ' ').replace('Z', '')
+        if not s:
+            return None
+        dt = datetime.fromisoformat(s[:19])
+        return float(calendar.timegm(dt.timetuple()))
+    except Exception:
+        return None
+
+
+class AntiSpamEngine:
+    """חלון נע בזיכרון לכל תלמיד + כתיבה אסינכרונית ל-DB"""
+
+    def __init__(self, db, *, max_window_minutes: int = 1, max_count: int = 30,
+                 flush_interval_sec: float = 1.5, blocks_resync_sec: float = 30.0,
+                 validations_resync_sec: float = 10.0):
+        self.db = db
+        self._lock = threading.RLock()
+        self._max_window_sec = 60.0
+        self._buffer_size = 64
+        self._swipes: Dict[int, deque] = {}
+        # student_id -> (block_until_ts, reason)
+        self._blocks: Dict[int, Tuple[float, str]] = {}
+        # student_id -> violation_count (נטען מה-DB; מתרוקן בכל רענון חסימות)
+        self._violations: Dict[int, int] = {}
+
+        self._pending_validations: List[tuple] = []
+        self._pending_blocks: List[tuple] = []
+        self._pending_events: List[tuple] = []
+        self._max_pending = 20000
+
+        self._flush_interval_sec = float(flush_interval_sec or 1.5)
+        self._blocks_resync_sec = float(blocks_resync_sec or 30.0)
+        self._last_blocks_sync_ts = 0.0
+        # תיקופים של עמדות אחרות מגיעים רק דרך ה-DB – טעינה מחדש של החלון מדי פעם
+        self._validations_resync_sec = float(validations_resync_sec or 10.0)
+        self._last_validations_sync_ts = 0.0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.set_limits(max_window_minutes, max_count)
+
+    # ------------------------------------------------------------------
+    # הגדרות ואתחול
+    # ------------------------------------------------------------------
+
+    def set_limits(self, max_window_minutes: int, max_count: int) -> None:
+        """עדכון גודל החלון והטבעת לפי הכלל הרחב ביותר"""
+        try:
+            minutes = max(1, int(max_window_minutes or 1))
+        except Exception:
+            minutes = 1
+        try:
+            count = max(1, int(max_count or 1))
+        except Exception:
+            count = 30
+        # מרווח כדי שהמונה {count} בהודעות ימשיך לגדול מעבר לסף
+        size = max(64, count * 2 + 16)
+        with self._lock:
+            self._max_window_sec = float(minutes * 60)
+            if size != self._buffer_size:
+                self._buffer_size = size
+                for sid, buf in list(self._swipes.items()):
+                    self._swipes[sid] = deque(buf, maxlen=size)
+
+    def configure_rules(self, rules) -> None:
+        """חישוב גבולות החלון מתוך רשימת כללי האנטי-ספאם"""
+        max_minutes = 1
+        max_count = 1
+        for rule in (rules or []):
+            try:
+                max_minutes = max(max_minutes, int(rule.get('minutes', 1) or 1))
+            except Exception:
+                pass
+            try:
+                max_count = max(max_count, int(rule.get('count', 10) or 0))
+            except Exception:
+                pass
+        self.set_limits(max_minutes, max_count)
+
+    def start(self) -> None:
+        """טעינת מצב מה-DB והפעלת תהליכון הכתיבה ברקע"""
+        self.rehydrate()
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._writer_loop, name='anti-spam-writer', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 3.0) -> None:
+        """עצירת התהליכון וכתיבת כל מה שממתין"""
+        self._stop.set()
+        self._wake.set()
+        t = self._thread
+        if t is not None:
+            try:
+                t.join(timeout)
+            except Exception:
+                pass
+        self._thread = None
+        self.flush()
+
+    def rehydrate(self) -> None:
+        """טעינת תיקופים אחרונים וחסימות פעילות מה-DB (בעליית העמדה)"""
+        self._resync_validations()
+        self._resync_blocks()
+
+    def _resync_validations(self) -> None:
+        """בניית החלון הנע מחדש מה-DB (כל העמדות) + תיקופים מקומיים שעוד לא נכתבו"""
+        try:
+            minutes = int(self._max_window_sec // 60) or 1
+            rows = self.db.get_recent_card_validations(minutes) or []
+        except Exception as e:
+            print(f"[ANTI-SPAM] rehydrate validations failed: {e}")
+            return
+        times: Dict[int, List[float]] = {}
+        for sid, validated_at in rows:
+            ts = _parse_utc(validated_at)
+            if ts is None:
+                continue
+            try:
+                sid = int(sid or 0)
+            except Exception:
+                continue
+            times.setdefault(sid, []).append(ts)
+        with self._lock:
+            for (sid, _card, validated_at) in self._pending_validations:
+                ts = _parse_utc(validated_at)
+                if ts is not None:
+                    times.setdefault(int(sid), []).append(ts)
+            swipes: Dict[int, deque] = {}
+            for sid, values in times.items():
+                values.sort()
+                swipes[sid] = deque(values, maxlen=self._buffer_size)
+            self._swipes = swipes
+            self._last_validations_sync_ts = time.time()
+
+    def _resync_blocks(self) -> None:
+        """רענון חסימות פעילות מה-DB (כולל שחרור ידני ע"י מנהל)"""
+        try:
+            rows = self.db.get_active_card_blocks() or []
+        except Exception as e:
+            print(f"[ANTI-SPAM] rehydrate blocks failed: {e}")
+            return
+        blocks: Dict[int, Tuple[float, str]] = {}
+        for r in rows:
+            try:
+                sid = int(r['student_id'] or 0)
+            except Exception:
+                continue
+            until = _parse_utc(r['block_end'])
+            if not sid or until is None:
+                continue
+            prev = blocks.get(sid)
+            if prev is None or until > prev[0]:
+                blocks[sid] = (until, str(r['block_reason'] or ''))
+        with self._lock:
+            # חסימות שנוצרו כאן ועוד לא נכתבו ל-DB נשמרות
+            pending_vc: Dict[int, int] = {}
+            for (sid, _card, _start, end, reason, vc) in self._pending_blocks:
+                until = _parse_utc(end)
+                if until is not None:
+                    blocks[int(sid)] = (until, str(reason or ''))
+                pending_vc[int(sid)] = int(vc or 0)
+            self._blocks = blocks
+            # מונה ההפרות נטען מחדש מה-DB (למשל אחרי איפוס ע"י מנהל)
+            self._violations = pending_vc
+            self._last_blocks_sync_ts = time.time()
+
+    # ------------------------------------------------------------------
+    # שאילתות בזמן תיקוף (זיכרון בלבד)
+    # ------------------------------------------------------------------
+
+    def record_validation(self, student_id, card_number, ts: float = None) -> None:
+        """רישום תיקוף בחלון הנע ובתור הכתיבה"""
+        try:
+            sid = int(student_id or 0)
+        except Exception:
+            return
+        if ts is None:
+            ts = time.time()
+        with self._lock:
+            buf = self._swipes.get(sid)
+            if buf is None:
+                buf = deque(maxlen=self._buffer_size)
+                self._swipes[sid] = buf
+            buf.append(float(ts))
+            cutoff = float(ts) - self._max_window_sec
+            while buf and buf[0] < cutoff:
+                buf.popleft()
+            self._queue(self._pending_validations, (sid, str(card_number or '').strip(), _utc_str(ts)))
+
+    def recent_count(self, student_id, minutes: int, now: float = None) -> int:
+        """מספר תיקופים ב-X הדקות האחרונות"""
+        try:
+            sid = int(student_id or 0)
+            window = max(1, int(minutes or 1)) * 60.0
+        except Exception:
+            return 0
+        if now is None:
+            now = time.time()
+        with self._lock:
+            buf = self._swipes.get(sid)
+            if not buf:
+                return 0
+            return len(buf) - bisect.bisect_left(buf, float(now) - window)
+
+    def is_card_blocked(self, student_id, now: float = None):
+        """(חסום?, block_until כמחרוזת UTC, סיבה) – באותו פורמט כמו Database.is_card_blocked"""
+        try:
+            sid = int(student_id or 0)
+        except Exception:
+            return False, None, ''
+        if now is None:
+            now = time.time()
+        with self._lock:
+            blk = self._blocks.get(sid)
+            if not blk:
+                return False, None, ''
+            until, reason = blk
+            if until <= float(now):
+                self._blocks.pop(sid, None)
+                return False, None, ''
+            return True, _utc_str(until), str(reason or '')
+
+    def get_violation_count(self, student_id) -> int:
+        """מספר חסימות קודמות – נטען מה-DB ונשמר בזיכרון עד רענון החסימות הבא"""
+        try:
+            sid = int(student_id or 0)
+        except Exception:
+            return 0
+        with self._lock:
+            if sid in self._violations:
+                return int(self._violations[sid])
+        try:
+            vc = int(self.db.get_violation_count(sid) or 0)
+        except Exception:
+            vc = 0
+        with self._lock:
+            return int(self._violations.setdefault(sid, vc))
+
+    # ------------------------------------------------------------------
+    # פעולות שנכתבות ל-DB ברקע
+    # ------------------------------------------------------------------
+
+    def block_card(self, student_id, card_number, duration_minutes: int, reason: str,
+                   violation_count: int, now: float = None) -> str:
+        """חסימת כרטיס מיידית בזיכרון; מחזיר block_until כמחרוזת UTC"""
+        sid = int(student_id or 0)
+        if now is None:
+            now = time.time()
+        try:
+            duration = int(duration_minutes or 0)
+        except Exception:
+            duration = 60
+        until = float(now) + max(0, duration) * 60.0
+        until_str = _utc_str(until)
+        with self._lock:
+            self._blocks[sid] = (until, str(reason or ''))
+            self._violations[sid] = int(violation_count or 0)
+            self._queue(self._pending_blocks, (
+                sid, str(card_number or '').strip(), _utc_str(now), until_str,
+                str(reason or ''), int(violation_count or 0),
+            ))
+        self._wake.set()
+        return until_str
+
+    def log_event(self, *, student_id, card_number, event_type, rule_count=None, rule_minutes=None,
+                  duration_minutes=None, recent_count=None, message='', now: float = None) -> None:
+        """רישום אירוע אזהרה/חסימה לדוח האנטי-ספאם"""
+        if now is None:
+            now = time.time()
+        with self._lock:
+            self._queue(self._pending_events, (
+                int(student_id or 0), str(card_number or '').strip(), str(event_type or ''),
+                rule_count, rule_minutes, duration_minutes, recent_count,
+                str(message or ''), _utc_str(now),
+            ))
+
+    def _queue(self, target: list, row: tuple) -> None:
+        target.append(row)
+        if len(target) > self._max_pending:
+            # DB לא זמין לאורך זמן – נשמור רק את החדשים
+            del target[:len(target) - self._max_pending]
+
+    def flush(self) -> bool:
+        """כתיבת כל הרשומות הממתינות בטרנזקציה אחת"""
+        with self._lock:
+            validations = self._pending_validations
+            blocks = self._pending_blocks
+            events = self._pending_events
+            if not validations and not blocks and not events:
+                return True
+            self._pending_validations = []
+            self._pending_blocks = []
+            self._pending_events = []
+        try:
+            self.db.write_anti_spam_batch(validations=validations, blocks=blocks, events=events)
+            return True
+        except sqlite3.IntegrityError as e:
+            # שורה אחת פסולה (למשל תלמיד שנמחק) – כותבים שורה-שורה ומוותרים רק עליה
+            print(f"[ANTI-SPAM] batch write failed, retrying row by row: {e}")
+            return self._flush_rows(validations, blocks, events)
+        except Exception as e:
+            print(f"[ANTI-SPAM] batch write failed: {e}")
+            self._requeue(validations, blocks, events)
+            return False
+
+    def _flush_rows(self, validations: list, blocks: list, events: list) -> bool:
+        pending = ([('validations', r) for r in validations] + [('blocks', r) for r in blocks]
+                   + [('events', r) for r in events])
+        for i, (kind, row) in enumerate(pending):
+            try:
+                self.db.write_anti_spam_batch(**{kind: [row]})
+            except sqlite3.IntegrityError as e:
+                print(f"[ANTI-SPAM] dropping {kind[:-1]} for student {row[0]}: {e}")
+            except Exception as e:
+                print(f"[ANTI-SPAM] row write failed: {e}")
+                rest = pending[i:]
+                self._requeue([r for k, r in rest if k == 'validations'],
+                              [r for k, r in rest if k == 'blocks'],
+                              [r for k, r in rest if k == 'events'])
+                return False
+        return True
+
+    def _requeue(self, validations: list, blocks: list, events: list) -> None:
+        """החזרה לראש התור (לפני מה שנצבר בינתיים), לניסיון במחזור הבא"""
+        with self._lock:
+            self._pending_validations[:0] = validations
+            self._pending_blocks[:0] = blocks
+            self._pending_events[:0] = events
+
+    def _writer_loop(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self._flush_interval_sec)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            self.flush()
+            try:
+                if (time.time() - float(self._last_validations_sync_ts or 0.0)) >= self._validations_resync_sec:
+                    self._resync_validations()
+                if (time.time() - float(self._last_blocks_sync_ts or 0.0)) >= self._blocks_resync_sec:
+                    self._resync_blocks()
+            except Exception:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'students': len(self._swipes),
+                'blocks': len(self._blocks),
+                'pending': len(self._pending_validations) + len(self._pending_blocks) + len(self._pending_events),
+            }
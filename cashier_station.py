@@ -1,3 +1,4 @@
+import startup_profile
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, simpledialog
 import os
@@ -23,6 +24,10 @@ from license_manager import LicenseManager
 from customer_display import CustomerDisplay
 from receipt_image_generator import create_receipt_image
 from thermal_printer import ThermalPrinterCached, HebrewDate
+from escpos_builder import (
+    EscPosWriter, SEGMENTS, raster_bytes,
+    SIZE_NORMAL, SIZE_LARGE, SIZE_LARGE2, SIZE_XLARGE,
+)
 
 
 UNIVERSAL_MASTER_CODE = "05276247440527624744"
@@ -350,6 +355,11 @@ class CashierStation:
         self._lock()
         self._schedule_idle_check()
         self._schedule_hold_heartbeat()
+        try:
+            # ניקוי שריונים שפג תוקפם ברקע (במקום בתחילת כל פעולת שריון)
+            self.db.start_hold_sweeper()
+        except Exception:
+            pass
         try:
             self._schedule_update_checks()
         except Exception:
@@ -378,33 +388,8 @@ class CashierStation:
         except Exception:
             now = None
 
-        ESC = b'\x1b'
-        GS = b'\x1d'
-        INIT = ESC + b'@'
-        codepage_byte = bytes([codepage & 0xFF])
-        CODEPAGE = ESC + b't' + codepage_byte
-        CUT = GS + b'V\x31'
-        BOLD_ON = ESC + b'E\x01'
-        BOLD_OFF = ESC + b'E\x00'
-        LARGE = GS + b'!\x11'
-        XLARGE = GS + b'!\x33'
-        LARGE2 = GS + b'!\x22'
-        NORMAL = GS + b'!\x00'
-        CENTER = ESC + b'a\x01'
-        RIGHT = ESC + b'a\x02'
-        LEFT = ESC + b'a\x00'
-        UNDERLINE_ON = ESC + b'-\x02'
-        UNDERLINE_OFF = ESC + b'-\x00'
-
-        def _rev(s: str) -> str:
-            return s[::-1]
-
-        def _enc(s: str) -> bytes:
-            return str(s or "").encode(encoding, errors="replace")
-
-        out = INIT
-        if send_codepage:
-            out += CODEPAGE
+        w = EscPosWriter(encoding)
+        w.init(codepage if send_codepage else None)
 
         # Logo
         logo_bytes = b''
@@ -413,38 +398,35 @@ class CashierStation:
         except Exception:
             logo_bytes = b''
         if logo_bytes:
-            out += CENTER
-            out += logo_bytes
-            out += b'\n'
+            w.align('center')
+            w.raw(logo_bytes)
+            w.newline()
 
         # Creative top decoration
-        out += CENTER
-        top_decoration = self._get_cached_text_decoration('stars')
-        if top_decoration:
-            out += top_decoration + b'\n'
-        else:
-            out += b'=' * 32 + b'\n'
+        w.align('center')
+        w.segment_line(self._get_cached_text_decoration('stars'), b'=')
 
         # Title with underline (prefer bitmap title)
-        out += CENTER
+        w.align('center')
         title_bytes = self._get_cached_text_title_bytes('קבלה')
         if title_bytes:
-            out += title_bytes + b'\n'
+            w.segment_line(title_bytes)
         else:
-            out += XLARGE + BOLD_ON + UNDERLINE_ON
-            title = _rev('קבלה')
-            out += _enc(title)
-            out += b'\n'
-            out += UNDERLINE_OFF + NORMAL + BOLD_OFF
-
-        mid_decoration = self._get_cached_text_decoration('wave')
-        if mid_decoration:
-            out += mid_decoration + b'\n\n'
-        else:
-            out += b'-' * 32 + b'\n\n'
+            w.size(SIZE_XLARGE)
+            w.bold()
+            w.underline()
+            w.label('קבלה')
+            w.newline()
+            w.underline(False)
+            w.size(SIZE_NORMAL)
+            w.bold(False)
+
+        w.segment_line(self._get_cached_text_decoration('wave'), b'-')
+        w.newline()
 
         # Student info
-        out += RIGHT + LARGE
+        w.align('right')
+        w.size(SIZE_LARGE)
         try:
             student_name = str(receipt_data.get('student_name') or '').strip()
         except Exception:
@@ -455,51 +437,38 @@ class CashierStation:
             class_name = ''
         
         if student_name:
-            line = _rev(f"תלמיד: {student_name}")
-            out += _enc(line)
-            out += b'\n'
+            w.rtl_line(f"תלמיד: {student_name}")
         if class_name:
-            line = _rev(f"כיתה: {class_name}")
-            out += _enc(line)
-            out += b'\n'
-        out += NORMAL + b'\n'
+            w.rtl_line(f"כיתה: {class_name}")
+        w.size(SIZE_NORMAL)
+        w.newline()
 
         # Hebrew date and time
         try:
             if now is not None:
-                hebrew_date = HebrewDate.get_hebrew_date(now)
-                out += _enc(_rev(hebrew_date))
-                out += b'\n'
-                time_line = f"{now.strftime('%H:%M:%S')} :" + _rev('שעה')
-                out += _enc(time_line)
-                out += b'\n\n'
+                w.rtl_line(HebrewDate.get_hebrew_date(now))
+                w.text(f"{now.strftime('%H:%M:%S')} :")
+                w.label('שעה')
+                w.newline(2)
         except Exception:
             pass
 
         # Purchases section with arrows
-        out += CENTER
-        header_decoration = self._get_cached_text_decoration('zigzag')
-        if header_decoration:
-            out += header_decoration + b'\n'
-        else:
-            out += b'-' * 32 + b'\n'
-        out += BOLD_ON
-        header = ">>> " + _rev('פירוט קניות') + " <<<"
-        out += _enc(header)
-        out += b'\n'
-        out += BOLD_OFF
-        underline_decoration = self._get_cached_text_decoration('dots')
-        if underline_decoration:
-            out += underline_decoration + b'\n'
-        else:
-            out += b'-' * 32 + b'\n'
+        w.align('center')
+        w.segment_line(self._get_cached_text_decoration('zigzag'), b'-')
+        w.bold()
+        w.text(">>> ")
+        w.label('פירוט קניות')
+        w.line(" <<<")
+        w.bold(False)
+        w.segment_line(self._get_cached_text_decoration('dots'), b'-')
         
         try:
             items = receipt_data.get('items', []) or []
         except Exception:
             items = []
         
-        out += RIGHT
+        w.align('right')
         total_points = 0
         for item in items:
             try:
@@ -522,38 +491,31 @@ class CashierStation:
             
             if nm:
                 # Format: "נקודות 10      שוקולד x2"
-                points_text = _rev('נקודות')
-                if qty > 1:
-                    item_name = f"{nm} x{qty}"
-                    spacing = max(1, 20 - len(item_name))
-                    line = points_text + f" {item_total:d}" + " " * spacing + _rev(item_name)
-                else:
-                    spacing = max(1, 20 - len(nm))
-                    line = points_text + f" {item_total:d}" + " " * spacing + _rev(nm)
-                out += _enc(line)
-                out += b'\n'
+                item_name = f"{nm} x{qty}" if qty > 1 else nm
+                spacing = max(1, 20 - len(item_name))
+                w.label('נקודות')
+                w.text(f" {item_total:d}" + " " * spacing)
+                w.rtl_line(item_name)
 
         # Total
-        out += CENTER
-        total_divider = self._get_cached_text_decoration('dots')
-        if total_divider:
-            out += total_divider + b'\n'
-        else:
-            out += b'=' * 32 + b'\n'
-        out += CENTER + LARGE2 + BOLD_ON + UNDERLINE_ON
-        total_line = f"{total_points:d} :" + _rev('סך הכל')
-        out += _enc(total_line)
-        out += b'\n'
-        out += UNDERLINE_OFF + NORMAL + BOLD_OFF
-        out += b'\n'
+        w.align('center')
+        w.segment_line(self._get_cached_text_decoration('dots'), b'=')
+        w.align('center')
+        w.size(SIZE_LARGE2)
+        w.bold()
+        w.underline()
+        w.text(f"{total_points:d} :")
+        w.label('סך הכל')
+        w.newline()
+        w.underline(False)
+        w.size(SIZE_NORMAL)
+        w.bold(False)
+        w.newline()
 
         # Points balance
         points_divider = self._get_cached_text_decoration('dots')
-        if points_divider:
-            out += points_divider + b'\n'
-        else:
-            out += b'.' * 32 + b'\n'
-        out += RIGHT
+        w.segment_line(points_divider, b'.')
+        w.align('right')
         try:
             bb = receipt_data.get('balance_before', None)
             ba = receipt_data.get('balance_after', None)
@@ -567,45 +529,38 @@ class CashierStation:
                 except Exception:
                     ba_i = None
                 if bb_i is not None:
-                    line = f"{bb_i:d} :" + _rev('נקודות לפני')
-                    out += _enc(line)
-                    out += b'\n'
+                    w.text(f"{bb_i:d} :")
+                    w.label('נקודות לפני')
+                    w.newline()
                 if ba_i is not None:
-                    line = f"{ba_i:d} :" + _rev('נקודות אחרי')
-                    out += _enc(line)
-                    out += b'\n'
+                    w.text(f"{ba_i:d} :")
+                    w.label('נקודות אחרי')
+                    w.newline()
         except Exception:
             pass
 
-        if points_divider:
-            out += points_divider + b'\n'
-        else:
-            out += b'.' * 32 + b'\n'
+        w.segment_line(points_divider, b'.')
 
         # Closing message
         closing_text = str(closing_message or receipt_data.get('closing_message') or '').strip()
         if closing_text:
-            out += b'\n'
-            out += CENTER + BOLD_ON
+            w.newline()
+            w.align('center')
+            w.bold()
             for line in closing_text.split('\n'):
                 if line.strip():
-                    msg_line = _rev(line.strip())
-                    out += _enc(msg_line)
-                    out += b'\n'
-            out += BOLD_OFF
+                    w.rtl_line(line.strip())
+            w.bold(False)
 
         # Bottom line
-        out += b'\n'
+        w.newline()
         bottom_decoration = self._get_cached_text_decoration('stars')
-        out += CENTER
-        if bottom_decoration:
-            out += bottom_decoration + b'\n'
-        else:
-            out += b'=' * 32 + b'\n'
+        w.align('center')
+        w.segment_line(bottom_decoration, b'=')
 
-        out += b'\n\n\n\n\n'
-        out += CUT
-        return out
+        w.newline(5)
+        w.cut()
+        return w.getvalue()
     
     def _print_with_decorated_printer(self, receipt_data: dict, printer_name: str, cfg: dict) -> bool:
         """Print using new decorated thermal printer with caching."""
@@ -704,54 +659,27 @@ class CashierStation:
         except Exception:
             now = None
 
-        ESC = b'\x1b'
-        GS = b'\x1d'
-        INIT = ESC + b'@'
-        codepage_byte = bytes([codepage & 0xFF])
-        CODEPAGE = ESC + b't' + codepage_byte
-        CENTER = ESC + b'a\x01'
-        RIGHT = ESC + b'a\x02'
-        BOLD_ON = ESC + b'E\x01'
-        BOLD_OFF = ESC + b'E\x00'
-        LARGE = GS + b'!\x11'
-        LARGE2 = GS + b'!\x22'
-        NORMAL = GS + b'!\x00'
-        UNDERLINE_ON = ESC + b'-\x02'
-        UNDERLINE_OFF = ESC + b'-\x00'
-        CUT = GS + b'V\x31'
-
-        def _enc(s: str) -> bytes:
-            return str(s or '').encode(encoding, errors='replace')
-
-        def _rev(s: str) -> str:
-            return s[::-1]
-
-        out = INIT
-        if send_codepage:
-            out += CODEPAGE
-
-        out += CENTER
-        top_decoration = self._get_cached_text_decoration('stars')
-        if top_decoration:
-            out += top_decoration + b'\n'
-        else:
-            out += b'=' * 32 + b'\n'
+        w = EscPosWriter(encoding)
+        w.init(codepage if send_codepage else None)
 
-        out += CENTER
+        w.align('center')
+        w.segment_line(self._get_cached_text_decoration('stars'), b'=')
+
+        w.align('center')
         title_bytes = self._get_cached_text_title_bytes('שובר קנייה')
         if title_bytes:
-            out += title_bytes + b'\n'
-        else:
-            out += LARGE2 + BOLD_ON + UNDERLINE_ON
-            out += _enc(_rev('שובר קנייה'))
-            out += b'\n'
-            out += UNDERLINE_OFF + NORMAL + BOLD_OFF
-
-        mid_decoration = self._get_cached_text_decoration('wave')
-        if mid_decoration:
-            out += mid_decoration + b'\n'
+            w.segment_line(title_bytes)
         else:
-            out += b'-' * 32 + b'\n'
+            w.size(SIZE_LARGE2)
+            w.bold()
+            w.underline()
+            w.label('שובר קנייה')
+            w.newline()
+            w.underline(False)
+            w.size(SIZE_NORMAL)
+            w.bold(False)
+
+        w.segment_line(self._get_cached_text_decoration('wave'), b'-')
 
         try:
             student_name = str(voucher_data.get('student_name') or '').strip()
@@ -761,44 +689,33 @@ class CashierStation:
             class_name = str(voucher_data.get('class_name') or '').strip()
         except Exception:
             class_name = ''
-        out += RIGHT + LARGE
+        w.align('right')
+        w.size(SIZE_LARGE)
         if student_name:
-            out += _enc(_rev(f"תלמיד: {student_name}"))
-            out += b'\n'
+            w.rtl_line(f"תלמיד: {student_name}")
         if class_name:
-            out += _enc(_rev(f"כיתה: {class_name}"))
-            out += b'\n'
-        out += NORMAL
+            w.rtl_line(f"כיתה: {class_name}")
+        w.size(SIZE_NORMAL)
 
         try:
             if now is not None:
-                hebrew_date = HebrewDate.get_hebrew_date(now)
-                out += _enc(_rev(hebrew_date))
-                out += b'\n'
-                time_line = f"{now.strftime('%H:%M:%S')} :" + _rev('שעה')
-                out += _enc(time_line)
-                out += b'\n'
+                w.rtl_line(HebrewDate.get_hebrew_date(now))
+                w.text(f"{now.strftime('%H:%M:%S')} :")
+                w.label('שעה')
+                w.newline()
         except Exception:
             pass
 
-        out += b'\n'
+        w.newline()
 
-        out += CENTER
-        header_decoration = self._get_cached_text_decoration('zigzag')
-        if header_decoration:
-            out += header_decoration + b'\n'
-        else:
-            out += b'-' * 32 + b'\n'
-        out += BOLD_ON
-        header = ">>> " + _rev('פרטי פריט') + " <<<"
-        out += _enc(header)
-        out += b'\n'
-        out += BOLD_OFF
-        underline_decoration = self._get_cached_text_decoration('dots')
-        if underline_decoration:
-            out += underline_decoration + b'\n'
-        else:
-            out += b'-' * 32 + b'\n'
+        w.align('center')
+        w.segment_line(self._get_cached_text_decoration('zigzag'), b'-')
+        w.bold()
+        w.text(">>> ")
+        w.label('פרטי פריט')
+        w.line(" <<<")
+        w.bold(False)
+        w.segment_line(self._get_cached_text_decoration('dots'), b'-')
 
         try:
             item_name = str(voucher_data.get('item_name') or '').strip()
@@ -829,22 +746,24 @@ class CashierStation:
         except Exception:
             duration_minutes = 0
 
-        out += RIGHT
+        w.align('right')
         if item_name:
-            out += BOLD_ON
-            out += _enc(_rev(item_name))
-            out += b'\n'
-            out += BOLD_OFF
+            w.bold()
+            w.rtl_line(item_name)
+            w.bold(False)
         if qty and qty != 1:
-            out += _enc(f"{qty:d} :" + _rev('כמות'))
-            out += b'\n'
+            w.text(f"{qty:d} :")
+            w.label('כמות')
+            w.newline()
         if price:
-            out += _enc(f"{price:d} :" + _rev('נקודות ליחידה'))
-            out += b'\n'
+            w.text(f"{price:d} :")
+            w.label('נקודות ליחידה')
+            w.newline()
         if qty and price:
             total_points = qty * price
-            out += _enc(f"{total_points:d} :" + _rev('סך הכל'))
-            out += b'\n'
+            w.text(f"{total_points:d} :")
+            w.label('סך הכל')
+            w.newline()
         if service_date:
             hebrew_service_date = ''
             try:
@@ -852,54 +771,56 @@ class CashierStation:
             except Exception:
                 hebrew_service_date = ''
             if hebrew_service_date:
-                out += _enc(f"{_rev(hebrew_service_date)} :" + _rev('תאריך עברי'))
-                out += b'\n'
+                w.rtl(hebrew_service_date)
+                w.text(" :")
+                w.label('תאריך עברי')
+                w.newline()
         if slot_time:
-            out += _enc(f"{slot_time} :" + _rev('שעה'))
-            out += b'\n'
+            w.text(f"{slot_time} :")
+            w.label('שעה')
+            w.newline()
         if slot_text and not (service_date or slot_time):
-            out += _enc(f"{slot_text} :" + _rev('זמן האתגר'))
-            out += b'\n'
+            w.text(f"{slot_text} :")
+            w.label('זמן האתגר')
+            w.newline()
         if duration_minutes:
-            out += _enc(f"{duration_minutes:d} " + _rev('דקות') + " :" + _rev('משך'))
-            out += b'\n'
+            w.text(f"{duration_minutes:d} ")
+            w.label('דקות')
+            w.text(" :")
+            w.label('משך')
+            w.newline()
 
         points_before = voucher_data.get('points_before', None)
         points_after = voucher_data.get('points_after', None)
         if points_before is not None or points_after is not None:
-            divider = self._get_cached_text_decoration('dots')
-            out += CENTER
-            if divider:
-                out += divider + b'\n'
-            else:
-                out += b'.' * 32 + b'\n'
-            out += RIGHT
+            w.align('center')
+            w.segment_line(self._get_cached_text_decoration('dots'), b'.')
+            w.align('right')
             try:
                 if points_before is not None:
                     pb_i = int(float(points_before))
-                    out += _enc(f"{pb_i:d} :" + _rev('נקודות לפני'))
-                    out += b'\n'
+                    w.text(f"{pb_i:d} :")
+                    w.label('נקודות לפני')
+                    w.newline()
             except Exception:
                 pass
             try:
                 if points_after is not None:
                     pa_i = int(float(points_after))
-                    out += _enc(f"{pa_i:d} :" + _rev('נקודות אחרי'))
-                    out += b'\n'
+                    w.text(f"{pa_i:d} :")
+                    w.label('נקודות אחרי')
+                    w.newline()
             except Exception:
                 pass
 
-        out += b'\n'
+        w.newline()
         bottom_decoration = self._get_cached_text_decoration('stars')
-        out += CENTER
-        if bottom_decoration:
-            out += bottom_decoration + b'\n'
-        else:
-            out += b'=' * 32 + b'\n'
+        w.align('center')
+        w.segment_line(bottom_decoration, b'=')
 
-        out += b'\n\n\n'
-        out += CUT
-        return out
+        w.newline(3)
+        w.cut()
+        return w.getvalue()
 
         t = None
         try:
@@ -2280,6 +2201,7 @@ class CashierStation:
                     self.db.clear_holds(station_id=str(self.station_id or '').strip(), student_id=int(sid))
                 except Exception:
                     pass
+                self._invalidate_slot_availability()
         self._cart = {}
         self._scheduled_cart = []
         self._refresh_cart_ui()
@@ -3258,94 +3180,59 @@ class CashierStation:
             student_id = 0
         dur0 = int(svc.get('duration_minutes', 10) or 10)
 
-        def _to_min(hhmm: str) -> int:
-            try:
-                hhmm = str(hhmm or '').strip()
-                if ':' not in hhmm:
-                    return -1
-                hh, mm = hhmm.split(':', 1)
-                return int(hh) * 60 + int(mm)
-            except Exception:
-                return -1
-
-        for d in dates:
-            try:
-                slots = self.db.get_scheduled_service_slots(service_id=int(sid), service_date=str(d)) or []
-            except Exception:
-                slots = []
-
-            try:
-                existing = self.db.get_student_scheduled_reservations_on_date(student_id=int(student_id), service_date=str(d)) or []
-            except Exception:
-                existing = []
-
-            def _conflicts(start_time: str) -> bool:
-                sm = _to_min(start_time)
-                if sm < 0:
-                    return True
-                em = sm + int(dur0 or 0)
-
-                for r in (existing or []):
-                    try:
-                        os_ = _to_min(r.get('slot_start_time'))
-                        od = int(r.get('duration_minutes') or 0)
-                    except Exception:
-                        os_ = -1
-                        od = 0
-                    if os_ < 0 or od <= 0:
-                        continue
-                    oe = os_ + od
-                    if sm < oe and os_ < em:
-                        return True
-
-                for r in (self._scheduled_cart or []):
-                    if str(r.get('service_date') or '').strip() != str(d):
-                        continue
-                    try:
-                        os_ = _to_min(r.get('slot_start_time'))
-                        od = int(r.get('duration_minutes') or 0)
-                    except Exception:
-                        os_ = -1
-                        od = 0
-                    if os_ < 0 or od <= 0:
-                        continue
-                    oe = os_ + od
-                    if sm < oe and os_ < em:
-                        return True
-
-                return False
-
-            for s in slots:
-                if int(s.get('remaining', 0) or 0) <= 0:
-                    continue
-                stt = str(s.get('slot_start_time') or '').strip()
-                if _conflicts(stt):
-                    continue
-                hr = self.db.create_scheduled_hold(
-                    station_id=str(self.station_id or '').strip(),
-                    student_id=int(student_id or 0),
-                    service_id=int(sid),
-                    service_date=str(d),
-                    slot_start_time=str(stt),
-                    duration_minutes=int(dur0),
-                )
-                if not hr or not hr.get('ok'):
-                    continue
-                self._scheduled_cart.append({
-                    'product_id': int(pid),
-                    'variant_id': int(vid_selected or 0),
-                    'service_id': int(sid),
-                    'service_date': str(d),
-                    'slot_start_time': stt,
-                    'duration_minutes': int(dur0),
-                })
-                self._refresh_cart_ui()
-                self._render_product_grid()
-                return
+        # סלוט פנוי ראשון בקריאה אחת (מטמון זמינות); אם עמדה אחרת תפסה אותו בינתיים – מנסים שוב
+        availability = self._get_slot_availability()
+        for _attempt in range(3):
+            found = availability.first_free_slot(
+                int(sid), dates, int(student_id or 0), extra_busy=list(self._scheduled_cart or [])
+            )
+            if not found:
+                break
+            d, s = found
+            stt = str(s.get('slot_start_time') or '').strip()
+            hr = self.db.create_scheduled_hold(
+                station_id=str(self.station_id or '').strip(),
+                student_id=int(student_id or 0),
+                service_id=int(sid),
+                service_date=str(d),
+                slot_start_time=str(stt),
+                duration_minutes=int(dur0),
+            )
+            availability.invalidate(int(sid))
+            if not hr or not hr.get('ok'):
+                continue
+            self._scheduled_cart.append({
+                'product_id': int(pid),
+                'variant_id': int(vid_selected or 0),
+                'service_id': int(sid),
+                'service_date': str(d),
+                'slot_start_time': stt,
+                'duration_minutes': int(dur0),
+            })
+            self._refresh_cart_ui()
+            self._render_product_grid()
+            return
 
         messagebox.showwarning('אין זמן פנוי', 'אין סלוט פנוי שאינו מתנגש עם אתגר אחר של התלמיד')
         return
 
+    def _get_slot_availability(self):
+        """מטמון זמינות סלוטים לאתגרים מתוזמנים (TTL קצר)"""
+        sa = getattr(self, '_slot_availability', None)
+        if sa is None:
+            from scheduled_slots import SlotAvailability
+            sa = SlotAvailability(self.db, station_id=str(self.station_id or '').strip())
+            self._slot_availability = sa
+        return sa
+
+    def _invalidate_slot_availability(self, service_id: int = None):
+        try:
+            sa = getattr(self, '_slot_availability', None)
+            if sa is not None:
+                sa.invalidate(service_id)
+        except Exception:
+            pass
+
     def _open_scheduled_service_picker(self, product_id: int):
         pid = int(product_id or 0)
         svc = self._scheduled_by_pid.get(pid)
@@ -3411,7 +3298,7 @@ class CashierStation:
                 pass
             slots = []
             try:
-                slots = self.db.get_scheduled_service_slots(service_id=int(sid), service_date=str(d)) or []
+                slots = self._get_slot_availability().slots(int(sid), str(d))
             except Exception:
                 slots = []
             for s in slots:
@@ -3478,6 +3365,7 @@ class CashierStation:
                 slot_start_time=str(selected_slot['value']),
                 duration_minutes=int(svc.get('duration_minutes', 10) or 10),
             )
+            self._invalidate_slot_availability(int(sid))
             if not hr or not hr.get('ok'):
                 messagebox.showwarning('אין מקום', str((hr or {}).get('error') or 'הסלוט מלא'))
                 try:
@@ -5484,6 +5372,7 @@ class CashierStation:
                 self.db.clear_holds(station_id=str(self.station_id or '').strip(), student_id=int(student_id or 0))
             except Exception:
                 pass
+            self._invalidate_slot_availability()
             return
 
         try:
@@ -5511,6 +5400,7 @@ class CashierStation:
             self.db.clear_holds(station_id=str(self.station_id or '').strip(), student_id=int(student_id or 0))
         except Exception:
             pass
+        self._invalidate_slot_availability()
 
         # Show total on customer display
         try:
@@ -5664,6 +5554,7 @@ class CashierStation:
                     if idx >= 0:
                         by_idx[idx] = sr
 
+                vouchers = []
                 for it in (items or []):
                     try:
                         pid = int(it.get('product_id') or 0)
@@ -5696,6 +5587,8 @@ class CashierStation:
 
                     slot_txt = ''
                     dur_mins = 0
+                    sdate = ''
+                    stt = ''
                     sr = by_idx.get(int(it.get('purchase_item_index') or -1))
                     if not sr:
                         try:
@@ -5714,18 +5607,20 @@ class CashierStation:
                         elif stt:
                             slot_txt = stt
 
-                    # Print voucher to thermal printer instead of PDF
+                    vouchers.append({
+                        'item_label': str(label or '').strip(),
+                        'qty': int(qty or 1),
+                        'price_points': int(price or 0),
+                        'slot_text': str(slot_txt or '').strip(),
+                        'duration_minutes': int(dur_mins or 0),
+                        'service_date': str(sdate or '').strip(),
+                        'slot_time': str(stt or '').strip(),
+                    })
+
+                # Print all vouchers to the thermal printer as a single job
+                if vouchers:
                     try:
-                        self._print_item_voucher_to_thermal(
-                            student_id=int(student_id or 0),
-                            item_label=str(label or '').strip(),
-                            qty=int(qty or 1),
-                            price_points=int(price or 0),
-                            slot_text=str(slot_txt or '').strip(),
-                            duration_minutes=int(dur_mins or 0),
-                            service_date=str(sdate or '').strip(),
-                            slot_time=str(stt or '').strip(),
-                        )
+                        self._print_item_vouchers_batch(int(student_id or 0), vouchers)
                     except Exception as e:
                         print(f"Voucher print error: {e}")
             except Exception as e:
@@ -6327,42 +6222,15 @@ class CashierStation:
         return enabled, cmd
 
     def _image_to_escpos_bytes(self, img) -> bytes:
-        try:
-            w, h = img.size
-            width_bytes = (w + 7) // 8
-            data = bytearray()
-            data.extend(b'\x1D\x76\x30\x00')
-            data.extend(bytes([width_bytes & 0xFF, (width_bytes >> 8) & 0xFF]))
-            data.extend(bytes([h & 0xFF, (h >> 8) & 0xFF]))
-            for y in range(h):
-                for x in range(0, w, 8):
-                    byte_val = 0
-                    for bit in range(8):
-                        if x + bit < w:
-                            try:
-                                pixel = img.getpixel((x + bit, y))
-                            except Exception:
-                                pixel = 255
-                            if pixel == 0:
-                                byte_val |= (1 << (7 - bit))
-                    data.append(byte_val)
-            return bytes(data)
-        except Exception:
-            return b''
+        return raster_bytes(img)
 
     def _get_cached_text_title_bytes(self, title: str) -> bytes:
         title = str(title or '').strip()
         if not title:
             return b''
-        try:
-            cache = getattr(self, '_text_title_cache', None)
-            if not isinstance(cache, dict):
-                cache = {}
-                setattr(self, '_text_title_cache', cache)
-            if title in cache:
-                return cache.get(title) or b''
-        except Exception:
-            cache = None
+        cached = SEGMENTS.lookup(('title', title))
+        if cached is not None:
+            return cached
 
         try:
             from PIL import Image, ImageDraw, ImageFont
@@ -6405,26 +6273,16 @@ class CashierStation:
             return b''
 
         data = self._image_to_escpos_bytes(img)
-        try:
-            if cache is not None:
-                cache[title] = data
-        except Exception:
-            pass
+        SEGMENTS.put(('title', title), data)
         return data
 
     def _get_cached_text_decoration(self, name: str) -> bytes:
         name = str(name or '').strip().lower()
         if not name:
             return b''
-        try:
-            cache = getattr(self, '_text_decoration_cache', None)
-            if not isinstance(cache, dict):
-                cache = {}
-                setattr(self, '_text_decoration_cache', cache)
-            if name in cache:
-                return cache.get(name) or b''
-        except Exception:
-            cache = None
+        cached = SEGMENTS.lookup(('decoration', name))
+        if cached is not None:
+            return cached
 
         try:
             from PIL import Image, ImageDraw
@@ -6469,8 +6327,7 @@ class CashierStation:
                 return b''
 
             data = self._image_to_escpos_bytes(img)
-            if isinstance(cache, dict):
-                cache[name] = data
+            SEGMENTS.put(('decoration', name), data)
             return data
         except Exception:
             return b''
@@ -6490,16 +6347,12 @@ class CashierStation:
             return b''
 
         try:
-            cache = getattr(self, '_text_logo_cache', None)
-            if not isinstance(cache, dict):
-                cache = {}
-                setattr(self, '_text_logo_cache', cache)
-            mtime = os.path.getmtime(logo_path)
-            cached = cache.get('data') if cache.get('path') == logo_path and cache.get('mtime') == mtime else None
-            if cached:
-                return cached
+            key = ('logo', logo_path, os.path.getmtime(logo_path))
         except Exception:
-            cache = None
+            key = None
+        cached = SEGMENTS.lookup(key) if key is not None else None
+        if cached:
+            return cached
 
         try:
             from PIL import Image
@@ -6520,13 +6373,8 @@ class CashierStation:
             img_bw = img_resized.point(lambda p: 0 if p < 128 else 255, mode='1')
 
             data = self._image_to_escpos_bytes(img_bw)
-            try:
-                if isinstance(cache, dict):
-                    cache['path'] = logo_path
-                    cache['mtime'] = mtime
-                    cache['data'] = data
-            except Exception:
-                pass
+            if key is not None and data:
+                SEGMENTS.put(key, data)
             return data
         except Exception:
             return b''
@@ -6885,6 +6733,22 @@ class CashierStation:
         slot_time: str = '',
     ):
         """Print simple item voucher to thermal printer"""
+        return self._print_item_vouchers_batch(student_id, [{
+            'item_label': item_label,
+            'qty': qty,
+            'price_points': price_points,
+            'slot_text': slot_text,
+            'duration_minutes': duration_minutes,
+            'service_date': service_date,
+            'slot_time': slot_time,
+        }])
+
+    def _print_item_vouchers_batch(self, student_id: int, vouchers: list) -> bool:
+        """הדפסת כל שוברי הפריטים של רכישה כעבודת הדפסה אחת (חיתוך בין שובר לשובר).
+        תלמיד, הגדרות ולוגו נטענים פעם אחת; השוברים מרונדרים מראש ורק אז נפתחת המדפסת."""
+        vouchers = [v for v in (vouchers or []) if isinstance(v, dict)]
+        if not vouchers:
+            return True
         try:
             # Get student info
             try:
@@ -6894,137 +6758,152 @@ class CashierStation:
             st = st or (self._current_student or {})
             student_name = f"{str(st.get('first_name') or '').strip()} {str(st.get('last_name') or '').strip()}".strip()
             cls = str(st.get('class_name') or '').strip()
-            
+
             try:
                 cfg = self._load_app_config() or {}
             except Exception:
                 cfg = {}
 
-            points_after = None
-            points_before = None
             try:
                 points_after = int(float(st.get('points', 0) or 0)) if st else None
-                points_before = int(points_after or 0) + int(qty or 0) * int(price_points or 0)
             except Exception:
-                points_before = None
                 points_after = None
 
-            service_date = str(service_date or '').strip()
-            slot_time = str(slot_time or '').strip()
-            if not service_date and not slot_time and slot_text:
-                try:
-                    parts = str(slot_text).strip().split()
-                except Exception:
-                    parts = []
-                if len(parts) >= 2:
-                    service_date = parts[0]
-                    slot_time = parts[1]
-                elif len(parts) == 1 and ':' in parts[0]:
-                    slot_time = parts[0]
-
-            # Build simple voucher data
-            voucher_data = {
-                'student_name': student_name,
-                'class_name': cls,
-                'item_name': item_label,
-                'qty': qty,
-                'price': price_points,
-                'slot_text': slot_text,
-                'service_date': service_date,
-                'slot_time': slot_time,
-                'duration_minutes': duration_minutes,
-                'points_before': points_before,
-                'points_after': points_after,
-            }
-
-            try:
-                printer_cfg = cfg.get('receipt_printer', {})
-                mode = str((printer_cfg or {}).get('mode') or '').strip().lower()
-            except Exception:
-                mode = ''
-            if mode == 'text':
-                printer_name = ''
+            voucher_datas = []
+            for v in vouchers:
                 try:
-                    printer_name = str((cfg or {}).get('default_printer') or '').strip()
+                    qty = int(v.get('qty') or 1)
                 except Exception:
-                    printer_name = ''
-                if not printer_name:
-                    printer_name = 'Cash Printer'
-                text_encoding = str((printer_cfg or {}).get('text_encoding') or 'cp862').strip()
+                    qty = 1
                 try:
-                    text_codepage = int((printer_cfg or {}).get('text_codepage', 0x0F))
+                    price_points = int(v.get('price_points') or 0)
                 except Exception:
-                    text_codepage = 0x0F
-                send_codepage = bool((printer_cfg or {}).get('send_codepage', True))
-                logo_path = ''
+                    price_points = 0
+                slot_text = str(v.get('slot_text') or '').strip()
                 try:
-                    logo_path = self.db.get_cashier_bw_logo_path() or cfg.get('logo_path', '')
+                    duration_minutes = int(v.get('duration_minutes') or 0)
                 except Exception:
-                    logo_path = cfg.get('logo_path', '')
-                data = self._build_thermal_text_voucher_bytes(
-                    voucher_data,
-                    encoding=text_encoding,
-                    codepage=text_codepage,
-                    send_codepage=send_codepage,
-                    logo_path=logo_path,
-                )
-                return bool(self._send_raw_bytes_to_printer(printer_name, data))
-            
-            # Create simple voucher image (not full receipt)
-            from voucher_image_generator import create_voucher_image
-            
+                    duration_minutes = 0
+
+                points_before = None
+                if points_after is not None:
+                    try:
+                        points_before = int(points_after or 0) + int(qty or 0) * int(price_points or 0)
+                    except Exception:
+                        points_before = None
+
+                service_date = str(v.get('service_date') or '').strip()
+                slot_time = str(v.get('slot_time') or '').strip()
+                if not service_date and not slot_time and slot_text:
+                    try:
+                        parts = str(slot_text).strip().split()
+                    except Exception:
+                        parts = []
+                    if len(parts) >= 2:
+                        service_date = parts[0]
+                        slot_time = parts[1]
+                    elif len(parts) == 1 and ':' in parts[0]:
+                        slot_time = parts[0]
+
+                # Build simple voucher data
+                voucher_datas.append({
+                    'student_name': student_name,
+                    'class_name': cls,
+                    'item_name': str(v.get('item_label') or '').strip(),
+                    'qty': qty,
+                    'price': price_points,
+                    'slot_text': slot_text,
+                    'service_date': service_date,
+                    'slot_time': slot_time,
+                    'duration_minutes': duration_minutes,
+                    'points_before': points_before,
+                    'points_after': points_after if points_before is not None else None,
+                })
+
+            printer_cfg = cfg.get('receipt_printer', {})
+            if not isinstance(printer_cfg, dict):
+                printer_cfg = {}
+            mode = str(printer_cfg.get('mode') or '').strip().lower()
+
+            printer_name = ''
+            try:
+                printer_name = str((cfg or {}).get('default_printer') or '').strip()
+            except Exception:
+                printer_name = ''
+            if not printer_name:
+                printer_name = 'Cash Printer'
+
             # Get print logo path from DB (set in admin panel) or fallback to config logo
             try:
                 logo_path = self.db.get_cashier_bw_logo_path() or cfg.get('logo_path', '')
             except Exception:
                 logo_path = cfg.get('logo_path', '')
-            
+
+            if mode == 'text':
+                text_encoding = str(printer_cfg.get('text_encoding') or 'cp862').strip()
+                try:
+                    text_codepage = int(printer_cfg.get('text_codepage', 0x0F))
+                except Exception:
+                    text_codepage = 0x0F
+                send_codepage = bool(printer_cfg.get('send_codepage', True))
+                # כל שובר מסתיים בפקודת חיתוך – שרשור הבייטים = עבודת RAW אחת
+                data = b''.join(
+                    self._build_thermal_text_voucher_bytes(
+                        vd,
+                        encoding=text_encoding,
+                        codepage=text_codepage,
+                        send_codepage=send_codepage,
+                        logo_path=logo_path,
+                    )
+                    for vd in voucher_datas
+                )
+                return bool(self._send_raw_bytes_to_printer(printer_name, data))
+
+            # Create simple voucher images (not full receipt)
+            from voucher_image_generator import create_voucher_images
+
             if logo_path:
                 # Normalize path - convert forward slashes to backslashes for Windows
                 logo_path = logo_path.replace('/', '\\')
                 if not os.path.exists(logo_path):
                     print(f"Print logo not found in voucher: {logo_path}")
                     logo_path = None
-            
-            # Create voucher image
-            voucher_img = create_voucher_image(voucher_data, logo_path)
 
-            image_impl = 'graphics'
-            try:
-                prn_cfg0 = cfg.get('receipt_printer', {})
-                if isinstance(prn_cfg0, dict) and str(prn_cfg0.get('image_impl') or '').strip():
-                    image_impl = str(prn_cfg0.get('image_impl') or '').strip()
-            except Exception:
-                image_impl = 'graphics'
-            
+            # Render everything before opening the printer, so the job is streamed in one go
+            voucher_imgs = create_voucher_images(voucher_datas, logo_path)
+
+            image_impl = str(printer_cfg.get('image_impl') or '').strip() or 'graphics'
+
+            def _emit(prn) -> None:
+                for voucher_img in voucher_imgs:
+                    # Print voucher image (all info is in the image, no extra text needed)
+                    prn.image(voucher_img, center=False, impl=image_impl)
+                    # Cut paper
+                    prn.text('\n\n')
+                    prn.cut()
+                # Force flush to printer
+                try:
+                    prn._raw(b'')
+                except Exception:
+                    pass
+
             # Print using python-escpos
             try:
                 from escpos.printer import Win32Raw
 
                 # Prefer direct Serial printing if configured (COMx)
                 try:
-                    prn_cfg1 = cfg.get('receipt_printer', {})
-                    port = ''
-                    baudrate = 38400
-                    if isinstance(prn_cfg1, dict):
-                        port = str(prn_cfg1.get('port') or '').strip()
-                        try:
-                            baudrate = int(prn_cfg1.get('baudrate') or 38400)
-                        except Exception:
-                            baudrate = 38400
+                    port = str(printer_cfg.get('port') or '').strip()
+                    try:
+                        baudrate = int(printer_cfg.get('baudrate') or 38400)
+                    except Exception:
+                        baudrate = 38400
                     if port and port.upper().startswith('COM'):
                         from escpos.printer import Serial  # type: ignore
                         ps = None
                         try:
                             ps = Serial(port=port, baudrate=baudrate, timeout=2)
-                            # Print voucher image (all info is in the image, no extra text needed)
-                            ps.image(voucher_img, center=False, impl=image_impl)
-                            ps.text('\n\n')
-                            ps.cut()
-                            try:
-                                ps._raw(b'')
-                            except Exception:
-                                pass
+                            _emit(ps)
                             return True
                         finally:
                             try:
@@ -7034,31 +6913,11 @@ class CashierStation:
                                 pass
                 except Exception:
                     pass
-                
-                printer_name = ''
-                try:
-                    printer_name = str((cfg or {}).get('default_printer') or '').strip()
-                except Exception:
-                    printer_name = ''
-                if not printer_name:
-                    printer_name = "Cash Printer"
+
                 p = None
                 try:
                     p = Win32Raw(printer_name)
-                    
-                    # Print voucher image (all info is in the image, no extra text needed)
-                    p.image(voucher_img, center=False, impl=image_impl)
-                    
-                    # Cut paper
-                    p.text('\n\n')
-                    p.cut()
-                    
-                    # Force flush to printer
-                    try:
-                        p._raw(b'')  # Send empty command to flush
-                    except Exception:
-                        pass
-                    
+                    _emit(p)
                     return True
                 finally:
                     # IMPORTANT: close handle so Windows flushes the raw job immediately
@@ -7067,11 +6926,11 @@ class CashierStation:
                             p.close()
                     except Exception:
                         pass
-                
+
             except ImportError as e:
                 print(f"python-escpos not available for voucher printing: {e}")
                 return False
-            
+
         except Exception as e:
             print(f"Voucher thermal printer error: {e}")
             import traceback
@@ -7960,7 +7819,9 @@ def main():
         _enable_windows_dpi_awareness()
     except Exception:
         pass
+    startup_profile.phase('imports')
     root = tk.Tk()
+    startup_profile.phase('tk.Tk()')
     try:
         import sys
         base_dir = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
@@ -7980,10 +7841,13 @@ def main():
     except Exception:
         pass
     CashierStation(root)
+    startup_profile.phase('CashierStation.__init__')
     try:
         root.deiconify()
     except Exception:
         pass
+    if startup_profile.ENABLED:
+        root.after_idle(lambda: root.after(1, lambda: startup_profile.report('cashier_station')))
     root.mainloop()
 
 
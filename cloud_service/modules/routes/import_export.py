@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Request, HTTPException, UploadFile, File, Form, Response
 from fastapi.responses import HTMLResponse, RedirectResponse
 from typing import Dict, Any
+import importlib.util
 import io
 import csv
 import traceback
@@ -8,7 +9,22 @@ import traceback
 from ..ui import basic_web_shell
 from ..auth import web_require_admin_teacher, web_tenant_from_cookie, web_current_teacher
 from ..db import tenant_db_connection, sql_placeholder
-from ..sync_logic import record_sync_event
+from ..sync_logic import record_sync_events_bulk
+
+try:
+    from excel_import_engine import (
+        apply_import_plan, build_import_plan, fetch_existing_students, normalize_import_frame, read_import_excel,
+    )
+except ImportError:
+    # The import engine lives at the repo root (shared with the desktop admin station)
+    import os as _os
+    import sys as _sys
+    _ROOT_DIR = _os.path.dirname(_os.path.dirname(_os.path.dirname(_os.path.dirname(_os.path.abspath(__file__)))))
+    if _ROOT_DIR not in _sys.path:
+        _sys.path.insert(0, _ROOT_DIR)
+    from excel_import_engine import (
+        apply_import_plan, build_import_plan, fetch_existing_students, normalize_import_frame, read_import_excel,
+    )
 
 router = APIRouter()
 
@@ -105,26 +121,25 @@ async def api_import_upload(request: Request, file: UploadFile = File(...), clea
     tenant_id = web_tenant_from_cookie(request)
     if not tenant_id: raise HTTPException(status_code=400, detail='missing tenant')
 
-    try:
-        import pandas as pd
-    except ImportError:
+    if importlib.util.find_spec('pandas') is None:
         raise HTTPException(status_code=500, detail='pandas not installed')
 
     contents = await file.read()
     try:
-        df = pd.read_excel(io.BytesIO(contents), dtype={'מס\' כרטיס': str, 'ת"ז': str, 'מס\' סידורי': str})
+        df = read_import_excel(io.BytesIO(contents), dtype={'מס\' סידורי': str})
     except Exception as e:
         raise HTTPException(status_code=400, detail=f'Invalid Excel file: {e}')
 
+    clearing = clear_existing.lower() == 'true'
+    frame = normalize_import_frame(df, serial_from_row_order=clearing)
+
     conn = tenant_db_connection(tenant_id)
-    imported_count = 0
-    errors = []
     
     try:
         cur = conn.cursor()
         
         # Check if clear_existing is requested
-        if clear_existing.lower() == 'true':
+        if clearing:
             try:
                 cur.execute('DELETE FROM students')
                 # Also clean logs? Usually implies full reset. Let's try to clean logs too.
@@ -136,173 +151,28 @@ async def api_import_upload(request: Request, file: UploadFile = File(...), clea
             except Exception as e:
                 return {'ok': False, 'detail': f'Failed to clear tables: {e}'}
 
-        # Pre-fetch existing students to minimize queries if not clearing
-        existing_students = {} # key: (first_name, last_name) -> dict
-        if clear_existing.lower() != 'true':
-            cur.execute('SELECT id, first_name, last_name, points, card_number, serial_number, photo_number, private_message, id_number, class_name FROM students')
-            for r in cur.fetchall():
-                # Normalize key
-                fn = str((r.get('first_name') if isinstance(r, dict) else r['first_name']) or '').strip()
-                ln = str((r.get('last_name') if isinstance(r, dict) else r['last_name']) or '').strip()
-                existing_students[(fn, ln)] = dict(r) if isinstance(r, dict) else {k: r[k] for k in r.keys()}
-
         teacher = web_current_teacher(request) or {}
         teacher_name = str(teacher.get('name') or 'import')
 
-        for index, row in df.iterrows():
-            try:
-                # Basic fields
-                last_name = str(row.get('שם משפחה', '')).strip()
-                first_name = str(row.get('שם פרטי', '')).strip()
-                
-                # Skip empty
-                if not last_name or not first_name or last_name.lower() == 'nan' or first_name.lower() == 'nan':
-                    continue
-
-                # Optional fields
-                id_number = str(row.get('ת"ז', '')).strip()
-                if id_number.lower() == 'nan': id_number = ''
-                
-                class_name = str(row.get('כיתה', '')).strip()
-                if class_name.lower() == 'nan': class_name = ''
-                
-                # Try both column names for photo
-                photo_col = "נתיב תמונה" if "נתיב תמונה" in df.columns else "מס' תמונה"
-                photo_number = str(row.get(photo_col, '')).strip()
-                if photo_number.lower() == 'nan': photo_number = ''
-                
-                card_number = str(row.get("מס' כרטיס", '')).strip().lstrip("'")
-                if card_number.lower() in ('nan', '', '0'): card_number = ''
-                
-                points = 0
-                if "מס' נקודות" in df.columns and pd.notna(row.get("מס' נקודות")):
-                    try: points = int(float(row.get("מס' נקודות")))
-                    except: points = 0
-                
-                private_message = ''
-                if "הודעה פרטית" in df.columns:
-                    pm = row.get("הודעה פרטית")
-                    if pd.notna(pm) and str(pm).lower() != 'nan':
-                        private_message = str(pm).strip()
-
-                # Serial number
-                serial_number = ''
-                serial_col = next((c for c in df.columns if 'סידורי' in str(c)), None)
-                if serial_col:
-                    val = row.get(serial_col)
-                    if pd.notna(val) and str(val).lower() != 'nan':
-                        try: serial_number = str(int(float(val)))
-                        except: serial_number = str(val).strip()
-                else:
-                    if clear_existing.lower() == 'true':
-                        serial_number = str(index + 1)
-
-                key = (first_name, last_name)
-                student = existing_students.get(key)
-                
-                if student:
-                    # Update
-                    sid = student['id']
-                    updated_fields = []
-                    params = []
-                    
-                    # Check changes
-                    if serial_number and str(student.get('serial_number') or '') != serial_number:
-                        updated_fields.append('serial_number = ?')
-                        params.append(serial_number)
-                    if card_number and str(student.get('card_number') or '') != card_number:
-                        updated_fields.append('card_number = ?')
-                        params.append(card_number)
-                    if photo_number and str(student.get('photo_number') or '') != photo_number:
-                        updated_fields.append('photo_number = ?')
-                        params.append(photo_number)
-                    if id_number and str(student.get('id_number') or '') != id_number:
-                        updated_fields.append('id_number = ?')
-                        params.append(id_number)
-                    if class_name and str(student.get('class_name') or '') != class_name:
-                        updated_fields.append('class_name = ?')
-                        params.append(class_name)
-                    if private_message != (student.get('private_message') or ''):
-                        updated_fields.append('private_message = ?')
-                        params.append(private_message)
-                        
-                    # Points update logic
-                    current_points = int(student.get('points') or 0)
-                    if points != current_points:
-                        updated_fields.append('points = ?')
-                        params.append(points)
-                        # Log points change
-                        delta = points - current_points
-                        try:
-                            cur.execute(
-                                sql_placeholder('INSERT INTO points_log (student_id, old_points, new_points, delta, reason, actor_name, action_type) VALUES (?, ?, ?, ?, ?, ?, ?)'),
-                                (sid, current_points, points, delta, "ייבוא מ-Excel", teacher_name, "import")
-                            )
-                            # Sync event for points
-                            record_sync_event(
-                                tenant_id=tenant_id,
-                                station_id='web',
-                                entity_type='student_points',
-                                entity_id=str(sid),
-                                action_type='update',
-                                payload={'old_points': current_points, 'new_points': points, 'reason': 'ייבוא', 'added_by': teacher_name}
-                            )
-                        except: pass
-
-                    if updated_fields:
-                        updated_fields.append('updated_at = CURRENT_TIMESTAMP')
-                        sql = f"UPDATE students SET {', '.join(updated_fields)} WHERE id = ?"
-                        params.append(sid)
-                        cur.execute(sql_placeholder(sql), params)
-                        imported_count += 1
-
-                else:
-                    # Insert
-                    cols = ['last_name', 'first_name', 'points']
-                    vals = [last_name, first_name, points]
-                    placeholders = ['?', '?', '?']
-                    
-                    if id_number:
-                        cols.append('id_number'); vals.append(id_number); placeholders.append('?')
-                    if class_name:
-                        cols.append('class_name'); vals.append(class_name); placeholders.append('?')
-                    if card_number:
-                        cols.append('card_number'); vals.append(card_number); placeholders.append('?')
-                    if photo_number:
-                        cols.append('photo_number'); vals.append(photo_number); placeholders.append('?')
-                    if serial_number:
-                        cols.append('serial_number'); vals.append(serial_number); placeholders.append('?')
-                    if private_message:
-                        cols.append('private_message'); vals.append(private_message); placeholders.append('?')
-                    
-                    sql = f"INSERT INTO students ({', '.join(cols)}) VALUES ({', '.join(placeholders)})"
-                    cur.execute(sql_placeholder(sql), vals)
-                    new_sid = cur.lastrowid
-                    imported_count += 1
-                    
-                    # Log initial points if > 0
-                    if points > 0 and new_sid:
-                        try:
-                            cur.execute(
-                                sql_placeholder('INSERT INTO points_log (student_id, old_points, new_points, delta, reason, actor_name, action_type) VALUES (?, ?, ?, ?, ?, ?, ?)'),
-                                (new_sid, 0, points, points, "ייבוא מ-Excel", teacher_name, "import")
-                            )
-                            # Sync event
-                            record_sync_event(
-                                tenant_id=tenant_id,
-                                station_id='web',
-                                entity_type='student_points',
-                                entity_id=str(new_sid),
-                                action_type='update',
-                                payload={'old_points': 0, 'new_points': points, 'reason': 'ייבוא', 'added_by': teacher_name}
-                            )
-                        except: pass
+        # One keyed map of existing students, then batched upserts in a single transaction
+        existing = fetch_existing_students(cur, sql_placeholder)
+        plan = build_import_plan(frame, existing, mode='web')
+        result = apply_import_plan(cur, plan, ph=sql_placeholder, actor_name=teacher_name, action_type='import')
+        conn.commit()
 
-            except Exception as row_err:
-                errors.append(f"שגיאה בשורה {index+2}: {row_err}")
+        # Points changes go to the sync stream in one batch (stations apply student_points deltas)
+        try:
+            record_sync_events_bulk(
+                tenant_id=tenant_id,
+                station_id='web',
+                events=[ev for ev in result['events'] if ev[0] == 'student_points'],
+            )
+        except Exception:
+            traceback.print_exc()
 
-        conn.commit()
-        return {'ok': True, 'imported_count': imported_count, 'errors': errors}
+        touched_existing = set(plan['updates']) | {sid for sid in plan['points_changes'] if sid not in set(result['new_ids'].values())}
+        imported_count = int(result['inserted']) + len(touched_existing)
+        return {'ok': True, 'imported_count': imported_count, 'errors': result['errors']}
         
     except Exception as e:
         traceback.print_exc()
@@ -99,6 +99,61 @@ def record_sync_event(
         except Exception:
             pass
 
+def record_sync_events_bulk(
+    *,
+    tenant_id: str,
+    station_id: str,
+    events: List[tuple],
+) -> int:
+    """Same as record_sync_event for many (entity_type, entity_id, action_type, payload) at once."""
+    if not events:
+        return 0
+    tid = str(tenant_id or '').strip()
+    sid = str(station_id or '').strip()
+    change_rows = []
+    event_rows = []
+    for entity_type, entity_id, action_type, payload in events:
+        try:
+            payload_json = json.dumps(payload or {}, ensure_ascii=False, default=str)
+        except Exception:
+            payload_json = '{}'
+        eid = (str(entity_id).strip() if entity_id is not None else None)
+        change_rows.append((tid, sid, str(entity_type or '').strip(), eid, str(action_type or '').strip(), payload_json, None))
+        event_rows.append((tid, str(make_event_id(station_id, None, None)), sid, None,
+                           str(entity_type or '').strip(), eid, str(action_type or '').strip(), payload_json, None))
+
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        try:
+            cur.executemany(
+                sql_placeholder(
+                    '''
+                    INSERT INTO changes (tenant_id, station_id, entity_type, entity_id, action_type, payload_json, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    '''
+                ),
+                change_rows
+            )
+        except Exception:
+            pass
+        cur.executemany(
+            sql_placeholder(
+                '''
+                INSERT INTO sync_events (tenant_id, event_id, station_id, change_local_id, entity_type, entity_id, action_type, payload_json, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                '''
+            ),
+            event_rows
+        )
+        conn.commit()
+        return len(event_rows)
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
 def apply_change_to_tenant_db(tconn, ch: Dict[str, Any]) -> None:
     et = str(ch.get('entity_type') or '').strip()
     at = str(ch.get('action_type') or '').strip()
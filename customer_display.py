@@ -1,15 +1,55 @@
 """
 מודול לתקשורת עם מסך לקוח VeriFone MX980L
+
+הכתיבה לפורט הטורי (9600 באוד + השהיות שהמסך צריך) נעשית בתהליכון רקע אחד.
+כל show_* רק מניח "פריים" (רצף פקודות) בתיבת דואר של פריים אחד – החדש דורס את
+הישן, ופריים שנמצא באמצע שליחה נקטע כשמגיע חדש. כך לחיצות מהירות על אריחים לא
+נערמות בתור, וזמן התגובה של הקופה לא תלוי בקצב המסך. חיבור/חיבור מחדש לפורט
+נעשים גם הם ברקע.
 """
 
-import serial
+import threading
 import time
 
 
+class LoopbackSerial:
+    """תחליף למסך בלי חומרה (בדיקות/הדגמה): שומר את מה שנכתב ומדמה זמן שידור לפי הבאוד.
+    לחלופין: port='loop://' (לולאה של pyserial) או נתיב pty ב-Linux."""
+
+    def __init__(self, baudrate=9600, simulate_baud=True):
+        self.baudrate = int(baudrate or 9600)
+        self.simulate_baud = bool(simulate_baud)
+        self.is_open = True
+        self.written = bytearray()
+
+    def write(self, data):
+        if not self.is_open:
+            raise IOError('port closed')
+        if self.simulate_baud and data:
+            # 8N1 – עשרה ביטים לכל בית
+            time.sleep(len(data) * 10.0 / self.baudrate)
+        self.written += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.is_open = False
+
+
 class CustomerDisplay:
     """מחלקה לניהול מסך לקוח VeriFone MX980L"""
-    
-    def __init__(self, com_port='COM1', baud_rate=9600, enabled=False, port=None, baudrate=None):
+
+    # השהיות בין פקודות – כמו בשליחה הסינכרונית הקודמת (המסך לא עומד בזרם רציף)
+    SEND_DELAY = 0.1
+    CLEAR_DELAY = 0.3
+    CONNECT_SETTLE = 0.5
+    RECONNECT_MIN_SEC = 1.0
+    RECONNECT_MAX_SEC = 15.0
+
+    def __init__(self, com_port='COM1', baud_rate=9600, enabled=False, port=None, baudrate=None,
+                 serial_factory=None):
         # Backward compatible args: port/baudrate
         if port is not None:
             com_port = port
@@ -24,178 +64,228 @@ class CustomerDisplay:
         self.enabled = bool(enabled)
         self.serial = None
         self.connected = False
+        # serial_factory() -> אובייקט דמוי serial (למשל LoopbackSerial) במקום פתיחת הפורט
+        self._serial_factory = serial_factory
+
+        self._io_lock = threading.Lock()
+        self._cond = threading.Condition()
+        # תיבת הדואר: הפריים האחרון בלבד + מונה שמזהה שהגיע פריים חדש יותר
+        self._pending = None
+        self._seq = 0
+        self._stop = False
+        self._thread = None
 
         if self.enabled:
-            try:
-                self.connect()
-            except Exception:
-                pass
-    
+            self._start_writer()
+
+    # ----------------------------
+    # חיבור
+    # ----------------------------
+
+    def _open_serial(self):
+        if self._serial_factory is not None:
+            return self._serial_factory()
+        # pyserial נטען רק כשהמסך מופעל בפועל
+        import serial
+        if '://' in self.port:
+            return serial.serial_for_url(self.port, baudrate=self.baudrate, timeout=5, write_timeout=5)
+        return serial.Serial(
+            port=self.port,
+            baudrate=self.baudrate,
+            bytesize=serial.EIGHTBITS,
+            parity=serial.PARITY_NONE,
+            stopbits=serial.STOPBITS_ONE,
+            timeout=5,
+            write_timeout=5,
+            xonxoff=False,
+            rtscts=False,
+            dsrdtr=False
+        )
+
     def connect(self):
-        """התחברות למסך"""
+        """התחברות למסך (חוסם – נקרא מתהליכון הכתיבה)"""
         try:
-            self.serial = serial.Serial(
-                port=self.port,
-                baudrate=self.baudrate,
-                bytesize=serial.EIGHTBITS,
-                parity=serial.PARITY_NONE,
-                stopbits=serial.STOPBITS_ONE,
-                timeout=5,
-                write_timeout=5,
-                xonxoff=False,
-                rtscts=False,
-                dsrdtr=False
-            )
-            self.connected = True
-            time.sleep(0.5)
-            self.clear()
+            with self._io_lock:
+                if self._stop:
+                    return False
+                self.serial = self._open_serial()
+                self.connected = True
+            time.sleep(self.CONNECT_SETTLE)
+            self._write_frame(self._frame(), seq=None)
             return True
         except Exception as e:
             self.connected = False
             return False
-    
+
     def disconnect(self):
         """ניתוק מהמסך"""
-        if self.serial and self.serial.is_open:
-            try:
-                self.serial.close()
-            except:
-                pass
-        self.connected = False
+        with self._io_lock:
+            if self.serial and getattr(self.serial, 'is_open', False):
+                try:
+                    self.serial.close()
+                except:
+                    pass
+            self.connected = False
 
     def close(self):
         """תאימות: cashier_station קורא close()"""
-        try:
-            self.disconnect()
-        except Exception:
-            pass
+        # לא נוגעים בפורט מכאן – תהליכון הכתיבה עשוי להחזיק אותו באמצע write איטי
+        # (עד write_timeout). הוא מתעורר, רואה _stop, סוגר את הפורט בעצמו ויוצא.
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        t = self._thread
+        if t is None or not t.is_alive():
+            try:
+                self.disconnect()
+            except Exception:
+                pass
+
+    # ----------------------------
+    # תהליכון הכתיבה
+    # ----------------------------
 
-    def _ensure_connected(self) -> bool:
-        if not bool(getattr(self, 'enabled', False)):
+    def _start_writer(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._writer_loop, name='customer-display', daemon=True)
+        self._thread.start()
+
+    def _post(self, frame):
+        """הנחת פריים בתיבה (לא חוסם). פריים שעוד לא נשלח נדרס."""
+        if not self.enabled:
             return False
+        with self._cond:
+            self._pending = frame
+            self._seq += 1
+            self._cond.notify_all()
+        return True
+
+    def _writer_loop(self):
         try:
-            if self.connected and self.serial and getattr(self.serial, 'is_open', False):
+            self._writer_run()
+        finally:
+            # הסגירה נעשית כאן – close() לא ממתין לפורט
+            try:
+                self.disconnect()
+            except Exception:
+                pass
+
+    def _writer_run(self):
+        backoff = self.RECONNECT_MIN_SEC
+        while True:
+            with self._cond:
+                if self._stop:
+                    return
+            if not self.connected:
+                if self.connect():
+                    backoff = self.RECONNECT_MIN_SEC
+                else:
+                    # ניסיון חוזר עם השהיה גדלה; close() מעיר מיד
+                    with self._cond:
+                        if not self._stop:
+                            self._cond.wait(backoff)
+                    backoff = min(self.RECONNECT_MAX_SEC, backoff * 2)
+                    continue
+
+            with self._cond:
+                while self._pending is None and not self._stop:
+                    self._cond.wait()
+                if self._stop:
+                    return
+                frame, seq = self._pending, self._seq
+                self._pending = None
+
+            if not self._write_frame(frame, seq=seq):
+                # שגיאת כתיבה – ניתוק, והפריים יישלח שוב אחרי חיבור מחדש (אם לא הגיע חדש)
+                print("[DISPLAY] write failed, reconnecting")
+                self.disconnect()
+                with self._cond:
+                    if self._pending is None:
+                        self._pending = frame
+
+    def _write_frame(self, frame, seq=None) -> bool:
+        """שליחת רצף (bytes, השהיה). נקטע אם הגיע פריים חדש (seq השתנה)."""
+        for data, delay in frame:
+            if self._stop or (seq is not None and seq != self._seq):
                 return True
-        except Exception:
-            pass
-        try:
-            return bool(self.connect())
-        except Exception:
-            return False
-    
+            if data and not self._send(data):
+                return False
+            if delay:
+                time.sleep(delay)
+        return True
+
     def _send(self, data):
         """שליחת נתונים למסך"""
-        if not self.connected or not self.serial:
-            return False
-        try:
-            if isinstance(data, str):
-                # Clean text - remove problematic characters
-                data = str(data).replace('"', '').replace('"', '').replace('"', '')
-                # Reverse Hebrew text for display
-                data = data[::-1]
-                # Encode with PC862 (as discovered from display boot screen)
-                data = data.encode('cp862', errors='ignore')  # ignore instead of replace
-            self.serial.write(data)
-            self.serial.flush()
-            time.sleep(0.1)  # Slightly longer delay
-            return True
-        except Exception as e:
-            print(f"Display send error: {e}")
-            return False
-    
-    def _send_text(self, text):
-        """Send text to display (automatically reversed and encoded)"""
-        if not self.connected or not self.serial:
-            return False
-        try:
-            # Reverse for Hebrew RTL display
-            reversed_text = text[::-1]
-            # Encode with PC862
-            encoded = reversed_text.encode('cp862', errors='replace')
-            self.serial.write(encoded)
-            self.serial.flush()
-            return True
-        except:
-            return False
-    
+        with self._io_lock:
+            if not self.connected or not self.serial:
+                return False
+            try:
+                self.serial.write(data)
+                self.serial.flush()
+                return True
+            except Exception as e:
+                print(f"Display send error: {e}")
+                return False
+
+    # ----------------------------
+    # פריימים
+    # ----------------------------
+
+    @staticmethod
+    def _encode(text) -> bytes:
+        # Clean text - remove problematic characters
+        data = str(text).replace('"', '')
+        # Reverse Hebrew text for display
+        data = data[::-1]
+        # Encode with PC862 (as discovered from display boot screen)
+        return data.encode('cp862', errors='ignore')
+
+    def _frame(self, *lines):
+        """ניקוי המסך ואחריו עד שתי שורות"""
+        steps = [(b'\x0C', self.SEND_DELAY + self.CLEAR_DELAY)]
+        for i, line in enumerate(lines):
+            if i:
+                steps.append((b'\n', self.SEND_DELAY * 2))
+            steps.append((self._encode(line), self.SEND_DELAY))
+        return tuple(steps)
+
     def clear(self):
         """ניקוי המסך"""
-        self._send(b'\x0C')
-        time.sleep(0.3)
-    
+        self._post(self._frame())
+
     def show_welcome(self, campaign_name=""):
         """הצגת הודעת ברוכים הבאים למבצע"""
-        if not self._ensure_connected():
-            return
-        self.clear()
         if campaign_name:
-            self._send(f"ברוכים הבאים למבצע {campaign_name}")
+            first = f"ברוכים הבאים למבצע {campaign_name}"
         else:
-            self._send("ברוכים הבאים")
-        time.sleep(0.1)
-        self._send(b'\n')
-        self._send("הקופה פתוחה")
-    
+            first = "ברוכים הבאים"
+        self._post(self._frame(first, "הקופה פתוחה"))
+
     def show_scan_card(self):
         """הצגת בקשה להעברת כרטיס"""
-        if not self._ensure_connected():
-            return
-        self.clear()
-        self._send("העבר כרטיס תלמיד")
-    
+        self._post(self._frame("העבר כרטיס תלמיד"))
+
     def show_student(self, name, points):
         """הצגת ברוך הבא לתלמיד + נקודות"""
-        if not self._ensure_connected():
-            return
-        self.clear()
-        self._send(f"ברוך הבא {str(name)}")
-        time.sleep(0.1)
-        self._send(b'\n')
-        self._send(f"יש לך {int(points)} נקודות")
-    
+        self._post(self._frame(f"ברוך הבא {str(name)}", f"יש לך {int(points)} נקודות"))
+
     def show_item(self, name, price):
         """הצגת פריט שנוסף לרכישה"""
-        if not self._ensure_connected():
-            return
-        self.clear()
-        self._send(str(name))
-        time.sleep(0.1)
-        self._send(b'\n')
-        self._send(f"{int(price)} נקודות")
-    
+        self._post(self._frame(str(name), f"{int(price)} נקודות"))
+
     def show_total(self, total, balance):
         """הצגת סה"כ ויתרה"""
-        if not self._ensure_connected():
-            return
-        self.clear()
-        self._send(f"סה\"כ: {int(total)} נקודות")
-        time.sleep(0.1)
-        self._send(b'\n')
-        self._send(f"יתרה: {int(balance)} נקודות")
-    
+        self._post(self._frame(f"סה\"כ: {int(total)} נקודות", f"יתרה: {int(balance)} נקודות"))
+
     def show_confirm_purchase(self):
         """הצגת בקשה לאישור רכישה"""
-        if not self._ensure_connected():
-            return
-        self.clear()
-        self._send("העבר כרטיס")
-        time.sleep(0.1)
-        self._send(b'\n')
-        self._send("לאישור הרכישה")
-    
+        self._post(self._frame("העבר כרטיס", "לאישור הרכישה"))
+
     def show_payment_complete(self, message="בהצלחה"):
         """הצגת הודעת סיום (בהצלחה / תודה רבה)"""
-        if not self._ensure_connected():
-            return
-        self.clear()
-        self._send(message)
-        time.sleep(0.1)
-        self._send(b'\n')
-        self._send("תודה רבה")
-    
+        self._post(self._frame(message, "תודה רבה"))
+
     def show_error(self, message="שגיאה"):
         """הצגת הודעת שגיאה"""
-        if not self._ensure_connected():
-            return
-        self.clear()
-        self._send(message)
+        self._post(self._frame(message))
@@ -165,11 +165,159 @@ class Database:
             raise last_err
         raise sqlite3.DatabaseError('failed to open database')
 
-    def _cleanup_expired_holds(self, cursor) -> None:
+    # ------------------------------------------------------------------
+    # שריונים (purchase_holds)
+    # ------------------------------------------------------------------
+    # כל השאילתות מסננות expires_at > CURRENT_TIMESTAMP, ולכן שריון שפג תוקפו
+    # פשוט לא נספר; המחיקה הפיזית נעשית ע"י sweep_expired_holds ברקע ולא
+    # בתחילת כל פעולה (שם היא החזיקה את נעילת הכתיבה של כל העמדות).
+    # product_hold_totals מחזיק סכום qty של כל שורות השריון לכל מוצר/וריאציה
+    # (כולל שפג תוקפן וטרם נמחקו) ומתוחזק ע"י טריגרים – כך שבדיקת מלאי
+    # רגילה היא קריאת מפתח אחת במקום SUM על הטבלה.
+
+    def _ensure_hold_schema(self, cursor) -> None:
+        if getattr(self, '_hold_schema_ready', False):
+            return
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_holds_owner_prod "
+            "ON purchase_holds(station_id, student_id, hold_type, product_id, variant_id)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_holds_prod ON purchase_holds(hold_type, product_id, variant_id, expires_at)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_holds_sched "
+            "ON purchase_holds(hold_type, service_id, service_date, slot_start_time, expires_at)"
+        )
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_holds_student_date ON purchase_holds(student_id, service_date)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_holds_exp ON purchase_holds(expires_at)")
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='product_hold_totals'")
+        fresh = cursor.fetchone() is None
+        cursor.execute(
+            '''
+            CREATE TABLE IF NOT EXISTS product_hold_totals (
+                product_id INTEGER NOT NULL,
+                variant_id INTEGER NOT NULL DEFAULT 0,
+                qty INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (product_id, variant_id)
+            )
+            '''
+        )
+        cursor.execute(
+            '''
+            CREATE TRIGGER IF NOT EXISTS trg_holds_totals_ins AFTER INSERT ON purchase_holds
+            WHEN NEW.hold_type = 'product' AND NEW.product_id IS NOT NULL
+            BEGIN
+                INSERT INTO product_hold_totals (product_id, variant_id, qty)
+                VALUES (NEW.product_id, COALESCE(NEW.variant_id, 0), COALESCE(NEW.qty, 0))
+                ON CONFLICT(product_id, variant_id) DO UPDATE SET qty = qty + excluded.qty;
+            END
+            '''
+        )
+        cursor.execute(
+            '''
+            CREATE TRIGGER IF NOT EXISTS trg_holds_totals_del AFTER DELETE ON purchase_holds
+            WHEN OLD.hold_type = 'product' AND OLD.product_id IS NOT NULL
+            BEGIN
+                UPDATE product_hold_totals SET qty = qty - COALESCE(OLD.qty, 0)
+                 WHERE product_id = OLD.product_id AND variant_id = COALESCE(OLD.variant_id, 0);
+            END
+            '''
+        )
+        cursor.execute(
+            '''
+            CREATE TRIGGER IF NOT EXISTS trg_holds_totals_upd AFTER UPDATE OF qty ON purchase_holds
+            WHEN OLD.hold_type = 'product' AND OLD.product_id IS NOT NULL
+            BEGIN
+                UPDATE product_hold_totals SET qty = qty - COALESCE(OLD.qty, 0) + COALESCE(NEW.qty, 0)
+                 WHERE product_id = OLD.product_id AND variant_id = COALESCE(OLD.variant_id, 0);
+            END
+            '''
+        )
+        if fresh:
+            cursor.execute(
+                '''
+                INSERT OR REPLACE INTO product_hold_totals (product_id, variant_id, qty)
+                SELECT product_id, COALESCE(variant_id, 0), COALESCE(SUM(qty), 0)
+                  FROM purchase_holds
+                 WHERE hold_type = 'product' AND product_id IS NOT NULL
+                 GROUP BY product_id, COALESCE(variant_id, 0)
+                '''
+            )
+        self._hold_schema_ready = True
+
+    def _prepare_holds(self, conn) -> None:
+        """יצירת אינדקסים/מונים (פעם אחת לכל מופע) מחוץ לטרנזקציית הכתיבה"""
+        if getattr(self, '_hold_schema_ready', False):
+            return
         try:
-            cursor.execute('DELETE FROM purchase_holds WHERE expires_at <= CURRENT_TIMESTAMP')
-        except Exception:
-            pass
+            conn.execute('BEGIN IMMEDIATE')
+            self._ensure_hold_schema(conn.cursor())
+            conn.commit()
+        except Exception as e:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            print(f"[HOLDS] schema setup failed: {e}")
+
+    def sweep_expired_holds(self, limit: int = 500) -> int:
+        """מחיקת שריונים שפג תוקפם – במנה קצרה אחת (מופעל ברקע)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            self._prepare_holds(conn)
+            cursor.execute(
+                'SELECT id FROM purchase_holds WHERE expires_at <= CURRENT_TIMESTAMP ORDER BY expires_at LIMIT ?',
+                (max(1, int(limit or 500)),)
+            )
+            ids = [int(r['id']) for r in (cursor.fetchall() or [])]
+            if not ids:
+                return 0
+            conn.execute('BEGIN IMMEDIATE')
+            marks = ','.join('?' * len(ids))
+            cursor.execute(
+                f'DELETE FROM purchase_holds WHERE id IN ({marks}) AND expires_at <= CURRENT_TIMESTAMP',
+                ids
+            )
+            n = int(cursor.rowcount or 0)
+            conn.commit()
+            return n
+        except Exception as e:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            print(f"[HOLDS] sweep failed: {e}")
+            return 0
+        finally:
+            conn.close()
+
+    def start_hold_sweeper(self, interval_sec: float = 60.0) -> None:
+        """תהליכון רקע שמנקה שריונים שפג תוקפם כל interval_sec שניות"""
+        t = getattr(self, '_hold_sweeper_thread', None)
+        if t is not None and t.is_alive():
+            return
+        import threading
+        interval = max(5.0, float(interval_sec or 60.0))
+        self._hold_sweeper_stop = threading.Event()
+
+        def _loop(stop=self._hold_sweeper_stop):
+            while not stop.wait(interval):
+                try:
+                    while self.sweep_expired_holds() >= 500:
+                        if stop.wait(0.05):
+                            return
+                except Exception:
+                    pass
+
+        self._hold_sweeper_thread = threading.Thread(target=_loop, name='hold-sweeper', daemon=True)
+        self._hold_sweeper_thread.start()
+
+    def stop_hold_sweeper(self) -> None:
+        ev = getattr(self, '_hold_sweeper_stop', None)
+        if ev is not None:
+            ev.set()
 
     def _is_unc_path(self) -> bool:
         try:
@@ -253,7 +401,7 @@ class Database:
         conn = self.get_connection()
         cursor = conn.cursor()
         try:
-            self._cleanup_expired_holds(cursor)
+            self._prepare_holds(conn)
             if student_id is None:
                 cursor.execute('DELETE FROM purchase_holds WHERE station_id = ?', (str(station_id or '').strip(),))
             else:
@@ -270,20 +418,21 @@ class Database:
         conn = self.get_connection()
         cursor = conn.cursor()
         try:
-            conn.execute('BEGIN IMMEDIATE')
-            self._cleanup_expired_holds(cursor)
             station_key = str(station_id or '').strip()
             if not station_key:
-                conn.rollback()
                 return
+            conn.execute('BEGIN IMMEDIATE')
+            # רק שריונים חיים מוארכים – שריון שפג תוקפו וטרם נמחק לא "חוזר לחיים"
             if student_id is None:
                 cursor.execute(
-                    "UPDATE purchase_holds SET expires_at = datetime('now', ?) WHERE station_id = ?",
+                    "UPDATE purchase_holds SET expires_at = datetime('now', ?) "
+                    "WHERE station_id = ? AND expires_at > CURRENT_TIMESTAMP",
                     (self._ttl_expr_minutes(int(ttl_minutes)), station_key)
                 )
             else:
                 cursor.execute(
-                    "UPDATE purchase_holds SET expires_at = datetime('now', ?) WHERE station_id = ? AND student_id = ?",
+                    "UPDATE purchase_holds SET expires_at = datetime('now', ?) "
+                    "WHERE station_id = ? AND student_id = ? AND expires_at > CURRENT_TIMESTAMP",
                     (self._ttl_expr_minutes(int(ttl_minutes)), station_key, int(student_id or 0))
                 )
             conn.commit()
@@ -310,83 +459,92 @@ class Database:
         conn = self.get_connection()
         cursor = conn.cursor()
         try:
-            conn.execute('BEGIN IMMEDIATE')
-            self._cleanup_expired_holds(cursor)
+            self._prepare_holds(conn)
 
             pid = int(product_id or 0)
             vid = int(variant_id or 0)
             dq = int(delta_qty or 0)
             if not pid or dq == 0:
-                conn.rollback()
                 return {'ok': False, 'error': 'כמות לא תקינה'}
+            station_key = str(station_id or '').strip()
+            stid = int(student_id or 0)
+
+            conn.execute('BEGIN IMMEDIATE')
 
-            stock_qty = None
+            # מוצר + וריאציה + מונה השריונים + השריונים שלי – בשאילתה אחת
+            cursor.execute(
+                '''
+                SELECT v.id AS v_id, v.stock_qty AS v_stock, v.is_active AS v_active, v.product_id AS v_pid,
+                       p.id AS p_id, p.stock_qty AS p_stock, p.is_active AS p_active
+                  FROM (SELECT ? AS pid, ? AS vid) q
+                  LEFT JOIN product_variants v ON q.vid > 0 AND v.id = q.vid
+                  JOIN products p ON p.id = COALESCE(v.product_id, q.pid)
+                ''',
+                (pid, vid)
+            )
+            prow = cursor.fetchone()
             if vid > 0:
-                cursor.execute('SELECT stock_qty, product_id, is_active FROM product_variants WHERE id = ?', (int(vid),))
-                vrow = cursor.fetchone()
-                if not vrow or int(vrow['is_active'] or 1) != 1:
+                if not prow or prow['v_id'] is None or int(prow['v_active'] or 1) != 1:
                     conn.rollback()
                     return {'ok': False, 'error': 'וריאציה לא פעילה'}
                 try:
-                    pid = int(vrow['product_id'] or 0)
+                    pid = int(prow['v_pid'] or 0) or pid
                 except Exception:
-                    pid = int(pid)
-                stock_qty = vrow['stock_qty']
-
-            cursor.execute('SELECT stock_qty, is_active FROM products WHERE id = ?', (int(pid),))
-            prow = cursor.fetchone()
-            if not prow or int(prow['is_active'] or 1) != 1:
+                    pass
+            if not prow or int(prow['p_active'] or 1) != 1:
                 conn.rollback()
                 return {'ok': False, 'error': 'מוצר לא פעיל'}
-            if vid <= 0:
-                stock_qty = prow['stock_qty']
-
+            stock_qty = prow['v_stock'] if vid > 0 else prow['p_stock']
             if stock_qty is not None:
                 try:
                     stock_qty = int(stock_qty)
                 except Exception:
                     stock_qty = None
 
-            station_key = str(station_id or '').strip()
+            cursor.execute(
+                '''
+                SELECT id, qty, expires_at > CURRENT_TIMESTAMP AS live
+                  FROM purchase_holds
+                 WHERE station_id = ? AND student_id = ? AND hold_type = 'product'
+                   AND product_id = ? AND COALESCE(variant_id, 0) = ?
+                 ORDER BY id DESC
+                ''',
+                (station_key, stid, int(pid), int(vid))
+            )
+            mine_rows = cursor.fetchall() or []
+            mine_qty = sum(int(r['qty'] or 0) for r in mine_rows if int(r['live'] or 0) == 1)
 
             if stock_qty is not None:
-                cursor.execute(
-                    '''
-                    SELECT COALESCE(SUM(qty),0) AS q
-                      FROM purchase_holds
-                     WHERE hold_type = 'product'
-                       AND expires_at > CURRENT_TIMESTAMP
-                       AND product_id = ?
-                       AND COALESCE(variant_id, 0) = ?
-                       AND station_id <> ?
-                    ''',
-                    (int(pid), int(vid), station_key)
-                )
-                row = cursor.fetchone()
-                other_qty = int((row['q'] if row else 0) or 0)
-
-                cursor.execute(
-                    '''
-                    SELECT COALESCE(SUM(qty),0) AS q
-                      FROM purchase_holds
-                     WHERE hold_type = 'product'
-                       AND expires_at > CURRENT_TIMESTAMP
-                       AND product_id = ?
-                       AND COALESCE(variant_id, 0) = ?
-                       AND station_id = ? AND student_id = ?
-                    ''',
-                    (int(pid), int(vid), station_key, int(student_id or 0))
-                )
-                row = cursor.fetchone()
-                mine_qty = int((row['q'] if row else 0) or 0)
-
-                new_mine = int(mine_qty + dq)
-                if new_mine < 0:
-                    new_mine = 0
-                available_for_me = int(stock_qty - other_qty)
-                if new_mine > available_for_me:
-                    conn.rollback()
-                    return {'ok': False, 'error': 'אין מספיק מלאי'}
+                new_mine = max(0, int(mine_qty + dq))
+                if dq > 0:
+                    # מונה = כל השריונים (כולל שפגו וטרם נמחקו) => חסם עליון לשריונים של אחרים
+                    cursor.execute(
+                        'SELECT qty FROM product_hold_totals WHERE product_id = ? AND variant_id = ?',
+                        (int(pid), int(vid))
+                    )
+                    trow = cursor.fetchone()
+                    total_all = int((trow['qty'] if trow else 0) or 0)
+                    mine_all = sum(int(r['qty'] or 0) for r in mine_rows)
+                    other_qty = max(0, total_all - mine_all)
+                    if new_mine > int(stock_qty - other_qty):
+                        # קרוב לגבול המלאי – ספירה מדויקת של שריונים חיים בלבד
+                        cursor.execute(
+                            '''
+                            SELECT COALESCE(SUM(qty),0) AS q
+                              FROM purchase_holds
+                             WHERE hold_type = 'product'
+                               AND expires_at > CURRENT_TIMESTAMP
+                               AND product_id = ?
+                               AND COALESCE(variant_id, 0) = ?
+                               AND station_id <> ?
+                            ''',
+                            (int(pid), int(vid), station_key)
+                        )
+                        row = cursor.fetchone()
+                        other_qty = int((row['q'] if row else 0) or 0)
+                        if new_mine > int(stock_qty - other_qty):
+                            conn.rollback()
+                            return {'ok': False, 'error': 'אין מספיק מלאי'}
 
             if dq > 0:
                 cursor.execute(
@@ -396,7 +554,7 @@ class Database:
                     ''',
                     (
                         station_key,
-                        int(student_id or 0),
+                        stid,
                         int(pid),
                         (int(vid) if int(vid or 0) > 0 else None),
                         int(dq),
@@ -405,22 +563,11 @@ class Database:
                 )
             else:
                 dq = abs(int(dq))
-                cursor.execute(
-                    '''
-                    SELECT id, qty
-                      FROM purchase_holds
-                     WHERE hold_type = 'product'
-                       AND expires_at > CURRENT_TIMESTAMP
-                       AND station_id = ? AND student_id = ?
-                       AND product_id = ? AND COALESCE(variant_id,0) = ?
-                     ORDER BY id DESC
-                    ''',
-                    (station_key, int(student_id or 0), int(pid), int(vid))
-                )
-                rows = cursor.fetchall() or []
-                for r in rows:
+                for r in mine_rows:
                     if dq <= 0:
                         break
+                    if int(r['live'] or 0) != 1:
+                        continue
                     rid = int(r['id'] or 0)
                     try:
                         q = int(r['qty'] or 0)
@@ -451,8 +598,8 @@ class Database:
         conn = self.get_connection()
         cursor = conn.cursor()
         try:
+            self._prepare_holds(conn)
             conn.execute('BEGIN IMMEDIATE')
-            self._cleanup_expired_holds(cursor)
 
             sid = int(service_id or 0)
             stid = int(student_id or 0)
@@ -463,40 +610,51 @@ class Database:
                 conn.rollback()
                 return {'ok': False, 'error': 'נתונים לא תקינים'}
 
-            cursor.execute('SELECT capacity_per_slot FROM scheduled_services WHERE id = ? AND is_active = 1', (int(sid),))
+            # שירות פעיל + תאריך פעיל בשאילתה אחת
+            cursor.execute(
+                '''
+                SELECT s.capacity_per_slot,
+                       (SELECT COUNT(1) FROM scheduled_service_dates d
+                         WHERE d.service_id = s.id AND d.is_active = 1 AND d.service_date = ?) AS date_ok
+                  FROM scheduled_services s
+                 WHERE s.id = ? AND s.is_active = 1
+                ''',
+                (sd, int(sid))
+            )
             row = cursor.fetchone()
             if not row:
                 conn.rollback()
                 return {'ok': False, 'error': 'האתגר לא פעיל'}
             cap = int((row['capacity_per_slot'] if row else 1) or 1)
-
-            cursor.execute(
-                'SELECT COUNT(1) AS c FROM scheduled_service_dates WHERE service_id = ? AND is_active = 1 AND service_date = ?',
-                (int(sid), sd)
-            )
-            ok = cursor.fetchone()
-            if int((ok['c'] if ok else 0) or 0) <= 0:
+            if int(row['date_ok'] or 0) <= 0:
                 conn.rollback()
                 return {'ok': False, 'error': 'התאריך לא זמין'}
 
             station_key = str(station_id or '').strip()
 
-            # If already held by this station/student for same slot, treat as ok (idempotent)
+            # כל מה שהתלמיד כבר תפס באותו יום (הזמנות + שריונים חיים) בשאילתה אחת
             cursor.execute(
                 '''
-                SELECT COUNT(1) AS c
+                SELECT 'res' AS src, service_id, '' AS station_id, slot_start_time, duration_minutes
+                  FROM scheduled_service_reservations
+                 WHERE student_id = ? AND service_date = ?
+                UNION ALL
+                SELECT 'hold' AS src, service_id, station_id, slot_start_time, duration_minutes
                   FROM purchase_holds
                  WHERE hold_type = 'scheduled'
                    AND expires_at > CURRENT_TIMESTAMP
-                   AND station_id = ? AND student_id = ?
-                   AND service_id = ? AND service_date = ? AND slot_start_time = ?
+                   AND student_id = ? AND service_date = ?
                 ''',
-                (station_key, int(stid), int(sid), sd, stt)
+                (int(stid), sd, int(stid), sd)
             )
-            row = cursor.fetchone()
-            if int((row['c'] if row else 0) or 0) > 0:
-                conn.commit()
-                return {'ok': True}
+            mine = cursor.fetchall() or []
+
+            # If already held by this station/student for same slot, treat as ok (idempotent)
+            for r in mine:
+                if (r['src'] == 'hold' and str(r['station_id'] or '') == station_key
+                        and int(r['service_id'] or 0) == int(sid) and str(r['slot_start_time'] or '') == stt):
+                    conn.commit()
+                    return {'ok': True}
 
             # Prevent overlaps for the same student on the same date (reservations + holds)
             try:
@@ -510,38 +668,7 @@ class Database:
                 start_min = _to_min(stt)
                 end_min = start_min + int(dur)
                 if start_min >= 0 and int(dur) > 0:
-                    cursor.execute(
-                        '''
-                        SELECT slot_start_time, duration_minutes
-                          FROM scheduled_service_reservations
-                         WHERE student_id = ? AND service_date = ?
-                        ''',
-                        (int(stid), sd)
-                    )
-                    for r in (cursor.fetchall() or []):
-                        os_ = _to_min(r['slot_start_time'])
-                        try:
-                            od = int(r['duration_minutes'] or 0)
-                        except Exception:
-                            od = 0
-                        if os_ < 0 or od <= 0:
-                            continue
-                        oe = os_ + od
-                        if start_min < oe and os_ < end_min:
-                            conn.rollback()
-                            return {'ok': False, 'error': 'לתלמיד כבר יש אתגר בזמן הזה'}
-
-                    cursor.execute(
-                        '''
-                        SELECT slot_start_time, duration_minutes
-                          FROM purchase_holds
-                         WHERE hold_type = 'scheduled'
-                           AND expires_at > CURRENT_TIMESTAMP
-                           AND student_id = ? AND service_date = ?
-                        ''',
-                        (int(stid), sd)
-                    )
-                    for r in (cursor.fetchall() or []):
+                    for r in mine:
                         os_ = _to_min(r['slot_start_time'])
                         try:
                             od = int(r['duration_minutes'] or 0)
@@ -552,30 +679,27 @@ class Database:
                         oe = os_ + od
                         if start_min < oe and os_ < end_min:
                             conn.rollback()
+                            if r['src'] == 'res':
+                                return {'ok': False, 'error': 'לתלמיד כבר יש אתגר בזמן הזה'}
                             return {'ok': False, 'error': 'לתלמיד כבר יש שריון לאתגר בזמן הזה'}
             except Exception:
                 pass
 
-            cursor.execute(
-                'SELECT COUNT(1) AS c FROM scheduled_service_reservations WHERE service_id = ? AND service_date = ? AND slot_start_time = ?',
-                (int(sid), sd, stt)
-            )
-            row = cursor.fetchone()
-            used_res = int((row['c'] if row else 0) or 0)
+            # תפוסת הסלוט: הזמנות + שריונים חיים של עמדות אחרות – שאילתה אחת
             cursor.execute(
                 '''
-                SELECT COALESCE(SUM(qty),0) AS q
-                  FROM purchase_holds
-                 WHERE hold_type = 'scheduled'
-                   AND expires_at > CURRENT_TIMESTAMP
-                   AND service_id = ? AND service_date = ? AND slot_start_time = ?
-                   AND station_id <> ?
+                SELECT (SELECT COUNT(1) FROM scheduled_service_reservations
+                         WHERE service_id = ? AND service_date = ? AND slot_start_time = ?)
+                     + (SELECT COALESCE(SUM(qty), 0) FROM purchase_holds
+                         WHERE hold_type = 'scheduled'
+                           AND expires_at > CURRENT_TIMESTAMP
+                           AND service_id = ? AND service_date = ? AND slot_start_time = ?
+                           AND station_id <> ?) AS used
                 ''',
-                (int(sid), sd, stt, station_key)
+                (int(sid), sd, stt, int(sid), sd, stt, station_key)
             )
-            other_h = cursor.fetchone()
-            used_hold = int((other_h['q'] if other_h else 0) or 0)
-            if int(used_res + used_hold) >= int(cap):
+            row = cursor.fetchone()
+            if int((row['used'] if row else 0) or 0) >= int(cap):
                 conn.rollback()
                 return {'ok': False, 'error': 'הסלוט מלא'}
 
@@ -597,6 +721,588 @@ class Database:
         finally:
             conn.close()
 
+    def get_recent_card_validations(self, minutes: int) -> List[Tuple[int, str]]:
+        """תיקופים מה-X דקות האחרונות (לטעינת מנוע האנטי-ספאם בעליית עמדה)"""
+        try:
+            m = max(1, int(minutes or 1))
+        except Exception:
+            m = 1
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                '''
+                SELECT student_id, validated_at
+                  FROM card_validations
+                 WHERE validated_at >= datetime('now', ?)
+                 ORDER BY validated_at
+                ''',
+                (f"-{m} minutes",)
+            )
+            return [(int(r['student_id'] or 0), str(r['validated_at'] or '')) for r in (cursor.fetchall() or [])]
+        finally:
+            conn.close()
+
+    def get_active_card_blocks(self) -> List[Dict[str, Any]]:
+        """חסימות כרטיס שעדיין בתוקף"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                '''
+                SELECT student_id, card_number, block_end, block_reason, violation_count
+                  FROM card_blocks
+                 WHERE block_end > datetime('now')
+                '''
+            )
+            return [dict(r) for r in (cursor.fetchall() or [])]
+        finally:
+            conn.close()
+
+    def write_anti_spam_batch(self, *, validations=None, blocks=None, events=None) -> None:
+        """כתיבת תיקופים/חסימות/אירועי אנטי-ספאם שנצברו בזיכרון – בטרנזקציה אחת.
+
+        validations: (student_id, card_number, validated_at)
+        blocks: (student_id, card_number, block_start, block_end, block_reason, violation_count)
+        events: (student_id, card_number, event_type, rule_count, rule_minutes,
+                 duration_minutes, recent_count, message, created_at)
+        """
+        if not validations and not blocks and not events:
+            return
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            if validations:
+                cursor.executemany(
+                    'INSERT INTO card_validations (student_id, card_number, validated_at) VALUES (?, ?, ?)',
+                    list(validations)
+                )
+            if blocks:
+                cursor.executemany(
+                    '''
+                    INSERT INTO card_blocks (student_id, card_number, block_start, block_end, block_reason, violation_count)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ''',
+                    list(blocks)
+                )
+            if events:
+                cursor.executemany(
+                    '''
+                    INSERT INTO anti_spam_events (student_id, card_number, event_type, rule_count, rule_minutes,
+                                                  duration_minutes, recent_count, message, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ''',
+                    list(events)
+                )
+            conn.commit()
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            raise
+        finally:
+            conn.close()
+
+    def apply_points_batch(self, changes, actor: str = '', reason: str = '', *,
+                           action_type: str = 'update', enforce_max: bool = True,
+                           chunk_size: int = 500) -> Dict[str, Any]:
+        """עדכון נקודות להרבה תלמידים בטרנזקציה אחת (עדכון כיתה/בונוס/שחזור).
+
+        changes: רשימת dict עם student_id ואחד מ:
+            'delta' – תוספת/הפחתה (התוצאה לא יורדת מתחת ל-0)
+            'set'   – ערך מוחלט
+          ואופציונלית 'reason' לשינוי ספציפי.
+        enforce_max: במדיניות 'block' – העלאה מעבר למקסימום המותר היום לא מתבצעת.
+
+        מחזיר {'ok', 'applied', 'blocked', 'max_allowed', 'error',
+                'results': [{'student_id', 'old_points', 'new_points', 'status'}]}
+        status: ok / unchanged / blocked / missing – old/new מתאימים ישירות למחסנית ה-Undo.
+        """
+        wanted: Dict[int, Dict[str, Any]] = {}
+        order: List[int] = []
+        for ch in (changes or []):
+            try:
+                sid = int(ch.get('student_id') or 0)
+            except Exception:
+                continue
+            if sid <= 0:
+                continue
+            if sid not in wanted:
+                order.append(sid)
+            wanted[sid] = ch
+
+        out: Dict[str, Any] = {'ok': True, 'applied': 0, 'blocked': 0, 'max_allowed': None,
+                               'error': None, 'results': []}
+        if not order:
+            return out
+
+        # מקסימום יומי ומדיניות – חישוב אחד לכל המנה
+        max_allowed = None
+        block_over_max = False
+        if enforce_max:
+            try:
+                max_allowed = int(self.compute_max_points_allowed() or 0)
+            except Exception:
+                max_allowed = None
+            if max_allowed:
+                try:
+                    ev = self.evaluate_points_against_max(proposed_points=int(max_allowed) + 1) or {}
+                    block_over_max = str(ev.get('policy') or 'none').strip().lower() == 'block'
+                except Exception:
+                    block_over_max = False
+        out['max_allowed'] = max_allowed
+
+        step = max(1, int(chunk_size or 500))
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+
+            current: Dict[int, int] = {}
+            for i in range(0, len(order), step):
+                chunk = order[i:i + step]
+                placeholders = ','.join('?' * len(chunk))
+                cursor.execute(f'SELECT id, points FROM students WHERE id IN ({placeholders})', tuple(chunk))
+                for r in cursor.fetchall():
+                    current[int(r['id'])] = int(r['points'] or 0)
+
+            results = []
+            writes = []
+            for sid in order:
+                ch = wanted[sid]
+                if sid not in current:
+                    results.append({'student_id': sid, 'old_points': None, 'new_points': None, 'status': 'missing'})
+                    continue
+                old = current[sid]
+                try:
+                    if ch.get('set') is not None:
+                        new = int(ch.get('set'))
+                    else:
+                        new = old + int(ch.get('delta') or 0)
+                except Exception:
+                    new = old
+                new = max(0, new)
+                status = 'ok'
+                if new == old:
+                    status = 'unchanged'
+                elif block_over_max and max_allowed and new > old and new > max_allowed:
+                    status = 'blocked'
+                    new = old
+                results.append({'student_id': sid, 'old_points': old, 'new_points': new, 'status': status})
+                if status == 'ok':
+                    writes.append((sid, old, new, str(ch.get('reason') or reason or '')))
+
+            actor_name = str(actor or '')
+            for i in range(0, len(writes), step):
+                chunk = writes[i:i + step]
+                cursor.executemany(
+                    'UPDATE students SET points = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
+                    [(new, sid) for sid, _old, new, _r in chunk]
+                )
+                cursor.executemany(
+                    '''
+                    INSERT INTO points_log (student_id, old_points, new_points, delta, reason, actor_name, action_type)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ''',
+                    [(sid, old, new, new - old, r, actor_name, action_type) for sid, old, new, r in chunk]
+                )
+                cursor.executemany(
+                    'INSERT INTO change_log (entity_type, entity_id, action_type, payload_json) VALUES (?, ?, ?, ?)',
+                    [
+                        ('student_points', str(sid), 'update', json.dumps(
+                            {'old_points': old, 'new_points': new, 'reason': r, 'added_by': actor_name},
+                            ensure_ascii=False
+                        ))
+                        for sid, old, new, r in chunk
+                    ]
+                )
+            conn.commit()
+            out['results'] = results
+            out['applied'] = len(writes)
+            out['blocked'] = sum(1 for r in results if r['status'] == 'blocked')
+            return out
+        except Exception as e:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            out['ok'] = False
+            out['error'] = str(e)
+            return out
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # תיקופים: swipe_log גולמי + סיכום יומי swipe_daily
+    # ------------------------------------------------------------------
+    # swipe_daily מחזיק שורה לכל (תלמיד, יום, סוג עמדה) עם מספר התיקופים
+    # והתיקוף הראשון. הסיכום מתעדכן בטרנזקציה של הכתיבה ל-swipe_log לפי
+    # סימן מים (המזהה האחרון שסוכם), כך שגם שורות שנכתבו ע"י עמדות אחרות
+    # נאספות בקריאה הבאה. סכומי תיקופים וספירת ימי לימודים נקראים מהסיכום.
+
+    def _ensure_swipe_daily(self, cursor) -> None:
+        if getattr(self, '_swipe_daily_ready', False):
+            return
+        cursor.execute(
+            '''
+            CREATE TABLE IF NOT EXISTS swipe_daily (
+                id INTEGER PRIMARY KEY,
+                student_id INTEGER NOT NULL,
+                date TEXT NOT NULL,
+                station_type TEXT NOT NULL DEFAULT '',
+                count INTEGER NOT NULL DEFAULT 0,
+                first_ts TEXT,
+                UNIQUE (student_id, date, station_type)
+            )
+            '''
+        )
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_swipe_daily_station_date ON swipe_daily(station_type, date)')
+        cursor.execute(
+            '''
+            CREATE TABLE IF NOT EXISTS swipe_daily_state (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                last_swipe_id INTEGER NOT NULL DEFAULT 0
+            )
+            '''
+        )
+        cursor.execute('INSERT OR IGNORE INTO swipe_daily_state (id, last_swipe_id) VALUES (1, 0)')
+        self._swipe_daily_ready = True
+
+    def _swipe_daily_watermark(self, cursor) -> int:
+        cursor.execute('SELECT last_swipe_id FROM swipe_daily_state WHERE id = 1')
+        row = cursor.fetchone()
+        return int((row[0] if row else 0) or 0)
+
+    def _catch_up_swipe_daily(self, cursor) -> int:
+        """סיכום שורות swipe_log שנוספו מאז הפעם הקודמת (בתוך הטרנזקציה של הקורא)"""
+        last_id = self._swipe_daily_watermark(cursor)
+        cursor.execute('SELECT MAX(id) FROM swipe_log')
+        row = cursor.fetchone()
+        max_id = int((row[0] if row else 0) or 0)
+        if max_id <= last_id:
+            return 0
+        cursor.execute(
+            '''
+            INSERT INTO swipe_daily (student_id, date, station_type, count, first_ts)
+            SELECT student_id, substr(swiped_at, 1, 10), COALESCE(station_type, ''), COUNT(1), MIN(swiped_at)
+              FROM swipe_log
+             WHERE id > ? AND id <= ? AND student_id IS NOT NULL AND swiped_at IS NOT NULL
+             GROUP BY student_id, substr(swiped_at, 1, 10), COALESCE(station_type, '')
+            ON CONFLICT(student_id, date, station_type) DO UPDATE SET
+                count = count + excluded.count,
+                first_ts = MIN(first_ts, excluded.first_ts)
+            ''',
+            (last_id, max_id)
+        )
+        cursor.execute('UPDATE swipe_daily_state SET last_swipe_id = ? WHERE id = 1', (max_id,))
+        return max_id - last_id
+
+    def _refresh_swipe_daily(self) -> None:
+        """לפני קריאה: אם עמדה אחרת כתבה ל-swipe_log – סיכום השורות החדשות"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            self._ensure_swipe_daily(cursor)
+            conn.commit()
+            last_id = self._swipe_daily_watermark(cursor)
+            cursor.execute('SELECT MAX(id) FROM swipe_log')
+            row = cursor.fetchone()
+            if int((row[0] if row else 0) or 0) <= last_id:
+                return
+            conn.execute('BEGIN IMMEDIATE')
+            self._catch_up_swipe_daily(cursor)
+            conn.commit()
+        except Exception as e:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            print(f"[SWIPES] swipe_daily refresh failed: {e}")
+        finally:
+            conn.close()
+
+    def rebuild_swipe_daily(self, cursor=None) -> int:
+        """בנייה מחדש של swipe_daily מכל swipe_log (השלמה ראשונית / אחרי מחיקה גורפת).
+        cursor – להרצה בתוך טרנזקציה קיימת (commit באחריות הקורא)."""
+        own = cursor is None
+        conn = None
+        if own:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+        try:
+            self._ensure_swipe_daily(cursor)
+            if own:
+                conn.commit()
+                conn.execute('BEGIN IMMEDIATE')
+            cursor.execute('DELETE FROM swipe_daily')
+            cursor.execute('UPDATE swipe_daily_state SET last_swipe_id = 0 WHERE id = 1')
+            self._catch_up_swipe_daily(cursor)
+            cursor.execute('SELECT COUNT(1) FROM swipe_daily')
+            n = int(cursor.fetchone()[0] or 0)
+            if own:
+                conn.commit()
+            return n
+        except Exception:
+            if own:
+                try:
+                    conn.rollback()
+                except Exception:
+                    pass
+            raise
+        finally:
+            if own:
+                conn.close()
+
+    def log_swipe(self, student_id: int, card_number: str = '', station_type: str = 'public',
+                  swiped_at: Optional[str] = None) -> bool:
+        """רישום תיקוף + עדכון הסיכום היומי באותה טרנזקציה"""
+        ts = str(swiped_at or datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            self._ensure_swipe_daily(cursor)
+            conn.commit()
+            conn.execute('BEGIN IMMEDIATE')
+            cursor.execute(
+                'INSERT INTO swipe_log (student_id, card_number, station_type, swiped_at) VALUES (?, ?, ?, ?)',
+                (int(student_id or 0), str(card_number or ''), str(station_type or ''), ts)
+            )
+            self._catch_up_swipe_daily(cursor)
+            conn.commit()
+            return True
+        except Exception as e:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            print(f"[SWIPES] log_swipe failed: {e}")
+            return False
+        finally:
+            conn.close()
+
+    def upsert_first_swipe_for_date(self, student_id: int, *, swiped_at: str, card_number: str = '',
+                                    station_type: str = 'public') -> bool:
+        """תיקוף ידני לתאריך: אם אין תיקוף באותו יום – נרשם חדש; אם יש ותיקוף זה
+        מוקדם יותר – התיקוף הראשון של היום מוקדם לשעה זו (מספר התיקופים לא משתנה)."""
+        ts = str(swiped_at or '').strip()
+        if not ts:
+            return False
+        day = ts[:10]
+        st = str(station_type or '')
+        sid = int(student_id or 0)
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            self._ensure_swipe_daily(cursor)
+            conn.commit()
+            conn.execute('BEGIN IMMEDIATE')
+            self._catch_up_swipe_daily(cursor)
+            cursor.execute(
+                '''
+                SELECT id, swiped_at FROM swipe_log
+                 WHERE student_id = ? AND COALESCE(station_type, '') = ? AND substr(swiped_at, 1, 10) = ?
+                 ORDER BY swiped_at LIMIT 1
+                ''',
+                (sid, st, day)
+            )
+            first = cursor.fetchone()
+            if first is None:
+                cursor.execute(
+                    'INSERT INTO swipe_log (student_id, card_number, station_type, swiped_at) VALUES (?, ?, ?, ?)',
+                    (sid, str(card_number or ''), st, ts)
+                )
+                self._catch_up_swipe_daily(cursor)
+            elif str(first['swiped_at'] or '') > ts:
+                cursor.execute('UPDATE swipe_log SET swiped_at = ? WHERE id = ?', (ts, int(first['id'])))
+                cursor.execute(
+                    'UPDATE swipe_daily SET first_ts = ? WHERE student_id = ? AND date = ? AND station_type = ?',
+                    (ts, sid, day, st)
+                )
+            conn.commit()
+            return True
+        except Exception as e:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            print(f"[SWIPES] upsert_first_swipe_for_date failed: {e}")
+            return False
+        finally:
+            conn.close()
+
+    def get_swipe_totals_for_students(self, student_ids, station_type: Optional[str] = None) -> Dict[int, int]:
+        """סה"כ תיקופים לכל תלמיד (מהסיכום היומי)"""
+        ids = []
+        for x in (student_ids or []):
+            try:
+                ids.append(int(x))
+            except Exception:
+                continue
+        if not ids:
+            return {}
+        self._refresh_swipe_daily()
+        totals: Dict[int, int] = {}
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                placeholders = ','.join('?' * len(chunk))
+                sql = f'SELECT student_id, SUM(count) AS total FROM swipe_daily WHERE student_id IN ({placeholders})'
+                params = list(chunk)
+                if station_type:
+                    sql += ' AND station_type = ?'
+                    params.append(str(station_type))
+                cursor.execute(sql + ' GROUP BY student_id', params)
+                for r in cursor.fetchall():
+                    totals[int(r['student_id'])] = int(r['total'] or 0)
+        finally:
+            conn.close()
+        return totals
+
+    def get_total_school_days(self, station_type: Optional[str] = None) -> int:
+        """מספר ימי הלימודים = ימים שבהם היה לפחות תיקוף אחד"""
+        self._refresh_swipe_daily()
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            if station_type:
+                cursor.execute('SELECT COUNT(DISTINCT date) FROM swipe_daily WHERE station_type = ?', (str(station_type),))
+            else:
+                cursor.execute('SELECT COUNT(DISTINCT date) FROM swipe_daily')
+            row = cursor.fetchone()
+            return int((row[0] if row else 0) or 0)
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # בונוס זמנים – הענקה בתפיסה (claim)
+    # ------------------------------------------------------------------
+    # ההענקה נתפסת בכתיבה למסד לפני שמוסיפים נקודות: INSERT ל-time_bonus_given
+    # (UNIQUE לתלמיד/בונוס/יום) ול-time_bonus_group_claims (מפתח לתלמיד/קבוצה/יום),
+    # באותה טרנזקציה. רק עמדה שהכתיבה שלה הצליחה מוסיפה את הנקודות – כך שתי
+    # עמדות שתיקפו את אותו כרטיס באותו רגע לא מעניקות פעמיים.
+
+    def _ensure_time_bonus_claims(self, cursor) -> None:
+        if getattr(self, '_time_bonus_claims_ready', False):
+            return
+        cursor.execute(
+            '''
+            CREATE TABLE IF NOT EXISTS time_bonus_group_claims (
+                given_date TEXT NOT NULL,
+                bonus_group TEXT NOT NULL,
+                student_id INTEGER NOT NULL,
+                bonus_schedule_id INTEGER NOT NULL,
+                PRIMARY KEY (given_date, bonus_group, student_id)
+            )
+            '''
+        )
+        self._time_bonus_claims_ready = True
+
+    def claim_time_bonus(self, student_id: int, bonus_schedule_id: int, bonus_group: str = '',
+                         given_date: Optional[str] = None) -> bool:
+        """תפיסת בונוס זמנים לתלמיד להיום. True – ההענקה נרשמה עכשיו (ורק אז מוסיפים נקודות);
+        False – כבר הוענק (הבונוס הזה או בונוס אחר מאותה קבוצה). שגיאת מסד נזרקת."""
+        sid = int(student_id or 0)
+        bid = int(bonus_schedule_id or 0)
+        group = str(bonus_group or '').strip()
+        d = str(given_date or datetime.now().strftime('%Y-%m-%d'))
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            self._ensure_time_bonus_claims(cursor)
+            conn.commit()
+            conn.execute('BEGIN IMMEDIATE')
+            if group:
+                # הענקות מאותה קבוצה שנרשמו בלי תפיסה (תיקון ידני / גרסה קודמת)
+                cursor.execute(
+                    '''
+                    SELECT 1
+                      FROM time_bonus_given g
+                      JOIN time_bonus_schedules s ON s.id = g.bonus_schedule_id
+                     WHERE g.student_id = ? AND g.given_date = ?
+                       AND COALESCE(NULLIF(TRIM(s.group_name), ''), TRIM(s.name)) = ?
+                     LIMIT 1
+                    ''',
+                    (sid, d, group)
+                )
+                if cursor.fetchone():
+                    conn.rollback()
+                    return False
+                cursor.execute(
+                    '''
+                    INSERT OR IGNORE INTO time_bonus_group_claims (given_date, bonus_group, student_id, bonus_schedule_id)
+                    VALUES (?, ?, ?, ?)
+                    ''',
+                    (d, group, sid, bid)
+                )
+                if cursor.rowcount != 1:
+                    conn.rollback()
+                    return False
+            cursor.execute(
+                '''
+                INSERT OR IGNORE INTO time_bonus_given (student_id, bonus_schedule_id, given_date, given_at)
+                SELECT ?, ?, ?, CURRENT_TIMESTAMP
+                 WHERE NOT EXISTS (
+                       SELECT 1 FROM time_bonus_given
+                        WHERE student_id = ? AND bonus_schedule_id = ? AND given_date = ?)
+                ''',
+                (sid, bid, d, sid, bid, d)
+            )
+            if cursor.rowcount != 1:
+                conn.rollback()
+                return False
+            cursor.execute('DELETE FROM time_bonus_group_claims WHERE given_date < ?', (d,))
+            conn.commit()
+            return True
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            raise
+        finally:
+            conn.close()
+
+    def release_time_bonus_claim(self, student_id: int, bonus_schedule_id: int, bonus_group: str = '',
+                                 given_date: Optional[str] = None) -> bool:
+        """ביטול תפיסה שהנקודות שלה לא נוספו (כדי שתיקוף הבא יוכל לקבל את הבונוס)"""
+        sid = int(student_id or 0)
+        bid = int(bonus_schedule_id or 0)
+        group = str(bonus_group or '').strip()
+        d = str(given_date or datetime.now().strftime('%Y-%m-%d'))
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            self._ensure_time_bonus_claims(cursor)
+            conn.commit()
+            conn.execute('BEGIN IMMEDIATE')
+            cursor.execute(
+                'DELETE FROM time_bonus_given WHERE student_id = ? AND bonus_schedule_id = ? AND given_date = ?',
+                (sid, bid, d)
+            )
+            if group:
+                cursor.execute(
+                    '''
+                    DELETE FROM time_bonus_group_claims
+                     WHERE given_date = ? AND bonus_group = ? AND student_id = ? AND bonus_schedule_id = ?
+                    ''',
+                    (d, group, sid, bid)
+                )
+            conn.commit()
+            return True
+        except Exception as e:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            print(f"[TIME-BONUS] release claim failed: {e}")
+            return False
+        finally:
+            conn.close()
+
     def create_tables(self):
         """יצירת טבלאות אם לא קיימות"""
         # (This was cut off in the restore, but it's enough to run the class logic)
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+בניית מסמכי ESC/POS (קבלות/שוברים במצב טקסט)
+
+- EscPosWriter: כותב על bytearray אחד עם פקודות מוגדרות (יישור, מודגש, גודל, חיתוך...)
+  במקום שרשור bytes חוזר;
+- קידוד עברית דרך טבלת charmap שנבנית פעם אחת לכל קידוד חד-בתי (cp862 כברירת מחדל)
+  ותוצאה זהה בדיוק ל-str.encode(encoding, errors);
+- תוויות קבועות ("סך הכל", "נקודות"...) נשמרות הפוכות ומקודדות ב-lru_cache;
+- SEGMENTS: מטמון LRU משותף לקטעים סטטיים מקודדים (לוגו, כותרות וקישוטים כתמונת raster).
+"""
+
+import codecs
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Callable, Dict, Hashable, Optional
+
+ESC = b'\x1b'
+GS = b'\x1d'
+INIT = ESC + b'@'
+CUT = GS + b'V\x31'
+BOLD_ON = ESC + b'E\x01'
+BOLD_OFF = ESC + b'E\x00'
+UNDERLINE_ON = ESC + b'-\x02'
+UNDERLINE_OFF = ESC + b'-\x00'
+ALIGN = {
+    'left': ESC + b'a\x00',
+    'center': ESC + b'a\x01',
+    'right': ESC + b'a\x02',
+}
+# GS ! n – רוחב/גובה תווים
+SIZE_NORMAL = 0x00
+SIZE_LARGE = 0x11
+SIZE_LARGE2 = 0x22
+SIZE_XLARGE = 0x33
+
+# רוחב שורה (תווים) לקווי הפרדה חלופיים כשאין קישוט גרפי
+LINE_CHARS = 32
+
+
+# ===================== קידוד =====================
+
+_CHARMAPS: Dict[str, object] = {}
+_CHARMAPS_LOCK = threading.Lock()
+
+
+def _charmap(encoding: str):
+    """טבלת קידוד (codecs.charmap_build) לקידוד חד-בתי, או None לקידוד אחר"""
+    key = str(encoding or '').lower()
+    try:
+        return _CHARMAPS[key]
+    except KeyError:
+        pass
+    with _CHARMAPS_LOCK:
+        if key not in _CHARMAPS:
+            table = None
+            try:
+                decoded = bytes(range(256)).decode(key)
+                if len(decoded) == 256:
+                    table = codecs.charmap_build(decoded)
+            except Exception:
+                table = None
+            _CHARMAPS[key] = table
+        return _CHARMAPS[key]
+
+
+def encode(text: str, encoding: str = 'cp862', errors: str = 'replace') -> bytes:
+    """כמו str(text).encode(encoding, errors) – דרך טבלת charmap כשאפשר"""
+    s = str(text or '')
+    table = _charmap(encoding)
+    if table is None:
+        return s.encode(encoding, errors=errors)
+    return codecs.charmap_encode(s, errors, table)[0]
+
+
+@lru_cache(maxsize=512)
+def encoded_label(text: str, encoding: str = 'cp862') -> bytes:
+    """תווית קבועה בעברית – הפוכה (RTL למדפסת) ומקודדת, מהמטמון"""
+    return encode(str(text or '')[::-1], encoding)
+
+
+# ===================== קטעים סטטיים =====================
+
+class SegmentCache:
+    """מטמון LRU חסום לקטעי ESC/POS מקודדים (לוגו, כותרות, קישוטים)"""
+
+    def __init__(self, max_items: int = 64):
+        self.max_items = max(1, int(max_items or 1))
+        self._lock = threading.Lock()
+        self._items: 'OrderedDict[Hashable, bytes]' = OrderedDict()
+
+    def lookup(self, key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+            return data
+
+    def put(self, key: Hashable, data: bytes) -> None:
+        with self._lock:
+            self._items[key] = bytes(data or b'')
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def get(self, key: Hashable, build: Callable[[], bytes]) -> bytes:
+        data = self.lookup(key)
+        if data is None:
+            data = build() or b''
+            if data:
+                self.put(key, data)
+        return data
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+SEGMENTS = SegmentCache()
+
+_INVERT = bytes(255 - i for i in range(256))
+
+
+def raster_bytes(img) -> bytes:
+    """תמונה -> GS v 0 (raster). פיקסל 0 = נקודה שחורה; שוליים בסוף שורה נשארים 0."""
+    try:
+        w, h = img.size
+        width_bytes = (w + 7) // 8
+        head = b'\x1D\x76\x30\x00' + bytes([
+            width_bytes & 0xFF, (width_bytes >> 8) & 0xFF, h & 0xFF, (h >> 8) & 0xFF,
+        ])
+        if img.mode == '1':
+            # PIL אורז שורות במצב '1' לבתים (ביט דולק = לבן) – היפוך נותן ביט דולק = שחור
+            body = img.tobytes().translate(_INVERT)
+            if w % 8:
+                mask = (0xFF << (8 - w % 8)) & 0xFF
+                body = bytearray(body)
+                for y in range(h):
+                    body[(y + 1) * width_bytes - 1] &= mask
+            return head + bytes(body)
+
+        data = bytearray(head)
+        for y in range(h):
+            for x in range(0, w, 8):
+                byte_val = 0
+                for bit in range(8):
+                    if x + bit < w:
+                        try:
+                            pixel = img.getpixel((x + bit, y))
+                        except Exception:
+                            pixel = 255
+                        if pixel == 0:
+                            byte_val |= (1 << (7 - bit))
+                data.append(byte_val)
+        return bytes(data)
+    except Exception:
+        return b''
+
+
+# ===================== כותב מסמך =====================
+
+class EscPosWriter:
+    """כותב מסמך ESC/POS על bytearray אחד"""
+
+    __slots__ = ('buf', 'encoding', '_table')
+
+    def __init__(self, encoding: str = 'cp862'):
+        self.buf = bytearray()
+        self.encoding = str(encoding or 'cp862')
+        self._table = _charmap(self.encoding)
+
+    def _encode(self, s: str) -> bytes:
+        if self._table is None:
+            return s.encode(self.encoding, errors='replace')
+        return codecs.charmap_encode(s, 'replace', self._table)[0]
+
+    def getvalue(self) -> bytes:
+        return bytes(self.buf)
+
+    def raw(self, data: bytes) -> None:
+        if data:
+            self.buf += data
+
+    def init(self, codepage: Optional[int] = None) -> None:
+        self.buf += INIT
+        if codepage is not None:
+            self.buf += ESC + b't' + bytes([int(codepage) & 0xFF])
+
+    def align(self, where: str) -> None:
+        self.buf += ALIGN[where]
+
+    def bold(self, on: bool = True) -> None:
+        self.buf += BOLD_ON if on else BOLD_OFF
+
+    def underline(self, on: bool = True) -> None:
+        self.buf += UNDERLINE_ON if on else UNDERLINE_OFF
+
+    def size(self, n: int = SIZE_NORMAL) -> None:
+        self.buf += GS + b'!' + bytes([int(n) & 0xFF])
+
+    def newline(self, count: int = 1) -> None:
+        self.buf += b'\n' * count
+
+    def text(self, s: str) -> None:
+        self.buf += self._encode(str(s or ''))
+
+    def rtl(self, s: str) -> None:
+        """טקסט דינמי בעברית – הפוך לסדר הדפסה"""
+        self.buf += self._encode(str(s or '')[::-1])
+
+    def label(self, s: str) -> None:
+        """תווית קבועה בעברית (מהמטמון)"""
+        self.buf += encoded_label(s, self.encoding)
+
+    def line(self, s: str = '') -> None:
+        self.text(s)
+        self.buf += b'\n'
+
+    def rtl_line(self, s: str) -> None:
+        self.rtl(s)
+        self.buf += b'\n'
+
+    def segment_line(self, segment: bytes, fallback: bytes = b'-') -> None:
+        """קטע גרפי מוכן (קישוט/כותרת) ושורה חדשה, או קו תווים כשאין"""
+        self.buf += (segment or fallback * LINE_CHARS) + b'\n'
+
+    def cut(self) -> None:
+        self.buf += CUT
@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+"""
+ייצוא אוטומטי מצטבר לקובץ האקסל המשותף (עמדת ניהול)
+
+במקום לכתוב מחדש את כל החוברת על כל שינוי, העובד ברקע:
+- מאחד רצפים של שינויים (coalescing) לכתיבה אחת;
+- משווה את ערכי ה-DB (כרטיס, נקודות, הודעה פרטית) מול התאים שבקובץ
+  ומעדכן רק את התאים של התלמידים ששונו;
+- אם אין הבדל – לא נוגע בקובץ בכלל;
+- כותב לקובץ זמני באותה תיקייה ומחליף באופן אטומי (os.replace).
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from excel_import import _strip_asterisk_annotations
+
+HEADER_LAST_NAME = 'שם משפחה'
+HEADER_FIRST_NAME = 'שם פרטי'
+HEADER_CARD = "מס' כרטיס"
+HEADER_POINTS = "מס' נקודות"
+HEADER_MESSAGE = 'הודעה פרטית'
+
+# ברירת מחדל אם הכותרות לא נמצאו: G, H, I
+_DEFAULT_COLUMNS = {HEADER_CARD: 7, HEADER_POINTS: 8, HEADER_MESSAGE: 9}
+
+
+def _name_key(first, last) -> Tuple[str, str]:
+    return (
+        str(_strip_asterisk_annotations(str(first or '').strip()) or '').strip(),
+        str(_strip_asterisk_annotations(str(last or '').strip()) or '').strip(),
+    )
+
+
+def _cell_text(v) -> str:
+    if v is None:
+        return ''
+    if isinstance(v, float) and v.is_integer():
+        v = int(v)
+    return str(v).strip()
+
+
+def patch_excel_columns(db, excel_path: str) -> int:
+    """עדכון עמודות כרטיס/נקודות/הודעה בקובץ קיים – רק בתאים שהשתנו.
+    מחזיר את מספר השורות שעודכנו (0 = הקובץ לא נכתב)."""
+    from openpyxl import load_workbook
+
+    conn = db.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('SELECT id, first_name, last_name, card_number, points, private_message FROM students ORDER BY id')
+        students: Dict[Tuple[str, str], tuple] = {}
+        for r in cursor.fetchall():
+            key = _name_key(r['first_name'], r['last_name'])
+            students.setdefault(key, (r['card_number'], r['points'], r['private_message']))
+    finally:
+        conn.close()
+
+    wb = load_workbook(excel_path)
+    ws = wb.active
+
+    header = {}
+    for cell in next(ws.iter_rows(min_row=1, max_row=1), ()):
+        if cell.value is not None:
+            header.setdefault(str(cell.value).strip(), cell.column)
+    col_last = header.get(HEADER_LAST_NAME)
+    col_first = header.get(HEADER_FIRST_NAME)
+    if not col_last or not col_first:
+        return 0
+    col_card = header.get(HEADER_CARD, _DEFAULT_COLUMNS[HEADER_CARD])
+    col_points = header.get(HEADER_POINTS, _DEFAULT_COLUMNS[HEADER_POINTS])
+    col_msg = header.get(HEADER_MESSAGE, _DEFAULT_COLUMNS[HEADER_MESSAGE])
+
+    changed_rows = 0
+    for row in ws.iter_rows(min_row=2):
+        cells = {c.column: c for c in row}
+        c_last = cells.get(col_last)
+        c_first = cells.get(col_first)
+        if c_last is None or c_first is None:
+            continue
+        key = _name_key(c_first.value, c_last.value)
+        if not key[0] or not key[1]:
+            continue
+        data = students.get(key)
+        if data is None:
+            continue
+        card, points, msg = data
+        row_changed = False
+
+        card_txt = str(card) if card else ''
+        c = cells.get(col_card) or ws.cell(row=c_last.row, column=col_card)
+        if _cell_text(c.value) != card_txt:
+            c.value = card_txt or None
+            c.number_format = '@'
+            row_changed = True
+
+        c = cells.get(col_points) or ws.cell(row=c_last.row, column=col_points)
+        try:
+            pts = int(points or 0)
+        except Exception:
+            pts = 0
+        if _cell_text(c.value) != str(pts):
+            c.value = pts
+            row_changed = True
+
+        msg_txt = str(msg or '').strip()
+        c = cells.get(col_msg) or ws.cell(row=c_last.row, column=col_msg)
+        if _cell_text(c.value) != msg_txt:
+            c.value = msg_txt or None
+            row_changed = True
+
+        if row_changed:
+            changed_rows += 1
+
+    if changed_rows == 0:
+        return 0
+
+    # כתיבה לקובץ זמני באותה תיקייה והחלפה אטומית – קורא אחר לא יראה קובץ חצי-כתוב
+    tmp_path = f"{excel_path}.{os.getpid()}.tmp"
+    try:
+        wb.save(tmp_path)
+        os.replace(tmp_path, excel_path)
+    finally:
+        try:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        except Exception:
+            pass
+    return changed_rows
+
+
+class ExcelAutoExporter:
+    """עובד רקע: מסמנים "מלוכלך", והוא כותב פעם אחת אחרי שקט של delay_sec"""
+
+    def __init__(self, db, excel_path: str, *, delay_sec: float = 300.0, min_gap_sec: float = 3.0,
+                 on_done: Optional[Callable[[int, Optional[float]], None]] = None,
+                 on_error: Optional[Callable[[Exception], None]] = None):
+        self.db = db
+        self.excel_path = excel_path
+        self.delay_sec = max(0.05, float(delay_sec or 300.0))
+        self.min_gap_sec = max(0.0, float(min_gap_sec or 0.0))
+        self.on_done = on_done
+        self.on_error = on_error
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._stop = False
+        self._dirty_since: Optional[float] = None
+        self._due_ts: Optional[float] = None
+        self._last_done_ts = 0.0
+        # callbacks חד-פעמיים לסבב הכתיבה הבא (סינכרון ידני)
+        self._waiters = []
+        self._thread = threading.Thread(target=self._loop, name='excel-auto-export', daemon=True)
+        self._thread.start()
+
+    def mark_dirty(self, force: bool = False) -> None:
+        """שינוי נתונים – הכתיבה תתבצע אחרי delay_sec (או מיד אם force)"""
+        now = time.time()
+        with self._lock:
+            if self._dirty_since is None:
+                self._dirty_since = now
+                self._due_ts = now + self.delay_sec
+            if force:
+                self._due_ts = now
+            self._idle.clear()
+        self._wake.set()
+
+    def is_pending(self) -> bool:
+        with self._lock:
+            return self._dirty_since is not None
+
+    def flush_now(self, wait: bool = False, timeout: float = 30.0,
+                  on_complete: Optional[Callable[[int, Optional[Exception]], None]] = None) -> bool:
+        """כתיבה מיידית (סינכרון ידני / סגירה). wait=True ממתין לסיום.
+        on_complete(changed_rows, error) נקרא מתהליכון הרקע בסיום הסבב."""
+        if on_complete is not None:
+            with self._lock:
+                self._waiters.append(on_complete)
+        self.mark_dirty(force=True)
+        if wait:
+            return self._idle.wait(timeout)
+        return True
+
+    def stop(self) -> None:
+        self._stop = True
+        self._wake.set()
+
+    def _loop(self) -> None:
+        while not self._stop:
+            with self._lock:
+                due = self._due_ts
+            if due is None:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            # שמירה על מרווח מינימלי בין כתיבות לשיתוף
+            due = max(due, self._last_done_ts + self.min_gap_sec)
+            wait_s = due - time.time()
+            if wait_s > 0:
+                self._wake.wait(wait_s)
+                self._wake.clear()
+                continue
+            with self._lock:
+                # שינויים שיגיעו מעכשיו ייכתבו בסבב הבא
+                self._dirty_since = None
+                self._due_ts = None
+                waiters, self._waiters = self._waiters, []
+            changed = 0
+            err = None
+            try:
+                if self.excel_path and os.path.exists(self.excel_path):
+                    changed = patch_excel_columns(self.db, self.excel_path)
+            except Exception as e:
+                err = e
+                print(f"[EXCEL-EXPORT] export failed: {e}")
+            self._last_done_ts = time.time()
+            if err is not None:
+                # למשל הקובץ פתוח באקסל – ננסה שוב בסבב הבא
+                with self._lock:
+                    if self._dirty_since is None:
+                        self._dirty_since = self._last_done_ts
+                        self._due_ts = self._last_done_ts + max(30.0, min(self.delay_sec, 300.0))
+                if self.on_error is not None:
+                    try:
+                        self.on_error(err)
+                    except Exception:
+                        pass
+            else:
+                mtime = None
+                try:
+                    mtime = os.path.getmtime(self.excel_path)
+                except Exception:
+                    pass
+                if self.on_done is not None:
+                    try:
+                        self.on_done(changed, mtime)
+                    except Exception:
+                        pass
+            for cb in waiters:
+                try:
+                    cb(changed, err)
+                except Exception:
+                    pass
+            with self._lock:
+                if self._dirty_since is None:
+                    self._idle.set()
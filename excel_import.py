@@ -1,11 +1,14 @@
 """
 מודול ייבוא נתונים מקובץ Excel
 """
-import pandas as pd
 from database import Database
 from typing import List, Dict
 from collections import Counter
 from datetime import date, timedelta, datetime, timezone
+from excel_import_engine import (
+    COL_FIRST_NAME, COL_LAST_NAME, apply_import_plan, build_import_plan, fetch_existing_students,
+    normalize_import_frame, read_import_excel, write_change_log,
+)
 
 
 def _strip_asterisk_annotations(text: str) -> str:
@@ -29,8 +32,7 @@ class ExcelImporter:
         logs: רשימת רשומות מ-DB.points_log (dict).
         """
         try:
-            from openpyxl import load_workbook
-            from openpyxl.styles import Alignment
+            from excel_styling import StreamingExcelWriter
 
             student_name = _strip_asterisk_annotations(f"{student.get('first_name', '')} {student.get('last_name', '')}".strip())
             class_name = _strip_asterisk_annotations(str(student.get('class_name') or '').strip())
@@ -104,31 +106,12 @@ class ExcelImporter:
                     'סיבה': _strip_asterisk_annotations(reason),
                 })
 
-            df = pd.DataFrame(data, columns=columns) if data else pd.DataFrame(columns=columns)
-            df.to_excel(excel_path, index=False, engine='openpyxl')
-
-            wb = load_workbook(excel_path)
-            ws = wb.active
-            
-            # Apply RTL and alternating colors styling
-            try:
-                from excel_styling import apply_rtl_and_alternating_colors
-                apply_rtl_and_alternating_colors(ws, has_header=True)
-            except Exception:
-                # Fallback to basic RTL if styling module not available
-                ws.sheet_view.rightToLeft = True
-                for row in ws.iter_rows(min_row=1, max_row=ws.max_row):
-                    for cell in row:
-                        cell.alignment = Alignment(horizontal='right', vertical='center', wrap_text=True)
-
             # שם גליון
-            try:
-                base = f"היסטוריה - {student.get('first_name','')}{student.get('last_name','')}".strip() or 'היסטוריה'
-                ws.title = str(base)[:31]
-            except Exception:
-                pass
+            base = f"היסטוריה - {student.get('first_name','')}{student.get('last_name','')}".strip() or 'היסטוריה'
 
-            wb.save(excel_path)
+            writer = StreamingExcelWriter(excel_path)
+            writer.write_sheet(str(base)[:31], columns, ([r[c] for c in columns] for r in data))
+            writer.save()
             return True
         except Exception as e:
             print(f"שגיאה בייצוא היסטוריית נקודות: {e}")
@@ -136,7 +119,100 @@ class ExcelImporter:
             traceback.print_exc()
             return False
     
-    def quick_update_from_excel(self, excel_path: str) -> tuple[int, List[str]]:
+    def _run_import(self, excel_path: str, *, mode: str, clear_existing: bool = False,
+                    dtype_dict: dict = None, progress=None, reason: str = "ייבוא מ-Excel") -> tuple[int, List[str], dict]:
+        """קריאה + נרמול וקטורי + כתיבה במנות בטרנזקציה אחת (ראו excel_import_engine)"""
+        df = read_import_excel(excel_path, dtype=dtype_dict)
+        if mode != 'quick':
+            for col in (COL_LAST_NAME, COL_FIRST_NAME):
+                if col not in df.columns:
+                    return 0, [f"חסרה עמודה נדרשת: {col}"], {}
+        frame = normalize_import_frame(df, serial_from_row_order=True, progress=progress)
+
+        # מחיקת נתונים קיימים אם נדרש
+        if clear_existing:
+            self.db.clear_all_students()
+
+        conn = self.db.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            existing = fetch_existing_students(cursor)
+            plan = build_import_plan(frame, existing, mode=mode)
+            result = apply_import_plan(cursor, plan, reason=reason, actor_name="מערכת", progress=progress)
+            try:
+                write_change_log(cursor, result.get('events') or [])
+            except Exception as e:
+                print(f"[IMPORT] change_log write failed: {e}")
+            if clear_existing:
+                ids = dict(result.get('new_ids') or {})
+                for key, row in existing.items():
+                    ids.setdefault(key, int(row['id']))
+                self._write_synthetic_swipes(cursor, frame, ids, result['errors'])
+            conn.commit()
+        except Exception:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            raise
+        finally:
+            conn.close()
+        return int(plan.get('rows') or 0), list(result.get('errors') or []), result
+
+    def _write_synthetic_swipes(self, cursor, frame, ids: Dict[tuple, int], errors: List[str]) -> None:
+        """שחזור היסטוריית swipe_log סינתטית מסיכומי התיקופים שבאקסל (רק בייבוא עם איפוס)"""
+        try:
+            with_swipes = frame[frame['total_swipes'] > 0]
+            if with_swipes.empty:
+                # אחרי איפוס – גם הסיכום היומי צריך להתאים ל-swipe_log
+                self.db.rebuild_swipe_daily(cursor=cursor)
+                return
+            # קביעת מספר ימי הלימודים הכולל (גלובלי לכל התלמידים) – הערך השכיח של סה"כ/ממוצע
+            both = with_swipes[with_swipes['avg_swipes'] > 0]
+            approx = (both['total_swipes'] / both['avg_swipes']).round().astype('int64')
+            approx = approx[approx >= 1]
+            total_days = 1
+            if not approx.empty:
+                counter = Counter(approx.tolist())
+                total_days = max(counter.items(), key=lambda kv: kv[1])[0]
+            if not total_days or total_days < 1:
+                total_days = 1
+
+            # בניית רשימת תאריכים (לא כולל שבת) – נסוגים מ-היום אחורה
+            days_list = []
+            current = date.today()
+            while len(days_list) < total_days:
+                if current.weekday() != 5:  # הימנעות משבת
+                    days_list.append(current.isoformat())
+                current = current - timedelta(days=1)
+
+            rows = []
+            for first_name, last_name, total_swipes in zip(with_swipes['first_name'], with_swipes['last_name'], with_swipes['total_swipes']):
+                student_id = ids.get((first_name, last_name))
+                if not student_id:
+                    continue
+                total_swipes = int(total_swipes)
+                base_per_day = total_swipes // total_days
+                remainder = total_swipes % total_days
+                # נפזר את השארית על הימים הראשונים כדי שהסכום הכולל יתאים
+                swipe_index = 0
+                for day_idx, day in enumerate(days_list):
+                    count_for_day = base_per_day + (1 if day_idx < remainder else 0)
+                    for k in range(count_for_day):
+                        minute = (swipe_index + k) % 60
+                        rows.append((student_id, "", "public", f"{day} 08:{minute:02d}:00"))
+                    swipe_index += count_for_day
+            if rows:
+                cursor.executemany(
+                    'INSERT INTO swipe_log (student_id, card_number, station_type, swiped_at) VALUES (?, ?, ?, ?)',
+                    rows
+                )
+            self.db.rebuild_swipe_daily(cursor=cursor)
+        except Exception as e:
+            errors.append(f"שגיאה בשחזור היסטוריית תיקופים: {str(e)}")
+
+    def quick_update_from_excel(self, excel_path: str, progress=None) -> tuple[int, List[str]]:
         """
         עדכון מהיר - רק עמודות G, H, I (כרטיס, נקודות, הודעה)
         משמש לפתיחת תוכנה
@@ -144,409 +220,99 @@ class ExcelImporter:
         Returns:
             tuple של (מספר תלמידים שעודכנו, רשימת שגיאות)
         """
-        errors = []
-        updated_count = 0
-        
         try:
-            # קריאת קובץ Excel
-            df = pd.read_excel(excel_path, dtype={'מס\' כרטיס': str})
-            
-            # קבלת כל התלמידים פעם אחת
-            all_students = self.db.get_all_students()
-            
-            # רק תלמידים עם שם
-            for index, row in df.iterrows():
-                try:
-                    last_name = str(row.get('שם משפחה', '')).strip() if pd.notna(row.get('שם משפחה')) else ''
-                    first_name = str(row.get('שם פרטי', '')).strip() if pd.notna(row.get('שם פרטי')) else ''
-                    
-                    if not last_name or not first_name:
-                        continue
-                    
-                    # חיפוש תלמיד קיים - לפי שם מדויק
-                    matching = [s for s in all_students if s['first_name'] == first_name and s['last_name'] == last_name]
-                    
-                    if not matching:
-                        continue  # לא מעדכנים תלמידים שלא קיימים
-                    
-                    student = matching[0]
-                    student_id = student['id']
-                    
-                    # עדכון כרטיס (עמודה G)
-                    card_number = str(row.get('מס\' כרטיס', '')).strip() if pd.notna(row.get('מס\' כרטיס')) else ''
-                    card_number = card_number.lstrip("'")
-                    if card_number == 'nan' or card_number == '' or card_number == '0':
-                        card_number = None
-                    
-                    if card_number != student.get('card_number'):
-                        self.db.update_card_number(student_id, card_number)
-                    
-                    # עדכון נקודות (עמודה H)
-                    points = 0
-                    if 'מס\' נקודות' in df.columns and pd.notna(row.get('מס\' נקודות')):
-                        try:
-                            points = int(float(row.get('מס\' נקודות')))
-                        except:
-                            points = 0
-                    
-                    if points != student['points']:
-                        self.db.update_student_points(student_id, points, "סנכרון מ-Excel", "מערכת")
-                    
-                    # עדכון הודעה פרטית (עמודה I)
-                    if 'הודעה פרטית' in df.columns:
-                        try:
-                            msg_val = row['הודעה פרטית']
-                            if pd.notna(msg_val) and str(msg_val).strip() and str(msg_val).strip().lower() != 'nan':
-                                self.db.update_private_message(student_id, str(msg_val).strip())
-                            else:
-                                self.db.update_private_message(student_id, None)
-                        except:
-                            pass
-                    
-                    updated_count += 1
-                    
-                except Exception as e:
-                    errors.append(f"שגיאה בשורה {index + 2}: {str(e)}")
-            
+            updated_count, errors, _result = self._run_import(
+                excel_path, mode='quick', progress=progress, reason="סנכרון מ-Excel"
+            )
             return updated_count, errors
-            
         except Exception as e:
-            errors.append(f"שגיאה כללית בקריאת הקובץ: {str(e)}")
-            return 0, errors
+            return 0, [f"שגיאה כללית בקריאת הקובץ: {str(e)}"]
     
-    def import_from_excel(self, excel_path: str, clear_existing: bool = False, dtype_dict: dict = None) -> tuple[int, List[str]]:
+    def import_from_excel(self, excel_path: str, clear_existing: bool = False, dtype_dict: dict = None,
+                          progress=None) -> tuple[int, List[str]]:
         """
         ייבוא תלמידים מקובץ Excel
         
         Args:
             excel_path: נתיב לקובץ Excel
             clear_existing: האם למחוק תלמידים קיימים לפני הייבוא
+            progress: callback אופציונלי (done, total, stage) לעדכון התקדמות
             
         Returns:
             tuple של (מספר תלמידים שיובאו, רשימת שגיאות)
         """
-        errors = []
-        imported_count = 0
-        # נתוני תיקופים לייבוא (רק כאשר clear_existing=True)
-        swipe_totals_by_student: Dict[int, int] = {}
-        approx_days_candidates: List[int] = []
-        
         try:
-            # קריאת קובץ Excel - עמודת כרטיס כטקסט!
-            df = pd.read_excel(excel_path, dtype={'מס\' כרטיס': str})
-            
-            # וידוא שהעמודות הנדרשות קיימות
-            required_columns = ['שם משפחה', 'שם פרטי']
-            for col in required_columns:
-                if col not in df.columns:
-                    errors.append(f"חסרה עמודה נדרשת: {col}")
-                    return 0, errors
-            
-            # מחיקת נתונים קיימים אם נדרש
-            if clear_existing:
-                self.db.clear_all_students()
-            
-            # ייבוא כל תלמיד
-            # תמונת תלמיד: תומך גם בעמודה ישנה "מס' תמונה" וגם חדשה "נתיב תמונה"
-            photo_col_name = "נתיב תמונה" if "נתיב תמונה" in df.columns else "מס' תמונה"
-
-            for index, row in df.iterrows():
-                try:
-                    # המרת ערכים ריקים ל-string ריק
-                    last_name = str(row.get('שם משפחה', '')).strip()
-                    first_name = str(row.get('שם פרטי', '')).strip()
-                    
-                    # דילוג על שורות ריקות
-                    if not last_name or not first_name or last_name == 'nan' or first_name == 'nan':
-                        continue
-                    
-                    id_number = str(row.get('ת"ז', '')).strip() if pd.notna(row.get('ת"ז')) else ''
-                    if id_number == 'nan':
-                        id_number = ''
-                    
-                    class_name = str(row.get('כיתה', '')).strip() if pd.notna(row.get('כיתה')) else ''
-                    if class_name == 'nan':
-                        class_name = ''
-                    
-                    photo_number = str(row.get(photo_col_name, '')).strip() if pd.notna(row.get(photo_col_name)) else ''
-                    if photo_number == 'nan':
-                        photo_number = ''
-                    
-                    # כרטיס - אם ריק, השאר NULL במקום string ריק כדי להימנע מ-UNIQUE constraint
-                    card_number = str(row.get('מס\' כרטיס', '')).strip() if pd.notna(row.get('מס\' כרטיס')) else ''
-                    # הסר apostroph אם יש (מטקסט באקסל)
-                    card_number = card_number.lstrip("'")
-                    if card_number == 'nan' or card_number == '' or card_number == '0':
-                        card_number = None  # NULL במסד הנתונים
-                    
-                    # נקודות - ברירת מחדל 0
-                    points = 0
-                    if 'מס\' נקודות' in df.columns and pd.notna(row.get('מס\' נקודות')):
-                        try:
-                            points = int(float(row.get('מס\' נקודות')))
-                        except:
-                            points = 0
-
-                    # תיקופים (סיכום) - מס' תיקופים וממוצע תיקופים (אופציונלי)
-                    total_swipes_val = None
-                    avg_swipes_val = None
-                    if "מס' תיקופים" in df.columns and pd.notna(row.get("מס' תיקופים")):
-                        try:
-                            total_swipes_val = int(float(row.get("מס' תיקופים")))
-                            if total_swipes_val <= 0:
-                                total_swipes_val = None
-                        except Exception:
-                            total_swipes_val = None
-
-                    if "ממוצע תיקופים" in df.columns and pd.notna(row.get("ממוצע תיקופים")):
-                        try:
-                            # יכול להיות float עם עיגול
-                            avg_swipes_val = float(row.get("ממוצע תיקופים"))
-                            if avg_swipes_val <= 0:
-                                avg_swipes_val = None
-                        except Exception:
-                            avg_swipes_val = None
-
-                    # אם יש גם מס' תיקופים וגם ממוצע – ניתן להעריך מספר ימי לימודים גלובלי
-                    if total_swipes_val is not None and avg_swipes_val is not None:
-                        try:
-                            approx_days = int(round(total_swipes_val / avg_swipes_val))
-                            if approx_days >= 1:
-                                approx_days_candidates.append(approx_days)
-                        except Exception:
-                            pass
-                    
-                    # הודעה פרטית
-                    private_message = None
-                    if 'הודעה פרטית' in df.columns:
-                        try:
-                            msg_val = row.get('הודעה פרטית')
-                            if pd.notna(msg_val) and str(msg_val).strip() and str(msg_val).strip().lower() != 'nan':
-                                private_message = str(msg_val).strip()
-                        except:
-                            pass
-
-                    # מס' סידורי (אם קיים בעמודה באקסל - זיהוי גמיש לפי שם העמודה)
-                    # אם אין עמודה כזו – ברירת מחדל: המספר לפי סדר השורה באקסל (1,2,3...)
-                    serial_number = None
-                    serial_col_name = None
-                    for col in df.columns:
-                        try:
-                            if 'סידורי' in str(col):
-                                serial_col_name = col
-                                break
-                        except Exception:
-                            continue
-
-                    if serial_col_name is not None:
-                        try:
-                            serial_val = row.get(serial_col_name)
-                            if pd.notna(serial_val) and str(serial_val).strip() and str(serial_val).strip().lower() != 'nan':
-                                serial_number = int(float(serial_val))
-                        except Exception:
-                            serial_number = None
-                    else:
-                        # אין עמודת "מס' סידורי" – השתמש בסדר השורות כמות שהוא
-                        serial_number = int(index) + 1
-                    
-                    # חיפוש תלמיד קיים (לפי שם)
-                    existing = self.db.search_students(f"{first_name} {last_name}")
-                    
-                    if existing:
-                        # עדכון תלמיד קיים
-                        student = existing[0]
-                        student_id = student['id']
-
-                        # עדכון מס' סידורי אם השתנה
-                        if serial_number is not None and serial_number != student.get('serial_number'):
-                            self.db.update_serial_number(student_id, serial_number)
-                        
-                        # עדכון כרטיס אם השתנה
-                        if card_number and card_number != student['card_number']:
-                            self.db.update_card_number(student_id, card_number)
-                        
-                        # עדכון נקודות אם השתנו
-                        if points != student['points']:
-                            self.db.update_student_points(student_id, points, "ייבוא מ-Excel", "מערכת")
-
-                        # עדכון נתיב תמונה אם השתנה
-                        if photo_number != (student.get('photo_number') or ''):
-                            self.db.update_photo_number(student_id, photo_number)
-                        
-                        # עדכון הודעה פרטית - תמיד מעדכן (גם אם ריק)!
-                        self.db.update_private_message(student_id, private_message)
-
-                        # שמירת סיכום תיקופים ליצירת swipe_log (רק אם clear_existing)
-                        if clear_existing and total_swipes_val is not None:
-                            swipe_totals_by_student[student_id] = total_swipes_val
-
-                        imported_count += 1
-                    elif last_name and first_name:
-                        # הוספת תלמיד חדש
-                        student_id = self.db.add_student(
-                            last_name=last_name,
-                            first_name=first_name,
-                            id_number=id_number,
-                            class_name=class_name,
-                            photo_number=photo_number,
-                            card_number=card_number,
-                            points=points,
-                            serial_number=serial_number
-                        )
-                        # אם קיימת הודעה פרטית בשורה – עדכן גם אותה לתלמיד החדש
-                        if private_message is not None:
-                            self.db.update_private_message(student_id, private_message)
-
-                        # שמירת סיכום תיקופים ליצירת swipe_log (רק אם clear_existing)
-                        if clear_existing and total_swipes_val is not None:
-                            swipe_totals_by_student[student_id] = total_swipes_val
-
-                        imported_count += 1
-                        
-                except Exception as e:
-                    errors.append(f"שגיאה בשורה {index + 2}: {str(e)}")
-            # לאחר ייבוא תלמידים – אם ביקשו איפוס נתונים קיימים ויש סיכומי תיקופים,
-            # נשחזר היסטוריית swipe_log סינתטית כך שהסטטיסטיקות יתאימו ככל האפשר.
-            if clear_existing and swipe_totals_by_student:
-                try:
-                    # קביעת מספר ימי הלימודים הכולל (גלובלי לכל התלמידים)
-                    total_days = None
-                    if approx_days_candidates:
-                        counter = Counter(approx_days_candidates)
-                        total_days = max(counter.items(), key=lambda kv: kv[1])[0]
-
-                    if not total_days or total_days < 1:
-                        total_days = 1
-
-                    # בניית רשימת תאריכים (לא כולל שבת) – נסוגים מ-היום אחורה
-                    days_list = []
-                    current = date.today()
-                    while len(days_list) < total_days:
-                        # ב-SQLite שבת היא '%w' == '6'. ב-Python weekday(): שבת היא 5.
-                        if current.weekday() != 5:  # הימנעות משבת
-                            days_list.append(current)
-                        current = current - timedelta(days=1)
-
-                    # יצירת רשומות swipe_log
-                    for student_id, total_swipes in swipe_totals_by_student.items():
-                        try:
-                            if total_swipes <= 0:
-                                continue
-                            base_per_day = total_swipes // total_days
-                            remainder = total_swipes % total_days
-
-                            # נפזר את השארית על הימים הראשונים כדי שהסכום הכולל יתאים
-                            swipe_index = 0
-                            for day_idx, day in enumerate(days_list):
-                                count_for_day = base_per_day + (1 if day_idx < remainder else 0)
-                                if count_for_day <= 0:
-                                    continue
-                                for i in range(count_for_day):
-                                    # שעה קבועה + דקות שונות רק לצורך ייחוד חלקי
-                                    minute = (swipe_index + i) % 60
-                                    swiped_at = f"{day.isoformat()} 08:{minute:02d}:00"
-                                    self.db.insert_swipe(student_id, swiped_at=swiped_at, card_number="", station_type="public")
-                                swipe_index += count_for_day
-                        except Exception as ex:
-                            errors.append(f"שגיאה ביצירת תיקופים לתלמיד {student_id}: {str(ex)}")
-
-                except Exception as e:
-                    errors.append(f"שגיאה בשחזור היסטוריית תיקופים: {str(e)}")
-
+            imported_count, errors, _result = self._run_import(
+                excel_path, mode='import', clear_existing=clear_existing, dtype_dict=dtype_dict, progress=progress
+            )
             return imported_count, errors
-            
         except Exception as e:
-            errors.append(f"שגיאה כללית בקריאת הקובץ: {str(e)}")
-            return 0, errors
+            return 0, [f"שגיאה כללית בקריאת הקובץ: {str(e)}"]
     
     def export_columns_only(self, excel_path: str) -> bool:
         """
         ייצוא חכם - עדכון רק עמודות G, H, I (כרטיס, נקודות, הודעה)
-        לא דורס את שאר העמודות!
+        לא דורס את שאר העמודות! רק תאים שהשתנו נכתבים, ואם אין שינוי הקובץ לא נכתב.
         """
         try:
-            from openpyxl import load_workbook
-            import pandas as pd
-            
-            # קריאת האקסל הקיים
-            df = pd.read_excel(excel_path, dtype={'מס\' כרטיס': str})
-            
-            # קבלת כל התלמידים מה-DB
-            students = self.db.get_all_students()
-            
-            # עדכון רק עמודות G, H, I
-            for index, row in df.iterrows():
-                try:
-                    last_name = str(row.get('שם משפחה', '')).strip() if pd.notna(row.get('שם משפחה')) else ''
-                    first_name = str(row.get('שם פרטי', '')).strip() if pd.notna(row.get('שם פרטי')) else ''
-                    
-                    if not last_name or not first_name:
-                        continue
-                    
-                    # חיפוש התלמיד ב-DB
-                    matching = [s for s in students if s['last_name'] == last_name and s['first_name'] == first_name]
-                    if not matching:
-                        continue
-                    
-                    student = matching[0]
-                    
-                    # עדכון רק G, H, I
-                    df.at[index, 'מס\' כרטיס'] = student['card_number'] if student['card_number'] else ''
-                    df.at[index, 'מס\' נקודות'] = student['points']
-                    df.at[index, 'הודעה פרטית'] = student.get('private_message', '') or ''
-                    
-                except Exception as e:
-                    print(f"שגיאה בעדכון שורה {index}: {e}")
-                    continue
-            
-            # שמירה חזרה
-            df.to_excel(excel_path, index=False, engine='openpyxl')
-            
-            # פורמט עמודת כרטיס כטקסט
-            wb = load_workbook(excel_path)
-            ws = wb.active
-            try:
-                from excel_styling import apply_rtl_and_alternating_colors
-                apply_rtl_and_alternating_colors(ws, has_header=True)
-            except Exception:
-                ws.sheet_view.rightToLeft = True
-            
-            # עמודת כרטיס כטקסט
-            card_col = 7  # G
-            for row_num in range(2, ws.max_row + 1):
-                cell = ws.cell(row=row_num, column=card_col)
-                cell.number_format = '@'
-            
-            wb.save(excel_path)
+            from excel_auto_export import patch_excel_columns
+            changed = patch_excel_columns(self.db, excel_path)
+            if changed:
+                print(f"[EXCEL-EXPORT] updated {changed} rows")
             return True
-            
         except Exception as e:
             print(f"שגיאה בייצוא עמודות: {e}")
             import traceback
             traceback.print_exc()
             return False
-    
+
+    def _iter_students(self, allowed_classes: list = None):
+        """תלמידים ישירות מ-cursor (בלי לבנות רשימה בזיכרון), באותו סדר כמו בטבלת הניהול"""
+        allowed = None
+        if allowed_classes:
+            allowed = set([str(c).strip() for c in (allowed_classes or []) if str(c).strip()]) or None
+        conn = self.db.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(
+                '''
+                SELECT * FROM students
+                ORDER BY (serial_number IS NULL OR serial_number = 0), serial_number, class_name, last_name, first_name
+                '''
+            )
+            for row in cursor:
+                student = dict(row)
+                if allowed is not None and str(student.get('class_name') or '').strip() not in allowed:
+                    continue
+                yield student
+        finally:
+            conn.close()
+
+    def _student_ids(self) -> List[int]:
+        conn = self.db.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT id FROM students')
+            return [int(r[0]) for r in cursor.fetchall()]
+        finally:
+            conn.close()
+
     def export_to_excel(self, excel_path: str, allowed_classes: list = None) -> bool:
         """ייצוא נתונים לקובץ Excel עם פורמט טקסט למס' כרטיס וכיוון RTL.
         אם אין תלמידים במסד הנתונים – ייווצר קובץ שבלונה עם שורת כותרות בלבד.
         כולל גם מספר תיקופים וממוצע תיקופים לכל תלמיד (מבוסס swipe_log).
+        השורות נכתבות בזרימה (write_only) ישירות מה-cursor.
         """
         try:
-            from openpyxl import load_workbook
-            from openpyxl.styles import Alignment
-
-            students = self.db.get_all_students()
-            if allowed_classes:
-                allowed = set([str(c).strip() for c in (allowed_classes or []) if str(c).strip()])
-                if allowed:
-                    students = [s for s in (students or []) if str(s.get('class_name') or '').strip() in allowed]
+            from excel_styling import StreamingExcelWriter
 
             # חישוב נתוני תיקופים לכל התלמידים
-            student_ids = [s['id'] for s in students]
-            swipe_totals = self.db.get_swipe_totals_for_students(student_ids, station_type="public")
+            swipe_totals = self.db.get_swipe_totals_for_students(self._student_ids(), station_type="public")
             total_days = self.db.get_total_school_days(station_type="public")
 
             # עמודות לקובץ ה-Excel (ללא עמודת ת"ז)
+            # סדר העמודות: A סידורי, B שם משפחה, C שם פרטי, D כיתה, E נתיב תמונה,
+            # F מס' כרטיס, G מס' נקודות, H מס' תיקופים, I ממוצע תיקופים, J הודעה פרטית
             columns = [
                 "מס' סידורי",
                 'שם משפחה',
@@ -560,80 +326,39 @@ class ExcelImporter:
                 'הודעה פרטית',
             ]
 
-            # המרה ל-DataFrame
-            data = []
-            for i, student in enumerate(students, 1):
-                # שמירת מספר כרטיס כטקסט - בדיוק כמו שהוא!
-                card_str = ''
-                if student['card_number']:
-                    card_str = str(student['card_number'])
-
-                # מס' סידורי: קודם כל מהמסד, ואם חסר – לפי הסדר בקובץ
-                serial_val = student.get('serial_number')
-                serial_out = serial_val if serial_val not in (None, 0) else i
+            def _rows():
+                for i, student in enumerate(self._iter_students(allowed_classes), 1):
+                    # שמירת מספר כרטיס כטקסט - בדיוק כמו שהוא!
+                    card_str = str(student['card_number']) if student['card_number'] else ''
 
-                # תיקופים
-                total_swipes = int(swipe_totals.get(student['id'], 0) or 0)
-                if total_days > 0 and total_swipes > 0:
-                    avg_swipes = round(total_swipes / float(total_days), 2)
-                else:
-                    avg_swipes = 0
+                    # מס' סידורי: קודם כל מהמסד, ואם חסר – לפי הסדר בקובץ
+                    serial_val = student.get('serial_number')
+                    serial_out = serial_val if serial_val not in (None, 0) else i
 
-                data.append({
-                    "מס' סידורי": serial_out,
-                    'שם משפחה': _strip_asterisk_annotations(student['last_name']),
-                    'שם פרטי': _strip_asterisk_annotations(student['first_name']),
-                    'כיתה': _strip_asterisk_annotations(student['class_name']),
-                    "נתיב תמונה": student['photo_number'],
-                    "מס' כרטיס": card_str,
-                    "מס' נקודות": student['points'],
-                    "מס' תיקופים": total_swipes,
-                    "ממוצע תיקופים": avg_swipes,
-                    'הודעה פרטית': _strip_asterisk_annotations(student.get('private_message', '') or '')
-                })
-            
-            # גם אם data ריק – ניצור DataFrame עם העמודות כדי לקבל שורת כותרות בלבד
-            if data:
-                df = pd.DataFrame(data, columns=columns)
-            else:
-                df = pd.DataFrame(columns=columns)
-            
-            # שמירה ראשונית
-            df.to_excel(excel_path, index=False, engine='openpyxl')
-            
-            # פתיחה מחדש לפורמט
-            wb = load_workbook(excel_path)
-            ws = wb.active
-            
-            # פורמט עמודת כרטיס כטקסט - FORCE TEXT!
-            # סדר העמודות: A סידורי, B שם משפחה, C שם פרטי, D כיתה, E נתיב תמונה,
-            # F מס' כרטיס, G מס' נקודות, H מס' תיקופים, I ממוצע תיקופים, J הודעה פרטית
-            card_col = 6  # עמודה F (מס' כרטיס)
-            
-            # הגדר את כותרת העמודה גם בטקסט
-            header_cell = ws.cell(row=1, column=card_col)
-            header_cell.number_format = '@'
-            
-            # הגדר כל תא בעמודת הכרטיס כטקסט (ללא הוספת גרש לתוכן)
-            for row in range(2, ws.max_row + 1):  # מתחיל מ-2 (אחרי הכותרות)
-                cell = ws.cell(row=row, column=card_col)
-                if cell.value is not None:
-                    cell.value = str(cell.value)
-                cell.number_format = '@'
-            
-            # Apply RTL and alternating colors styling
-            try:
-                from excel_styling import apply_rtl_and_alternating_colors
-                apply_rtl_and_alternating_colors(ws, has_header=True)
-            except Exception:
-                # Fallback to basic RTL if styling module not available
-                ws.sheet_view.rightToLeft = True
-                for row in ws.iter_rows(min_row=1, max_row=ws.max_row):
-                    for cell in row:
-                        cell.alignment = Alignment(horizontal='right', vertical='center')
-            
-            wb.save(excel_path)
-            
+                    # תיקופים
+                    total_swipes = int(swipe_totals.get(student['id'], 0) or 0)
+                    if total_days > 0 and total_swipes > 0:
+                        avg_swipes = round(total_swipes / float(total_days), 2)
+                    else:
+                        avg_swipes = 0
+
+                    yield (
+                        serial_out,
+                        _strip_asterisk_annotations(student['last_name']),
+                        _strip_asterisk_annotations(student['first_name']),
+                        _strip_asterisk_annotations(student['class_name']),
+                        student['photo_number'],
+                        card_str,
+                        student['points'],
+                        total_swipes,
+                        avg_swipes,
+                        _strip_asterisk_annotations(student.get('private_message', '') or ''),
+                    )
+
+            writer = StreamingExcelWriter(excel_path)
+            # עמודת כרטיס (F) כטקסט - FORCE TEXT!
+            writer.write_sheet('Sheet1', columns, _rows(), text_columns=(5,))
+            writer.save()
             return True
             
         except Exception as e:
@@ -653,16 +378,28 @@ class ExcelImporter:
         """
         try:
             from datetime import date
-            from openpyxl import load_workbook
-            from openpyxl.styles import Alignment
-
-            students = self.db.get_all_students()
-            if allowed_classes:
-                allowed = set([str(c).strip() for c in (allowed_classes or []) if str(c).strip()])
-                if allowed:
-                    students = [s for s in (students or []) if str(s.get('class_name') or '').strip() in allowed]
+            from excel_styling import StreamingExcelWriter
+
             time_bonuses = self.db.get_all_time_bonuses()
 
+            def _base_cells(i, student):
+                serial_val = student.get('serial_number')
+                serial_out = serial_val if serial_val not in (None, 0) else i
+                return [serial_out, student['last_name'], student['first_name'], student['class_name']]
+
+            base_columns = [
+                "מס' סידורי",
+                'שם משפחה',
+                'שם פרטי',
+                'כיתה',
+            ]
+
+            def _dates_rows(attendance_map, sorted_dates):
+                # שורה לכל תלמיד – התלמידים נקראים מה-cursor בזמן הכתיבה
+                for i, student in enumerate(self._iter_students(allowed_classes), 1):
+                    student_times = attendance_map.get(student['id'], {})
+                    yield _base_cells(i, student) + [student_times.get(d_iso, '') for d_iso in sorted_dates]
+
             def _bonus_group_name(b: dict) -> str:
                 return (b.get('group_name') or b.get('name') or '').strip()
 
@@ -739,60 +476,28 @@ class ExcelImporter:
                         except Exception:
                             pass
 
-                columns = [
-                    "מס' סידורי",
-                    'שם משפחה',
-                    'שם פרטי',
-                    'כיתה',
-                ] + group_names
-
-                data = []
-                for i, student in enumerate(students, 1):
-                    serial_val = student.get('serial_number')
-                    serial_out = serial_val if serial_val not in (None, 0) else i
-                    row_dict = {
-                        "מס' סידורי": serial_out,
-                        'שם משפחה': student['last_name'],
-                        'שם פרטי': student['first_name'],
-                        'כיתה': student['class_name'],
-                    }
-
-                    sid = int(student['id'])
-                    for g in group_names:
-                        info = by_student_group.get(sid, {}).get(g)
-                        if not info:
-                            row_dict[g] = ''
-                            continue
-                        t = str(info.get('time') or '').strip()
-                        pts = int(info.get('pts', 0) or 0)
-                        if not t:
-                            row_dict[g] = ''
-                        elif pts > 0:
-                            row_dict[g] = f"{t} (+{pts})"
-                        else:
-                            row_dict[g] = t
-
-                    data.append(row_dict)
-
-                df = pd.DataFrame(data, columns=columns) if data else pd.DataFrame(columns=columns)
-
-                df.to_excel(excel_path, index=False, engine='openpyxl')
-
-                wb = load_workbook(excel_path)
-                ws = wb.active
-                
-                # Apply RTL and alternating colors styling
-                try:
-                    from excel_styling import apply_rtl_and_alternating_colors
-                    apply_rtl_and_alternating_colors(ws, has_header=True)
-                except Exception:
-                    # Fallback to basic RTL
-                    ws.sheet_view.rightToLeft = True
-                    for row in ws.iter_rows(min_row=1, max_row=ws.max_row):
-                        for cell in row:
-                            cell.alignment = Alignment(horizontal='right', vertical='center')
+                def _day_rows():
+                    for i, student in enumerate(self._iter_students(allowed_classes), 1):
+                        cells = _base_cells(i, student)
+                        sid = int(student['id'])
+                        for g in group_names:
+                            info = by_student_group.get(sid, {}).get(g)
+                            if not info:
+                                cells.append('')
+                                continue
+                            t = str(info.get('time') or '').strip()
+                            pts = int(info.get('pts', 0) or 0)
+                            if not t:
+                                cells.append('')
+                            elif pts > 0:
+                                cells.append(f"{t} (+{pts})")
+                            else:
+                                cells.append(t)
+                        yield cells
 
-                wb.save(excel_path)
+                writer = StreamingExcelWriter(excel_path)
+                writer.write_sheet('Sheet1', base_columns + group_names, _day_rows())
+                writer.save()
                 return True
 
             # כלי עזר לפורמט תאריך מעמודת given_date (YYYY-MM-DD → DD.MM.YYYY)
@@ -842,54 +547,10 @@ class ExcelImporter:
                 sorted_dates = sorted(dates_set)
                 date_headers = [_format_date(d) for d in sorted_dates]
 
-                columns = [
-                    "מס' סידורי",
-                    'שם משפחה',
-                    'שם פרטי',
-                    'כיתה',
-                ] + date_headers
-
-                data = []
-                for i, student in enumerate(students, 1):
-                    serial_val = student.get('serial_number')
-                    serial_out = serial_val if serial_val not in (None, 0) else i
-                    row_dict = {
-                        "מס' סידורי": serial_out,
-                        'שם משפחה': student['last_name'],
-                        'שם פרטי': student['first_name'],
-                        'כיתה': student['class_name'],
-                    }
-
-                    student_times = attendance_map.get(student['id'], {})
-                    for d_iso, header in zip(sorted_dates, date_headers):
-                        row_dict[header] = student_times.get(d_iso, '')
-
-                    data.append(row_dict)
-
-                df = pd.DataFrame(data, columns=columns) if data else pd.DataFrame(columns=columns)
-                df.to_excel(excel_path, index=False, engine='openpyxl')
-
-                wb = load_workbook(excel_path)
-                ws = wb.active
-                
-                # Apply RTL and alternating colors styling
-                try:
-                    from excel_styling import apply_rtl_and_alternating_colors
-                    apply_rtl_and_alternating_colors(ws, has_header=True)
-                except Exception:
-                    # Fallback to basic RTL
-                    ws.sheet_view.rightToLeft = True
-                    for row in ws.iter_rows(min_row=1, max_row=ws.max_row):
-                        for cell in row:
-                            cell.alignment = Alignment(horizontal='right', vertical='center')
-
-                try:
-                    sheet_name = str(chosen_group or chosen_bonus.get('name', 'נוכחות'))[:31]
-                    ws.title = sheet_name
-                except Exception:
-                    pass
-
-                wb.save(excel_path)
+                sheet_name = str(chosen_group or chosen_bonus.get('name', 'נוכחות'))[:31] or 'נוכחות'
+                writer = StreamingExcelWriter(excel_path)
+                writer.write_sheet(sheet_name, base_columns + date_headers, _dates_rows(attendance_map, sorted_dates))
+                writer.save()
                 return True
 
             # מצב 3: כל הבונוסים וכל התאריכים – גליון נפרד לכל בונוס
@@ -902,97 +563,56 @@ class ExcelImporter:
                         continue
                     groups.setdefault(g, []).append(int(b['id']))
 
-                wrote_any = False
                 used_sheet_names = set()
+                writer = StreamingExcelWriter(excel_path)
+
+                for group_name, bonus_ids in groups.items():
+                    rows = []
+                    for bid in bonus_ids:
+                        try:
+                            rows.extend(self.db.get_time_bonus_given_for_bonus(bid) or [])
+                        except Exception:
+                            pass
+                    if not rows:
+                        continue
 
-                with pd.ExcelWriter(excel_path, engine='openpyxl') as writer:
-                    for group_name, bonus_ids in groups.items():
-                        rows = []
-                        for bid in bonus_ids:
-                            try:
-                                rows.extend(self.db.get_time_bonus_given_for_bonus(bid) or [])
-                            except Exception:
-                                pass
-                        if not rows:
+                    attendance_map = {}
+                    dates_set = set()
+                    for row in rows:
+                        sid = row.get('student_id')
+                        d_iso = row.get('given_date')
+                        if not sid or not d_iso:
+                            continue
+                        dates_set.add(d_iso)
+                        time_str = _given_at_to_time_str(row.get('given_at'))
+                        if not time_str:
                             continue
+                        prev = attendance_map.setdefault(sid, {}).get(d_iso, '')
+                        if not prev or time_str < prev:
+                            attendance_map[sid][d_iso] = time_str
+                    rows = None
+
+                    sorted_dates = sorted(dates_set)
+                    date_headers = [_format_date(d) for d in sorted_dates]
+
+                    base_name = str(group_name).strip() or 'נוכחות'
+                    sheet_name = base_name[:31]
+                    if sheet_name in used_sheet_names:
+                        for n in range(2, 100):
+                            suffix = f" ({n})"
+                            cand = (base_name[: max(1, 31 - len(suffix))] + suffix)
+                            if cand not in used_sheet_names:
+                                sheet_name = cand
+                                break
+                    used_sheet_names.add(sheet_name)
+                    # כל גיליון נכתב בזרימה ונסגר לפני הבא – הזיכרון לא גדל עם מספר הגיליונות
+                    writer.write_sheet(sheet_name, base_columns + date_headers, _dates_rows(attendance_map, sorted_dates))
 
-                        attendance_map = {}
-                        dates_set = set()
-                        for row in rows:
-                            sid = row.get('student_id')
-                            d_iso = row.get('given_date')
-                            if not sid or not d_iso:
-                                continue
-                            dates_set.add(d_iso)
-                            time_str = _given_at_to_time_str(row.get('given_at'))
-                            if not time_str:
-                                continue
-                            prev = attendance_map.setdefault(sid, {}).get(d_iso, '')
-                            if not prev or time_str < prev:
-                                attendance_map[sid][d_iso] = time_str
-
-                        sorted_dates = sorted(dates_set)
-                        date_headers = [_format_date(d) for d in sorted_dates]
-
-                        columns = [
-                            "מס' סידורי",
-                            'שם משפחה',
-                            'שם פרטי',
-                            'כיתה',
-                        ] + date_headers
-
-                        data = []
-                        for i, student in enumerate(students, 1):
-                            serial_val = student.get('serial_number')
-                            serial_out = serial_val if serial_val not in (None, 0) else i
-                            row_dict = {
-                                "מס' סידורי": serial_out,
-                                'שם משפחה': student['last_name'],
-                                'שם פרטי': student['first_name'],
-                                'כיתה': student['class_name'],
-                            }
-
-                            student_times = attendance_map.get(student['id'], {})
-                            for d_iso, header in zip(sorted_dates, date_headers):
-                                row_dict[header] = student_times.get(d_iso, '')
-
-                            data.append(row_dict)
-
-                        df = pd.DataFrame(data, columns=columns) if data else pd.DataFrame(columns=columns)
-
-                        base_name = str(group_name).strip() or 'נוכחות'
-                        sheet_name = base_name[:31]
-                        if sheet_name in used_sheet_names:
-                            for n in range(2, 100):
-                                suffix = f" ({n})"
-                                cand = (base_name[: max(1, 31 - len(suffix))] + suffix)
-                                if cand not in used_sheet_names:
-                                    sheet_name = cand
-                                    break
-                        used_sheet_names.add(sheet_name)
-                        df.to_excel(writer, sheet_name=sheet_name, index=False)
-                        wrote_any = True
-
-                    if not wrote_any:
-                        # אם אין נתונים בכלל – עדיין לייצר קובץ תקין עם כותרות בסיסיות
-                        columns = ["מס' סידורי", 'שם משפחה', 'שם פרטי', 'כיתה']
-                        pd.DataFrame([], columns=columns).to_excel(writer, sheet_name='נוכחות', index=False)
-
-                # Apply RTL and alternating colors styling to all sheets
-                wb = load_workbook(excel_path)
-                try:
-                    from excel_styling import apply_rtl_and_alternating_colors
-                    for ws in wb.worksheets:
-                        apply_rtl_and_alternating_colors(ws, has_header=True)
-                except Exception:
-                    # Fallback to basic RTL
-                    for ws in wb.worksheets:
-                        ws.sheet_view.rightToLeft = True
-                        for row in ws.iter_rows(min_row=1, max_row=ws.max_row):
-                            for cell in row:
-                                cell.alignment = Alignment(horizontal='right', vertical='center')
-
-                wb.save(excel_path)
+                if writer.sheet_count == 0:
+                    # אם אין נתונים בכלל – עדיין לייצר קובץ תקין עם כותרות בסיסיות
+                    writer.write_sheet('נוכחות', base_columns, [])
+
+                writer.save()
                 return True
 
             # מצב לא מוכר
@@ -1006,42 +626,22 @@ class ExcelImporter:
 
     def export_daily_points_summary_excel(self, excel_path: str, *, allowed_classes: list = None) -> bool:
         try:
-            from openpyxl import load_workbook
-            from openpyxl.styles import Alignment
+            from excel_styling import StreamingExcelWriter
 
             rows, headers = self.db.get_daily_points_summary_matrix(allowed_classes=allowed_classes)
             base_cols = ["מס' סידורי", 'שם משפחה', 'שם פרטי', 'כיתה']
             cols = base_cols + list(headers or [])
 
-            try:
-                df = pd.DataFrame(rows or [])
-            except Exception:
-                df = pd.DataFrame([])
-
-            for c in cols:
-                if c not in df.columns:
-                    df[c] = ''
-            df = df[cols]
-
-            df.to_excel(excel_path, index=False, engine='openpyxl')
-
-            wb = load_workbook(excel_path)
-            ws = wb.active
-            try:
-                ws.title = 'תשקיף יומי'[:31]
-            except Exception:
-                pass
-
-            try:
-                from excel_styling import apply_rtl_and_alternating_colors
-                apply_rtl_and_alternating_colors(ws, has_header=True)
-            except Exception:
-                ws.sheet_view.rightToLeft = True
-                for row in ws.iter_rows(min_row=1, max_row=ws.max_row):
-                    for cell in row:
-                        cell.alignment = Alignment(horizontal='right', vertical='center', wrap_text=True)
+            def _rows():
+                for r in (rows or []):
+                    try:
+                        yield [('' if r.get(c) is None else r.get(c)) for c in cols]
+                    except Exception:
+                        continue
 
-            wb.save(excel_path)
+            writer = StreamingExcelWriter(excel_path)
+            writer.write_sheet('תשקיף יומי'[:31], cols, _rows())
+            writer.save()
             return True
         except Exception as e:
             print(f"שגיאה בייצוא תשקיף יומי נקודות: {e}")
@@ -0,0 +1,476 @@
+# -*- coding: utf-8 -*-
+"""
+מנוע ייבוא תלמידים מאקסל – משותף לעמדת הניהול ולשרת הענן
+
+1. normalize_import_frame – נרמול כל העמודות בפעולות pandas וקטוריות
+   (בלי iterrows ובלי pd.notna/str לכל תא).
+2. fetch_existing_students – מפה אחת של התלמידים הקיימים לפי (שם פרטי, שם משפחה).
+3. build_import_plan – השוואה מול המפה: הכנסות, עדכוני שדות ושינויי נקודות.
+4. apply_import_plan – כתיבה ב-executemany בתוך הטרנזקציה של הקורא, כולל
+   points_log, והחזרת רשימת אירועי שינוי (change events) לכתיבה במנה אחת.
+
+המנוע לא תלוי ב-Database של העמדה: הוא עובד על cursor של DB-API ופונקציית
+placeholder (כמו sql_placeholder בענן) כך שאותו קוד רץ גם על Postgres.
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import pandas as pd
+except Exception:  # pragma: no cover - pandas חובה לייבוא, אבל לא לטעינת המודול
+    pd = None
+
+COL_LAST_NAME = 'שם משפחה'
+COL_FIRST_NAME = 'שם פרטי'
+COL_ID_NUMBER = 'ת"ז'
+COL_CLASS = 'כיתה'
+COL_CARD = "מס' כרטיס"
+COL_POINTS = "מס' נקודות"
+COL_MESSAGE = 'הודעה פרטית'
+COL_PHOTO_PATH = 'נתיב תמונה'
+COL_PHOTO_NUMBER = "מס' תמונה"
+COL_SWIPES = "מס' תיקופים"
+COL_AVG_SWIPES = 'ממוצע תיקופים'
+
+# עמודות שנקראות כטקסט כדי לא לאבד אפסים מובילים
+READ_DTYPES = {COL_CARD: str, COL_ID_NUMBER: str}
+
+_EMPTY_TEXT = ('', 'nan', 'none', '<na>', 'nat')
+
+ProgressFn = Optional[Callable[[int, int, str], None]]
+
+STUDENT_FIELDS = ('id', 'first_name', 'last_name', 'points', 'card_number', 'serial_number',
+                  'photo_number', 'private_message', 'id_number', 'class_name')
+
+
+def _identity(sql: str) -> str:
+    return sql
+
+
+def _report(progress: ProgressFn, done: int, total: int, stage: str) -> None:
+    if progress is None:
+        return
+    try:
+        progress(int(done), int(total), stage)
+    except Exception:
+        pass
+
+
+# ----------------------------------------------------------------------
+# נרמול וקטורי
+# ----------------------------------------------------------------------
+
+def read_import_excel(source, dtype: dict = None):
+    """קריאת קובץ (נתיב או BytesIO) עם עמודות כרטיס/ת"ז כטקסט"""
+    dtypes = dict(READ_DTYPES)
+    if dtype:
+        dtypes.update(dtype)
+    return pd.read_excel(source, dtype=dtypes)
+
+
+def _text_series(df, col):
+    """עמודה כטקסט נקי: NaN/'nan' -> '', מספר שלם מ-float ('123.0') -> '123'"""
+    if col is None or col not in df.columns:
+        return pd.Series('', index=df.index, dtype=object)
+    s = df[col]
+    if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+        num = pd.to_numeric(s, errors='coerce')
+        integral = num.notna() & (num % 1 == 0)
+        out = s.astype(object).where(s.notna(), '').astype(str)
+        if integral.any():
+            out = out.where(~integral, num[integral].astype('int64').astype(str))
+    else:
+        out = s.astype(object).where(s.notna(), '').astype(str)
+    out = out.str.strip()
+    return out.where(~out.str.lower().isin(_EMPTY_TEXT), '')
+
+
+def _int_series(df, col, default: int = 0):
+    if col is None or col not in df.columns:
+        return pd.Series(default, index=df.index, dtype='int64')
+    num = pd.to_numeric(df[col], errors='coerce')
+    # int(float(x)) – קיצוץ לכיוון אפס
+    return num.fillna(default).astype('int64')
+
+
+def _serial_column(df):
+    for col in df.columns:
+        try:
+            if 'סידורי' in str(col):
+                return col
+        except Exception:
+            continue
+    return None
+
+
+def normalize_import_frame(df, *, serial_from_row_order: bool = True, progress: ProgressFn = None):
+    """DataFrame גולמי מהאקסל -> DataFrame אחיד עם עמודות באנגלית.
+    שורות בלי שם פרטי/משפחה מושמטות; row_number = מספר השורה באקסל (לשגיאות)."""
+    total = int(len(df.index))
+    _report(progress, 0, total, 'normalize')
+    out = pd.DataFrame(index=df.index)
+    out['row_number'] = pd.RangeIndex(start=2, stop=total + 2, step=1)
+    out['last_name'] = _text_series(df, COL_LAST_NAME)
+    out['first_name'] = _text_series(df, COL_FIRST_NAME)
+    out['id_number'] = _text_series(df, COL_ID_NUMBER)
+    out['class_name'] = _text_series(df, COL_CLASS)
+    photo_col = COL_PHOTO_PATH if COL_PHOTO_PATH in df.columns else COL_PHOTO_NUMBER
+    out['photo_number'] = _text_series(df, photo_col)
+
+    card = _text_series(df, COL_CARD).str.lstrip("'")
+    # כרטיס ריק/0 -> NULL (כדי לא להתנגש ב-UNIQUE). astype(object) – בעמודת מחרוזות where מחזיר NaN במקום None
+    out['card_number'] = card.astype(object).where(~card.isin(('', '0')), None)
+
+    out['has_points'] = COL_POINTS in df.columns
+    out['points'] = _int_series(df, COL_POINTS, 0)
+
+    msg = _text_series(df, COL_MESSAGE)
+    out['has_message'] = COL_MESSAGE in df.columns
+    out['private_message'] = msg.astype(object).where(msg != '', None)
+
+    serial_col = _serial_column(df)
+    if serial_col is not None:
+        serial = pd.to_numeric(df[serial_col], errors='coerce')
+        out['serial_number'] = serial.astype('Int64').astype(object).where(serial.notna(), None)
+    elif serial_from_row_order:
+        out['serial_number'] = pd.RangeIndex(start=1, stop=total + 1, step=1)
+    else:
+        out['serial_number'] = None
+
+    swipes = pd.to_numeric(df[COL_SWIPES], errors='coerce') if COL_SWIPES in df.columns else pd.Series(float('nan'), index=df.index)
+    avg = pd.to_numeric(df[COL_AVG_SWIPES], errors='coerce') if COL_AVG_SWIPES in df.columns else pd.Series(float('nan'), index=df.index)
+    swipes = swipes.where(swipes > 0)
+    avg = avg.where(avg > 0)
+    out['total_swipes'] = swipes.fillna(0).astype('int64')
+    out['avg_swipes'] = avg.fillna(0.0).astype(float)
+
+    out = out[(out['last_name'] != '') & (out['first_name'] != '')]
+    _report(progress, total, total, 'normalize')
+    return out
+
+
+# ----------------------------------------------------------------------
+# התאמה מול הקיים
+# ----------------------------------------------------------------------
+
+def _row_get(r, key):
+    try:
+        return r[key]
+    except Exception:
+        try:
+            return r.get(key)
+        except Exception:
+            return None
+
+
+def fetch_existing_students(cursor, ph: Callable[[str], str] = _identity) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    """מפה אחת (שם פרטי, שם משפחה) -> תלמיד; במקרה של כפילות – המזהה הנמוך"""
+    cursor.execute(ph(f"SELECT {', '.join(STUDENT_FIELDS)} FROM students ORDER BY id"))
+    existing: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for r in (cursor.fetchall() or []):
+        row = {k: _row_get(r, k) for k in STUDENT_FIELDS}
+        key = (str(row.get('first_name') or '').strip(), str(row.get('last_name') or '').strip())
+        existing.setdefault(key, row)
+    return existing
+
+
+def _same(a, b) -> bool:
+    return str(a if a is not None else '') == str(b if b is not None else '')
+
+
+def _row_changes(r: Dict[str, Any], current: Dict[str, Any], mode: str) -> Dict[str, Any]:
+    """השדות ששורת האקסל משנה בתלמיד קיים (current – הערכים אחרי השורות הקודמות בקובץ)"""
+    changes: Dict[str, Any] = {}
+    if mode == 'quick':
+        if not _same(r['card_number'], current.get('card_number')):
+            changes['card_number'] = r['card_number']
+        if bool(r['has_message']) and not _same(r['private_message'] or '', current.get('private_message') or ''):
+            changes['private_message'] = r['private_message']
+    elif mode == 'web':
+        for f in ('serial_number', 'card_number', 'photo_number', 'id_number', 'class_name'):
+            v = r.get(f)
+            if v not in (None, '') and not _same(v, current.get(f)):
+                changes[f] = v
+        if not _same(r['private_message'] or '', current.get('private_message') or ''):
+            changes['private_message'] = r['private_message'] or ''
+    else:
+        if r['serial_number'] is not None and not _same(r['serial_number'], current.get('serial_number')):
+            changes['serial_number'] = int(r['serial_number'])
+        if r['card_number'] and not _same(r['card_number'], current.get('card_number')):
+            changes['card_number'] = r['card_number']
+        if not _same(r['photo_number'], current.get('photo_number') or ''):
+            changes['photo_number'] = r['photo_number']
+        # הודעה פרטית – תמיד מעודכנת (גם ריקון)
+        if not _same(r['private_message'], current.get('private_message')):
+            changes['private_message'] = r['private_message']
+    return changes
+
+
+def _sets_points(r: Dict[str, Any], mode: str) -> bool:
+    return mode == 'web' or mode == 'import' or bool(r['has_points'])
+
+
+def build_import_plan(frame, existing: Dict[Tuple[str, str], Dict[str, Any]], *, mode: str = 'import',
+                      update_fields: Tuple[str, ...] = None) -> Dict[str, Any]:
+    """השוואת השורות המנורמלות מול המפה הקיימת.
+
+    mode='import' – תלמידים חדשים נוספים; לקיימים: מס' סידורי, כרטיס (אם לא ריק),
+                    נקודות, תמונה והודעה פרטית (כמו הייבוא הקודם).
+    mode='quick'  – רק תלמידים קיימים: כרטיס (גם ריקון), נקודות, הודעה פרטית.
+    mode='web'    – כמו import, אבל שדות ריקים לא דורסים ערכים קיימים (התנהגות הענן).
+
+    שורות עם אותו שם באותו קובץ מוחלות לפי הסדר, כמו עיבוד שורה-שורה: הראשונה
+    מוסיפה תלמיד חדש, והבאות מעדכנות אותו לפי כללי התלמיד הקיים.
+    """
+    # (first, last) -> שורת הכנסה מצטברת
+    pending_new: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    # sid -> ערכי התלמיד אחרי השורות שכבר עובדו
+    state: Dict[int, Dict[str, Any]] = {}
+    originals: Dict[int, Dict[str, Any]] = {}
+    changed: Dict[int, set] = {}
+    wanted_points: Dict[int, int] = {}
+    touched = 0
+
+    cols = list(frame.columns)
+    for tup in frame.itertuples(index=False, name=None):
+        r = dict(zip(cols, tup))
+        key = (r['first_name'], r['last_name'])
+        student = existing.get(key)
+        points = int(r['points'])
+        if student is None:
+            if mode == 'quick':
+                continue
+            touched += 1
+            new = pending_new.get(key)
+            if new is None:
+                pending_new[key] = {
+                    'last_name': r['last_name'],
+                    'first_name': r['first_name'],
+                    'id_number': r['id_number'] or '',
+                    'class_name': r['class_name'] or '',
+                    'photo_number': r['photo_number'] or '',
+                    'card_number': r['card_number'],
+                    'points': points,
+                    'serial_number': None if r['serial_number'] is None else int(r['serial_number']),
+                    'private_message': r['private_message'],
+                    'total_swipes': int(r['total_swipes']),
+                }
+                continue
+            # שם כפול בקובץ – השורה הזו מעדכנת את התלמיד שהשורה הקודמת הוסיפה
+            new.update(_row_changes(r, new, mode))
+            if _sets_points(r, mode):
+                new['points'] = points
+            continue
+
+        sid = int(student['id'])
+        if sid not in state:
+            originals[sid] = student
+            state[sid] = dict(student)
+            changed[sid] = set()
+        ch = _row_changes(r, state[sid], mode)
+        if update_fields is not None:
+            ch = {f: v for f, v in ch.items() if f in update_fields}
+        state[sid].update(ch)
+        changed[sid].update(ch)
+        if _sets_points(r, mode):
+            wanted_points[sid] = points
+        touched += 1
+
+    updates: Dict[int, Dict[str, Any]] = {}
+    for sid, fields in changed.items():
+        ch = {f: state[sid][f] for f in fields if not _same(state[sid][f], originals[sid].get(f))}
+        if ch:
+            updates[sid] = ch
+    points_changes: Dict[int, Tuple[int, int]] = {}
+    for sid, points in wanted_points.items():
+        old_points = int(originals[sid].get('points') or 0)
+        if points != old_points:
+            points_changes[sid] = (old_points, points)
+
+    by_id = {int(s['id']): s for s in existing.values()}
+    return {
+        'inserts': list(pending_new.values()),
+        'updates': updates,
+        # פרופיל מלא לאירועי סינכרון (הצד המקבל מעדכן את כל השדות מה-payload)
+        'profiles': {sid: by_id[sid] for sid in updates if sid in by_id},
+        'points_changes': points_changes,
+        'rows': touched,
+        'mode': mode,
+    }
+
+
+# ----------------------------------------------------------------------
+# כתיבה
+# ----------------------------------------------------------------------
+
+def _executemany_guarded(cursor, ph, sql: str, rows: List[tuple], labels: List[str], errors: List[str],
+                         applied: Optional[List[int]] = None) -> int:
+    """executemany במנה אחת; אם שורה אחת נכשלת (למשל UNIQUE על כרטיס) –
+    חוזרים לשורה-שורה רק עבור המנה הזו, כדי לדווח שגיאה לשורה ולא להפיל את כל הייבוא.
+    applied – אם ניתן, מתמלא באינדקסים (בתוך rows) של השורות שנכתבו."""
+    if not rows:
+        return 0
+    cursor.execute('SAVEPOINT import_batch')
+    try:
+        cursor.executemany(ph(sql), rows)
+        cursor.execute('RELEASE SAVEPOINT import_batch')
+        if applied is not None:
+            applied.extend(range(len(rows)))
+        return len(rows)
+    except Exception:
+        cursor.execute('ROLLBACK TO SAVEPOINT import_batch')
+        cursor.execute('RELEASE SAVEPOINT import_batch')
+    ok = 0
+    for idx, (params, label) in enumerate(zip(rows, labels)):
+        cursor.execute('SAVEPOINT import_row')
+        try:
+            cursor.execute(ph(sql), params)
+            cursor.execute('RELEASE SAVEPOINT import_row')
+            ok += 1
+            if applied is not None:
+                applied.append(idx)
+        except Exception as e:
+            cursor.execute('ROLLBACK TO SAVEPOINT import_row')
+            cursor.execute('RELEASE SAVEPOINT import_row')
+            errors.append(f"{label}: {e}")
+    return ok
+
+
+def apply_import_plan(cursor, plan: Dict[str, Any], *, ph: Callable[[str], str] = _identity,
+                      reason: str = 'ייבוא מ-Excel', actor_name: str = 'מערכת', action_type: str = 'import',
+                      chunk_size: int = 500, progress: ProgressFn = None) -> Dict[str, Any]:
+    """כתיבת התוכנית בטרנזקציה של הקורא (commit באחריות הקורא).
+    מחזיר: inserted, updated, points_changed, errors, events, new_ids {(first,last): id}."""
+    errors: List[str] = []
+    events: List[Tuple[str, str, str, Dict[str, Any]]] = []
+    inserts = plan.get('inserts') or []
+    updates = plan.get('updates') or {}
+    points_changes = plan.get('points_changes') or {}
+    profiles = plan.get('profiles') or {}
+    total = len(inserts) + len(updates) + len(points_changes) + sum(1 for r in inserts if int(r['points'] or 0) > 0)
+    done = 0
+    _report(progress, 0, total, 'write')
+
+    # sqlite3 במצב ברירת מחדל לא פותח טרנזקציה לפני SAVEPOINT – פותחים אחת כדי שהכל יהיה אטומי
+    try:
+        if getattr(cursor.connection, 'in_transaction', None) is False:
+            cursor.execute('BEGIN IMMEDIATE')
+    except Exception:
+        pass
+
+    # 1) הכנסות
+    insert_sql = (
+        'INSERT INTO students (last_name, first_name, id_number, class_name, photo_number, card_number, '
+        'points, serial_number, private_message) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)'
+    )
+    inserted = 0
+    for i in range(0, len(inserts), chunk_size):
+        chunk = inserts[i:i + chunk_size]
+        rows = [(r['last_name'], r['first_name'], r['id_number'], r['class_name'], r['photo_number'],
+                 r['card_number'], r['points'], r['serial_number'], r['private_message']) for r in chunk]
+        labels = [f"{r['first_name']} {r['last_name']}" for r in chunk]
+        inserted += _executemany_guarded(cursor, ph, insert_sql, rows, labels, errors)
+        done += len(chunk)
+        _report(progress, done, total, 'write')
+
+    new_ids: Dict[Tuple[str, str], int] = {}
+    if inserts:
+        # מזהים חדשים – שאילתה אחת במקום lastrowid לכל שורה
+        wanted = {(r['first_name'], r['last_name']) for r in inserts}
+        for key, row in fetch_existing_students(cursor, ph).items():
+            if key in wanted:
+                new_ids[key] = int(row['id'])
+        for r in inserts:
+            sid = new_ids.get((r['first_name'], r['last_name']))
+            if not sid:
+                continue
+            payload = {k: r.get(k) for k in ('first_name', 'last_name', 'class_name', 'card_number',
+                                             'photo_number', 'private_message', 'id_number', 'serial_number', 'points')}
+            payload['id'] = sid
+            events.append(('student', str(sid), 'create', payload))
+            if int(r['points'] or 0) > 0:
+                points_changes.setdefault(sid, (0, int(r['points'])))
+
+    # 2) עדכוני שדות – קיבוץ לפי קבוצת העמודות כדי להשתמש ב-executemany
+    by_shape: Dict[Tuple[str, ...], List[Tuple[int, Dict[str, Any]]]] = {}
+    for sid, ch in updates.items():
+        by_shape.setdefault(tuple(sorted(ch)), []).append((sid, ch))
+    updated = 0
+    for fields, items in by_shape.items():
+        sets = ', '.join(f"{f} = ?" for f in fields)
+        sql = f"UPDATE students SET {sets}, updated_at = CURRENT_TIMESTAMP WHERE id = ?"
+        for i in range(0, len(items), chunk_size):
+            chunk = items[i:i + chunk_size]
+            rows = [tuple(ch[f] for f in fields) + (sid,) for sid, ch in chunk]
+            labels = [f"תלמיד {sid}" for sid, _ in chunk]
+            ok_idx: List[int] = []
+            updated += _executemany_guarded(cursor, ph, sql, rows, labels, errors, ok_idx)
+            # אירוע רק לעדכון שנכתב בפועל
+            for sid, ch in (chunk[j] for j in ok_idx):
+                payload = {k: v for k, v in (profiles.get(sid) or {}).items() if k != 'points'}
+                payload.update(ch)
+                payload['id'] = sid
+                events.append(('student', str(sid), 'update', payload))
+            done += len(chunk)
+            _report(progress, done, total, 'write')
+
+    # 3) נקודות + points_log
+    pc_items = [(sid, int(old), int(new)) for sid, (old, new) in points_changes.items() if int(old) != int(new)]
+    points_changed = 0
+    inserted_ids = set(new_ids.values())
+    for i in range(0, len(pc_items), chunk_size):
+        chunk = pc_items[i:i + chunk_size]
+        # לתלמידים חדשים הנקודות כבר נכתבו ב-INSERT – רק points_log
+        existing_chunk = [(sid, old, new) for sid, old, new in chunk if sid not in inserted_ids]
+        ok_idx: List[int] = []
+        if existing_chunk:
+            _executemany_guarded(
+                cursor, ph,
+                'UPDATE students SET points = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
+                [(new, sid) for sid, _old, new in existing_chunk],
+                [f"נקודות לתלמיד {sid}" for sid, _o, _n in existing_chunk], errors, ok_idx,
+            )
+        # היסטוריה ואירועים רק לנקודות שנכתבו בפועל
+        written = {existing_chunk[j][0] for j in ok_idx} | inserted_ids
+        applied_chunk = [(sid, old, new) for sid, old, new in chunk if sid in written]
+        points_changed += _executemany_guarded(
+            cursor, ph,
+            'INSERT INTO points_log (student_id, old_points, new_points, delta, reason, actor_name, action_type) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            [(sid, old, new, new - old, reason, actor_name, action_type) for sid, old, new in applied_chunk],
+            [f"היסטוריית נקודות לתלמיד {sid}" for sid, _o, _n in applied_chunk], errors,
+        )
+        for sid, old, new in applied_chunk:
+            events.append(('student_points', str(sid), 'update', {
+                'old_points': old, 'new_points': new, 'reason': reason, 'added_by': actor_name,
+            }))
+        done += len(chunk)
+        _report(progress, done, total, 'write')
+
+    return {
+        'inserted': inserted,
+        'updated': updated,
+        'points_changed': points_changed,
+        'errors': errors,
+        'events': events,
+        'new_ids': new_ids,
+    }
+
+
+def write_change_log(cursor, events, ph: Callable[[str], str] = _identity) -> int:
+    """רישום אירועי השינוי ב-change_log של העמדה במנה אחת"""
+    if not events:
+        return 0
+    import json
+    rows = []
+    for entity_type, entity_id, action_type, payload in events:
+        try:
+            payload_json = json.dumps(payload or {}, ensure_ascii=False, default=str)
+        except Exception:
+            payload_json = '{}'
+        rows.append((entity_type, entity_id, action_type, payload_json))
+    cursor.executemany(
+        ph('INSERT INTO change_log (entity_type, entity_id, action_type, payload_json) VALUES (?, ?, ?, ?)'),
+        rows,
+    )
+    return len(rows)
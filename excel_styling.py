@@ -93,3 +93,180 @@ def apply_rtl_styling_simple(worksheet: Worksheet):
     for row in worksheet.iter_rows():
         for cell in row:
             cell.alignment = alignment_right
+
+
+# ----------------------------------------------------------------------
+# ייצוא זורם (write_only) עם סגנונות בעלי שם
+# ----------------------------------------------------------------------
+
+STYLE_HEADER = 'sp_header'
+STYLE_ROW_ODD = 'sp_row_odd'
+STYLE_ROW_EVEN = 'sp_row_even'
+STYLE_ROW_ODD_TEXT = 'sp_row_odd_text'
+STYLE_ROW_EVEN_TEXT = 'sp_row_even_text'
+STYLE_HEADER_TEXT = 'sp_header_text'
+
+
+def register_named_styles(workbook) -> None:
+    """יצירת הסגנונות פעם אחת לחוברת (אותו מראה כמו apply_rtl_and_alternating_colors)"""
+    from openpyxl.styles import NamedStyle
+
+    existing = set()
+    try:
+        existing = {s if isinstance(s, str) else s.name for s in workbook.named_styles}
+    except Exception:
+        pass
+
+    side = Side(style='thin', color='000000')
+    border = Border(left=side, right=side, top=side, bottom=side)
+    header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+    header_font = Font(bold=True, color="FFFFFF", size=12)
+    align_center = Alignment(horizontal="center", vertical="center", wrap_text=True)
+    align_right = Alignment(horizontal="right", vertical="center", wrap_text=True)
+    fill_odd = PatternFill(start_color="FFFFFF", end_color="FFFFFF", fill_type="solid")
+    fill_even = PatternFill(start_color="F0F0F0", end_color="F0F0F0", fill_type="solid")
+
+    specs = (
+        (STYLE_HEADER, header_fill, header_font, align_center, 'General'),
+        (STYLE_HEADER_TEXT, header_fill, header_font, align_center, '@'),
+        (STYLE_ROW_ODD, fill_odd, None, align_right, 'General'),
+        (STYLE_ROW_EVEN, fill_even, None, align_right, 'General'),
+        (STYLE_ROW_ODD_TEXT, fill_odd, None, align_right, '@'),
+        (STYLE_ROW_EVEN_TEXT, fill_even, None, align_right, '@'),
+    )
+    for name, fill, font, alignment, number_format in specs:
+        if name in existing:
+            continue
+        style = NamedStyle(name=name)
+        style.fill = fill
+        style.border = border
+        style.alignment = alignment
+        style.number_format = number_format
+        if font is not None:
+            style.font = font
+        workbook.add_named_style(style)
+
+
+def _display_len(value) -> int:
+    if value is None or value == '':
+        return 0
+    try:
+        return len(str(value))
+    except Exception:
+        return 0
+
+
+class StreamingExcelWriter:
+    """חוברת write_only: שורות נכתבות ישר לקובץ, בלי load_workbook ובלי מעבר נוסף על התאים.
+
+    רוחב העמודות חייב להיקבע לפני השורה הראשונה (מגבלה של write_only), לכן
+    נשמרות בזיכרון רק עד sample_rows שורות ראשונות לחישוב הרוחב – בייצוא
+    רגיל (כמה אלפי תלמידים) זה כל הקובץ והרוחב מדויק; מעבר לכך הרוחב לפי
+    הדגימה והשאר זורם ישר לקובץ.
+    """
+
+    def __init__(self, path: str, *, sample_rows: int = 5000, min_width: int = 12, max_width: int = 50):
+        from openpyxl import Workbook
+
+        self.path = path
+        self.sample_rows = max(1, int(sample_rows or 5000))
+        self.min_width = min_width
+        self.max_width = max_width
+        self.workbook = Workbook(write_only=True)
+        register_named_styles(self.workbook)
+        self.sheet_count = 0
+
+    def _safe_title(self, title) -> str:
+        t = str(title or '').strip()
+        for ch in '[]:*?/\\':
+            t = t.replace(ch, ' ')
+        t = t.strip()[:31] or f"Sheet{self.sheet_count + 1}"
+        existing = set(self.workbook.sheetnames)
+        base, n = t, 2
+        while t in existing:
+            suffix = f" ({n})"
+            t = base[:31 - len(suffix)] + suffix
+            n += 1
+        return t
+
+    def write_sheet(self, title: str, headers, rows, *, text_columns=()) -> int:
+        """כתיבת גיליון: headers – רשימת כותרות, rows – כל iterable של שורות (גם cursor/generator).
+        text_columns – אינדקסים (0-based) של עמודות בפורמט טקסט ('@'), למשל מס' כרטיס.
+        מחזיר את מספר שורות הנתונים."""
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.utils import get_column_letter
+
+        ws = self.workbook.create_sheet(title=self._safe_title(title))
+        ws.sheet_view.rightToLeft = True
+        headers = list(headers or [])
+        text_cols = set(int(c) for c in (text_columns or ()))
+        ncols = len(headers)
+
+        # דגימה לחישוב רוחב (מהזרם עצמו)
+        widths = [_display_len(h) for h in headers]
+        it = iter(rows if rows is not None else ())
+        sample = []
+        for row in it:
+            row = list(row)
+            sample.append(row)
+            for i, v in enumerate(row):
+                n = _display_len(v)
+                if i >= len(widths):
+                    widths.append(n)
+                elif n > widths[i]:
+                    widths[i] = n
+            if len(sample) >= self.sample_rows:
+                break
+        ncols = max(ncols, len(widths))
+        for i in range(ncols):
+            w = widths[i] if i < len(widths) else 0
+            ws.column_dimensions[get_column_letter(i + 1)].width = max(min(w + 2, self.max_width), self.min_width)
+
+        def _cells(values, style_plain, style_text):
+            out = []
+            for i in range(ncols):
+                v = values[i] if i < len(values) else None
+                if i in text_cols and v is not None and v != '':
+                    v = str(v)
+                c = WriteOnlyCell(ws, value=v)
+                c.style = style_text if i in text_cols else style_plain
+                out.append(c)
+            return out
+
+        ws.append(_cells(headers, STYLE_HEADER, STYLE_HEADER_TEXT))
+        count = 0
+        for row in sample:
+            count += 1
+            odd = (count % 2 == 1)
+            ws.append(_cells(row, STYLE_ROW_ODD if odd else STYLE_ROW_EVEN,
+                             STYLE_ROW_ODD_TEXT if odd else STYLE_ROW_EVEN_TEXT))
+        sample = None
+        for row in it:
+            count += 1
+            odd = (count % 2 == 1)
+            ws.append(_cells(list(row), STYLE_ROW_ODD if odd else STYLE_ROW_EVEN,
+                             STYLE_ROW_ODD_TEXT if odd else STYLE_ROW_EVEN_TEXT))
+        self.sheet_count += 1
+        return count
+
+    def write_dataframe(self, title: str, df, *, text_columns=()) -> int:
+        """גיליון מ-DataFrame (NaN -> תא ריק)"""
+        headers = [str(c) for c in df.columns]
+
+        def _rows():
+            for tup in df.itertuples(index=False, name=None):
+                yield [None if (v is None or (isinstance(v, float) and v != v)) else v for v in tup]
+
+        return self.write_sheet(title, headers, _rows(), text_columns=text_columns)
+
+    def save(self) -> None:
+        if self.sheet_count == 0:
+            self.write_sheet('Sheet', [], [])
+        self.workbook.save(self.path)
+
+
+def write_dataframe_styled(df, path: str, sheet_name: str = 'Sheet1', *, text_columns=()) -> None:
+    """תחליף ל-df.to_excel + load_workbook + apply_rtl_and_alternating_colors"""
+    writer = StreamingExcelWriter(path)
+    writer.write_dataframe(sheet_name, df, text_columns=text_columns)
+    writer.save()
@@ -79,31 +79,31 @@ def encode_logo_optimized(img_path):
     return bytes(logo_data)
 
 
+# אותיות עבריות, ספרות וסימני תאריך/שעה בלבד – כל תו אחר מושמט.
+# ₪ אינו קיים ב-cp862; המדפסת הזו מציגה אותו בתו 0xA4
+_CP862_MAP = {
+    'א': 0x80, 'ב': 0x81, 'ג': 0x82, 'ד': 0x83, 'ה': 0x84,
+    'ו': 0x85, 'ז': 0x86, 'ח': 0x87, 'ט': 0x88, 'י': 0x89,
+    'ך': 0x8A, 'כ': 0x8B, 'ל': 0x8C, 'ם': 0x8D, 'מ': 0x8E,
+    'ן': 0x8F, 'נ': 0x90, 'ס': 0x91, 'ע': 0x92, 'ף': 0x93,
+    'פ': 0x94, 'ץ': 0x95, 'צ': 0x96, 'ק': 0x97, 'ר': 0x98,
+    'ש': 0x99, 'ת': 0x9A, ' ': 0x20, '\n': 0x0A,
+    '0': 0x30, '1': 0x31, '2': 0x32, '3': 0x33, '4': 0x34,
+    '5': 0x35, '6': 0x36, '7': 0x37, '8': 0x38, '9': 0x39,
+    ':': 0x3A, '.': 0x2E, '-': 0x2D, '/': 0x2F, '₪': 0xA4
+}
+
+
 def hebrew_to_cp862(text):
-    """Convert Hebrew text to CP862 encoding."""
-    cp862_map = {
-        'א': 0x80, 'ב': 0x81, 'ג': 0x82, 'ד': 0x83, 'ה': 0x84,
-        'ו': 0x85, 'ז': 0x86, 'ח': 0x87, 'ט': 0x88, 'י': 0x89,
-        'ך': 0x8A, 'כ': 0x8B, 'ל': 0x8C, 'ם': 0x8D, 'מ': 0x8E,
-        'ן': 0x8F, 'נ': 0x90, 'ס': 0x91, 'ע': 0x92, 'ף': 0x93,
-        'פ': 0x94, 'ץ': 0x95, 'צ': 0x96, 'ק': 0x97, 'ר': 0x98,
-        'ש': 0x99, 'ת': 0x9A, ' ': 0x20, '\n': 0x0A,
-        '0': 0x30, '1': 0x31, '2': 0x32, '3': 0x33, '4': 0x34,
-        '5': 0x35, '6': 0x36, '7': 0x37, '8': 0x38, '9': 0x39,
-        ':': 0x3A, '.': 0x2E, '-': 0x2D, '/': 0x2F, '₪': 0xA4
-    }
-    
-    bytes_list = []
+    """Convert Hebrew text to CP862 encoding (unsupported characters are skipped)."""
+    out = []
     for char in text:
-        if char in cp862_map:
-            bytes_list.append(cp862_map[char])
-        elif char.isdigit() or char in '.-/:':
-            bytes_list.append(ord(char))
-        elif char == '\n':
-            bytes_list.append(0x0A)
-        # Skip unsupported characters
-    
-    return bytes_list
+        b = _CP862_MAP.get(char)
+        if b is not None:
+            out.append(b)
+        elif char.isdigit():
+            out.append(ord(char))
+    return out
 
 
 def create_receipt_with_logo(logo_path, store_name, items, total, date=""):
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import bisect
+import threading
 from dataclasses import dataclass
 from datetime import date as pydate
 from typing import List, Optional, Dict
@@ -34,12 +36,6 @@ def is_available() -> bool:
     return _PYLUACH_AVAILABLE
 
 
-def _greg_from_pydate(d: pydate):
-    if not _PYLUACH_AVAILABLE:
-        raise RuntimeError("pyluach not available")
-    return dates.GregorianDate.from_pydate(d)
-
-
 def _normalize_hebrew_quotes(text: Optional[str]) -> str:
     if text is None:
         return ""
@@ -53,46 +49,181 @@ def _normalize_hebrew_quotes(text: Optional[str]) -> str:
     return result if result else ""
 
 
+class _YearTable:
+    """Precomputed strings for one Hebrew year (Rosh Hashana .. Elul 29), indexed by day offset."""
+
+    __slots__ = ('start', 'hebrew_date', 'weekday', 'parsha', 'holiday', 'holiday_days')
+
+    def __init__(self, hebrew_year: int):
+        first = dates.HebrewDate(hebrew_year, 7, 1)
+        last = dates.HebrewDate(hebrew_year + 1, 7, 1)
+        self.start = first.to_pydate().toordinal()
+
+        hebrew_date: List[str] = []
+        weekday: List[str] = []
+        # israel -> strings per day ("" when none)
+        parsha: Dict[bool, List[str]] = {True: [], False: []}
+        holiday: Dict[bool, List[str]] = {True: [], False: []}
+        d = first
+        while d < last:
+            hebrew_date.append(_normalize_hebrew_quotes(d.hebrew_date_string()))
+            weekday.append(_normalize_hebrew_quotes((f"יום {d:%*A}").strip()))
+            for israel in (True, False):
+                parsha[israel].append(_normalize_hebrew_quotes(parshios.getparsha_string(d, hebrew=True, israel=israel)))
+                holiday[israel].append(_normalize_hebrew_quotes(d.holiday(israel=israel, hebrew=True, prefix_day=True)))
+            d = d + 1
+
+        self.hebrew_date = tuple(hebrew_date)
+        self.weekday = tuple(weekday)
+        self.parsha = {k: tuple(v) for k, v in parsha.items()}
+        self.holiday = {k: tuple(v) for k, v in holiday.items()}
+        # ordinals of days that have a holiday – for "upcoming" scans without walking empty days
+        self.holiday_days = {
+            k: tuple(self.start + i for i, h in enumerate(v) if h) for k, v in holiday.items()
+        }
+
+    @property
+    def end(self) -> int:
+        return self.start + len(self.hebrew_date)
+
+
+class JewishCalendarService:
+    """Memoized calendar lookups.
+
+    Each Hebrew year is computed once with pyluach on first use (~20-40ms) and then
+    served from tuples: a day lookup is a bisect over the loaded years plus an index.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (sorted start ordinals, matching tables) – replaced as a whole so readers need no lock
+        self._index: tuple = ((), ())
+        self._years: Dict[int, _YearTable] = {}
+
+    def _loaded(self, ordinal: int) -> Optional[_YearTable]:
+        starts, tables = self._index
+        i = bisect.bisect_right(starts, ordinal) - 1
+        if i >= 0 and ordinal < tables[i].end:
+            return tables[i]
+        return None
+
+    def _table(self, ordinal: int) -> _YearTable:
+        table = self._loaded(ordinal)
+        if table is not None:
+            return table
+        with self._lock:
+            table = self._loaded(ordinal)
+            if table is not None:
+                return table
+            hebrew_year = dates.GregorianDate.from_pydate(pydate.fromordinal(ordinal)).to_heb().year
+            table = self._years.get(hebrew_year)
+            if table is None:
+                table = _YearTable(hebrew_year)
+                self._years[hebrew_year] = table
+            ordered = sorted(self._years.values(), key=lambda t: t.start)
+            self._index = (tuple(t.start for t in ordered), tuple(ordered))
+            return table
+
+    def _day(self, ordinal: int):
+        table = self._table(ordinal)
+        return table, ordinal - table.start
+
+    # ------------------------------------------------------------------
+
+    def hebrew_date(self, d: pydate) -> str:
+        table, i = self._day(d.toordinal())
+        return table.hebrew_date[i]
+
+    def day_info(self, d: pydate, *, israel: bool = True) -> JewishDayInfo:
+        table, i = self._day(d.toordinal())
+        israel = bool(israel)
+        return JewishDayInfo(
+            weekday_he=table.weekday[i],
+            hebrew_date_he=table.hebrew_date[i],
+            parsha_he=table.parsha[israel][i],
+            holiday_he=table.holiday[israel][i],
+        )
+
+    def upcoming_parshios(self, start: pydate, *, weeks: int, israel: bool = True) -> List[JewishListItem]:
+        israel = bool(israel)
+        # השבת הקרובה (או היום אם זו שבת); date.weekday(): שני=0 ... שבת=5
+        ordinal = start.toordinal() + (5 - start.weekday()) % 7
+        out: List[JewishListItem] = []
+        for _ in range(weeks):
+            table, i = self._day(ordinal)
+            parsha = table.parsha[israel][i]
+            title = f"פרשת {parsha}".strip() if parsha else table.holiday[israel][i]
+            if title:
+                out.append(JewishListItem(
+                    gregorian=pydate.fromordinal(ordinal),
+                    hebrew_date_he=table.hebrew_date[i],
+                    title_he=title,
+                ))
+            ordinal += 7
+        return out
+
+    def upcoming_holidays(self, start: pydate, *, days: int, israel: bool = True) -> List[JewishListItem]:
+        israel = bool(israel)
+        ordinal = start.toordinal()
+        stop = ordinal + days
+        out: List[JewishListItem] = []
+        last_title: Optional[str] = None
+        while ordinal < stop:
+            table = self._table(ordinal)
+            marks = table.holiday_days[israel]
+            for day in marks[bisect.bisect_left(marks, ordinal):]:
+                if day >= stop:
+                    break
+                i = day - table.start
+                hol = table.holiday[israel][i]
+                if hol == last_title:
+                    continue
+                last_title = hol
+                out.append(JewishListItem(
+                    gregorian=pydate.fromordinal(day),
+                    hebrew_date_he=table.hebrew_date[i],
+                    title_he=hol,
+                ))
+            ordinal = table.end
+        return out
+
+
+_SERVICE: Optional[JewishCalendarService] = None
+
+
+def get_calendar_service() -> Optional[JewishCalendarService]:
+    """The shared service, or None when pyluach is not available."""
+    global _SERVICE
+    if not _PYLUACH_AVAILABLE:
+        return None
+    if _SERVICE is None:
+        _SERVICE = JewishCalendarService()
+    return _SERVICE
+
+
 def hebrew_date_from_gregorian_str(gregorian_date: str, *, israel: bool = True) -> str:
     """Convert YYYY-MM-DD (Gregorian) to Hebrew date string for UI/printing.
 
     Returns empty string if conversion is unavailable or input is invalid.
     """
-    if not _PYLUACH_AVAILABLE:
+    service = get_calendar_service()
+    if service is None:
         return ""
     s = str(gregorian_date or '').strip()
     if not s:
         return ""
     try:
         y, m, d = s.split('-', 2)
-        g = dates.GregorianDate(int(y), int(m), int(d))
-        heb = g.to_heb()
-        return _normalize_hebrew_quotes(heb.hebrew_date_string()) or ""
+        return service.hebrew_date(pydate(int(y), int(m), int(d))) or ""
     except Exception:
         return ""
 
 
 def get_today_info(today: Optional[pydate] = None, *, israel: bool = True) -> Optional[JewishDayInfo]:
-    if not _PYLUACH_AVAILABLE:
+    service = get_calendar_service()
+    if service is None:
         return None
-
-    today = today or pydate.today()
-    greg = _greg_from_pydate(today)
-    heb = greg.to_heb()
-
-    weekday_he = _normalize_hebrew_quotes((f"יום {heb:%*A}").strip())
-    hebrew_date_he = _normalize_hebrew_quotes(heb.hebrew_date_string())
-
-    parsha_he = _normalize_hebrew_quotes(parshios.getparsha_string(greg, hebrew=True, israel=israel))
-
-    holiday_he = _normalize_hebrew_quotes(heb.holiday(israel=israel, hebrew=True, prefix_day=True))
-
-    return JewishDayInfo(
-        weekday_he=weekday_he,
-        hebrew_date_he=hebrew_date_he,
-        parsha_he=parsha_he,
-        holiday_he=holiday_he,
-    )
+    return service.day_info(today or pydate.today(), israel=israel)
 
 
 def upcoming_parshios(
@@ -101,37 +232,14 @@ def upcoming_parshios(
     weeks: int = 12,
     israel: bool = True,
 ) -> List[JewishListItem]:
-    if not _PYLUACH_AVAILABLE:
+    service = get_calendar_service()
+    if service is None:
         return []
 
     if weeks < 1:
         return []
 
-    start = start or pydate.today()
-    g0 = _greg_from_pydate(start).shabbos()
-
-    out: List[JewishListItem] = []
-    for i in range(weeks):
-        g = g0 + (i * 7)
-        heb = g.to_heb()
-        greg_py = g.to_pydate()
-
-        parsha = _normalize_hebrew_quotes(parshios.getparsha_string(g, hebrew=True, israel=israel))
-        if parsha:
-            title = f"פרשת {parsha}".strip()
-        else:
-            hol = _normalize_hebrew_quotes(heb.holiday(israel=israel, hebrew=True, prefix_day=True))
-            title = hol or ""
-        if title:
-            out.append(
-                JewishListItem(
-                    gregorian=greg_py,
-                    hebrew_date_he=_normalize_hebrew_quotes(heb.hebrew_date_string()) or "",
-                    title_he=title,
-                )
-            )
-
-    return out
+    return service.upcoming_parshios(start or pydate.today(), weeks=weeks, israel=israel)
 
 
 def upcoming_holidays(
@@ -140,38 +248,14 @@ def upcoming_holidays(
     days: int = 120,
     israel: bool = True,
 ) -> List[JewishListItem]:
-    if not _PYLUACH_AVAILABLE:
+    service = get_calendar_service()
+    if service is None:
         return []
 
     if days < 1:
         return []
 
-    start = start or pydate.today()
-    g0 = _greg_from_pydate(start)
-
-    out: List[JewishListItem] = []
-    last_title: Optional[str] = None
-
-    for i in range(days):
-        g = g0 + i
-        heb = g.to_heb()
-        hol = _normalize_hebrew_quotes(heb.holiday(israel=israel, hebrew=True, prefix_day=True))
-        if not hol:
-            continue
-
-        if hol == last_title:
-            continue
-        last_title = hol
-
-        out.append(
-            JewishListItem(
-                gregorian=g.to_pydate(),
-                hebrew_date_he=_normalize_hebrew_quotes(heb.hebrew_date_string()) or "",
-                title_he=hol,
-            )
-        )
-
-    return out
+    return service.upcoming_holidays(start or pydate.today(), days=days, israel=israel)
 
 
 def build_calendar_news_items(
@@ -0,0 +1,171 @@
+import argparse
+import sys
+import time
+from datetime import date as pydate, timedelta
+from typing import List, Optional
+
+
+def _ms(t0: float, t1: float) -> float:
+    return (t1 - t0) * 1000.0
+
+
+# ---------------------------------------------------------------------------
+# מימוש ישיר (ללא מטמון) – כפי שהיה ב-jewish_calendar לפני שירות הלוח, להשוואה
+# ---------------------------------------------------------------------------
+
+def _ref_hebrew_date_str(jc, gregorian_date: str) -> str:
+    from pyluach import dates
+    s = str(gregorian_date or '').strip()
+    if not s:
+        return ""
+    try:
+        y, m, d = s.split('-', 2)
+        heb = dates.GregorianDate(int(y), int(m), int(d)).to_heb()
+        return jc._normalize_hebrew_quotes(heb.hebrew_date_string()) or ""
+    except Exception:
+        return ""
+
+
+def _ref_today_info(jc, today: pydate, israel: bool):
+    from pyluach import dates, parshios
+    greg = dates.GregorianDate.from_pydate(today)
+    heb = greg.to_heb()
+    return jc.JewishDayInfo(
+        weekday_he=jc._normalize_hebrew_quotes((f"יום {heb:%*A}").strip()),
+        hebrew_date_he=jc._normalize_hebrew_quotes(heb.hebrew_date_string()),
+        parsha_he=jc._normalize_hebrew_quotes(parshios.getparsha_string(greg, hebrew=True, israel=israel)),
+        holiday_he=jc._normalize_hebrew_quotes(heb.holiday(israel=israel, hebrew=True, prefix_day=True)),
+    )
+
+
+def _ref_upcoming_parshios(jc, start: pydate, weeks: int, israel: bool) -> List:
+    from pyluach import dates, parshios
+    g0 = dates.GregorianDate.from_pydate(start).shabbos()
+    out = []
+    for i in range(weeks):
+        g = g0 + (i * 7)
+        heb = g.to_heb()
+        parsha = jc._normalize_hebrew_quotes(parshios.getparsha_string(g, hebrew=True, israel=israel))
+        if parsha:
+            title = f"פרשת {parsha}".strip()
+        else:
+            title = jc._normalize_hebrew_quotes(heb.holiday(israel=israel, hebrew=True, prefix_day=True)) or ""
+        if title:
+            out.append(jc.JewishListItem(
+                gregorian=g.to_pydate(),
+                hebrew_date_he=jc._normalize_hebrew_quotes(heb.hebrew_date_string()) or "",
+                title_he=title,
+            ))
+    return out
+
+
+def _ref_upcoming_holidays(jc, start: pydate, days: int, israel: bool) -> List:
+    from pyluach import dates
+    g0 = dates.GregorianDate.from_pydate(start)
+    out = []
+    last_title: Optional[str] = None
+    for i in range(days):
+        g = g0 + i
+        heb = g.to_heb()
+        hol = jc._normalize_hebrew_quotes(heb.holiday(israel=israel, hebrew=True, prefix_day=True))
+        if not hol or hol == last_title:
+            continue
+        last_title = hol
+        out.append(jc.JewishListItem(
+            gregorian=g.to_pydate(),
+            hebrew_date_he=jc._normalize_hebrew_quotes(heb.hebrew_date_string()) or "",
+            title_he=hol,
+        ))
+    return out
+
+
+# ---------------------------------------------------------------------------
+
+def _timeit(label: str, loops: int, fn) -> float:
+    best = None
+    for _ in range(loops):
+        t0 = time.perf_counter()
+        fn()
+        t1 = time.perf_counter()
+        ms = _ms(t0, t1)
+        if best is None or ms < best:
+            best = ms
+    print(f'[BENCH] {label:<34} best_ms={best:.3f}')
+    return best
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description='SchoolPoints Jewish calendar benchmark (cached service vs direct pyluach)')
+    ap.add_argument('--start', default='', help='YYYY-MM-DD (default: today)')
+    ap.add_argument('--dates', type=int, default=2000, help='number of consecutive dates for the export-style test')
+    ap.add_argument('--loops', type=int, default=5)
+    ap.add_argument('--diaspora', action='store_true', help='use the diaspora schedule instead of Israel')
+    args = ap.parse_args()
+
+    t_import0 = time.perf_counter()
+    import jewish_calendar as jc
+    t_import1 = time.perf_counter()
+    print(f'[BENCH] imports_ms={_ms(t_import0, t_import1):.1f}')
+    if not jc.is_available():
+        print('[BENCH] pyluach not available')
+        return 2
+
+    start = pydate.fromisoformat(args.start) if args.start else pydate.today()
+    israel = not args.diaspora
+    loops = max(1, int(args.loops or 1))
+    date_strs = [(start + timedelta(days=i)).isoformat() for i in range(max(1, int(args.dates or 1)))]
+
+    # בנייה ראשונה (קר) – כולל חישוב כל שנות הלוח הנדרשות
+    service = jc.get_calendar_service()
+    t0 = time.perf_counter()
+    for s in date_strs:
+        jc.hebrew_date_from_gregorian_str(s)
+    jc.upcoming_holidays(start, days=120, israel=israel)
+    t1 = time.perf_counter()
+    print(f'[BENCH] cold_build_ms={_ms(t0, t1):.1f} years_loaded={len(service._years)}')
+
+    # נכונות: אותן תוצאות כמו המימוש הישיר
+    mismatches = 0
+    for s in date_strs:
+        if jc.hebrew_date_from_gregorian_str(s) != _ref_hebrew_date_str(jc, s):
+            mismatches += 1
+    for i in range(0, len(date_strs), 7):
+        d = start + timedelta(days=i)
+        if jc.get_today_info(d, israel=israel) != _ref_today_info(jc, d, israel):
+            mismatches += 1
+    if jc.upcoming_parshios(start, weeks=12, israel=israel) != _ref_upcoming_parshios(jc, start, 12, israel):
+        mismatches += 1
+    if jc.upcoming_holidays(start, days=120, israel=israel) != _ref_upcoming_holidays(jc, start, 120, israel):
+        mismatches += 1
+    print(f'[BENCH] mismatches={mismatches}')
+
+    rows = []
+    rows.append((
+        f'hebrew_date x{len(date_strs)}',
+        _timeit(f'direct hebrew_date x{len(date_strs)}', loops, lambda: [_ref_hebrew_date_str(jc, s) for s in date_strs]),
+        _timeit(f'cached hebrew_date x{len(date_strs)}', loops, lambda: [jc.hebrew_date_from_gregorian_str(s) for s in date_strs]),
+    ))
+    rows.append((
+        'today_info x100',
+        _timeit('direct today_info x100', loops, lambda: [_ref_today_info(jc, start, israel) for _ in range(100)]),
+        _timeit('cached today_info x100', loops, lambda: [jc.get_today_info(start, israel=israel) for _ in range(100)]),
+    ))
+    rows.append((
+        'upcoming_parshios(12)',
+        _timeit('direct upcoming_parshios(12)', loops, lambda: _ref_upcoming_parshios(jc, start, 12, israel)),
+        _timeit('cached upcoming_parshios(12)', loops, lambda: jc.upcoming_parshios(start, weeks=12, israel=israel)),
+    ))
+    rows.append((
+        'upcoming_holidays(120)',
+        _timeit('direct upcoming_holidays(120)', loops, lambda: _ref_upcoming_holidays(jc, start, 120, israel)),
+        _timeit('cached upcoming_holidays(120)', loops, lambda: jc.upcoming_holidays(start, days=120, israel=israel)),
+    ))
+
+    for label, direct, cached in rows:
+        speedup = (direct / cached) if cached > 0 else float('inf')
+        print(f'[BENCH] {label:<26} direct={direct:9.3f}ms cached={cached:9.3f}ms x{speedup:.1f}')
+    return 0 if mismatches == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,80 +1,41 @@
 """
 מערכת הודעות למערכת ניקוד בית ספרית
 """
-import sqlite3
-import os
+import bisect
+import threading
+import time
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 
 
 class MessagesDB:
-    def __init__(self, db_path: str = None):
-        # ברירת מחדל: קובץ ה-DB בתיקייה של הפרויקט (תומך ב-UNC)
-        if db_path is None:
-            base_dir = os.path.dirname(os.path.abspath(__file__))
-            
-            # בדיקה אם יש נתיב DB משותף מוגדר (כמו ב-database.py)
-            custom_db_path = None
-            db_config_file = os.path.join(base_dir, 'db_path.txt')
-            if os.path.exists(db_config_file):
-                try:
-                    with open(db_config_file, 'r', encoding='utf-8') as f:
-                        for line in f:
-                            line = line.strip()
-                            if line and not line.startswith('#'):
-                                custom_db_path = line
-                                break
-                except:
-                    pass
-            
-            # השתמש ב-DB משותף אם הוגדר, אחרת מקומי
-            if custom_db_path:
-                self.db_path = custom_db_path
-            else:
-                self.db_path = os.path.join(base_dir, 'school_points.db')
-        else:
-            self.db_path = db_path
+    # בדיקת מוני הגרסה לכל היותר פעם בפרק זמן זה; כתיבה מקומית מאלצת בדיקה מיידית
+    CACHE_CHECK_SEC = 2.0
+
+    def __init__(self, db_path: str = None, database=None):
+        # חיבורים דרך Database – אותו איתור נתיב (config/shared/db_path.txt), אותם PRAGMA,
+        # ניסיונות חוזרים וטיפול ב-DB פגום. ברירת מחדל: Database עם אותו db_path.
+        if database is None:
+            from database import Database
+            database = Database(db_path)
+        self.db = database
+        self.db_path = database.db_path
+
+        # מטמון ההודעות שנקראות בכל העברת כרטיס (ראו _refresh_cache)
+        self._cache_lock = threading.Lock()
+        self._cache_checked_at = 0.0
+        self._cache_versions: Dict[str, int] = {}
+        self._static_cache: List[Dict[str, Any]] = []
+        self._student_cache: Dict[int, str] = {}
+        # אינדקס מקטעים: גבולות ממוינים + ההודעה הזוכה בכל מקטע [bounds[i], bounds[i+1])
+        self._threshold_bounds: List[int] = []
+        self._threshold_winners: List[Optional[str]] = []
+
         self.init_tables()
     
     def get_connection(self):
-        """יצירת חיבור למסד הנתונים"""
-        db_dir = os.path.dirname(self.db_path) or '.'
-        try:
-            os.makedirs(db_dir, exist_ok=True)
-        except Exception:
-            # אם לא הצלחנו ליצור תיקייה – ניתן ל-sqlite לטפל בשגיאה
-            pass
-
-        conn = sqlite3.connect(self.db_path, timeout=10)
-        conn.row_factory = sqlite3.Row
-        self._apply_pragmas(conn)
-        return conn
-
-    def _is_unc_path(self) -> bool:
-        try:
-            p = str(self.db_path or '')
-        except Exception:
-            return False
-        return p.startswith('\\') or p.startswith('//')
-
-    def _apply_pragmas(self, conn: sqlite3.Connection) -> None:
-        try:
-            conn.execute('PRAGMA foreign_keys = ON')
-        except Exception:
-            pass
-        try:
-            conn.execute('PRAGMA busy_timeout = 5000')
-        except Exception:
-            pass
-        try:
-            if self._is_unc_path():
-                conn.execute('PRAGMA journal_mode = DELETE')
-                conn.execute('PRAGMA synchronous = FULL')
-            else:
-                conn.execute('PRAGMA journal_mode = WAL')
-                conn.execute('PRAGMA synchronous = NORMAL')
-        except Exception:
-            pass
+        """יצירת חיבור למסד הנתונים (דרך Database)"""
+        return self.db.get_connection()
     
     def init_tables(self):
         """יצירת טבלאות הודעות"""
@@ -203,10 +164,132 @@ class MessagesDB:
                 FOREIGN KEY (student_id) REFERENCES students (id)
             )
         ''')
+
+        self._init_content_versions(cursor)
         
         conn.commit()
         conn.close()
+
+    # ===================== גרסאות תוכן =====================
+
+    # טבלאות שכל כתיבה אליהן מקדמת מונה גרסה (בטריגר – כך שגם כתיבות מסנכרון/ענן נספרות)
+    CONTENT_TABLES = ('news_items', 'ads_items', 'static_messages', 'threshold_messages',
+                      'student_messages', 'settings')
+
+    def _init_content_versions(self, cursor) -> None:
+        """טבלת content_versions + טריגרים שמקדמים את המונה בכל INSERT/UPDATE/DELETE"""
+        try:
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS content_versions (
+                    name TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+        except Exception:
+            return
+        for table in self.CONTENT_TABLES:
+            try:
+                cursor.execute('INSERT OR IGNORE INTO content_versions (name, version) VALUES (?, 0)', (table,))
+                for op in ('INSERT', 'UPDATE', 'DELETE'):
+                    cursor.execute(
+                        f"CREATE TRIGGER IF NOT EXISTS trg_cv_{table}_{op.lower()} AFTER {op} ON {table} "
+                        f"BEGIN UPDATE content_versions SET version = version + 1 WHERE name = '{table}'; END"
+                    )
+            except Exception:
+                # למשל settings עוד לא נוצרה – ננסה שוב באתחול הבא
+                continue
+
+    def get_content_versions(self) -> Dict[str, int]:
+        """כל מוני הגרסה בשאילתה אחת קטנה – לבדיקה זולה האם משהו השתנה"""
+        conn = self.get_connection()
+        try:
+            rows = conn.execute('SELECT name, version FROM content_versions').fetchall()
+            return {str(r['name']): int(r['version'] or 0) for r in rows}
+        except Exception:
+            return {}
+        finally:
+            conn.close()
     
+    # ===================== מטמון הודעות להעברת כרטיס =====================
+
+    # הטבלאות שנשמרות בזיכרון; כל אחת נטענת מחדש רק כשהמונה שלה ב-content_versions זז
+    CACHED_TABLES = ('static_messages', 'threshold_messages', 'student_messages')
+
+    def _invalidate_cache(self) -> None:
+        """אחרי כתיבה מקומית: הטריגר כבר קידם את המונה – נבדוק אותו בקריאה הבאה"""
+        self._cache_checked_at = 0.0
+
+    def _refresh_cache(self) -> None:
+        """טעינה מחדש של טבלאות שהמונה שלהן השתנה (חיבור אחד לבדיקה ולטעינה)"""
+        if (time.monotonic() - self._cache_checked_at) < self.CACHE_CHECK_SEC:
+            return
+        with self._cache_lock:
+            if (time.monotonic() - self._cache_checked_at) < self.CACHE_CHECK_SEC:
+                return
+            conn = self.get_connection()
+            try:
+                cursor = conn.cursor()
+                try:
+                    cursor.execute('SELECT name, version FROM content_versions')
+                    versions = {str(r['name']): int(r['version'] or 0) for r in cursor.fetchall()}
+                except Exception:
+                    versions = {}
+                for table in self.CACHED_TABLES:
+                    # בלי מונה (DB ישן) – טוענים בכל בדיקה
+                    if table in versions and self._cache_versions.get(table) == versions[table]:
+                        continue
+                    if table == 'static_messages':
+                        self._load_static_cache(cursor)
+                    elif table == 'threshold_messages':
+                        self._load_threshold_cache(cursor)
+                    else:
+                        self._load_student_cache(cursor)
+                    if table in versions:
+                        self._cache_versions[table] = versions[table]
+            finally:
+                conn.close()
+            self._cache_checked_at = time.monotonic()
+
+    def _load_static_cache(self, cursor) -> None:
+        cursor.execute('''
+            SELECT * FROM static_messages WHERE is_active = 1
+            ORDER BY created_at DESC
+        ''')
+        self._static_cache = [dict(row) for row in cursor.fetchall()]
+
+    def _load_student_cache(self, cursor) -> None:
+        cursor.execute('''
+            SELECT student_id, message FROM student_messages
+            WHERE is_active = 1
+            ORDER BY created_at ASC, id ASC
+        ''')
+        # החדשה ביותר דורסת – כמו ORDER BY created_at DESC LIMIT 1
+        self._student_cache = {int(row['student_id']): row['message'] for row in cursor.fetchall()}
+
+    def _load_threshold_cache(self, cursor) -> None:
+        """אינדקס מקטעים: בין כל שני גבולות עוקבים ההודעה הזוכה (החדשה ביותר) קבועה"""
+        cursor.execute('''
+            SELECT id, min_points, max_points, message, created_at FROM threshold_messages
+            WHERE is_active = 1 AND min_points <= max_points
+        ''')
+        ranges = []
+        for row in cursor.fetchall():
+            try:
+                ranges.append((int(row['min_points']), int(row['max_points']),
+                               (str(row['created_at'] or ''), int(row['id'] or 0)), row['message']))
+            except Exception:
+                continue
+        bounds = sorted({r[0] for r in ranges} | {r[1] + 1 for r in ranges})
+        winners: List[Optional[str]] = []
+        for start in bounds[:-1]:
+            best = None
+            for lo, hi, order, message in ranges:
+                if lo <= start <= hi and (best is None or order > best[0]):
+                    best = (order, message)
+            winners.append(best[1] if best else None)
+        self._threshold_bounds = bounds
+        self._threshold_winners = winners
+
     # ===================== הודעות סטטיות =====================
     
     def add_static_message(self, message: str, show_always: bool = False) -> int:
@@ -219,27 +302,17 @@ class MessagesDB:
         message_id = cursor.lastrowid
         conn.commit()
         conn.close()
+        self._invalidate_cache()
         return message_id
     
     def get_active_static_messages(self, show_always: bool = None) -> List[Dict[str, Any]]:
         """קבלת כל ההודעות הסטטיות הפעילות"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        if show_always is None:
-            cursor.execute('''
-                SELECT * FROM static_messages WHERE is_active = 1
-                ORDER BY created_at DESC
-            ''')
-        else:
-            cursor.execute('''
-                SELECT * FROM static_messages WHERE is_active = 1 AND show_always = ?
-                ORDER BY created_at DESC
-            ''', (1 if show_always else 0,))
-        
-        messages = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        return messages
+        self._refresh_cache()
+        messages = self._static_cache
+        if show_always is not None:
+            flag = 1 if show_always else 0
+            messages = [m for m in messages if int(m.get('show_always') or 0) == flag]
+        return [dict(m) for m in messages]
     
     def update_static_message(self, message_id: int, message: str) -> bool:
         """עדכון הודעה סטטית"""
@@ -251,6 +324,7 @@ class MessagesDB:
         success = cursor.rowcount > 0
         conn.commit()
         conn.close()
+        self._invalidate_cache()
         return success
     
     def delete_static_message(self, message_id: int) -> bool:
@@ -261,6 +335,7 @@ class MessagesDB:
         success = cursor.rowcount > 0
         conn.commit()
         conn.close()
+        self._invalidate_cache()
         return success
     
     def toggle_static_message(self, message_id: int) -> bool:
@@ -275,6 +350,7 @@ class MessagesDB:
         success = cursor.rowcount > 0
         conn.commit()
         conn.close()
+        self._invalidate_cache()
         return success
     
     # ===================== הודעות לפי סף נקודות =====================
@@ -290,23 +366,22 @@ class MessagesDB:
         message_id = cursor.lastrowid
         conn.commit()
         conn.close()
+        self._invalidate_cache()
         return message_id
     
     def get_message_for_points(self, points: int) -> Optional[str]:
-        """קבלת הודעה לפי מספר נקודות"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT message FROM threshold_messages 
-            WHERE is_active = 1 
-            AND ? >= min_points 
-            AND ? <= max_points
-            ORDER BY created_at DESC
-            LIMIT 1
-        ''', (points, points))
-        row = cursor.fetchone()
-        conn.close()
-        return dict(row)['message'] if row else None
+        """קבלת הודעה לפי מספר נקודות (bisect על אינדקס המקטעים שבזיכרון)"""
+        self._refresh_cache()
+        try:
+            points = int(points)
+        except Exception:
+            return None
+        bounds = self._threshold_bounds
+        winners = self._threshold_winners
+        i = bisect.bisect_right(bounds, points) - 1
+        if i < 0 or i >= len(winners):
+            return None
+        return winners[i]
     
     def get_all_threshold_messages(self) -> List[Dict[str, Any]]:
         """קבלת כל הודעות הסף"""
@@ -333,6 +408,7 @@ class MessagesDB:
         success = cursor.rowcount > 0
         conn.commit()
         conn.close()
+        self._invalidate_cache()
         return success
     
     def delete_threshold_message(self, message_id: int) -> bool:
@@ -343,6 +419,7 @@ class MessagesDB:
         success = cursor.rowcount > 0
         conn.commit()
         conn.close()
+        self._invalidate_cache()
         return success
     
     def toggle_threshold_message(self, message_id: int) -> bool:
@@ -357,6 +434,7 @@ class MessagesDB:
         success = cursor.rowcount > 0
         conn.commit()
         conn.close()
+        self._invalidate_cache()
         return success
     
     # ===================== חדשות (News) =====================
@@ -708,21 +786,16 @@ class MessagesDB:
         message_id = cursor.lastrowid
         conn.commit()
         conn.close()
+        self._invalidate_cache()
         return message_id
     
     def get_student_message(self, student_id: int) -> Optional[str]:
         """קבלת הודעה פרטית לתלמיד"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT message FROM student_messages 
-            WHERE student_id = ? AND is_active = 1
-            ORDER BY created_at DESC
-            LIMIT 1
-        ''', (student_id,))
-        row = cursor.fetchone()
-        conn.close()
-        return dict(row)['message'] if row else None
+        self._refresh_cache()
+        try:
+            return self._student_cache.get(int(student_id))
+        except Exception:
+            return None
     
     def get_all_student_messages(self) -> List[Dict[str, Any]]:
         """קבלת כל ההודעות הפרטיות"""
@@ -748,6 +821,7 @@ class MessagesDB:
         success = cursor.rowcount > 0
         conn.commit()
         conn.close()
+        self._invalidate_cache()
         return success
     
     def delete_student_message(self, message_id: int) -> bool:
@@ -758,6 +832,7 @@ class MessagesDB:
         success = cursor.rowcount > 0
         conn.commit()
         conn.close()
+        self._invalidate_cache()
         return success
     
     def toggle_student_message(self, message_id: int) -> bool:
@@ -772,4 +847,5 @@ class MessagesDB:
         success = cursor.rowcount > 0
         conn.commit()
         conn.close()
+        self._invalidate_cache()
         return success
@@ -172,7 +172,7 @@ class MessagesManager:
         
         # השתמש באותו מסד נתונים כמו המערכת הראשית
         self.db = Database()
-        self.messages_db = MessagesDB(self.db.db_path)
+        self.messages_db = MessagesDB(database=self.db)
 
         # דגל פנימי כדי לא לבצע bind_all לקיצורי טקסט יותר מפעם אחת
         self._global_text_shortcuts_bound = False
@@ -2,12 +2,13 @@
 עמדה ציבורית - תצוגת נקודות לתלמידים
 מקבל קלט מקורא RFID (מדמה מקלדת)
 """
+import startup_profile
 import tkinter as tk
 from tkinter import messagebox, filedialog
 import tkinter.font as tkfont
 from database import Database
 from messages import MessagesDB
-from PIL import Image, ImageTk, ImageOps, ImageDraw, ImageFont
+from PIL import Image, ImageTk, ImageOps, ImageDraw, ImageFont, ImageChops
 import os
 import json
 import shutil
@@ -24,7 +25,9 @@ import urllib.request
 import urllib.parse
 from license_manager import LicenseManager
 from datetime import date, datetime
-from sound_manager import SoundManager, USE_PYGAME
+from sound_manager import SoundManager, SoundBank, USE_PYGAME
+from anti_spam_engine import AntiSpamEngine
+from time_bonus_schedule import TimeBonusSchedule
 
 try:
     from ui_icons import normalize_ui_icons as _normalize_ui_icons
@@ -266,6 +269,21 @@ def _force_tk_scaling_96dpi(root: tk.Tk) -> None:
         pass
 
 
+# מטמון פונטים לפי (נתיב, גודל) – ImageFont.truetype קורא ומפענח את הקובץ בכל קריאה
+_TRUETYPE_CACHE = {}
+
+
+def _cached_truetype(path: str, size: int):
+    key = (str(path or ''), int(size))
+    font = _TRUETYPE_CACHE.get(key)
+    if font is None:
+        font = ImageFont.truetype(key[0], key[1])
+        if len(_TRUETYPE_CACHE) > 128:
+            _TRUETYPE_CACHE.clear()
+        _TRUETYPE_CACHE[key] = font
+    return font
+
+
 def _hex_to_rgb(color: str):
     try:
         if not color:
@@ -586,22 +604,38 @@ class PublicStation:
         except Exception:
             pass
 
+        startup_profile.phase('config')
+
+        # אתחול לא-קריטי (סנכרון רקע, סנכרון צלילים כשיש כבר מטמון, בדיקת עדכונים, פרסומות)
+        # רץ רק אחרי הפריים הראשון – ראה _run_deferred_startup
+        self._deferred_startup = []
+
         # הפעלת סנכרון רקע אוטומטי (Hybrid/Cloud בלבד)
         self._sync_agent_thread = None
         self._sync_agent_started = False
-        try:
-            self._maybe_start_sync_agent()
-        except Exception:
-            pass
+        self._deferred_startup.append(self._maybe_start_sync_agent)
 
         try:
             self._sounds_cache_dir = self._get_local_sounds_cache_dir()
         except Exception:
             self._sounds_cache_dir = None
+        sounds_cache_ready = False
         try:
-            self._sync_sounds_from_network(self.app_config, self._sounds_cache_dir)
+            sounds_cache_ready = bool(self._sounds_cache_dir) and os.path.exists(
+                os.path.join(self._sounds_cache_dir, '.sounds_cache_ready')
+            )
         except Exception:
-            pass
+            sounds_cache_ready = False
+        if sounds_cache_ready:
+            # יש מטמון מקומי מוכן – העמדה עולה ממנו, והעדכון מהרשת ירוץ אחרי הפריים הראשון
+            self._deferred_startup.append(
+                lambda: self._sync_sounds_from_network(self.app_config, self._sounds_cache_dir)
+            )
+        else:
+            try:
+                self._sync_sounds_from_network(self.app_config, self._sounds_cache_dir)
+            except Exception:
+                pass
 
         sounds_root = None
         try:
@@ -642,10 +676,18 @@ class PublicStation:
 
         # צלילים
         self.sound_manager = None
+        self.sound_bank = None
         try:
             self.sound_manager = SoundManager(self.base_dir, sounds_dir=self._sounds_root_dir)
         except Exception:
             self.sound_manager = None
+        if self.sound_manager is not None:
+            # טעינה מראש של כל הצלילים ומאגרי התיקיות ברקע – ההשמעה עצמה בלי גישה לדיסק
+            try:
+                self.sound_bank = SoundBank(self.sound_manager)
+                self.sound_bank.start()
+            except Exception:
+                self.sound_bank = None
         try:
             self._apply_sound_settings_from_config(self.app_config)
         except Exception:
@@ -666,6 +708,8 @@ class PublicStation:
         except Exception:
             pass
 
+        startup_profile.phase('sounds')
+
         # צלילי אירועים מתוך color_settings.json (אם הוגדרו)
         try:
             self.event_sounds = self.load_event_sounds()
@@ -754,7 +798,12 @@ class PublicStation:
             pass
 
         try:
-            self.db = Database()
+            if (getattr(self, 'app_config', None) or {}).get('read_replica'):
+                # תיקייה משותפת: קריאות מעותק מקומי, כתיבות ברקע (ראו read_replica.py)
+                from read_replica import ReplicaDatabase
+                self.db = ReplicaDatabase()
+            else:
+                self.db = Database()
         except Exception as e:
             try:
                 messagebox.showerror("שגיאה", f"לא ניתן לפתוח את מסד הנתונים.\n\n{e}")
@@ -769,9 +818,17 @@ class PublicStation:
 
         _debug_log('Database נפתח בהצלחה')
         # שימוש באותו מסד נתונים כמו ה-Database הראשי (db_path משותף)
-        self.messages_db = MessagesDB(self.db.db_path)
+        self.messages_db = MessagesDB(database=self.db)
         self.card_buffer = ""
 
+        # אנטי-ספאם בזיכרון: טעינת חלון התיקופים והחסימות מה-DB פעם אחת בעלייה
+        self.anti_spam_engine = None
+        try:
+            self._get_anti_spam_engine()
+        except Exception as e:
+            print(f"[ANTI-SPAM] init failed: {e}")
+            self.anti_spam_engine = None
+
         self._last_settings_refresh_ts = 0.0
         self._settings_refresh_interval_sec = 1.0
 
@@ -877,20 +934,19 @@ class PublicStation:
 
         _debug_log(f'ui_font_family={self.ui_font_family}, scale={scale}')
 
+        startup_profile.phase('fonts')
         self.setup_ui()
+        startup_profile.phase('setup_ui')
         self.bind_keyboard()
         self._init_cursor_auto_hide()
         self._schedule_initial_focus()
         self._schedule_restart_check()
+        self._deferred_startup.append(self._schedule_update_checks)
+        self._deferred_startup.append(self._schedule_ads_popup_loop)
         try:
-            self._schedule_update_checks()
-        except Exception:
-            pass
-
-        try:
-            self._schedule_ads_popup_loop()
+            self.root.after_idle(lambda: self.root.after(300, self._run_deferred_startup))
         except Exception:
-            pass
+            self._run_deferred_startup()
 
         # חסימות/חופשות לעמדה הציבורית
         self._closure_overlay = None
@@ -928,6 +984,17 @@ class PublicStation:
         except Exception:
             pass
 
+    def _run_deferred_startup(self):
+        """הרצת שלבי האתחול הלא-קריטיים אחרי שהחלון כבר צויר"""
+        jobs = list(getattr(self, '_deferred_startup', None) or [])
+        self._deferred_startup = []
+        for job in jobs:
+            try:
+                job()
+            except Exception as e:
+                print(f"[STARTUP] deferred init failed: {e}")
+        startup_profile.phase('deferred init')
+
     def _sync_window_size_after_startup(self):
         try:
             w = int(self.root.winfo_width() or 0)
@@ -1639,8 +1706,12 @@ class PublicStation:
         self.always_message_label.pack(padx=0)
         
         # עדכון הודעות קבועות
+        try:
+            self._content_changed('always_messages', ('static_messages',))
+        except Exception:
+            pass
         self.update_always_messages()
-        self.root.after(60000, self.update_always_messages_loop)  # עדכון כל דקה
+        self.root.after(10000, self.update_always_messages_loop)
 
         # בתבנית template1 אנחנו מציירים כותרת/הנחיה/הודעות קבועות ישירות על הרקע
         if self.background_template == 'template1':
@@ -1887,9 +1958,13 @@ class PublicStation:
         self._news_strip_w = 0
         self._news_strip_h = 0
 
+        try:
+            self._content_changed('news', ('news_items', 'settings'))
+        except Exception:
+            pass
         self.load_news_items()
         self.update_news_ticker()
-        self.root.after(60000, self.refresh_news_items_loop)
+        self.root.after(5000, self.refresh_news_items_loop)
         try:
             if getattr(self, '_news_ticker_watchdog_job', None) is None:
                 self._news_ticker_watchdog_job = self.root.after(4000, self._news_ticker_watchdog)
@@ -2379,7 +2454,11 @@ class PublicStation:
             # בדיקת בונוס זמנים - אם יש בונוס פעיל עכשיו (לפי כיתה)
             self.time_bonus_message = ""  # איפוס הודעת בונוס זמנים
             class_name = (student.get('class_name') or '').strip()
-            time_bonus = self.db.get_active_time_bonus_now(class_name=class_name)
+            tb_schedule = self._get_time_bonus_schedule()
+            if tb_schedule is not None:
+                time_bonus = tb_schedule.active_now(class_name=class_name)
+            else:
+                time_bonus = self.db.get_active_time_bonus_now(class_name=class_name)
             if time_bonus:
                 student_id = student['id']
                 bonus_schedule_id = time_bonus['id']
@@ -2411,20 +2490,27 @@ class PublicStation:
                 except Exception:
                     first_today_text = "*הגעת ראשון להיום!*"
 
+                def _group_given_count(per_class: bool) -> int:
+                    if tb_schedule is not None:
+                        return int(tb_schedule.group_given_count(bonus_group, class_name if per_class else None) or 0)
+                    if per_class:
+                        return int(self.db.get_time_bonus_group_given_count_today_for_class(bonus_group, class_name) or 0)
+                    return int(self.db.get_time_bonus_group_given_count_today(bonus_group) or 0)
+
                 if enabled_ft and bonus_group:
                     try:
                         if mode_ft == 'first_per_class':
-                            cnt = int(self.db.get_time_bonus_group_given_count_today_for_class(bonus_group, class_name) or 0)
+                            cnt = _group_given_count(True)
                             is_first_time_bonus_today_for_group = (cnt <= 0)
                         elif mode_ft == 'first_n_per_class':
-                            cnt = int(self.db.get_time_bonus_group_given_count_today_for_class(bonus_group, class_name) or 0)
+                            cnt = _group_given_count(True)
                             is_first_time_bonus_today_for_group = (cnt < int(n_ft or 1))
                         elif mode_ft == 'first_n_overall':
-                            cnt = int(self.db.get_time_bonus_group_given_count_today(bonus_group) or 0)
+                            cnt = _group_given_count(False)
                             is_first_time_bonus_today_for_group = (cnt < int(n_ft or 1))
                         else:
                             # first_overall
-                            cnt = int(self.db.get_time_bonus_group_given_count_today(bonus_group) or 0)
+                            cnt = _group_given_count(False)
                             is_first_time_bonus_today_for_group = (cnt <= 0)
                     except Exception:
                         is_first_time_bonus_today_for_group = False
@@ -2433,38 +2519,55 @@ class PublicStation:
                 except Exception:
                     bonus_points = 0
                 
-                # בדוק אם התלמיד כבר קיבל בונוס מהקבוצה היום (מניעת דרגות כפולות)
+                # בדוק אם התלמיד כבר קיבל בונוס מהקבוצה / את הבונוס הספציפי היום (מניעת דרגות כפולות).
+                # נענה מהזיכרון של היום (כולל הענקות של עמדות אחרות שנמשכות ברקע);
+                # ה-DB נכתב רק בהענקה בפועל. בלי לוח מהודר – שאילתה ישירה כמו קודם.
                 already_got_group = False
-                try:
-                    already_got_group = bool(self.db.has_student_received_time_bonus_group_today(student_id, bonus_group))
-                except Exception:
-                    already_got_group = False
-
-                # בדוק אם התלמיד כבר קיבל את הבונוס הספציפי היום
                 already_got_exact = False
-                try:
-                    already_got_exact = bool(self.db.has_student_received_time_bonus_today(student_id, bonus_schedule_id))
-                except Exception:
-                    already_got_exact = False
+                if tb_schedule is not None:
+                    already_got_group = tb_schedule.has_received_group(student_id, bonus_group)
+                    already_got_exact = tb_schedule.has_received_exact(student_id, bonus_schedule_id)
+                else:
+                    try:
+                        already_got_group = bool(self.db.has_student_received_time_bonus_group_today(student_id, bonus_group))
+                    except Exception:
+                        already_got_group = False
+                    try:
+                        already_got_exact = bool(self.db.has_student_received_time_bonus_today(student_id, bonus_schedule_id))
+                    except Exception:
+                        already_got_exact = False
+
+                # הזיכרון רק חוסך ניסיון; ההחלטה היא התפיסה במסד (כתיבה ל-time_bonus_given
+                # עם אילוצי ייחודיות לבונוס ולקבוצה) – עמדה אחרת שתפסה קודם מנצחת.
+                claimed = False
+                claim_failed = False
+                if (not already_got_group) and (not already_got_exact):
+                    try:
+                        claimed = bool(self.db.claim_time_bonus(student_id, bonus_schedule_id, bonus_group))
+                    except Exception as e:
+                        print(f"[TIME-BONUS] claim failed: {e}")
+                        claim_failed = True
+                    # נתפס עכשיו, או שעמדה אחרת כבר תפסה – בכל מקרה לא ננסה שוב היום
+                    if not claim_failed and tb_schedule is not None:
+                        tb_schedule.mark_given(student_id, bonus_schedule_id, class_name)
 
                 if bonus_points <= 0:
                     # 0 נק' = שומר נתונים בלבד (לצורך דוחות/ייצוא). ללא שום הודעה לתלמיד.
-                    try:
-                        if (not already_got_group) and (not already_got_exact):
-                            self.db.record_time_bonus_given(student_id, bonus_schedule_id)
-                    except Exception:
-                        pass
+                    pass
                 else:
-                    if (not already_got_group) and (not already_got_exact):
+                    if claimed or claim_failed:
                         bonus_name = time_bonus['name']
                         ok_add = False
-                        try:
-                            ok_add = bool(self.db.add_points(student_id, bonus_points, f"⏰ בונוס זמנים ({bonus_name}): +{bonus_points}", "תיקוף אוטומטי"))
-                        except Exception:
-                            ok_add = False
+                        if claimed:
+                            try:
+                                ok_add = bool(self.db.add_points(student_id, bonus_points, f"⏰ בונוס זמנים ({bonus_name}): +{bonus_points}", "תיקוף אוטומטי"))
+                            except Exception:
+                                ok_add = False
+                            if not ok_add:
+                                # הנקודות לא נוספו – משחררים את התפיסה כדי שתיקוף הבא יקבל את הבונוס
+                                if self.db.release_time_bonus_claim(student_id, bonus_schedule_id, bonus_group) and tb_schedule is not None:
+                                    tb_schedule.forget_given(student_id, bonus_schedule_id)
                         if ok_add:
-                            # רשום שהתלמיד קיבל את הבונוס היום
-                            self.db.record_time_bonus_given(student_id, bonus_schedule_id)
                             # רענן את פרטי התלמיד
                             student = self.db.get_student_by_card(card_number)
                             # אייקון וי (✅ → גליף ייעודי בגופן) לפני הטקסט
@@ -3119,9 +3222,14 @@ class PublicStation:
             print(f"שגיאה בעדכון הודעות: {e}")
     
     def update_always_messages_loop(self):
-        """לולאה לעדכון הודעות קבועות"""
-        self.update_always_messages()
-        self.root.after(60000, self.update_always_messages_loop)  # עדכון כל דקה
+        """לולאה לעדכון הודעות קבועות – ציור מחדש רק כשההודעות השתנו"""
+        try:
+            changed = self._content_changed('always_messages', ('static_messages',))
+        except Exception:
+            changed = True
+        if changed:
+            self.update_always_messages()
+        self.root.after(10000, self.update_always_messages_loop)
     
     def display_statistics(self, student):
         """הצגת סטטיסטיקות (ממוצע כיתה וכללי)"""
@@ -3195,7 +3303,7 @@ class PublicStation:
                     show_parsha = str(self.db.get_setting('news_show_parsha', '0')) == '1'
                     show_holidays = str(self.db.get_setting('news_show_holidays', '0')) == '1'
 
-                    calendar_items = jewish_calendar.build_calendar_news_items(
+                    calendar_items = self._get_calendar_news_items(
                         israel=israel,
                         show_weekday=show_weekday,
                         show_hebrew_date=show_hebrew_date,
@@ -3242,9 +3350,12 @@ class PublicStation:
             self.news_current_index = 0
 
     def update_news_ticker(self):
-        """עדכון טקסט רצועת החדשות – גלילה רציפה משמאל לימין עם Canvas.
-        
-        ציור ידני של הטקסט עם PIL/ImageDraw כדי לטפל בעברית נכון.
+        """עדכון רצועת החדשות – גלילה רציפה משמאל לימין עם Canvas.
+
+        הטקסט מצויר פעם אחת לכל שינוי תוכן (PIL, כולל המרה חזותית RTL ומפריד \uE236)
+        לתמונת strip אחת שמוצבת על ה-Canvas. בכל פריים רק מזיזים את התמונה (coords),
+        והמיקום מחושב לפי שעון מונוטוני – כך שהמהירות קבועה גם אם פריים התעכב
+        (למשל בזמן טיפול בתיקוף).
         """
         try:
             def _get_speed_setting() -> str:
@@ -3297,23 +3408,28 @@ class PublicStation:
             if not getattr(self, 'news_canvas', None):
                 return
 
-            # עדכון גודל ה-Canvas
-            try:
-                self.news_canvas.update_idletasks()
-            except Exception:
-                pass
-
             canvas_w = self.news_canvas.winfo_width() or self.screen_width
             canvas_h = self.news_canvas.winfo_height() or int(40 * (self.screen_height / 1080))
-            if canvas_w <= 0:
+            if canvas_w <= 1:
                 canvas_w = self.screen_width
-            if canvas_h <= 0:
+            if canvas_h <= 1:
                 canvas_h = int(40 * (self.screen_height / 1080))
 
+            speed_setting = _get_speed_setting()
+            # אותן מהירויות כמו בעבר (צעד לפריים / קצב פריימים), כפיקסלים לשנייה
+            if speed_setting == 'very_fast':
+                step, frame_ms = max(3, int(canvas_w / 320)), 15
+            elif speed_setting == 'fast':
+                step, frame_ms = max(2, int(canvas_w / 480)), 20
+            else:  # normal
+                step, frame_ms = max(1, int(canvas_w / 960)), 30
+            px_per_sec = float(step) * 1000.0 / float(frame_ms)
+
             text = getattr(self, 'news_text_full', "") or ""
             if not text:
                 # אין חדשות – ניקוי Canvas
-                self.news_canvas.delete("all")
+                if getattr(self, 'news_current_text', ""):
+                    self.news_canvas.delete("all")
                 self.news_scroll_x = 0
                 self.news_text_width = 0
                 self.news_unit_width = 0
@@ -3321,135 +3437,43 @@ class PublicStation:
                 self._news_strip_img = None
                 self._news_strip_w = 0
                 self._news_strip_h = 0
+                self._news_strip_item = None
+                self._news_strip_key = None
             else:
-                # אם התוכן השתנה - צור תמונה מחדש
-                if text != getattr(self, 'news_current_text', ""):
-                    self.news_current_text = text
-                    # המרה חזותית של הטקסט לפני ציור (PIL לא מטפל ב-BIDI אוטומטית)
-                    visual_text = visual_rtl_simple(text)
-                    unit_text = visual_text + f"   \uE236   "
-                    
-                    # יצירת תמונה עם PIL למדידת רוחב הטקסט
-                    try:
-                        # שימוש בפונט Gan CLM Bold שתומך בעברית
-                        if hasattr(self, 'agas_ttf_path') and self.agas_ttf_path and os.path.exists(self.agas_ttf_path):
-                            font_path = self.agas_ttf_path
-                        else:
-                            # חיפוש פונט בתיקיית התוכנה
-                            font_path = os.path.join(self.base_dir, "Gan CLM Bold.otf")
-                            if not os.path.exists(font_path):
-                                font_path = os.path.join(self.base_dir, "fonts", "Gan CLM Bold.otf")
-                        
-                        font_size = int(self.font_info * 0.9) + 5
-                        img_font = ImageFont.truetype(font_path, font_size)
-                    except Exception as e:
-                        print(f"שגיאה בטעינת פונט: {e}")
-                        # ניסיון עם Arial כגיבוי
-                        try:
-                            img_font = ImageFont.truetype("arial.ttf", int(self.font_info * 0.9) + 5)
-                        except:
-                            img_font = ImageFont.load_default()
-                    
-                    # יצירת תמונה זמנית למדידה
-                    temp_img = Image.new('RGB', (1, 1))
-                    temp_draw = ImageDraw.Draw(temp_img)
-                    bbox = temp_draw.textbbox((0, 0), unit_text, font=img_font)
-                    unit_w = max(1, bbox[2] - bbox[0])
-
-                    # שכפול לכיסוי מסך
-                    repeat_count = max(3, int(canvas_w / unit_w) + 4)
-                    full_text = unit_text * repeat_count
-
-                    bbox = temp_draw.textbbox((0, 0), full_text, font=img_font)
-                    total_w = max(1, bbox[2] - bbox[0])
-
-                    self.news_unit_width = unit_w
-                    self.news_text_width = total_w
-                    self.news_scroll_x = 0
-
-                    # בניית strip image פעם אחת (במקום ציור כל פריים)
-                    bg_color = self.root.cget('bg')
-                    theme = getattr(self, 'theme_name', 'dark') or 'dark'
-                    if theme == 'light':
-                        news_color = '#111111'
-                    else:
-                        news_color = '#FFD700'
-
-                    strip_h = int(canvas_h)
-                    strip_w = int(total_w)
-                    if strip_h <= 0:
-                        strip_h = int(40 * (self.screen_height / 1080))
-                    if strip_w <= 0:
-                        strip_w = max(1, unit_w * 3)
-
+                theme = getattr(self, 'theme_name', 'dark') or 'dark'
+                strip_key = (text, int(canvas_w), int(canvas_h), theme)
+                # אם התוכן/גודל השתנה – ציור strip מחדש (פעם אחת)
+                if strip_key != getattr(self, '_news_strip_key', None) or getattr(self, '_news_strip_item', None) is None:
+                    self._build_news_ticker_strip(text, int(canvas_w), int(canvas_h), theme)
+                    self._news_strip_key = strip_key
+
+                unit_w = max(1, int(getattr(self, 'news_unit_width', 1) or 1))
+                now = time.monotonic()
+                last = getattr(self, '_news_ticker_mono_ts', None)
+                if last is None or (now - float(last)) > 2.0:
+                    # אחרי עצירה ארוכה (מסך סגירה/שינוי תוכן) לא "קופצים" קדימה
+                    last = now
+                # הזזה לפי זמן שחלף בפועל (פיצוי על פריימים שהתעכבו)
+                self._news_ticker_pos = (float(getattr(self, '_news_ticker_pos', 0.0) or 0.0)
+                                         + (now - float(last)) * px_per_sec) % unit_w
+                self._news_ticker_mono_ts = now
+                self.news_scroll_x = int(self._news_ticker_pos)
+
+                item = getattr(self, '_news_strip_item', None)
+                if item is not None:
+                    # שמאל→ימין: הרצועה מתחילה ב--unit_w ומתקדמת ימינה עד 0 ואז חוזרת
                     try:
-                        strip_img = Image.new('RGB', (strip_w, strip_h), bg_color)
-                        draw = ImageDraw.Draw(strip_img)
-                        y_pos = max(0, int((strip_h - int(getattr(img_font, 'size', 22) or 22)) / 2))
-                        draw.text((0, y_pos), full_text, font=img_font, fill=news_color)
-                        self._news_strip_img = strip_img
-                        self._news_strip_w = strip_w
-                        self._news_strip_h = strip_h
+                        self.news_canvas.coords(item, int(self._news_ticker_pos) - unit_w, 0)
                     except Exception:
-                        self._news_strip_img = None
-                        self._news_strip_w = 0
-                        self._news_strip_h = 0
-                
-                # הזזה משמאל לימין - מהירות לפי הגדרות
-                speed_setting = _get_speed_setting()
-
-                if speed_setting == 'very_fast':
-                    step = max(3, int(canvas_w / 320))
-                elif speed_setting == 'fast':
-                    step = max(2, int(canvas_w / 480))
-                else:  # normal
-                    step = max(1, int(canvas_w / 960))
-
-                # כאשר אנו מזיזים את חלון ה-crop בתוך ה-strip:
-                # הגדלת offset גורמת לתנועה מימין לשמאל. כדי להשיג שמאל→ימין, נלך אחורה.
-                self.news_scroll_x = (self.news_scroll_x - step) % max(1, int(getattr(self, 'news_unit_width', 1) or 1))
-
-                strip = getattr(self, '_news_strip_img', None)
-                sw = int(getattr(self, '_news_strip_w', 0) or 0)
-                sh = int(getattr(self, '_news_strip_h', 0) or 0)
-                if strip is not None and sw > 0 and sh > 0:
-                    # חישוב offset בתוך ה-strip
-                    off = int(int(self.news_scroll_x) % max(1, sw))
+                        self._news_strip_item = None
 
-                    try:
-                        if off + int(canvas_w) <= sw:
-                            view = strip.crop((off, 0, off + int(canvas_w), sh))
-                        else:
-                            # wrap
-                            part1 = strip.crop((off, 0, sw, sh))
-                            part2 = strip.crop((0, 0, max(1, (off + int(canvas_w)) - sw), sh))
-                            view = Image.new('RGB', (int(canvas_w), sh), self.root.cget('bg'))
-                            view.paste(part1, (0, 0))
-                            view.paste(part2, (part1.size[0], 0))
-
-                        self.news_photo = ImageTk.PhotoImage(view)
-                        self.news_canvas.delete("all")
-                        self.news_canvas.create_image(0, 0, image=self.news_photo, anchor='nw')
-                    except Exception:
-                        pass
-
-            # קצב רענון לפי מהירות
-            speed_setting = _get_speed_setting()
-            
-            if speed_setting == 'very_fast':
-                refresh_ms = 15
-            elif speed_setting == 'fast':
-                refresh_ms = 20
-            else:  # normal
-                refresh_ms = 30
-            
             try:
                 self._news_ticker_last_ts = float(time.time())
             except Exception:
                 self._news_ticker_last_ts = 0.0
 
             try:
-                self._news_ticker_job = self.root.after(refresh_ms, self.update_news_ticker)
+                self._news_ticker_job = self.root.after(frame_ms, self.update_news_ticker)
             except Exception:
                 self._news_ticker_job = None
         except Exception as e:
@@ -3459,6 +3483,68 @@ class PublicStation:
             except Exception:
                 self._news_ticker_job = None
 
+    def _build_news_ticker_strip(self, text: str, canvas_w: int, canvas_h: int, theme: str) -> None:
+        """ציור רצועת החדשות לתמונה אחת והצבתה על ה-Canvas"""
+        self.news_current_text = text
+        # המרה חזותית של הטקסט לפני ציור (PIL לא מטפל ב-BIDI אוטומטית)
+        visual_text = visual_rtl_simple(text)
+        unit_text = visual_text + f"   \uE236   "
+
+        try:
+            # שימוש בפונט Gan CLM Bold שתומך בעברית
+            if hasattr(self, 'agas_ttf_path') and self.agas_ttf_path and os.path.exists(self.agas_ttf_path):
+                font_path = self.agas_ttf_path
+            else:
+                # חיפוש פונט בתיקיית התוכנה
+                font_path = os.path.join(self.base_dir, "Gan CLM Bold.otf")
+                if not os.path.exists(font_path):
+                    font_path = os.path.join(self.base_dir, "fonts", "Gan CLM Bold.otf")
+            img_font = ImageFont.truetype(font_path, int(self.font_info * 0.9) + 5)
+        except Exception as e:
+            print(f"שגיאה בטעינת פונט: {e}")
+            # ניסיון עם Arial כגיבוי
+            try:
+                img_font = ImageFont.truetype("arial.ttf", int(self.font_info * 0.9) + 5)
+            except Exception:
+                img_font = ImageFont.load_default()
+
+        temp_draw = ImageDraw.Draw(Image.new('RGB', (1, 1)))
+        bbox = temp_draw.textbbox((0, 0), unit_text, font=img_font)
+        unit_w = max(1, bbox[2] - bbox[0])
+
+        # מספיק עותקים כדי לכסות את רוחב המסך + יחידה אחת להזזה מחזורית
+        repeat_count = max(2, int(canvas_w / unit_w) + 2)
+        full_text = unit_text * repeat_count
+        bbox = temp_draw.textbbox((0, 0), full_text, font=img_font)
+        total_w = max(1, bbox[2] - bbox[0])
+
+        self.news_unit_width = unit_w
+        self.news_text_width = total_w
+
+        news_color = '#111111' if theme == 'light' else '#FFD700'
+        strip_h = int(canvas_h) if canvas_h > 0 else int(40 * (self.screen_height / 1080))
+        strip_w = int(total_w)
+
+        self.news_canvas.delete("all")
+        self._news_strip_item = None
+        try:
+            strip_img = Image.new('RGB', (strip_w, strip_h), self.root.cget('bg'))
+            draw = ImageDraw.Draw(strip_img)
+            y_pos = max(0, int((strip_h - int(getattr(img_font, 'size', 22) or 22)) / 2))
+            draw.text((0, y_pos), full_text, font=img_font, fill=news_color)
+            self._news_strip_img = strip_img
+            self._news_strip_w = strip_w
+            self._news_strip_h = strip_h
+            # המרה ל-PhotoImage פעם אחת בלבד; בכל פריים רק מזיזים את הפריט
+            self.news_photo = ImageTk.PhotoImage(strip_img)
+            self._news_strip_item = self.news_canvas.create_image(-unit_w, 0, image=self.news_photo, anchor='nw')
+        except Exception:
+            self._news_strip_img = None
+            self._news_strip_w = 0
+            self._news_strip_h = 0
+        self._news_ticker_pos = 0.0
+        self._news_ticker_mono_ts = None
+
     def _news_ticker_watchdog(self):
         try:
             self._news_ticker_watchdog_job = None
@@ -3484,6 +3570,8 @@ class PublicStation:
                     self._news_strip_img = None
                     self._news_strip_w = 0
                     self._news_strip_h = 0
+                    self._news_strip_item = None
+                    self._news_strip_key = None
                 except Exception:
                     pass
                 try:
@@ -3500,65 +3588,223 @@ class PublicStation:
             self._news_ticker_watchdog_job = None
 
     def refresh_news_items_loop(self):
-        """ריענון רשימת החדשות כל דקה (לשינויים מעמדת הניהול)."""
-        self.load_news_items()
-        # ריענון תדיר יותר כדי שעדכונים בעמדת הניהול יופיעו כמעט מיד.
+        """ריענון רשימת החדשות – רק כשגרסת התוכן או היום השתנו (לשינויים מעמדת הניהול)."""
+        try:
+            if self._content_changed('news', ('news_items', 'settings')):
+                self.load_news_items()
+        except Exception:
+            self.load_news_items()
+        # בדיקה זולה (מונה אחד) כל 5 שניות כדי שעדכונים בעמדת הניהול יופיעו כמעט מיד.
         self.root.after(5000, self.refresh_news_items_loop)
 
+    def _get_content_versions(self) -> dict:
+        """מוני גרסת התוכן מה-DB (מטמון לשנייה אחת – כמה לולאות בודקות באותו זמן)"""
+        now = time.time()
+        cached = getattr(self, '_content_versions_cache', None)
+        if cached is not None and (now - float(getattr(self, '_content_versions_ts', 0.0) or 0.0)) < 1.0:
+            return cached
+        try:
+            versions = self.messages_db.get_content_versions() or {}
+        except Exception:
+            versions = {}
+        self._content_versions_cache = versions
+        self._content_versions_ts = now
+        return versions
+
+    def _content_changed(self, consumer: str, names) -> bool:
+        """האם אחת מהטבלאות names השתנתה (או שהיום התחלף) מאז הבדיקה הקודמת של consumer"""
+        versions = self._get_content_versions()
+        if not versions:
+            # אין מונים (DB ישן/שגיאה) – נתנהג כמו קודם ונטען תמיד
+            return True
+        key = (
+            tuple(int(versions.get(n, 0) or 0) for n in names),
+            date.today().isoformat(),
+            datetime.utcnow().date().isoformat(),
+        )
+        seen = getattr(self, '_content_seen', None)
+        if seen is None:
+            seen = {}
+            self._content_seen = seen
+        if seen.get(consumer) == key:
+            return False
+        seen[consumer] = key
+        return True
+
+    def _get_calendar_news_items(self, **flags) -> list:
+        """פריטי לוח עברי לרצועת החדשות – מחושבים פעם אחת ליום לכל צירוף הגדרות"""
+        key = (date.today().isoformat(), tuple(sorted(flags.items())))
+        cached = getattr(self, '_calendar_news_cache', None)
+        if cached is not None and cached[0] == key:
+            return list(cached[1])
+        items = jewish_calendar.build_calendar_news_items(**flags) or []
+        self._calendar_news_cache = (key, list(items))
+        return list(items)
+
+    def _get_bg_tiles(self):
+        tiles = getattr(self, '_bg_tiles', None)
+        if tiles is None:
+            from slideshow_renderer import TileCache
+            tiles = self._bg_tiles = TileCache(max_items=256)
+        return tiles
+
+    def _get_bg_prefetcher(self):
+        prefetch = getattr(self, '_bg_prefetch', None)
+        if prefetch is None:
+            from slideshow_renderer import FramePrefetcher
+            prefetch = self._bg_prefetch = FramePrefetcher()
+        return prefetch
+
+    def _montage_geometry(self) -> dict:
+        """גאומטריית המונטאז' (נמדדת ב-Tk, ולכן רק בתהליכון הראשי)"""
+        screen_w, screen_h = self.screen_width, self.screen_height
+        cols = max(1, getattr(self, 'slideshow_grid_cols', 4))
+        if cols > 10:
+            cols = 10
+
+        # גובה אזור המונטאז' בפועל – לפי גובה חלון השורש פחות רצועת החדשות התחתונה.
+        try:
+            self.root.update_idletasks()
+            root_h = self.root.winfo_height() or screen_h
+        except Exception:
+            root_h = screen_h
+
+        news_h = 0
+        if hasattr(self, 'news_frame'):
+            try:
+                self.news_frame.update_idletasks()
+                news_h = self.news_frame.winfo_height() or 0
+            except Exception:
+                news_h = 0
+        if news_h <= 0:
+            news_h = int(40 * (root_h / 1080))
+
+        # נוסיף גם מרווח קטן מעל רצועת החדשות כדי שלא תהיה חפיפה.
+        margin_h = max(2, int(4 * (root_h / 1080)))
+        available_h = max(1, root_h - news_h - margin_h)
+
+        # גודל ריבוע לפי רוחב המסך ומספר העמודות
+        cell_size = max(1, screen_w // cols)
+        # מספר שורות מירבי שיכול להיכנס בגובה הזמין, כאשר כל ריבוע נכנס בשלמותו
+        rows = max(1, available_h // cell_size)
+        return {
+            'screen_size': (int(screen_w), int(screen_h)),
+            'cols': cols,
+            'rows': rows,
+            'cell_size': cell_size,
+            'available_h': available_h,
+        }
+
+    def _next_background_job(self, mode: str):
+        """(key, build) לפריים הבא לפי bg_index, ומקדם את bg_index.
+        build רץ בתהליכון רקע – PIL בלבד, בלי גישה ל-Tk."""
+        from slideshow_renderer import compose_montage, open_oriented
+
+        files = tuple(self.bg_files or ())
+        total = len(files)
+        layout = getattr(self, 'bg_layout', 'cover')
+        bg_color = self.root_bg_color or '#000000'
+        index = self.bg_index if hasattr(self, 'bg_index') else 0
+
+        if mode == 'single':
+            path = files[index % total]
+            self.bg_index = (index + 1) % total
+            key = ('single', path, self.screen_width, self.screen_height, layout, bg_color)
+
+            def build():
+                if not os.path.exists(path):
+                    return None
+                return self._prepare_background_image(open_oriented(path))
+            return key, build
+
+        geo = self._montage_geometry()
+        self.bg_index = (index + geo['rows'] * geo['cols']) % total
+        key = ('grid', files, index, tuple(sorted(geo.items())), layout, bg_color)
+        tiles = self._get_bg_tiles()
+
+        def build():
+            img, _next = compose_montage(files, index, layout=layout, bg_color=bg_color, tiles=tiles, **geo)
+            return img
+        return key, build
+
+    def _show_background_frame(self, img: Image.Image) -> None:
+        """הצגת פריים רקע מוכן (מצגת/מונטאז') – כולל ציור template1 מעליו"""
+        # שמירת תמונת בסיס לשימוש בתבנית הגרפית (template1)
+        self.bg_base_image = img
+        if getattr(self, 'background_template', None) == 'template1':
+            # במצב template1 נצייר את הכיתוב על כל שקופית באותו סגנון
+            try:
+                has_student = False
+                if hasattr(self, 'name_label') and hasattr(self, 'points_label'):
+                    has_student = bool(self.name_label.cget('text') or self.points_label.cget('text'))
+            except Exception:
+                has_student = False
+
+            try:
+                if has_student:
+                    self._render_template1_overlay_from_widgets()
+                else:
+                    always_text = getattr(self, 'always_messages_text', "")
+                    self._render_static_overlay_template1(always_text)
+            except Exception:
+                # במקרה של כשל נציג לפחות את התמונה הבסיסית
+                self.bg_image = ImageTk.PhotoImage(img)
+                if getattr(self, 'bg_label', None):
+                    self.bg_label.config(image=self.bg_image)
+        else:
+            self.bg_image = ImageTk.PhotoImage(img)
+            if getattr(self, 'bg_label', None):
+                self.bg_label.config(image=self.bg_image)
+
+    def _schedule_background_slideshow(self, delay_ms: int) -> None:
+        # טיימר יחיד – קריאה חוזרת (למשל אחרי טעינת הגדרות) לא מכפילה את הסבבים
+        job = getattr(self, '_bg_slideshow_after', None)
+        if job is not None:
+            try:
+                self.root.after_cancel(job)
+            except Exception:
+                pass
+        self._bg_slideshow_after = self.root.after(int(delay_ms), self.update_background_slideshow)
+
     def update_background_slideshow(self):
-        """עדכון תמונת הרקע במצב מצגת (אם הוגדר)"""
+        """עדכון תמונת הרקע במצב מצגת (אם הוגדר).
+
+        הפריים הבא נבנה מראש בתהליכון רקע (פענוח, EXIF, הקטנה, הרכבה); בטיימר נשאר
+        רק להציג אותו. אם עוד לא מוכן – מנסים שוב בעוד רגע במקום לחסום את הממשק."""
         try:
+            self._bg_slideshow_after = None
             if not getattr(self, 'bg_files', None):
                 return
             mode = getattr(self, 'slideshow_mode', 'single')
 
-            if mode == 'single':
-                # מצגת רגילה - תמונה אחת בכל פעם
-                path = self.bg_files[self.bg_index % len(self.bg_files)]
-                self.bg_index = (self.bg_index + 1) % len(self.bg_files)
-                if os.path.exists(path):
-                    img = Image.open(path)
-                    # כיבוד כיוון התמונה לפי EXIF (כמו בצפייה רגילה בקבצים)
-                    try:
-                        img = ImageOps.exif_transpose(img)
-                    except Exception:
-                        pass
-                    img = self._prepare_background_image(img)
-                    # שמירת תמונת בסיס לשימוש בתבנית הגרפית (template1)
-                    self.bg_base_image = img
-                    if getattr(self, 'background_template', None) == 'template1':
-                        # במצב template1 נצייר את הכיתוב על כל שקופית באותו סגנון
-                        try:
-                            has_student = False
-                            if hasattr(self, 'name_label') and hasattr(self, 'points_label'):
-                                has_student = bool(self.name_label.cget('text') or self.points_label.cget('text'))
-                        except Exception:
-                            has_student = False
+            if mode == 'grid_static':
+                # מונטאז' סטטי – פעם אחת, ללא החלפה
+                self._render_montage_background(static=True)
+                return
 
-                        try:
-                            if has_student:
-                                self._render_template1_overlay_from_widgets()
-                            else:
-                                always_text = getattr(self, 'always_messages_text', "")
-                                self._render_static_overlay_template1(always_text)
-                        except Exception:
-                            # במקרה של כשל נציג לפחות את התמונה הבסיסית
-                            self.bg_image = ImageTk.PhotoImage(img)
-                            if getattr(self, 'bg_label', None):
-                                self.bg_label.config(image=self.bg_image)
-                    else:
-                        self.bg_image = ImageTk.PhotoImage(img)
-                        if getattr(self, 'bg_label', None):
-                            self.bg_label.config(image=self.bg_image)
-            elif mode in ('grid_static', 'grid_dynamic'):
-                # מונטאז' ריבועים - סטטי או מתחלף
-                self._render_montage_background(static=(mode == 'grid_static'))
-                if mode == 'grid_static':
-                    return
+            if mode in ('single', 'grid_dynamic'):
+                prefetch = self._get_bg_prefetcher()
+                pending = getattr(self, '_bg_next_key', None)
+                if pending is not None and pending[0] == ('single' if mode == 'single' else 'grid'):
+                    if prefetch.is_pending(pending):
+                        self._schedule_background_slideshow(300)
+                        return
+                    img = prefetch.take(pending)
+                else:
+                    # פריים ראשון (או שהמצב השתנה) – נבנה מיד
+                    key, build = self._next_background_job(mode)
+                    img = build()
+                self._bg_next_key = None
+                if img is not None:
+                    self._show_background_frame(img)
+
+                key, build = self._next_background_job(mode)
+                self._bg_next_key = key
+                prefetch.request(key, build)
 
             # עדכון מחודש לפי זמן שהוגדר (למעט מונטאז' סטטי)
             interval = getattr(self, 'bg_interval_ms', 15000)
-            self.root.after(interval, self.update_background_slideshow)
+            self._schedule_background_slideshow(interval)
         except Exception as e:
             print(f"שגיאה בעדכון מצגת רקע: {e}")
 
@@ -3568,143 +3814,19 @@ class PublicStation:
             files = getattr(self, 'bg_files', None)
             if not files:
                 return
+            from slideshow_renderer import compose_montage
 
-            screen_w, screen_h = self.screen_width, self.screen_height
-            cols = max(1, getattr(self, 'slideshow_grid_cols', 4))
-            if cols > 10:
-                cols = 10
-
-            # גובה אזור המונטאז' בפועל – לפי גובה חלון השורש פחות רצועת החדשות התחתונה.
-            try:
-                self.root.update_idletasks()
-                root_h = self.root.winfo_height() or screen_h
-            except Exception:
-                root_h = screen_h
-
-            news_h = 0
-            if hasattr(self, 'news_frame'):
-                try:
-                    self.news_frame.update_idletasks()
-                    news_h = self.news_frame.winfo_height() or 0
-                except Exception:
-                    news_h = 0
-            if news_h <= 0:
-                news_h = int(40 * (root_h / 1080))
-
-            # נוסיף גם מרווח קטן מעל רצועת החדשות כדי שלא תהיה חפיפה.
-            margin_h = max(2, int(4 * (root_h / 1080)))
-            available_h = max(1, root_h - news_h - margin_h)
-
-            # גודל ריבוע לפי רוחב המסך ומספר העמודות
-            cell_size = max(1, screen_w // cols)
-            # מספר שורות מירבי שיכול להיכנס בגובה הזמין, כאשר כל ריבוע נכנס בשלמותו
-            rows = max(1, available_h // cell_size)
-
-            bg_color = self.root_bg_color or '#000000'
-            montage = Image.new('RGB', (screen_w, screen_h), bg_color)
-
+            geo = self._montage_geometry()
             index = self.bg_index if hasattr(self, 'bg_index') else 0
-            total = len(files)
-            if total == 0:
-                return
-
-            for row in range(rows):
-                for col in range(cols):
-                    path = files[index % total]
-                    index += 1
-                    if not os.path.exists(path):
-                        continue
-                    try:
-                        img = Image.open(path)
-                        # כיבוד כיוון התמונה לפי EXIF (כמו בצפייה רגילה בקבצים)
-                        try:
-                            img = ImageOps.exif_transpose(img)
-                        except Exception:
-                            pass
-
-                        if img.mode not in ('RGB', 'RGBA'):
-                            img = img.convert('RGB')
-
-                        # התאמת התמונה לגודל ריבוע cell_size×cell_size בהתאם ל-background_layout.
-                        layout = getattr(self, 'bg_layout', 'cover')
-                        if layout in ('contain', 'center', 'tile'):
-                            layout = 'cover'
-
-                        if layout in ('stretch',):
-                            # מתיחה לא אחידה – ממלאת את כל הריבוע ללא שוליים (עלולה לעוות מעט).
-                            img_resized = img.resize((cell_size, cell_size), Image.Resampling.LANCZOS)
-                            tile = img_resized
-                        elif layout in ('cover',):
-                            # כיסוי מלא של הריבוע תוך שמירת יחס – עלול לחתוך מעט מהקצוות, בלי פסים שחורים.
-                            scale_ratio = max(cell_size / max(1, img.width), cell_size / max(1, img.height))
-                            new_w = max(1, int(img.width * scale_ratio))
-                            new_h = max(1, int(img.height * scale_ratio))
-                            img_resized = img.resize((new_w, new_h), Image.Resampling.LANCZOS)
-
-                            # חיתוך מרכזי לריבוע מדויק בגודל cell_size×cell_size
-                            left = max(0, (new_w - cell_size) // 2)
-                            top = max(0, (new_h - cell_size) // 2)
-                            right = left + cell_size
-                            bottom = top + cell_size
-                            if right > new_w:
-                                right = new_w
-                                left = max(0, right - cell_size)
-                            if bottom > new_h:
-                                bottom = new_h
-                                top = max(0, bottom - cell_size)
-                            tile = img_resized.crop((left, top, right, bottom))
-                        else:
-                            # contain / center / tile / ברירת מחדל – התמונה כולה נכנסת לריבוע, עם שוליים במידת הצורך.
-                            scale_ratio = min(cell_size / max(1, img.width), cell_size / max(1, img.height))
-                            new_w = max(1, int(img.width * scale_ratio))
-                            new_h = max(1, int(img.height * scale_ratio))
-                            img_resized = img.resize((new_w, new_h), Image.Resampling.LANCZOS)
-
-                            # יצירת ריבוע רקע ובו נמרכז את התמונה המוקטנת
-                            tile = Image.new('RGB', (cell_size, cell_size), bg_color)
-                            offset_x = max(0, (cell_size - new_w) // 2)
-                            offset_y = max(0, (cell_size - new_h) // 2)
-                            tile.paste(img_resized, (offset_x, offset_y))
-
-                        x0 = col * cell_size
-                        y0 = row * cell_size
-
-                        # לא נצייר אריחים שמתחת לאזור המונטאז' – שם יושבת רצועת החדשות
-                        if x0 >= screen_w or (y0 + cell_size) > available_h:
-                            continue
-
-                        montage.paste(tile, (x0, y0))
-                    except Exception as e:
-                        print(f"שגיאה בבניית מונטאז': {e}")
-                        continue
-
-            # עדכון אינדקס בסיסי להמשך רצף התמונות
-            self.bg_index = index % total
-
+            montage, self.bg_index = compose_montage(
+                tuple(files), index,
+                layout=getattr(self, 'bg_layout', 'cover'),
+                bg_color=self.root_bg_color or '#000000',
+                tiles=self._get_bg_tiles(),
+                **geo,
+            )
             # שמירת תמונת בסיס למונטאז' לציור overlay של template1
-            self.bg_base_image = montage
-            if getattr(self, 'background_template', None) == 'template1':
-                try:
-                    has_student = False
-                    if hasattr(self, 'name_label') and hasattr(self, 'points_label'):
-                        has_student = bool(self.name_label.cget('text') or self.points_label.cget('text'))
-                except Exception:
-                    has_student = False
-
-                try:
-                    if has_student:
-                        self._render_template1_overlay_from_widgets()
-                    else:
-                        always_text = getattr(self, 'always_messages_text', "")
-                        self._render_static_overlay_template1(always_text)
-                except Exception:
-                    self.bg_image = ImageTk.PhotoImage(montage)
-                    if getattr(self, 'bg_label', None):
-                        self.bg_label.config(image=self.bg_image)
-            else:
-                self.bg_image = ImageTk.PhotoImage(montage)
-                if getattr(self, 'bg_label', None):
-                    self.bg_label.config(image=self.bg_image)
+            self._show_background_frame(montage)
         except Exception as e:
             print(f"שגיאה כללית בבניית מונטאז': {e}")
 
@@ -3827,33 +3949,18 @@ class PublicStation:
             except Exception:
                 return None
 
-        # עבודה על עותק כדי לשמור על תמונת הבסיס נקייה
-        img = base.copy()
-        img_w, img_h = img.size
-        draw = ImageDraw.Draw(img)
+        img_w, img_h = base.size
+        # draw מוצב בהמשך – קודם על השכבה הסטטית (אם צריך לבנות אותה) ואז על עותק הפריים
+        draw = None
 
         orientation = getattr(self, 'screen_orientation', 'landscape')
 
-        # ציור לוגו template1 (אם קיים) ישירות על הרקע, עם שקיפות מלאה
         logo_img = getattr(self, 'template1_logo_original', None)
         logo_top = getattr(self, 'template1_logo_top', None)
-        if logo_img is not None and logo_top is not None:
-            try:
-                logo = logo_img.copy()
-                lw, lh = logo.size
-                # מיקום הלוגו במרכז החלק העליון
-                x = (img_w - lw) // 2
-                y = int(logo_top)
-                if logo.mode in ('RGBA', 'LA'):
-                    img.paste(logo, (x, y), logo)
-                else:
-                    img.paste(logo, (x, y))
-            except Exception:
-                pass
 
         # פונקציה פנימית לטעינת פונט בגודל נתון
         def _load_font(size: int):
-            """טעינת פונט עבור ציור על template1.
+            """טעינת פונט עבור ציור על template1 (מהמטמון לפי נתיב וגודל).
 
             עדיפות לפונט גרפי מקומי (למשל Gan CLM Bold) שמוגדר ב-__init__.
             אם אינו קיים או לא נטען – ננסה Arial, ואז ברירת מחדל של Pillow.
@@ -3862,13 +3969,13 @@ class PublicStation:
             font_path = getattr(self, 'agas_ttf_path', None)
             if font_path:
                 try:
-                    return ImageFont.truetype(font_path, size)
+                    return _cached_truetype(font_path, size)
                 except Exception:
                     pass
 
             # 2. Arial מערכתית
             try:
-                return ImageFont.truetype("arial.ttf", size)
+                return _cached_truetype("arial.ttf", size)
             except Exception:
                 # 3. ברירת מחדל – לעולם לא מפיל את הציור
                 return ImageFont.load_default()
@@ -4015,7 +4122,21 @@ class PublicStation:
             # הסרת סימוני RLE/RLM/PDF אם קיימים בטקסט שהוכן עבור Tkinter
             return text.replace(RLE, "").replace(PDF, "").replace(RLM, "")
 
+        # מטמוני פריסה: אותם טקסטים (כותרות, תוויות, שמות חוזרים) נמדדים/מומרים פעם אחת
+        rtl_cache = getattr(self, '_t1_rtl_cache', None)
+        measure_cache = getattr(self, '_t1_measure_cache', None)
+        if rtl_cache is None or len(rtl_cache) > 1024:
+            rtl_cache = self._t1_rtl_cache = {}
+        if measure_cache is None or len(measure_cache) > 2048:
+            measure_cache = self._t1_measure_cache = {}
+
         def _visual_rtl(text: str) -> str:
+            hit = rtl_cache.get(text)
+            if hit is None:
+                hit = rtl_cache[text] = _visual_rtl_uncached(text)
+            return hit
+
+        def _visual_rtl_uncached(text: str) -> str:
             """המרה חזותית פשוטה ל-RTL: שומרת מספרים בסדרם והופכת את רצפי האותיות, וכן מהפכת את סדר המילים.
 
             זו לא מימוש מלא של אלגוריתם BIDI, אבל מספיקה עבור טקסטי הממשק (ללא סימונים מורכבים).
@@ -4060,15 +4181,21 @@ class PublicStation:
         def _measure_text(t: str, font) -> tuple:
             if not t:
                 return 0, 0
+            key = (t, id(font))
+            hit = measure_cache.get(key)
+            if hit is not None and hit[0] is font:
+                return hit[1]
             try:
                 bbox = draw.textbbox((0, 0), t, font=font)
-                return max(0, bbox[2] - bbox[0]), max(0, bbox[3] - bbox[1])
+                size = (max(0, bbox[2] - bbox[0]), max(0, bbox[3] - bbox[1]))
             except Exception:
                 try:
-                    return font.getsize(t)
+                    size = font.getsize(t)
                 except Exception:
                     approx_h = getattr(font, 'size', 20)
-                    return len(t) * approx_h // 2, approx_h
+                    size = (len(t) * approx_h // 2, approx_h)
+            measure_cache[key] = (font, size)
+            return size
 
         # פונקציות עזר לציור טקסט
         def draw_centered(text: str, center_y: int, font, fill=(255, 255, 255), stroke_fill=(0, 0, 0), rtl: bool = True):
@@ -4101,15 +4228,54 @@ class PublicStation:
                     draw.text((x, y), t, font=font, fill=fill)
                 y += line_spacing
 
-        # 1. כותרת עליונה
-        title_y = int(img_h * title_y_factor)  # מעט נמוך יותר מתחת ללוגו
-        draw_centered(title_text, title_y, font_title_pil, fill=col_title, stroke_fill=stroke_outline)
-
-        # 2. הודעות כלליות (ללא כרטיס) – רצועה בין הכותרת לבין כרטיס התלמיד
+        # שכבה סטטית: רקע + לוגו + כותרת + הודעות כלליות. נבנית מחדש רק כשאחד מהם משתנה,
+        # וכל פריים של תלמיד מתחיל מעותק שלה.
+        combined_always = ""
         if always_text:
             combined_always = "   |   ".join([ln.strip() for ln in str(always_text).splitlines() if ln.strip()])
-            always_y = int(img_h * always_y_factor)
-            draw_centered(combined_always, always_y, font_always_pil, fill=col_always, stroke_fill=stroke_outline)
+        static_key = (
+            img_w, img_h, logo_top, title_text, combined_always, title_size, always_size,
+            col_title, col_always, stroke_outline, orientation, getattr(self, 'agas_ttf_path', None),
+        )
+        cache = getattr(self, '_t1_static_cache', None)
+        if cache and cache.get('base') is base and cache.get('logo') is logo_img and cache.get('key') == static_key:
+            static = cache['img']
+        else:
+            static = base.copy()
+            draw = ImageDraw.Draw(static)
+
+            # ציור לוגו template1 (אם קיים) ישירות על הרקע, עם שקיפות מלאה
+            if logo_img is not None and logo_top is not None:
+                try:
+                    logo = logo_img.copy()
+                    lw, lh = logo.size
+                    # מיקום הלוגו במרכז החלק העליון
+                    x = (img_w - lw) // 2
+                    y = int(logo_top)
+                    if logo.mode in ('RGBA', 'LA'):
+                        static.paste(logo, (x, y), logo)
+                    else:
+                        static.paste(logo, (x, y))
+                except Exception:
+                    pass
+
+            # 1. כותרת עליונה
+            title_y = int(img_h * title_y_factor)  # מעט נמוך יותר מתחת ללוגו
+            draw_centered(title_text, title_y, font_title_pil, fill=col_title, stroke_fill=stroke_outline)
+
+            # 2. הודעות כלליות (ללא כרטיס) – רצועה בין הכותרת לבין כרטיס התלמיד
+            if combined_always:
+                always_y = int(img_h * always_y_factor)
+                draw_centered(combined_always, always_y, font_always_pil, fill=col_always, stroke_fill=stroke_outline)
+
+            self._t1_static_cache = {'key': static_key, 'base': base, 'logo': logo_img, 'img': static}
+
+        # השכבה הסטטית של הפריים האחרון – משמשת לחישוב האזור המלוכלך ב-_push_template1_frame
+        self._t1_frame_static = static
+
+        # עבודה על עותק כדי לשמור על השכבה הסטטית נקייה
+        img = static.copy()
+        draw = ImageDraw.Draw(img)
 
         # 3. כרטיס תלמיד מרכזי (שם, כיתה, נקודות) – רק אם יש שם תלמיד
         if name_text:
@@ -4656,13 +4822,58 @@ class PublicStation:
 
         return img
 
+    def _push_template1_frame(self, img: Image.Image) -> None:
+        """הצגת פריים template1 – כשהשכבה הסטטית לא השתנתה, רק אזור פאנל התלמיד
+        (האזור ששונה מהשכבה הסטטית בפריים הקודם או הנוכחי) מועתק לתמונת ה-Tk הקיימת."""
+        static = getattr(self, '_t1_frame_static', None)
+        student_box = None
+        if static is not None and static.size == img.size:
+            try:
+                student_box = ImageChops.difference(img, static).getbbox()
+            except Exception:
+                static = None
+
+        prev = getattr(self, '_t1_pushed', None)
+        photo = getattr(self, 'bg_image', None)
+        label = getattr(self, 'bg_label', None)
+        partial_ok = (
+            static is not None and prev is not None and photo is not None and label is not None
+            and prev[0] is static and prev[1] is photo
+        )
+        if partial_ok:
+            try:
+                partial_ok = (str(label.cget('image')) == str(photo)
+                              and (photo.width(), photo.height()) == img.size)
+            except Exception:
+                partial_ok = False
+
+        if not partial_ok:
+            self._update_bg_label(img)
+            self._t1_pushed = (static, getattr(self, 'bg_image', None), student_box)
+            return
+
+        # איחוד האזור של הפריים הקודם (למחיקה) עם הנוכחי (לציור)
+        boxes = [b for b in (prev[2], student_box) if b]
+        if boxes:
+            box = (
+                min(b[0] for b in boxes), min(b[1] for b in boxes),
+                max(b[2] for b in boxes), max(b[3] for b in boxes),
+            )
+            try:
+                patch = ImageTk.PhotoImage(img.crop(box))
+                self.root.tk.call(str(photo), 'copy', str(patch), '-to', box[0], box[1])
+            except Exception:
+                self._update_bg_label(img)
+                photo = getattr(self, 'bg_image', None)
+        self._t1_pushed = (static, photo, student_box)
+
     def _render_static_overlay_template1(self, always_text: str = "") -> None:
         """ציור שכבת רקע סטטית (כותרת + הודעות קבועות) על template1."""
         try:
             text = always_text or getattr(self, 'always_messages_text', "")
             img = self._compose_template1_image(always_text=text)
             if img is not None:
-                self._update_bg_label(img)
+                self._push_template1_frame(img)
         except Exception as e:
             print(f"שגיאה בציור שכבת טקסט על template1: {e}")
 
@@ -4707,7 +4918,7 @@ class PublicStation:
                 points_label_color=points_label_color,
             )
             if img is not None:
-                self._update_bg_label(img)
+                self._push_template1_frame(img)
         except Exception as e:
             print(f"שגיאה בציור שכבת תלמיד על template1: {e}")
     
@@ -5062,6 +5273,7 @@ class PublicStation:
                 pass
             if not os.path.isdir(src_root):
                 return
+            copied = 0
             for root, _, files in os.walk(src_root):
                 rel = os.path.relpath(root, src_root)
                 if rel == '.':
@@ -5081,10 +5293,18 @@ class PublicStation:
                             continue
                         try:
                             shutil.copy2(sp, dp)
+                            copied += 1
                         except Exception:
                             pass
                     except Exception:
                         continue
+            # העמדות מסתנכרנות לפי המניפסט – מעדכנים אותו כשנוספו קבצים (או כשהוא חסר)
+            try:
+                from sounds_sync import MANIFEST_NAME, write_manifest
+                if copied or not os.path.exists(os.path.join(dst_root, MANIFEST_NAME)):
+                    write_manifest(dst_root)
+            except Exception as e:
+                print(f"[SOUNDS] manifest update failed: {e}")
         except Exception:
             return
 
@@ -5853,7 +6073,18 @@ class PublicStation:
         out = {'ok': False}
 
         def _worker():
+            # מסלול מהיר: מניפסט בשיתוף – קריאת קובץ אחד והעתקת השינויים בלבד
+            try:
+                from sounds_sync import sync_from_manifest
+                res = sync_from_manifest(src, cache_dir)
+            except Exception as e:
+                print(f"[SOUNDS] manifest sync failed: {e}")
+                res = None
+            if res is not None:
+                out['ok'] = True
+                return
             try:
+                from sounds_sync import copy_atomic
                 for root, _, files in os.walk(src):
                     rel = os.path.relpath(root, src)
                     if rel == '.':
@@ -5883,7 +6114,7 @@ class PublicStation:
                                 need = True
                             if need:
                                 try:
-                                    shutil.copy2(sp, dp)
+                                    copy_atomic(sp, dp)
                                 except Exception:
                                     pass
                         except Exception:
@@ -5956,6 +6187,16 @@ class PublicStation:
             return files[0]
 
     def _pick_random_from_sound_subfolder(self, folder_name: str, filenames=None) -> str:
+        # מאגר התיקיות שבזיכרון (SoundBank) – בלי listdir על השיתוף בכל אירוע
+        if not filenames:
+            bank = getattr(self, 'sound_bank', None)
+            if bank is not None:
+                try:
+                    picked = bank.pick_from_folder(folder_name)
+                except Exception:
+                    picked = ''
+                if picked:
+                    return picked
         try:
             root_dir = getattr(self, '_sounds_root_dir', None) or os.path.join(self.base_dir, 'sounds')
         except Exception:
@@ -6546,6 +6787,9 @@ class PublicStation:
         try:
             if not getattr(self, 'sound_manager', None):
                 return
+            bank = getattr(self, 'sound_bank', None)
+            if bank is not None and path and bank.play(path):
+                return
             if path and os.path.exists(path):
                 try:
                     ext = str(os.path.splitext(path)[1] or '').lower()
@@ -6586,7 +6830,11 @@ class PublicStation:
             k = str(sound_key or '').strip()
             if not k:
                 return False
-            path = self.sound_manager.resolve_sound([k])
+            bank = getattr(self, 'sound_bank', None)
+            if bank is not None:
+                path = bank.resolve([k])
+            else:
+                path = self.sound_manager.resolve_sound([k])
             try:
                 _debug_log(f"play_sound_key key={k} resolved={path}")
             except Exception:
@@ -6723,6 +6971,12 @@ class PublicStation:
             self._admin_menu_open = False
             self._admin_menu_dialog = None
             self._admin_menu_exit_deadline = None
+            try:
+                stop_replica = getattr(self.db, 'stop_replica', None)
+                if stop_replica:
+                    stop_replica()
+            except Exception:
+                pass
             self.root.destroy()
 
         tk.Button(
@@ -7504,7 +7758,10 @@ class PublicStation:
         if since >= float(idle_sec):
             items = []
             try:
-                items = self.messages_db.get_active_ads_items() if getattr(self, 'messages_db', None) else []
+                if getattr(self, 'messages_db', None):
+                    if self._content_changed('ads', ('ads_items',)) or getattr(self, '_ads_items_cache', None) is None:
+                        self._ads_items_cache = self.messages_db.get_active_ads_items() or []
+                    items = list(self._ads_items_cache or [])
             except Exception:
                 items = []
             if items:
@@ -8003,7 +8260,7 @@ class PublicStation:
             # (בונוס 0 נק' לא נספר כתצוגה)
             has_time_bonus = False
             try:
-                tb = self.db.get_active_time_bonus_now(only_shown_public=True)
+                tb = self._get_active_time_bonus_for_display()
                 has_time_bonus = bool(tb) and int(tb.get('bonus_points', 0) or 0) > 0
             except Exception:
                 has_time_bonus = False
@@ -8035,11 +8292,34 @@ class PublicStation:
         else:
             self.bonus_label.place_forget()  # הסתר
 
+    def _get_time_bonus_schedule(self):
+        """לוח בונוס הזמנים המחושב (None אם לא ניתן לטעון – נופלים לשאילתות DB)"""
+        sched = getattr(self, 'time_bonus_schedule', None)
+        if sched is not None:
+            return sched
+        if bool(getattr(self, '_time_bonus_schedule_failed', False)):
+            return None
+        try:
+            sched = TimeBonusSchedule(self.db)
+            sched.start()
+            self.time_bonus_schedule = sched
+            return sched
+        except Exception as e:
+            print(f"[TIME-BONUS] schedule init failed: {e}")
+            self._time_bonus_schedule_failed = True
+            return None
+
+    def _get_active_time_bonus_for_display(self):
+        sched = self._get_time_bonus_schedule()
+        if sched is not None:
+            return sched.active_now(only_shown_public=True)
+        return self.db.get_active_time_bonus_now(only_shown_public=True)
+
     def update_time_bonus_display(self):
         """עדכון תצוגת מצב בונוס זמנים"""
         # בעמדה ציבורית מציגים בונוס זמנים שמסומן כמוצג.
         # אם זה בונוס לפי כיתה – נציג גם פירוט כיתות כדי למנוע בלבול.
-        time_bonus = self.db.get_active_time_bonus_now(only_shown_public=True)
+        time_bonus = self._get_active_time_bonus_for_display()
         if time_bonus:
             bonus_name = time_bonus['name']
             bonus_points = time_bonus['bonus_points']
@@ -8106,7 +8386,8 @@ class PublicStation:
     def _check_anti_spam(self, student_id, card_number):
         """בדיקת אנטי-ספאם - מחזיר dict עם פרטי חסימה/אזהרה או None"""
         try:
-            config = self.load_app_config()
+            config = self._get_anti_spam_config()
+            engine = self._get_anti_spam_engine()
 
             def _cfg_bool(v, default=True) -> bool:
                 try:
@@ -8165,13 +8446,14 @@ class PublicStation:
                     },
                 ]
             
-            self.db.log_card_validation(student_id, card_number)
+            engine.configure_rules(rules)
+            engine.record_validation(student_id, card_number)
             
-            is_blocked, block_until, reason = self.db.is_card_blocked(student_id)
+            is_blocked, block_until, reason = engine.is_card_blocked(student_id)
             if is_blocked:
                 vc = 1
                 try:
-                    vc = int(self.db.get_violation_count(student_id) or 0)
+                    vc = int(engine.get_violation_count(student_id) or 0)
                 except Exception:
                     vc = 1
                 if vc < 1:
@@ -8185,7 +8467,7 @@ class PublicStation:
                     'stage': int(vc),
                 }
             
-            violation_count = self.db.get_violation_count(student_id)
+            violation_count = engine.get_violation_count(student_id)
 
             suppress_warnings_due_to_hold = False
             try:
@@ -8270,12 +8552,12 @@ class PublicStation:
             # 1) אם הגענו לסף חסימה של השלב: נחסום רק אם כבר הוצגה אזהרה של השלב
             if block_item is not None:
                 b_count, b_minutes, b_rule, _b_type, b_index = block_item
-                b_recent = self.db.get_recent_validations_count(student_id, int(b_minutes or 1))
+                b_recent = engine.recent_count(student_id, int(b_minutes or 1))
                 if int(b_recent or 0) >= int(b_count or 0):
                     # אם לא הראינו אזהרה בשלב הזה – ננסה להראות קודם אזהרה (גם אם סף החסימה כבר התקיים)
                     if warn_item is not None and (not _has_stage_warning_within(int(b_minutes or 1))):
                         w_count, w_minutes, w_rule, _w_type, w_index = warn_item
-                        w_recent = self.db.get_recent_validations_count(student_id, int(w_minutes or 1))
+                        w_recent = engine.recent_count(student_id, int(w_minutes or 1))
                         if int(w_recent or 0) >= int(w_count or 0):
                             chosen = (w_count, w_minutes, w_recent, w_rule, 'warning', w_index)
                     if chosen is None and _has_stage_warning_within(int(b_minutes or 1)):
@@ -8286,7 +8568,7 @@ class PublicStation:
                 if suppress_warnings_due_to_hold:
                     return None
                 w_count, w_minutes, w_rule, _w_type, w_index = warn_item
-                w_recent = self.db.get_recent_validations_count(student_id, int(w_minutes or 1))
+                w_recent = engine.recent_count(student_id, int(w_minutes or 1))
                 if int(w_recent or 0) >= int(w_count or 0):
                     chosen = (w_count, w_minutes, w_recent, w_rule, 'warning', w_index)
 
@@ -8305,9 +8587,9 @@ class PublicStation:
                 except Exception:
                     duration = 60
                 message = rule.get('message', 'הכרטיס נחסם')
-                self.db.block_card(student_id, card_number, duration, message, violation_count + 1)
+                block_until = engine.block_card(student_id, card_number, duration, message, violation_count + 1)
                 try:
-                    self.db.log_anti_spam_event(
+                    engine.log_event(
                         student_id=int(student_id or 0),
                         card_number=str(card_number or '').strip(),
                         event_type='block',
@@ -8319,14 +8601,6 @@ class PublicStation:
                     )
                 except Exception:
                     pass
-                # לחשב זמן שנותר לפי block_until בפועל מה-DB (מדויק גם מיד לאחר חסימה)
-                block_until = None
-                try:
-                    is_blocked2, block_until2, _reason2 = self.db.is_card_blocked(student_id)
-                    if is_blocked2:
-                        block_until = block_until2
-                except Exception:
-                    block_until = None
                 time_left = self._format_time_left(block_until, duration)
                 return {
                     'type': 'block',
@@ -8342,7 +8616,7 @@ class PublicStation:
             else:
                 message = rule.get('message', 'אזהרה')
                 try:
-                    self.db.log_anti_spam_event(
+                    engine.log_event(
                         student_id=int(student_id or 0),
                         card_number=str(card_number or '').strip(),
                         event_type='warning',
@@ -8369,6 +8643,32 @@ class PublicStation:
             print(f"שגיאה בבדיקת אנטי-ספאם: {e}")
             return None
     
+    def _get_anti_spam_engine(self) -> AntiSpamEngine:
+        """מנוע האנטי-ספאם בזיכרון (נוצר ונטען מה-DB בפעם הראשונה)"""
+        engine = getattr(self, 'anti_spam_engine', None)
+        if engine is None:
+            engine = AntiSpamEngine(self.db)
+            try:
+                engine.configure_rules((self._get_anti_spam_config() or {}).get('anti_spam_rules'))
+            except Exception:
+                pass
+            engine.start()
+            self.anti_spam_engine = engine
+        return engine
+
+    def _get_anti_spam_config(self) -> dict:
+        """הגדרות האנטי-ספאם – נטענות מחדש לכל היותר פעם ב-5 שניות ולא בכל תיקוף"""
+        now = time.time()
+        cfg = getattr(self, '_anti_spam_cfg', None)
+        if cfg is None or (now - float(getattr(self, '_anti_spam_cfg_ts', 0.0) or 0.0)) >= 5.0:
+            try:
+                cfg = self.load_app_config() or {}
+            except Exception:
+                cfg = cfg or {}
+            self._anti_spam_cfg = cfg
+            self._anti_spam_cfg_ts = now
+        return cfg
+
     def _format_time_left(self, block_until=None, duration_minutes=None):
         """עיצוב זמן שנותר לחסימה"""
         try:
@@ -8604,6 +8904,7 @@ def main():
         _debug_log('entered main()')
     except Exception:
         pass
+    startup_profile.phase('imports')
 
     while True:
         _set_windows_dpi_awareness()
@@ -8642,8 +8943,10 @@ def main():
             )
         except Exception:
             pass
+        startup_profile.phase('tk.Tk()')
         try:
             app = PublicStation(root)
+            startup_profile.phase('PublicStation.__init__')
         except Exception as e:
             try:
                 _debug_log("❌ PublicStation init failed: " + repr(e))
@@ -8668,7 +8971,19 @@ def main():
                 pass
             return
 
+        if startup_profile.ENABLED:
+            root.after_idle(lambda: root.after(1, lambda: startup_profile.report('public_station')))
         root.mainloop()
+        try:
+            if getattr(app, 'anti_spam_engine', None) is not None:
+                app.anti_spam_engine.stop()
+        except Exception:
+            pass
+        try:
+            if getattr(app, 'time_bonus_schedule', None) is not None:
+                app.time_bonus_schedule.stop()
+        except Exception:
+            pass
         if not getattr(app, "_restart_requested", False):
             break
 
@@ -0,0 +1,725 @@
+# -*- coding: utf-8 -*-
+"""
+עותק קריאה מקומי לעמדה ציבורית בהתקנה עם תיקייה משותפת
+
+ReplicaDatabase מחליף את Database בעמדה:
+- קריאות: מעותק SQLite מקומי במצב WAL (לא נוגעות בשיתוף ולא מתחרות בכתיבות של הקופה/ניהול);
+- כתיבות (תיקופים, נקודות, הגדרות): נרשמות קודם בקובץ spool מקומי עמיד, מוחלות על העותק
+  המקומי (כדי שהעמדה תראה את מה שכתבה מיד), ותהליכון רקע משדר אותן למסד המשותף בסדר;
+- תפיסת בונוס זמנים והוספת נקודות: ישירות למסד המשותף (ההחלטה מי קיבל חייבת להיות משותפת
+  לכל העמדות; כשהמשותף לא זמין הפעולה נכשלת במקום להתקבל רק מקומית);
+- רענון: אחרי שה-spool התרוקן, ורק כשמונה השינויים בכותרת קובץ המסד המשותף זז:
+  * טבלאות עם updated_at – שורות שעודכנו מאז סימן המים (+ תלמידים שהופיעו ב-change_log);
+  * טבלאות לוג (תיקופים, נקודות, בונוסי זמנים, אנטי-ספאם) – שורות חדשות לפי id;
+  * טבלאות תוכן עם מונה ב-content_versions – העתקה מלאה כשהמונה השתנה;
+  * כל השאר – העתקה מלאה לכל היותר פעם ב-FULL_REFRESH_SEC. עבודה שנדחתה בגלל המגבלה
+    מחזיקה את הרענון פעיל (גם בלי שינוי נוסף במונה) עד שהיא מתבצעת.
+כתיבה שנכשלה כי המסד המשותף לא זמין נשארת ב-spool ומנוסה שוב עד שהיא מצליחה. שגיאה קבועה
+(IntegrityError, רשומה פגומה) או סירוב חוזר (False) כשהמסד המשותף זמין לכתיבה מעבירים אותה
+לטבלת write_spool_dead; מנה (write_anti_spam_batch) מפוצלת קודם לשורות, ורק השורה הפסולה נפסלת.
+כשסכמת המסד המשותף משתנה, העותק נבנה מחדש (sqlite backup API).
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from database import Database
+
+# מתודות Database שכותבות – בעמדה הציבורית עוברות דרך ה-spool.
+# נתיב כתיבה חדש בעמדה הציבורית חייב להופיע כאן, אחרת הוא ייכתב לעותק המקומי בלבד.
+WRITE_METHODS = (
+    'apply_points_batch',
+    'set_setting',
+    'set_student_tier_index',
+    'increment_teacher_bonus_runs',
+    'increment_teacher_bonus_points_used',
+    'log_swipe',
+    'upsert_first_swipe_for_date',
+    'write_anti_spam_batch',
+)
+# כתיבות שהתוצאה שלהן היא החלטה (תפיסת בונוס זמנים, הוספת נקודות) – ישירות למסד המשותף, בלי spool;
+# כשהמשותף לא זמין הן נכשלות (והתיקוף לא מעניק) במקום להצליח רק בעותק המקומי
+DIRECT_WRITE_METHODS = (
+    'claim_time_bonus',
+    'release_time_bonus_claim',
+    'add_points',
+    'record_time_bonus_given',
+)
+# מתודות מנה: בשגיאה קבועה המנה נכתבת שורה-שורה לפי הארגומנטים האלה
+BATCH_WRITE_KWARGS = {
+    'write_anti_spam_batch': ('validations', 'blocks', 'events'),
+}
+
+# טבלאות שרק מתווספות אליהן שורות – נמשכות לפי id
+APPEND_ONLY_TABLES = ('swipe_log', 'points_log', 'time_bonus_given', 'card_validations', 'card_blocks',
+                      'anti_spam_events')
+# מתוכן – טבלאות שגם נמחקות מהן שורות (שחרור חסימה / ביטול בונוס): השוואת מזהים פעם ב-FULL_REFRESH_SEC
+DELETABLE_LOG_TABLES = ('card_blocks', 'time_bonus_given')
+# טבלאות שלא מועתקות: נגזרות מקומית (swipe_daily), של הקופה או של הסנכרון
+SKIP_TABLES = (
+    'change_log', 'swipe_daily', 'swipe_daily_state', 'purchase_holds', 'product_hold_totals',
+    'sync_state', 'applied_events', 'replica_state', 'time_bonus_group_claims',
+)
+VERSIONED_TABLES = ('news_items', 'ads_items', 'static_messages', 'threshold_messages',
+                    'student_messages', 'settings')
+
+# סימן המים של updated_at נלקח אחורה בזמן זה – כתיבה שהתחילה לפני המשיכה ונשמרה אחריה
+UPDATED_AT_OVERLAP_SEC = 5
+# שגיאות שניסיון חוזר לא יתקן – הרשומה עוברת ל-write_spool_dead
+PERMANENT_WRITE_ERRORS = (sqlite3.IntegrityError, TypeError, ValueError)
+# כתיבה שהחזירה False כשהמסד המשותף זמין לכתיבה – אחרי כמה ניסיונות עוברת ל-write_spool_dead
+MAX_REFUSED_ATTEMPTS = 3
+
+
+def _default_replica_dir() -> str:
+    for env_name in ("PROGRAMDATA", "LOCALAPPDATA", "APPDATA", "TEMP", "TMP"):
+        root = os.environ.get(env_name)
+        if not root:
+            continue
+        try:
+            if os.path.isdir(root) and os.access(root, os.W_OK):
+                d = os.path.join(root, "SchoolPoints", "replica")
+                os.makedirs(d, exist_ok=True)
+                if os.access(d, os.W_OK):
+                    return d
+        except Exception:
+            continue
+    return os.path.dirname(os.path.abspath(__file__))
+
+
+def _file_change_counter(path: str) -> Optional[int]:
+    """מונה השינויים שבכותרת קובץ SQLite (offset 24) – עולה בכל commit במצב journal רגיל"""
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(28)
+        if len(head) == 28 and head[:16] == b'SQLite format 3\x00':
+            return int.from_bytes(head[24:28], 'big')
+    except Exception:
+        pass
+    return None
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    return [str(r[1]) for r in conn.execute(f'PRAGMA table_info("{table}")').fetchall()]
+
+
+class _WriteSpool:
+    """תור כתיבות עמיד על הדיסק המקומי (SQLite נפרד, synchronous=FULL)"""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode = WAL')
+        self._conn.execute('PRAGMA synchronous = FULL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS write_spool (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                method TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS write_spool_dead (
+                id INTEGER PRIMARY KEY,
+                method TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                created_at TEXT,
+                failed_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        self._conn.commit()
+
+    def push(self, method: str, payload: str) -> None:
+        with self._lock:
+            self._conn.execute('INSERT INTO write_spool (method, payload) VALUES (?, ?)', (method, payload))
+            self._conn.commit()
+
+    def peek(self, limit: int) -> List[tuple]:
+        with self._lock:
+            return self._conn.execute(
+                'SELECT id, method, payload, attempts FROM write_spool ORDER BY id LIMIT ?', (int(limit),)
+            ).fetchall()
+
+    def remove(self, entry_id: int) -> None:
+        with self._lock:
+            self._conn.execute('DELETE FROM write_spool WHERE id = ?', (int(entry_id),))
+            self._conn.commit()
+
+    def bump_attempts(self, entry_id: int) -> None:
+        with self._lock:
+            self._conn.execute('UPDATE write_spool SET attempts = attempts + 1 WHERE id = ?', (int(entry_id),))
+            self._conn.commit()
+
+    def update_payload(self, entry_id: int, payload: str) -> None:
+        with self._lock:
+            self._conn.execute('UPDATE write_spool SET payload = ? WHERE id = ?', (payload, int(entry_id)))
+            self._conn.commit()
+
+    def bury_payload(self, method: str, payload: str, error: str) -> None:
+        """שורה בודדת מתוך מנה שנפסלה"""
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO write_spool_dead (method, payload, attempts, error) VALUES (?, ?, 1, ?)',
+                (method, payload, str(error or ''))
+            )
+            self._conn.commit()
+
+    def bury(self, entry_id: int, error: str) -> None:
+        """העברה ל-write_spool_dead (נשמרת לבדיקה ידנית, לא נמחקת)"""
+        with self._lock:
+            try:
+                self._conn.execute(
+                    '''
+                    INSERT INTO write_spool_dead (method, payload, attempts, error, created_at)
+                    SELECT method, payload, attempts + 1, ?, created_at FROM write_spool WHERE id = ?
+                    ''',
+                    (str(error or ''), int(entry_id))
+                )
+                self._conn.execute('DELETE FROM write_spool WHERE id = ?', (int(entry_id),))
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+
+    def count(self) -> int:
+        with self._lock:
+            return int(self._conn.execute('SELECT COUNT(1) FROM write_spool').fetchone()[0] or 0)
+
+    def dead_count(self) -> int:
+        with self._lock:
+            return int(self._conn.execute('SELECT COUNT(1) FROM write_spool_dead').fetchone()[0] or 0)
+
+
+class _SharedUnavailable(Exception):
+    pass
+
+
+class ReplicaDatabase(Database):
+    """Database שקורא מעותק מקומי וכותב למסד המשותף דרך spool (ראו תיעוד המודול)"""
+
+    REFRESH_SEC = 3.0
+    FULL_REFRESH_SEC = 60.0
+    FLUSH_BATCH = 50
+
+    def __init__(self, db_path: str = None, replica_dir: str = None, autostart: bool = True):
+        # המסד המשותף – יעד הכתיבות ומקור הרענון
+        self.shared = Database(db_path)
+        shared_path = self.shared.db_path
+        h = hashlib.md5(os.path.abspath(str(shared_path)).lower().encode('utf-8', errors='ignore')).hexdigest()[:12]
+        base = replica_dir or _default_replica_dir()
+        self.replica_path = os.path.join(base, f'replica_{h}.db')
+        self._spool = _WriteSpool(os.path.join(base, f'write_spool_{h}.db'))
+
+        self._last_counter: Optional[int] = None
+        self._last_full: Dict[str, float] = {}
+        self._needs_bootstrap = False
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+
+        if not self._replica_ready():
+            self._bootstrap()
+        # db_path נשאר הנתיב המשותף (לכלים שפותחים אותו ישירות); get_connection מחזיר את העותק
+        super().__init__(shared_path)
+
+        self._thread = None
+        if autostart:
+            self.start()
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='db-replica', daemon=True)
+        self._thread.start()
+
+    # ------------------------------------------------------------------
+    # חיבורים
+    # ------------------------------------------------------------------
+
+    def get_connection(self):
+        """חיבור לעותק המקומי (WAL – קוראים לא נחסמים ע"י הרענון)"""
+        conn = sqlite3.connect(self.replica_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute('PRAGMA foreign_keys = ON')
+            conn.execute('PRAGMA busy_timeout = 10000')
+            conn.execute('PRAGMA synchronous = NORMAL')
+        except sqlite3.OperationalError:
+            pass
+        return conn
+
+    def _refresh_connection(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.replica_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        # העתקה מלאה של טבלת הורה לפני/אחרי טבלת בן – בלי אכיפת מפתחות זרים
+        conn.execute('PRAGMA foreign_keys = OFF')
+        conn.execute('PRAGMA synchronous = NORMAL')
+        return conn
+
+    # ------------------------------------------------------------------
+    # מצב העותק
+    # ------------------------------------------------------------------
+
+    def _replica_ready(self) -> bool:
+        if not os.path.exists(self.replica_path):
+            return False
+        try:
+            conn = sqlite3.connect(self.replica_path, timeout=10)
+            try:
+                row = conn.execute("SELECT value FROM replica_state WHERE key = 'bootstrapped'").fetchone()
+                return bool(row and row[0])
+            finally:
+                conn.close()
+        except Exception:
+            return False
+
+    @staticmethod
+    def _get_state(conn, key: str, default: str = '') -> str:
+        row = conn.execute('SELECT value FROM replica_state WHERE key = ?', (key,)).fetchone()
+        return str(row[0]) if row and row[0] is not None else default
+
+    @staticmethod
+    def _set_state(conn, key: str, value) -> None:
+        conn.execute('INSERT OR REPLACE INTO replica_state (key, value) VALUES (?, ?)', (key, str(value)))
+
+    def _bootstrap(self) -> None:
+        """בניית העותק מחדש מהמסד המשותף (backup API) וקביעת סימני המים מתוך העותק עצמו"""
+        t0 = time.perf_counter()
+        counter = _file_change_counter(self.shared.db_path)
+        src = self.shared.get_connection()
+        dst = sqlite3.connect(self.replica_path, timeout=30)
+        try:
+            src.backup(dst)
+            dst.execute('PRAGMA journal_mode = WAL')
+            dst.execute('CREATE TABLE IF NOT EXISTS replica_state (key TEXT PRIMARY KEY, value TEXT)')
+            tables = [str(r[0]) for r in dst.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+            ).fetchall()]
+            for table in tables:
+                cols = _columns(dst, table)
+                if table in APPEND_ONLY_TABLES and 'id' in cols:
+                    self._set_state(dst, f'log:{table}', dst.execute(f'SELECT COALESCE(MAX(id), 0) FROM "{table}"').fetchone()[0])
+                elif 'updated_at' in cols and 'id' in cols:
+                    self._set_state(dst, f'upd:{table}', dst.execute(f'SELECT COALESCE(MAX(updated_at), \'\') FROM "{table}"').fetchone()[0])
+            if 'change_log' in tables:
+                self._set_state(dst, 'change_log', dst.execute('SELECT COALESCE(MAX(id), 0) FROM change_log').fetchone()[0])
+                # רק סימן המים נחוץ; שורות שייכתבו כאן מקומית נמחקות בכל רענון
+                dst.execute('DELETE FROM change_log')
+            if 'content_versions' in tables:
+                for r in dst.execute('SELECT name, version FROM content_versions').fetchall():
+                    self._set_state(dst, f'cv:{r[0]}', r[1])
+            self._set_state(dst, 'bootstrapped', datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+            dst.commit()
+        finally:
+            dst.close()
+            src.close()
+        self._last_counter = counter
+        self._last_full = {}
+        self._needs_bootstrap = False
+        print(f"[REPLICA] bootstrap {self.replica_path} in {time.perf_counter() - t0:.2f}s")
+
+    # ------------------------------------------------------------------
+    # כתיבות
+    # ------------------------------------------------------------------
+
+    def _write(self, name: str, args: tuple, kwargs: dict):
+        if name == 'log_swipe' and len(args) < 4 and not kwargs.get('swiped_at'):
+            # זמן התיקוף נקבע עכשיו – כך השורה במסד המשותף זהה לשורה המקומית
+            kwargs = dict(kwargs, swiped_at=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        try:
+            payload = json.dumps([list(args), kwargs], ensure_ascii=False)
+        except (TypeError, ValueError):
+            payload = None
+        if payload is None:
+            # ארגומנטים שאי אפשר לשמור בתור – כתיבה ישירה למשותף, כמו בלי עותק
+            result = getattr(self.shared, name)(*args, **kwargs)
+            self._wake.set()
+            return result
+
+        self._spool.push(name, payload)
+        try:
+            result = getattr(Database, name)(self, *args, **kwargs)
+        except Exception as e:
+            print(f"[REPLICA] local apply {name} failed: {e}")
+            result = None
+        self._wake.set()
+        return result
+
+    def _write_through(self, name: str, args: tuple, kwargs: dict):
+        result = getattr(self.shared, name)(*args, **kwargs)
+        if result:
+            try:
+                getattr(Database, name)(self, *args, **kwargs)
+            except Exception as e:
+                print(f"[REPLICA] local apply {name} failed: {e}")
+        self._wake.set()
+        return result
+
+    def _flush(self) -> int:
+        """שידור כתיבות מה-spool למסד המשותף לפי הסדר. מחזיר כמה נשארו.
+        רשומה נמחקת רק אחרי הצלחה; כשל זמני עוצר את השידור (הסדר נשמר) עד המחזור הבא."""
+        for entry_id, name, payload, attempts in self._spool.peek(self.FLUSH_BATCH):
+            try:
+                args, kwargs = json.loads(payload)
+                method = getattr(self.shared, name)
+            except Exception as e:
+                print(f"[REPLICA] bad spool entry {entry_id} ({name}) moved to write_spool_dead: {e}")
+                self._spool.bury(entry_id, f"bad entry: {e}")
+                continue
+            try:
+                result = method(*args, **kwargs)
+            except PERMANENT_WRITE_ERRORS as e:
+                if name in BATCH_WRITE_KWARGS and self._flush_batch_rows(entry_id, name, kwargs):
+                    continue
+                print(f"[REPLICA] spooled {name} failed permanently, moved to write_spool_dead: {e}")
+                self._spool.bury(entry_id, f"{type(e).__name__}: {e}")
+                continue
+            except Exception as e:
+                raise _SharedUnavailable(f"{name}: {e}")
+            if result is False:
+                # רוב מתודות הכתיבה בולעות שגיאות ומחזירות False: אם המסד המשותף לא זמין – נשאר
+                # בתור בלי הגבלה; אם הוא זמין, זה סירוב – אחרי כמה ניסיונות לא נתקעים עליו
+                if not self._shared_writable():
+                    raise _SharedUnavailable(f"{name} returned False (shared DB not writable)")
+                refused = int(attempts or 0) + 1
+                if refused >= MAX_REFUSED_ATTEMPTS:
+                    print(f"[REPLICA] spooled {name} refused {refused} times, moved to write_spool_dead")
+                    self._spool.bury(entry_id, f"returned False {refused} times")
+                    continue
+                self._spool.bump_attempts(entry_id)
+                raise _SharedUnavailable(f"{name} returned False (refused {refused}/{MAX_REFUSED_ATTEMPTS})")
+            self._spool.remove(entry_id)
+        return self._spool.count()
+
+    def _flush_batch_rows(self, entry_id: int, name: str, kwargs: dict) -> bool:
+        """מנה שנכשלה בשגיאה קבועה – שורה-שורה; רק השורות הפסולות עוברות ל-write_spool_dead.
+        ה-payload ברשומה מתעדכן אחרי כל שורה, כך שכשל זמני באמצע לא משדר שורות פעמיים."""
+        rows = [(key, row) for key in BATCH_WRITE_KWARGS[name] for row in (kwargs.get(key) or [])]
+        if len(rows) <= 1:
+            return False
+        method = getattr(self.shared, name)
+        for i, (key, row) in enumerate(rows):
+            try:
+                method(**{key: [row]})
+            except PERMANENT_WRITE_ERRORS as e:
+                print(f"[REPLICA] {name} row moved to write_spool_dead ({key}): {e}")
+                self._spool.bury_payload(name, json.dumps([[], {key: [row]}], ensure_ascii=False),
+                                         f"{type(e).__name__}: {e}")
+            except Exception as e:
+                raise _SharedUnavailable(f"{name}: {e}")
+            rest: Dict[str, list] = {}
+            for k, r in rows[i + 1:]:
+                rest.setdefault(k, []).append(r)
+            self._spool.update_payload(entry_id, json.dumps([[], rest], ensure_ascii=False))
+        self._spool.remove(entry_id)
+        return True
+
+    def _shared_writable(self) -> bool:
+        """האם אפשר לקחת עכשיו נעילת כתיבה על המסד המשותף"""
+        try:
+            conn = self.shared.get_connection()
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                conn.rollback()
+                return True
+            finally:
+                conn.close()
+        except Exception:
+            return False
+
+    # ------------------------------------------------------------------
+    # רענון
+    # ------------------------------------------------------------------
+
+    def _refresh(self) -> bool:
+        """משיכת שינויים מהמסד המשותף. True אם העותק עודכן."""
+        if self._needs_bootstrap:
+            self._bootstrap()
+            return True
+        counter = _file_change_counter(self.shared.db_path)
+        if counter is not None and counter == self._last_counter:
+            return False
+
+        src = self.shared.get_connection()
+        dst = self._refresh_connection()
+        try:
+            shared_tables = [str(r[0]) for r in src.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+            ).fetchall()]
+            local_tables = {str(r[0]) for r in dst.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table'"
+            ).fetchall()}
+            if any(t not in local_tables for t in shared_tables if t not in SKIP_TABLES):
+                raise sqlite3.OperationalError('schema changed')
+
+            versions: Dict[str, int] = {}
+            if 'content_versions' in shared_tables:
+                versions = {str(r[0]): int(r[1] or 0) for r in src.execute('SELECT name, version FROM content_versions')}
+
+            dst.execute('BEGIN IMMEDIATE')
+            now = time.monotonic()
+            # עבודה מוגבלת-קצב שבוצעה עכשיו / שנדחתה (ואז המונה לא מתקדם)
+            done_full: List[str] = []
+            deferred = False
+            for table in shared_tables:
+                if table in SKIP_TABLES or table == 'content_versions':
+                    continue
+                cols = _columns(src, table)
+                full_due = (now - self._last_full.get(table, 0.0)) >= self.FULL_REFRESH_SEC
+                if table in APPEND_ONLY_TABLES and 'id' in cols:
+                    self._pull_log_rows(src, dst, table)
+                    if table in DELETABLE_LOG_TABLES:
+                        if full_due:
+                            self._drop_deleted_rows(src, dst, table)
+                            done_full.append(table)
+                        else:
+                            deferred = True
+                elif 'updated_at' in cols and 'id' in cols:
+                    self._pull_updated_rows(src, dst, table)
+                    if full_due:
+                        self._drop_deleted_rows(src, dst, table)
+                        done_full.append(table)
+                    else:
+                        deferred = True
+                elif table in versions:
+                    if self._get_state(dst, f'cv:{table}') != str(versions[table]):
+                        self._copy_table(src, dst, table)
+                elif full_due:
+                    self._copy_table(src, dst, table)
+                    done_full.append(table)
+                else:
+                    deferred = True
+            self._pull_changed_students(src, dst, shared_tables)
+            if versions:
+                # אחרון: הטריגרים המקומיים קידמו מונים בזמן ההעתקה – מיישרים לערכי המשותף
+                self._copy_table(src, dst, 'content_versions')
+                for name, version in versions.items():
+                    self._set_state(dst, f'cv:{name}', version)
+            if 'change_log' in local_tables:
+                dst.execute('DELETE FROM change_log')
+            dst.commit()
+        except sqlite3.OperationalError as e:
+            try:
+                dst.rollback()
+            except Exception:
+                pass
+            msg = str(e).lower()
+            if 'no such' in msg or 'has no column' in msg or 'schema changed' in msg:
+                print(f"[REPLICA] schema changed ({e}) – rebuilding replica")
+                self._needs_bootstrap = True
+                return False
+            raise
+        except Exception:
+            try:
+                dst.rollback()
+            except Exception:
+                pass
+            raise
+        finally:
+            dst.close()
+            src.close()
+        for table in done_full:
+            self._last_full[table] = now
+        # טבלה שהעתקתה נדחתה עדיין לא משקפת את השינוי – לא מסמנים את המונה כמטופל
+        self._last_counter = None if deferred else counter
+        return True
+
+    @staticmethod
+    def _upsert(dst, table: str, cols: List[str], rows) -> int:
+        if not rows:
+            return 0
+        names = ', '.join(f'"{c}"' for c in cols)
+        marks = ', '.join('?' * len(cols))
+        dst.executemany(f'INSERT OR REPLACE INTO "{table}" ({names}) VALUES ({marks})', [tuple(r) for r in rows])
+        return len(rows)
+
+    def _copy_table(self, src, dst, table: str) -> None:
+        cur = src.execute(f'SELECT * FROM "{table}"')
+        cols = [d[0] for d in cur.description]
+        rows = cur.fetchall()
+        dst.execute(f'DELETE FROM "{table}"')
+        self._upsert(dst, table, cols, rows)
+
+    def _pull_updated_rows(self, src, dst, table: str) -> None:
+        mark = self._get_state(dst, f'upd:{table}')
+        since = mark
+        try:
+            since = (datetime.strptime(mark[:19], '%Y-%m-%d %H:%M:%S')
+                     - timedelta(seconds=UPDATED_AT_OVERLAP_SEC)).strftime('%Y-%m-%d %H:%M:%S')
+        except Exception:
+            pass
+        cur = src.execute(f'SELECT * FROM "{table}" WHERE updated_at >= ?', (since,))
+        cols = [d[0] for d in cur.description]
+        rows = cur.fetchall()
+        if rows:
+            self._upsert(dst, table, cols, rows)
+            top = max(str(r['updated_at'] or '') for r in rows)
+            if top > mark:
+                self._set_state(dst, f'upd:{table}', top)
+
+    @staticmethod
+    def _drop_deleted_rows(src, dst, table: str) -> None:
+        """מחיקות לא משאירות updated_at/id חדש – השוואת מזהים מול המשותף"""
+        shared_ids = {r[0] for r in src.execute(f'SELECT id FROM "{table}"')}
+        gone = [(i,) for (i,) in dst.execute(f'SELECT id FROM "{table}"') if i not in shared_ids]
+        if gone:
+            dst.executemany(f'DELETE FROM "{table}" WHERE id = ?', gone)
+
+    def _pull_log_rows(self, src, dst, table: str) -> None:
+        mark = int(self._get_state(dst, f'log:{table}', '0') or 0)
+        local_max = int(dst.execute(f'SELECT COALESCE(MAX(id), 0) FROM "{table}"').fetchone()[0] or 0)
+        if local_max > mark:
+            # שורות זמניות שנכתבו מקומית – כבר שודרו (ה-spool ריק) ויחזרו עם המזהים של המשותף
+            if table == 'swipe_log':
+                self._unsummarize_swipes(dst, mark)
+            dst.execute(f'DELETE FROM "{table}" WHERE id > ?', (mark,))
+        # שורות שהועברו לארכיון במשותף (retention) – מזהה קטן מהמינימום שנשאר שם
+        floor = src.execute(f'SELECT MIN(id) FROM "{table}"').fetchone()[0]
+        if floor is None:
+            dst.execute(f'DELETE FROM "{table}" WHERE id <= ?', (mark,))
+        else:
+            dst.execute(f'DELETE FROM "{table}" WHERE id < ?', (int(floor),))
+        while True:
+            cur = src.execute(f'SELECT * FROM "{table}" WHERE id > ? ORDER BY id LIMIT 5000', (mark,))
+            cols = [d[0] for d in cur.description]
+            rows = cur.fetchall()
+            if not rows:
+                break
+            self._upsert(dst, table, cols, rows)
+            mark = int(rows[-1]['id'])
+        self._set_state(dst, f'log:{table}', mark)
+
+    @staticmethod
+    def _unsummarize_swipes(dst, mark: int) -> None:
+        """הורדת השורות הזמניות מ-swipe_daily; השורות מהמשותף יסוכמו בקריאה הבאה"""
+        try:
+            row = dst.execute('SELECT last_swipe_id FROM swipe_daily_state WHERE id = 1').fetchone()
+        except sqlite3.OperationalError:
+            return
+        summarized = int((row[0] if row else 0) or 0)
+        if summarized <= mark:
+            return
+        groups = dst.execute(
+            '''
+            SELECT student_id, substr(swiped_at, 1, 10) AS d, COALESCE(station_type, '') AS st, COUNT(1) AS n
+              FROM swipe_log
+             WHERE id > ? AND id <= ? AND student_id IS NOT NULL AND swiped_at IS NOT NULL
+             GROUP BY student_id, substr(swiped_at, 1, 10), COALESCE(station_type, '')
+            ''',
+            (mark, summarized)
+        ).fetchall()
+        dst.executemany(
+            'UPDATE swipe_daily SET count = count - ? WHERE student_id = ? AND date = ? AND station_type = ?',
+            [(int(g['n']), g['student_id'], g['d'], g['st']) for g in groups]
+        )
+        dst.execute('DELETE FROM swipe_daily WHERE count <= 0')
+        dst.execute('UPDATE swipe_daily_state SET last_swipe_id = ? WHERE id = 1', (mark,))
+
+    def _pull_changed_students(self, src, dst, shared_tables) -> None:
+        """תלמידים שהופיעו ב-change_log מאז הפעם הקודמת (כתיבות שלא קידמו updated_at)"""
+        if 'change_log' not in shared_tables or 'students' not in shared_tables:
+            return
+        mark = int(self._get_state(dst, 'change_log', '0') or 0)
+        rows = src.execute(
+            'SELECT id, entity_type, entity_id FROM change_log WHERE id > ? ORDER BY id LIMIT 20000', (mark,)
+        ).fetchall()
+        if not rows:
+            return
+        ids = set()
+        for r in rows:
+            if str(r['entity_type'] or '').startswith('student'):
+                try:
+                    ids.add(int(r['entity_id']))
+                except Exception:
+                    continue
+        ids = sorted(ids)
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            cur = src.execute(f'SELECT * FROM students WHERE id IN ({",".join("?" * len(chunk))})', chunk)
+            self._upsert(dst, 'students', [d[0] for d in cur.description], cur.fetchall())
+        self._set_state(dst, 'change_log', int(rows[-1]['id']))
+
+    # ------------------------------------------------------------------
+    # תהליכון רקע
+    # ------------------------------------------------------------------
+
+    def _loop(self) -> None:
+        backoff = 1.0
+        while not self._stop.is_set():
+            wait = self.REFRESH_SEC
+            try:
+                remaining = self._flush()
+                if remaining:
+                    wait = 0.2
+                else:
+                    # רענון רק אחרי שכל הכתיבות המקומיות הגיעו למשותף – אחרת הן היו נדרסות
+                    self._refresh()
+                backoff = 1.0
+            except _SharedUnavailable as e:
+                print(f"[REPLICA] shared DB unavailable, will retry: {e}")
+                wait = backoff
+                backoff = min(30.0, backoff * 2)
+            except Exception as e:
+                print(f"[REPLICA] cycle failed: {e}")
+                wait = backoff
+                backoff = min(30.0, backoff * 2)
+            self._wake.wait(wait)
+            self._wake.clear()
+        try:
+            self._flush()
+        except Exception:
+            pass
+
+    def pending_writes(self) -> int:
+        try:
+            return self._spool.count()
+        except Exception:
+            return 0
+
+    def failed_writes(self) -> int:
+        """כתיבות שהועברו ל-write_spool_dead"""
+        try:
+            return self._spool.dead_count()
+        except Exception:
+            return 0
+
+    def stop_replica(self, flush_timeout: float = 2.0) -> None:
+        """עצירת תהליכון הרקע, עם ניסיון אחרון קצר לשדר את ה-spool (מה שנשאר יישלח בעלייה הבאה)"""
+        self._stop.set()
+        self._wake.set()
+        try:
+            self._thread.join(timeout=flush_timeout)
+        except Exception:
+            pass
+
+
+def _spooled(name: str):
+    def method(self, *args, **kwargs):
+        return self._write(name, args, kwargs)
+    method.__name__ = name
+    method.__doc__ = f"{name} – נרשם ב-spool, מוחל מקומית ומשודר למסד המשותף ברקע"
+    return method
+
+
+def _direct(name: str):
+    def method(self, *args, **kwargs):
+        return self._write_through(name, args, kwargs)
+    method.__name__ = name
+    method.__doc__ = f"{name} – נכתב ישירות למסד המשותף ואז לעותק המקומי"
+    return method
+
+
+for _name in WRITE_METHODS:
+    setattr(ReplicaDatabase, _name, _spooled(_name))
+for _name in DIRECT_WRITE_METHODS:
+    setattr(ReplicaDatabase, _name, _direct(_name))
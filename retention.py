@@ -0,0 +1,451 @@
+# -*- coding: utf-8 -*-
+"""
+שמירה, סיכום וארכוב של טבלאות לוג גדולות ב-school_points.db
+
+כל טבלה מקבלת מדיניות: כמה זמן לשמור שורות גולמיות, האם לסכם אותן לטבלה
+יומית לפני מחיקה, והאם להעביר אותן לקובץ ארכיון לפי שנת לימודים
+(archive/school_points_<שנה>.db). קבצי הארכיון נשארים זמינים לשאילתות
+דרך ATTACH (ראו open_with_archives).
+
+המחיקה נעשית במנות קטנות – כל מנה בטרנזקציה קצרה משלה – כדי שנעילת
+הכתיבה על ה-DB המשותף לא תוחזק יותר מכמה מילישניות בכל פעם.
+"""
+
+import os
+import re
+import sqlite3
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+# מדיניות ברירת מחדל. keep_days – שמירה לפי ימים; keep_school_years – שמירת
+# שנת הלימודים הנוכחית + X-1 שנים קודמות. rollup – טבלת סיכום יומית לפי תלמיד.
+# utc – העמודה נשמרת ב-UTC (CURRENT_TIMESTAMP); החיתוך והימים מחושבים בזמן מקומי.
+DEFAULT_POLICIES: List[Dict[str, Any]] = [
+    {
+        'table': 'card_validations',
+        'ts_col': 'validated_at',
+        'utc': True,
+        'keep_days': 30,
+        'rollup': 'card_validations_daily',
+        'archive': False,
+    },
+    {
+        'table': 'anti_spam_events',
+        'ts_col': 'created_at',
+        'utc': True,
+        'keep_days': 180,
+        'archive': True,
+    },
+    {
+        'table': 'points_log',
+        'ts_col': 'created_at',
+        'utc': True,
+        'keep_school_years': 2,
+        'archive': True,
+    },
+    {
+        'table': 'points_history',
+        'ts_col': 'added_at',
+        'utc': True,
+        'keep_school_years': 2,
+        'archive': True,
+    },
+    {
+        'table': 'swipe_log',
+        'ts_col': 'swiped_at',
+        'keep_school_years': 2,
+        'archive': True,
+    },
+    {
+        # הסיכום היומי של swipe_log נשמר ומאורכב באותה מדיניות כמו הטבלה הגולמית
+        'table': 'swipe_daily',
+        'ts_col': 'date',
+        'keep_school_years': 2,
+        'archive': True,
+    },
+    {
+        'table': 'time_bonus_given',
+        'ts_col': 'given_date',
+        'keep_school_years': 2,
+        'archive': True,
+    },
+]
+
+ARCHIVE_TABLES = tuple(p['table'] for p in DEFAULT_POLICIES if p.get('archive'))
+
+_SAFE_NAME_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+def school_year_start(d: date) -> date:
+    """תחילת שנת הלימודים (1 בספטמבר) שבה נמצא התאריך"""
+    if d.month >= 9:
+        return date(d.year, 9, 1)
+    return date(d.year - 1, 9, 1)
+
+
+def school_year_label(d: date) -> str:
+    """שם שנת לימודים, למשל 2025-2026"""
+    start = school_year_start(d)
+    return f"{start.year}-{start.year + 1}"
+
+
+def archive_dir_for(db_path: str) -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(db_path)) or '.', 'archive')
+
+
+def archive_path_for(db_path: str, label: str) -> str:
+    return os.path.join(archive_dir_for(db_path), f"school_points_{label}.db")
+
+
+def list_archives(db_path: str) -> Dict[str, str]:
+    """label -> נתיב קובץ ארכיון"""
+    result: Dict[str, str] = {}
+    folder = archive_dir_for(db_path)
+    try:
+        names = sorted(os.listdir(folder))
+    except Exception:
+        return result
+    for name in names:
+        m = re.match(r'^school_points_(\d{4}-\d{4})\.db$', name)
+        if m:
+            result[m.group(1)] = os.path.join(folder, name)
+    return result
+
+
+def open_with_archives(db, tables=ARCHIVE_TABLES) -> sqlite3.Connection:
+    """חיבור ל-DB הראשי עם כל קבצי הארכיון מחוברים (ATTACH).
+
+    לכל טבלה נוצר TEMP VIEW בשם <table>_all שמאחד את הנתונים העדכניים
+    עם כל שנות הארכיון – לשימוש בייצוא דוחות היסטוריים.
+    """
+    conn = db.get_connection()
+    aliases: List[str] = []
+    for label, path in list_archives(db.db_path).items():
+        alias = 'arch_' + label.replace('-', '_')
+        try:
+            conn.execute('ATTACH DATABASE ? AS ' + alias, (path,))
+            aliases.append(alias)
+        except Exception as e:
+            print(f"[RETENTION] attach failed for {path}: {e}")
+    for t in tables:
+        if not _SAFE_NAME_RE.match(str(t)):
+            continue
+        parts = [f"SELECT * FROM main.{t}"]
+        for alias in aliases:
+            try:
+                row = conn.execute(
+                    f"SELECT 1 FROM {alias}.sqlite_master WHERE type='table' AND name=?", (t,)
+                ).fetchone()
+            except Exception:
+                row = None
+            if row:
+                parts.append(f"SELECT * FROM {alias}.{t}")
+        try:
+            conn.execute(f"DROP VIEW IF EXISTS temp.{t}_all")
+            conn.execute(f"CREATE TEMP VIEW {t}_all AS " + " UNION ALL ".join(parts))
+        except Exception as e:
+            print(f"[RETENTION] view {t}_all failed: {e}")
+    return conn
+
+
+class RetentionManager:
+    """הרצת מדיניות השמירה על ה-DB – במנות קצרות"""
+
+    def __init__(self, db, policies: Optional[List[Dict[str, Any]]] = None,
+                 chunk_size: int = 300, pause_sec: float = 0.05):
+        self.db = db
+        self.policies = [dict(p) for p in (policies if policies is not None else DEFAULT_POLICIES)]
+        self.chunk_size = max(50, int(chunk_size or 300))
+        self.pause_sec = max(0.0, float(pause_sec or 0.0))
+
+    def apply_overrides(self, overrides: Optional[Dict[str, Any]]) -> None:
+        """עדכון מדיניות מהגדרות (config['retention_policies'] = {table: {...}})"""
+        if not isinstance(overrides, dict):
+            return
+        for p in self.policies:
+            o = overrides.get(p['table'])
+            if isinstance(o, dict):
+                p.update({k: v for k, v in o.items() if k in ('keep_days', 'keep_school_years', 'archive', 'enabled')})
+
+    def _cutoff_for(self, policy: Dict[str, Any], today: date) -> Optional[date]:
+        """התאריך שלפניו שורות יוסרו מהטבלה הראשית"""
+        try:
+            if policy.get('keep_days') is not None:
+                days = int(policy.get('keep_days') or 0)
+                if days <= 0:
+                    return None
+                return today - timedelta(days=days)
+            years = int(policy.get('keep_school_years') or 0)
+            if years <= 0:
+                return None
+            start = school_year_start(today)
+            return date(start.year - (years - 1), 9, 1)
+        except Exception:
+            return None
+
+    def _ensure_rollup_table(self, conn: sqlite3.Connection, name: str) -> None:
+        conn.execute(
+            f'''
+            CREATE TABLE IF NOT EXISTS {name} (
+                student_id INTEGER NOT NULL,
+                day TEXT NOT NULL,
+                count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (student_id, day)
+            )
+            '''
+        )
+
+    @staticmethod
+    def _archive_ddl(conn: sqlite3.Connection, target: str, table: str) -> str:
+        """CREATE TABLE לארכיון לפי הטבלה הראשית – עם PRIMARY KEY ו-UNIQUE (בלי מפתחות זרים,
+        שטבלאות ההורה שלהם לא נמצאות בקובץ הארכיון), כך ש-INSERT OR IGNORE לא משכפל שורות"""
+        cols = conn.execute(f"PRAGMA main.table_info({table})").fetchall()
+        pk = [str(c[1]) for c in sorted((c for c in cols if int(c[5] or 0) > 0), key=lambda c: int(c[5]))]
+        defs = []
+        for cid, name, ctype, notnull, dflt, pk_pos in cols:
+            d = f'"{name}" {ctype or ""}'.rstrip()
+            if len(pk) == 1 and int(pk_pos or 0) == 1:
+                d += ' PRIMARY KEY'
+            if notnull:
+                d += ' NOT NULL'
+            if dflt is not None:
+                d += f' DEFAULT {dflt}'
+            defs.append(d)
+        if len(pk) > 1:
+            defs.append('PRIMARY KEY (' + ', '.join(f'"{c}"' for c in pk) + ')')
+        for idx in conn.execute(f"PRAGMA main.index_list({table})").fetchall():
+            # (seq, name, unique, origin, partial)
+            if not int(idx[2] or 0) or str(idx[3]) == 'pk' or (len(idx) > 4 and int(idx[4] or 0)):
+                continue
+            names = [str(r[2]) for r in conn.execute(f"PRAGMA main.index_info(\"{idx[1]}\")").fetchall()]
+            if names and all(names):
+                defs.append('UNIQUE (' + ', '.join(f'"{c}"' for c in names) + ')')
+        return f"CREATE TABLE {target} (\n    " + ',\n    '.join(defs) + "\n)"
+
+    def _ensure_archive_table(self, conn: sqlite3.Connection, alias: str, table: str) -> None:
+        row = conn.execute(
+            f"SELECT 1 FROM {alias}.sqlite_master WHERE type='table' AND name=?", (table,)
+        ).fetchone()
+        if not row:
+            conn.execute(self._archive_ddl(conn, f"{alias}.{table}", table))
+            return
+        # ארכיון שנוצר בעבר בלי אילוצים (CREATE TABLE AS) – בנייה מחדש עם מפתח, תוך הסרת כפילויות
+        has_key = any(int(c[5] or 0) for c in conn.execute(f"PRAGMA {alias}.table_info({table})").fetchall())
+        main_has_key = any(int(c[5] or 0) for c in conn.execute(f"PRAGMA main.table_info({table})").fetchall())
+        if has_key or not main_has_key:
+            return
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(self._archive_ddl(conn, f"{alias}.{table}__new", table))
+            conn.execute(f"INSERT OR IGNORE INTO {alias}.{table}__new SELECT * FROM {alias}.{table}")
+            conn.execute(f"DROP TABLE {alias}.{table}")
+            conn.execute(f"ALTER TABLE {alias}.{table}__new RENAME TO {table}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def _db_size(self, conn: sqlite3.Connection) -> Dict[str, int]:
+        try:
+            page_size = int(conn.execute('PRAGMA page_size').fetchone()[0] or 0)
+            page_count = int(conn.execute('PRAGMA page_count').fetchone()[0] or 0)
+            freelist = int(conn.execute('PRAGMA freelist_count').fetchone()[0] or 0)
+        except Exception:
+            return {'bytes': 0, 'free_bytes': 0}
+        return {'bytes': page_size * page_count, 'free_bytes': page_size * freelist}
+
+    def _purge_table(self, conn: sqlite3.Connection, policy: Dict[str, Any], cutoff: date,
+                     stats: Dict[str, Any]) -> int:
+        table = str(policy.get('table') or '')
+        ts_col = str(policy.get('ts_col') or 'created_at')
+        if not (_SAFE_NAME_RE.match(table) and _SAFE_NAME_RE.match(ts_col)):
+            return 0
+        try:
+            exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)
+            ).fetchone()
+        except Exception:
+            exists = None
+        if not exists:
+            return 0
+
+        rollup = str(policy.get('rollup') or '')
+        if rollup and not _SAFE_NAME_RE.match(rollup):
+            rollup = ''
+        if rollup:
+            self._ensure_rollup_table(conn, rollup)
+            conn.commit()
+
+        if policy.get('utc'):
+            # עמודת UTC: חצות מקומית של יום החיתוך מומרת ל-UTC, והימים (סיכום/שנת ארכיון) מקומיים
+            cutoff_s = conn.execute(
+                "SELECT datetime(?, 'utc')", (cutoff.isoformat() + ' 00:00:00',)
+            ).fetchone()[0]
+            day_expr = f"date({ts_col}, 'localtime')"
+        else:
+            cutoff_s = cutoff.isoformat()
+            day_expr = f"date({ts_col})"
+        removed = 0
+        attached: Dict[str, str] = {}
+        try:
+            while True:
+                # המנה הבאה נבחרת לפי id כך שכל טרנזקציה קצרה וצפויה
+                ids = [int(r[0]) for r in conn.execute(
+                    f"SELECT id FROM {table} WHERE {ts_col} < ? ORDER BY id LIMIT ?",
+                    (cutoff_s, int(self.chunk_size))
+                ).fetchall()]
+                if not ids:
+                    break
+
+                label_by_id: Dict[str, List[int]] = {}
+                if policy.get('archive'):
+                    qmarks = ','.join('?' * len(ids))
+                    for rid, day in conn.execute(
+                        f"SELECT id, {day_expr} FROM {table} WHERE id IN ({qmarks})", ids
+                    ).fetchall():
+                        try:
+                            d = datetime.fromisoformat(str(day or '')[:10]).date()
+                        except Exception:
+                            d = cutoff
+                        label_by_id.setdefault(school_year_label(d), []).append(int(rid))
+                    for label in label_by_id:
+                        if label in attached:
+                            continue
+                        path = archive_path_for(self.db.db_path, label)
+                        os.makedirs(os.path.dirname(path), exist_ok=True)
+                        alias = 'arch_' + label.replace('-', '_')
+                        conn.execute('ATTACH DATABASE ? AS ' + alias, (path,))
+                        attached[label] = alias
+                        self._ensure_archive_table(conn, alias, table)
+                        conn.commit()
+
+                qmarks = ','.join('?' * len(ids))
+                t0 = time.perf_counter()
+                conn.execute('BEGIN IMMEDIATE')
+                try:
+                    for label, group in label_by_id.items():
+                        gq = ','.join('?' * len(group))
+                        conn.execute(
+                            f"INSERT OR IGNORE INTO {attached[label]}.{table} SELECT * FROM main.{table} WHERE id IN ({gq})",
+                            group
+                        )
+                    if rollup:
+                        conn.execute(
+                            f'''
+                            INSERT INTO {rollup} (student_id, day, count)
+                            SELECT student_id, {day_expr}, COUNT(1)
+                              FROM {table}
+                             WHERE id IN ({qmarks})
+                             GROUP BY student_id, {day_expr}
+                            ON CONFLICT(student_id, day) DO UPDATE SET count = count + excluded.count
+                            ''',
+                            ids
+                        )
+                    conn.execute(f"DELETE FROM {table} WHERE id IN ({qmarks})", ids)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                stats['max_lock_ms'] = max(float(stats.get('max_lock_ms') or 0.0), (time.perf_counter() - t0) * 1000.0)
+                removed += len(ids)
+                if len(ids) < self.chunk_size:
+                    break
+                if self.pause_sec:
+                    # משחרר את ה-DB לעמדות אחרות בין מנות
+                    time.sleep(self.pause_sec)
+        finally:
+            for alias in attached.values():
+                try:
+                    conn.execute('DETACH DATABASE ' + alias)
+                except Exception:
+                    pass
+        return removed
+
+    def run(self, today: Optional[date] = None, vacuum: bool = False) -> Dict[str, Any]:
+        """הרצת כל המדיניות. מחזיר דוח: שורות שהוסרו לכל טבלה ונפח שהתפנה"""
+        if today is None:
+            today = date.today()
+        report: Dict[str, Any] = {'tables': {}, 'max_lock_ms': 0.0}
+        conn = self.db.get_connection()
+        # ניהול טרנזקציות ידני (BEGIN IMMEDIATE לכל מנה)
+        conn.isolation_level = None
+        try:
+            before = self._db_size(conn)
+            for policy in self.policies:
+                if policy.get('enabled') is False:
+                    continue
+                cutoff = self._cutoff_for(policy, today)
+                if cutoff is None:
+                    continue
+                try:
+                    n = self._purge_table(conn, policy, cutoff, report)
+                except Exception as e:
+                    print(f"[RETENTION] {policy.get('table')}: {e}")
+                    n = 0
+                report['tables'][policy.get('table')] = {'removed': int(n), 'cutoff': cutoff.isoformat()}
+            if vacuum:
+                try:
+                    conn.execute('VACUUM')
+                except Exception as e:
+                    print(f"[RETENTION] vacuum failed: {e}")
+            after = self._db_size(conn)
+        finally:
+            conn.close()
+        report['bytes_before'] = int(before.get('bytes') or 0)
+        report['bytes_after'] = int(after.get('bytes') or 0)
+        report['reclaimed_bytes'] = max(0, report['bytes_before'] - report['bytes_after'])
+        # דפים פנויים בתוך הקובץ – ינוצלו ע"י כתיבות חדשות או ישוחררו ב-VACUUM
+        report['reusable_bytes'] = int(after.get('free_bytes') or 0)
+        report['removed_total'] = sum(int(v.get('removed') or 0) for v in report['tables'].values())
+        return report
+
+
+def run_if_due(db, config: Optional[Dict[str, Any]] = None, min_interval_hours: float = 20.0) -> Optional[Dict[str, Any]]:
+    """הרצה מתוזמנת: לכל היותר פעם ב-min_interval_hours (חותמת זמן בתיקיית הארכיון)"""
+    cfg = config if isinstance(config, dict) else {}
+    if cfg.get('retention_enabled') is False:
+        return None
+    stamp = os.path.join(archive_dir_for(db.db_path), 'last_retention_run.txt')
+    try:
+        last = float(os.path.getmtime(stamp))
+    except Exception:
+        last = 0.0
+    if (time.time() - last) < float(min_interval_hours) * 3600.0:
+        return None
+    mgr = RetentionManager(db)
+    mgr.apply_overrides(cfg.get('retention_policies'))
+    report = mgr.run()
+    try:
+        os.makedirs(os.path.dirname(stamp), exist_ok=True)
+        with open(stamp, 'w', encoding='utf-8') as f:
+            f.write(format_report(report))
+    except Exception:
+        pass
+    return report
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    lines = []
+    for table, info in (report.get('tables') or {}).items():
+        lines.append(f"{table}: {int(info.get('removed') or 0)} rows (< {info.get('cutoff')})")
+    mb = 1024.0 * 1024.0
+    lines.append(
+        f"reclaimed {report.get('reclaimed_bytes', 0) / mb:.2f}MB, "
+        f"reusable {report.get('reusable_bytes', 0) / mb:.2f}MB, "
+        f"max lock {float(report.get('max_lock_ms') or 0.0):.1f}ms"
+    )
+    return "\n".join(lines)
+
+
+if __name__ == '__main__':
+    import sys
+    from database import Database
+
+    args = [a for a in sys.argv[1:] if not a.startswith('--')]
+    db = Database(args[0]) if args else Database()
+    if '--rebuild-swipe-daily' in sys.argv:
+        # בנייה מחדש של הסיכום היומי של התיקופים מתוך swipe_log
+        print(f"swipe_daily: {db.rebuild_swipe_daily()} rows")
+    else:
+        print(format_report(RetentionManager(db).run(vacuum=('--vacuum' in sys.argv))))
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+זמינות סלוטים לאתגרים מתוזמנים (עמדת קופה)
+
+לכל אתגר נטענים בשאילתה מקובצת אחת – לכל התאריכים המבוקשים יחד – מספר
+ההזמנות והשריונים החיים (של עמדות אחרות) לכל (תאריך, שעת התחלה). התוצאה
+נשמרת בזיכרון ל-TTL קצר ומתבטלת אחרי שריון/ניקוי שריונים/רכישה בעמדה.
+"הסלוט הפנוי הראשון שאינו מתנגש לתלמיד" מחושב בקריאה אחת, כולל בדיקת
+התנגשויות מול ההזמנות והשריונים של התלמיד בכל התאריכים.
+"""
+
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+def _to_min(hhmm) -> int:
+    try:
+        s = str(hhmm or '').strip()
+        if ':' not in s:
+            return -1
+        hh, mm = s.split(':', 1)
+        return int(hh) * 60 + int(mm[:2])
+    except Exception:
+        return -1
+
+
+def _fmt_min(m: int) -> str:
+    return f"{int(m) // 60:02d}:{int(m) % 60:02d}"
+
+
+def _overlaps(start: int, dur: int, busy: Iterable[Tuple[int, int]]) -> bool:
+    end = start + dur
+    for os_, od in busy:
+        if os_ < 0 or od <= 0:
+            continue
+        if start < os_ + od and os_ < end:
+            return True
+    return False
+
+
+class SlotAvailability:
+    """מטמון זמינות לפי (service_id, date) עם TTL קצר"""
+
+    def __init__(self, db, station_id: str = '', ttl_sec: float = 3.0):
+        self.db = db
+        self.station_id = str(station_id or '').strip()
+        self.ttl_sec = max(0.5, float(ttl_sec or 3.0))
+        self._lock = threading.Lock()
+        # service_id -> (ts, service row)
+        self._services: Dict[int, Tuple[float, Dict[str, Any]]] = {}
+        # (service_id, date) -> (ts, [slot dict])
+        self._slots: Dict[Tuple[int, str], Tuple[float, List[Dict[str, Any]]]] = {}
+
+    def invalidate(self, service_id: Optional[int] = None) -> None:
+        with self._lock:
+            if service_id is None:
+                self._slots.clear()
+                self._services.clear()
+                return
+            sid = int(service_id or 0)
+            for key in [k for k in self._slots if k[0] == sid]:
+                self._slots.pop(key, None)
+            self._services.pop(sid, None)
+
+    # ------------------------------------------------------------------
+
+    def _service(self, cursor, sid: int) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            hit = self._services.get(sid)
+        if hit and (now - hit[0]) < self.ttl_sec:
+            return hit[1]
+        cursor.execute(
+            '''
+            SELECT id, start_time, end_time, duration_minutes, capacity_per_slot
+              FROM scheduled_services WHERE id = ? AND is_active = 1
+            ''',
+            (sid,)
+        )
+        row = cursor.fetchone()
+        svc = dict(row) if row else None
+        with self._lock:
+            self._services[sid] = (now, svc)
+        return svc
+
+    def _layout(self, svc: Dict[str, Any]) -> List[int]:
+        """שעות התחלה של הסלוטים: מ-start_time עד end_time בקפיצות של משך האתגר"""
+        start = _to_min(svc.get('start_time'))
+        end = _to_min(svc.get('end_time'))
+        dur = int(svc.get('duration_minutes') or 0)
+        if start < 0 or end < 0 or dur <= 0:
+            return []
+        return list(range(start, end - dur + 1, dur))
+
+    def _load(self, sid: int, dates: List[str]) -> None:
+        """שאילתה מקובצת אחת: הזמנות + שריונים חיים לכל (תאריך, סלוט) של האתגר"""
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        try:
+            svc = self._service(cursor, sid)
+            if not svc:
+                now = time.time()
+                with self._lock:
+                    for d in dates:
+                        self._slots[(sid, d)] = (now, [])
+                return
+            marks = ','.join('?' * len(dates))
+            cursor.execute(
+                f'''
+                SELECT service_date, slot_start_time, SUM(res) AS reserved, SUM(held) AS held
+                  FROM (
+                        SELECT service_date, slot_start_time, 1 AS res, 0 AS held
+                          FROM scheduled_service_reservations
+                         WHERE service_id = ? AND service_date IN ({marks})
+                        UNION ALL
+                        SELECT service_date, slot_start_time, 0 AS res, COALESCE(qty, 1) AS held
+                          FROM purchase_holds
+                         WHERE hold_type = 'scheduled'
+                           AND service_id = ? AND service_date IN ({marks})
+                           AND expires_at > CURRENT_TIMESTAMP
+                           AND station_id <> ?
+                       )
+                 GROUP BY service_date, slot_start_time
+                ''',
+                (sid, *dates, sid, *dates, self.station_id)
+            )
+            used: Dict[Tuple[str, int], Tuple[int, int]] = {}
+            for r in (cursor.fetchall() or []):
+                used[(str(r['service_date']), _to_min(r['slot_start_time']))] = (
+                    int(r['reserved'] or 0), int(r['held'] or 0)
+                )
+        finally:
+            conn.close()
+
+        cap = max(1, int(svc.get('capacity_per_slot') or 1))
+        dur = int(svc.get('duration_minutes') or 0)
+        layout = self._layout(svc)
+        now = time.time()
+        with self._lock:
+            for d in dates:
+                slots = []
+                for m in layout:
+                    reserved, held = used.get((d, m), (0, 0))
+                    slots.append({
+                        'slot_start_time': _fmt_min(m),
+                        'duration_minutes': dur,
+                        'capacity': cap,
+                        'reserved': reserved,
+                        'held': held,
+                        'remaining': max(0, cap - reserved - held),
+                    })
+                self._slots[(sid, d)] = (now, slots)
+
+    def slots_for_dates(self, service_id: int, dates: Iterable[str]) -> Dict[str, List[Dict[str, Any]]]:
+        sid = int(service_id or 0)
+        wanted = [str(d or '').strip() for d in (dates or []) if str(d or '').strip()]
+        now = time.time()
+        with self._lock:
+            stale = [d for d in wanted
+                     if (sid, d) not in self._slots or (now - self._slots[(sid, d)][0]) >= self.ttl_sec]
+        if stale:
+            self._load(sid, stale)
+        with self._lock:
+            return {d: [dict(s) for s in (self._slots.get((sid, d)) or (0, []))[1]] for d in wanted}
+
+    def slots(self, service_id: int, service_date: str) -> List[Dict[str, Any]]:
+        """כמו get_scheduled_service_slots – מהמטמון"""
+        d = str(service_date or '').strip()
+        return self.slots_for_dates(service_id, [d]).get(d, [])
+
+    # ------------------------------------------------------------------
+
+    def _student_busy(self, student_id: int, dates: List[str]) -> Dict[str, List[Tuple[int, int]]]:
+        """הזמנות + שריונים חיים של התלמיד בתאריכים (כל האתגרים, כל העמדות)"""
+        busy: Dict[str, List[Tuple[int, int]]] = {}
+        if not student_id or not dates:
+            return busy
+        marks = ','.join('?' * len(dates))
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                f'''
+                SELECT service_date, slot_start_time, duration_minutes
+                  FROM scheduled_service_reservations
+                 WHERE student_id = ? AND service_date IN ({marks})
+                UNION ALL
+                SELECT service_date, slot_start_time, duration_minutes
+                  FROM purchase_holds
+                 WHERE hold_type = 'scheduled'
+                   AND student_id = ? AND service_date IN ({marks})
+                   AND expires_at > CURRENT_TIMESTAMP
+                ''',
+                (int(student_id), *dates, int(student_id), *dates)
+            )
+            for r in (cursor.fetchall() or []):
+                busy.setdefault(str(r['service_date']), []).append(
+                    (_to_min(r['slot_start_time']), int(r['duration_minutes'] or 0))
+                )
+        finally:
+            conn.close()
+        return busy
+
+    def first_free_slot(self, service_id: int, dates: Iterable[str], student_id: int,
+                        extra_busy: Iterable[Dict[str, Any]] = ()) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """(תאריך, סלוט) הראשון עם מקום שאינו מתנגש עם התלמיד; None אם אין.
+        extra_busy – סלוטים שכבר בעגלה ({'service_date','slot_start_time','duration_minutes'})."""
+        wanted = [str(d or '').strip() for d in (dates or []) if str(d or '').strip()]
+        if not wanted:
+            return None
+        by_date = self.slots_for_dates(service_id, wanted)
+        busy = self._student_busy(int(student_id or 0), wanted)
+        for r in (extra_busy or []):
+            try:
+                busy.setdefault(str(r.get('service_date') or '').strip(), []).append(
+                    (_to_min(r.get('slot_start_time')), int(r.get('duration_minutes') or 0))
+                )
+            except Exception:
+                continue
+        for d in wanted:
+            for s in by_date.get(d) or []:
+                if int(s.get('remaining') or 0) <= 0:
+                    continue
+                start = _to_min(s.get('slot_start_time'))
+                if start < 0 or _overlaps(start, int(s.get('duration_minutes') or 0), busy.get(d, ())):
+                    continue
+                return d, s
+        return None
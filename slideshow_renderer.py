@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+מנוע מצגת/מונטאז' רקע לעמדה הציבורית
+
+- מטמון חסום (LRU) של אריחים מוקטנים מראש לפי (נתיב, mtime, גודל תא, פריסה, צבע רקע) –
+  תמונה שכבר פוענחה והוקטנה לא נפתחת שוב מהשיתוף בכל סבב;
+- תהליכון רקע שמרכיב את הפריים *הבא* מראש, כך שבטיימר של Tk נשאר רק להחליף תמונה.
+
+המודול עובד רק עם PIL; יצירת PhotoImage וכל גישה ל-Tk נשארות בתהליכון הראשי.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional, Sequence, Tuple
+
+from PIL import Image, ImageOps
+
+
+def _file_mtime(path: str) -> Optional[float]:
+    try:
+        return os.path.getmtime(path)
+    except Exception:
+        return None
+
+
+def open_oriented(path: str) -> Image.Image:
+    """פתיחת תמונה מהדיסק כולל כיבוד כיוון EXIF, במצב RGB/RGBA"""
+    with Image.open(path) as raw:
+        raw.load()
+        img = raw
+        # כיבוד כיוון התמונה לפי EXIF (כמו בצפייה רגילה בקבצים)
+        try:
+            img = ImageOps.exif_transpose(raw)
+        except Exception:
+            pass
+    if img.mode not in ('RGB', 'RGBA'):
+        img = img.convert('RGB')
+    return img
+
+
+def render_tile(img: Image.Image, cell_size: int, layout: str, bg_color) -> Image.Image:
+    """התאמת תמונה לריבוע cell_size×cell_size בהתאם ל-background_layout"""
+    if layout in ('contain', 'center', 'tile'):
+        layout = 'cover'
+
+    if layout in ('stretch',):
+        # מתיחה לא אחידה – ממלאת את כל הריבוע ללא שוליים (עלולה לעוות מעט).
+        return img.resize((cell_size, cell_size), Image.Resampling.LANCZOS)
+
+    if layout in ('cover',):
+        # כיסוי מלא של הריבוע תוך שמירת יחס – עלול לחתוך מעט מהקצוות, בלי פסים שחורים.
+        scale_ratio = max(cell_size / max(1, img.width), cell_size / max(1, img.height))
+        new_w = max(1, int(img.width * scale_ratio))
+        new_h = max(1, int(img.height * scale_ratio))
+        img_resized = img.resize((new_w, new_h), Image.Resampling.LANCZOS)
+
+        # חיתוך מרכזי לריבוע מדויק בגודל cell_size×cell_size
+        left = max(0, (new_w - cell_size) // 2)
+        top = max(0, (new_h - cell_size) // 2)
+        right = left + cell_size
+        bottom = top + cell_size
+        if right > new_w:
+            right = new_w
+            left = max(0, right - cell_size)
+        if bottom > new_h:
+            bottom = new_h
+            top = max(0, bottom - cell_size)
+        return img_resized.crop((left, top, right, bottom))
+
+    # ברירת מחדל – התמונה כולה נכנסת לריבוע, עם שוליים במידת הצורך.
+    scale_ratio = min(cell_size / max(1, img.width), cell_size / max(1, img.height))
+    new_w = max(1, int(img.width * scale_ratio))
+    new_h = max(1, int(img.height * scale_ratio))
+    img_resized = img.resize((new_w, new_h), Image.Resampling.LANCZOS)
+
+    # יצירת ריבוע רקע ובו נמרכז את התמונה המוקטנת
+    tile = Image.new('RGB', (cell_size, cell_size), bg_color)
+    offset_x = max(0, (cell_size - new_w) // 2)
+    offset_y = max(0, (cell_size - new_h) // 2)
+    tile.paste(img_resized, (offset_x, offset_y))
+    return tile
+
+
+class TileCache:
+    """מטמון LRU חסום של אריחים מוקטנים"""
+
+    def __init__(self, max_items: int = 256):
+        self.max_items = max(1, int(max_items or 1))
+        self._lock = threading.Lock()
+        self._tiles: 'OrderedDict[tuple, Image.Image]' = OrderedDict()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tiles.clear()
+
+    def get(self, path: str, cell_size: int, layout: str, bg_color) -> Optional[Image.Image]:
+        """אריח מהמטמון, או פענוח+הקטנה ושמירה. None אם הקובץ חסר/פגום."""
+        mtime = _file_mtime(path)
+        if mtime is None:
+            return None
+        key = (path, mtime, int(cell_size), str(layout or ''), str(bg_color or ''))
+        with self._lock:
+            tile = self._tiles.get(key)
+            if tile is not None:
+                self._tiles.move_to_end(key)
+                return tile
+        tile = render_tile(open_oriented(path), int(cell_size), layout, bg_color)
+        with self._lock:
+            self._tiles[key] = tile
+            self._tiles.move_to_end(key)
+            while len(self._tiles) > self.max_items:
+                self._tiles.popitem(last=False)
+        return tile
+
+
+def compose_montage(files: Sequence[str], start_index: int, *, screen_size: Tuple[int, int],
+                    cols: int, rows: int, cell_size: int, available_h: int,
+                    layout: str, bg_color, tiles: TileCache) -> Tuple[Image.Image, int]:
+    """בניית תמונת מונטאז' מלאה. מחזיר (תמונה, אינדקס התחלה לפריים הבא)."""
+    screen_w, screen_h = screen_size
+    montage = Image.new('RGB', (screen_w, screen_h), bg_color)
+    total = len(files)
+    index = int(start_index or 0)
+    if total == 0:
+        return montage, 0
+
+    for row in range(rows):
+        for col in range(cols):
+            path = files[index % total]
+            index += 1
+            x0 = col * cell_size
+            y0 = row * cell_size
+            # לא נצייר אריחים שמתחת לאזור המונטאז' – שם יושבת רצועת החדשות
+            if x0 >= screen_w or (y0 + cell_size) > available_h:
+                continue
+            try:
+                tile = tiles.get(path, cell_size, layout, bg_color)
+            except Exception as e:
+                print(f"שגיאה בבניית מונטאז': {e}")
+                continue
+            if tile is not None:
+                montage.paste(tile, (x0, y0))
+
+    return montage, index % total
+
+
+class FramePrefetcher:
+    """תהליכון רקע שבונה את הפריים הבא מראש (משבצת אחת – בקשה חדשה מחליפה ישנה)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._job: Optional[Tuple[Hashable, Callable[[], Optional[Image.Image]]]] = None
+        self._busy_key: Optional[Hashable] = None
+        self._ready: Optional[Tuple[Hashable, Optional[Image.Image]]] = None
+        self._stop = False
+        self._thread = threading.Thread(target=self._loop, name='slideshow-prefetch', daemon=True)
+        self._thread.start()
+
+    def request(self, key: Hashable, build: Callable[[], Optional[Image.Image]]) -> None:
+        with self._lock:
+            if (self._ready is not None and self._ready[0] == key) or self._busy_key == key:
+                return
+            self._job = (key, build)
+        self._wake.set()
+
+    def is_pending(self, key: Hashable) -> bool:
+        with self._lock:
+            return (self._job is not None and self._job[0] == key) or self._busy_key == key
+
+    def take(self, key: Hashable) -> Optional[Image.Image]:
+        """הפריים המוכן עבור key (פעם אחת), או None אם עוד לא מוכן"""
+        with self._lock:
+            if self._ready is None or self._ready[0] != key:
+                return None
+            img = self._ready[1]
+            self._ready = None
+            return img
+
+    def stop(self) -> None:
+        self._stop = True
+        self._wake.set()
+
+    def _loop(self) -> None:
+        while not self._stop:
+            self._wake.wait()
+            self._wake.clear()
+            with self._lock:
+                job, self._job = self._job, None
+                if job is not None:
+                    self._busy_key = job[0]
+            if job is None:
+                continue
+            key, build = job
+            img = None
+            try:
+                img = build()
+            except Exception as e:
+                print(f"[SLIDESHOW] prefetch failed: {e}")
+            with self._lock:
+                self._busy_key = None
+                self._ready = (key, img)
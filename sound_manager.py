@@ -26,6 +26,15 @@ except ImportError:
     print("⚠️ pygame לא זמין, משתמש ב-winsound (תמיכה מוגבלת ל-WAV בלבד)")
 
 
+def _file_sig(path: str) -> Optional[tuple]:
+    """(גודל, mtime, inode) – משתנה גם כשקובץ מוחלף באטומיות (os.replace) עם אותו mtime"""
+    try:
+        st = os.stat(path)
+        return (st.st_size, st.st_mtime_ns, st.st_ino)
+    except Exception:
+        return None
+
+
 class SoundManager:
     """מנהל השמעת צלילים"""
     
@@ -44,6 +53,8 @@ class SoundManager:
         self.enabled = True
         self.volume = 1.0  # 0.0 - 1.0
         self.sound_cache: Dict[str, any] = {}
+        # נתיב -> (גודל, mtime, inode) של הקובץ כשפוענח – קובץ שהוחלף באותו נתיב מפוענח מחדש
+        self._cache_sigs: Dict[str, tuple] = {}
         self._sound_index_cache: Optional[Dict[str, str]] = None
         self._sound_index_cache_ts = 0.0
         self._sound_index_cache_ttl_sec = 30.0
@@ -97,6 +108,7 @@ class SoundManager:
             print(f"⚠️ קובץ צליל לא נמצא: {sound_path}")
             return False
         
+        sig = _file_sig(sound_path)
         # בדיקת גודל קובץ (אזהרה אם גדול מ-500KB)
         file_size = os.path.getsize(sound_path)
         if file_size > 500 * 1024:
@@ -109,22 +121,44 @@ class SoundManager:
                     sound = pygame.mixer.Sound(sound_path)
                     sound.set_volume(self.volume)
                     self.sound_cache[sound_path] = sound
+                    self._cache_sigs[sound_path] = sig
                     return True
                 except Exception:
                     # בחלק מהתקנות pygame לא יודע לטעון MP3 כ-Sound.
                     # נשתמש ב-mixer.music כ-fallback לערוץ יחיד.
                     if ext in ('.mp3', '.ogg'):
                         self.sound_cache[sound_path] = ('music', sound_path)
+                        self._cache_sigs[sound_path] = sig
                         return True
                     raise
             else:
                 # עם winsound לא צריך לטעון מראש
                 self.sound_cache[sound_path] = sound_path
+                self._cache_sigs[sound_path] = sig
             return True
         except Exception as e:
             print(f"❌ שגיאה בטעינת צליל {sound_path}: {e}")
             return False
     
+    def is_cached_current(self, sound_path: str) -> bool:
+        """האם הצליל במטמון ותואם לקובץ שעל הדיסק; אם הקובץ הוחלף – מוסר מהמטמון"""
+        if sound_path not in self.sound_cache:
+            return False
+        if _file_sig(sound_path) == self._cache_sigs.get(sound_path):
+            return True
+        self.sound_cache.pop(sound_path, None)
+        self._cache_sigs.pop(sound_path, None)
+        return False
+
+    def evict_missing(self, keep) -> int:
+        """הסרת צלילים שכבר לא קיימים בתיקייה (keep – הנתיבים הנוכחיים)"""
+        keep = set(keep or ())
+        gone = [p for p in list(self.sound_cache) if p not in keep and not os.path.exists(p)]
+        for p in gone:
+            self.sound_cache.pop(p, None)
+            self._cache_sigs.pop(p, None)
+        return len(gone)
+
     def play_sound(self, sound_path: str, async_play: bool = True):
         """
         השמעת צליל
@@ -269,9 +303,9 @@ class SoundManager:
         self._sound_index_cache = None
         self._sound_index_cache_ts = 0.0
 
-    def resolve_sound(self, keys) -> Optional[str]:
+    def resolve_sound(self, keys, index: Optional[Dict[str, str]] = None) -> Optional[str]:
         try:
-            sounds = self._get_sound_index()
+            sounds = index if index is not None else self._get_sound_index()
         except Exception:
             sounds = {}
 
@@ -346,6 +380,202 @@ class SoundManager:
                 self.load_sound(path)
 
 
+_DIR_CONTROL_CHARS = (
+    '\u200e', '\u200f', '\u202a', '\u202b', '\u202c', '\u202d', '\u202e',
+    '\u2066', '\u2067', '\u2068', '\u2069',
+)
+
+
+def _norm_folder_name(name: str) -> str:
+    """שם תיקייה מנורמל – בלי תווי RTL/Control נסתרים"""
+    x = str(name or '')
+    for ch in _DIR_CONTROL_CHARS:
+        x = x.replace(ch, '')
+    return x.strip().lower()
+
+
+class SoundBank:
+    """מאגר צלילים טעון מראש לזיכרון
+
+    - כל קבצי הצלילים בתיקייה נטענים ומפוענחים מראש (pygame.mixer.Sound) בתהליכון רקע;
+    - לכל תת-תיקייה נשמרת בזיכרון רשימת הקבצים שלה (להגרלה בלי לגשת לדיסק/לשיתוף);
+    - ההשמעה היא על ערוצי mixer שמורים, בלי תהליכון לכל צליל;
+    - חותמת גרסה (mtime של התיקיות + סמן המטמון) נבדקת ברקע, ושינוי גורם לטעינה מחדש.
+
+    עם winsound אין השמעה אסינכרונית מזיכרון (SND_MEMORY חוסם), ולכן שם נשמרים רק
+    האינדקס והמאגרים, וההשמעה היא SND_ASYNC מהקובץ המקומי.
+    """
+
+    def __init__(self, manager: SoundManager, channels: int = 6, watch_interval_sec: float = 10.0):
+        self.manager = manager
+        self.channels = max(1, int(channels or 1))
+        self.watch_interval_sec = max(1.0, float(watch_interval_sec or 10.0))
+        self._lock = threading.Lock()
+        self._index: Dict[str, str] = {}
+        self._pools: Dict[str, list] = {}
+        self._loaded = set()
+        self._stamp = None
+        self._next_channel = 0
+        self._reserved = False
+        self._ready = threading.Event()
+        self._stop = False
+        self._thread = None
+
+    # ------------------------------------------------------------------
+
+    def _version_stamp(self):
+        root_dir = self.manager.sounds_dir
+        stamp = []
+        try:
+            for root, dirs, _files in os.walk(root_dir):
+                try:
+                    stamp.append((root, os.stat(root).st_mtime))
+                except Exception:
+                    continue
+            marker = os.path.join(root_dir, '.sounds_cache_ready')
+            if os.path.exists(marker):
+                stamp.append((marker, os.stat(marker).st_mtime))
+        except Exception:
+            pass
+        return tuple(stamp)
+
+    def _reserve_channels(self) -> None:
+        if self._reserved or not USE_PYGAME:
+            return
+        try:
+            total = max(int(pygame.mixer.get_num_channels() or 8), self.channels + 8)
+            pygame.mixer.set_num_channels(total)
+            pygame.mixer.set_reserved(self.channels)
+            self._reserved = True
+        except Exception:
+            pass
+
+    def reload(self) -> None:
+        """בניית האינדקס והמאגרים מחדש וטעינה מראש של כל הצלילים"""
+        stamp = self._version_stamp()
+        index = self.manager._build_sound_index()
+        allowed = ('.wav', '.mp3', '.ogg') if USE_PYGAME else ('.wav',)
+        pools: Dict[str, list] = {}
+        root_dir = self.manager.sounds_dir
+        try:
+            for root, _dirs, files in os.walk(root_dir):
+                if os.path.abspath(root) == os.path.abspath(root_dir):
+                    continue
+                paths = [os.path.join(root, f) for f in files if str(f).lower().endswith(allowed)]
+                if paths:
+                    rel = os.path.relpath(root, root_dir)
+                    pools[_norm_folder_name(rel)] = paths
+                    # גם לפי שם התיקייה האחרונה בלבד (כך פונים אליה מהעמדה)
+                    pools.setdefault(_norm_folder_name(os.path.basename(root)), paths)
+        except Exception:
+            pass
+
+        loaded = set()
+        if USE_PYGAME:
+            wanted = set(index.values())
+            for paths in pools.values():
+                wanted.update(paths)
+            for path in wanted:
+                try:
+                    # קובץ שהוחלף באותו נתיב (העתקה אטומית מהשיתוף) מפוענח מחדש
+                    if self.manager.is_cached_current(path) or self.manager.load_sound(path):
+                        loaded.add(path)
+                except Exception:
+                    continue
+            try:
+                self.manager.evict_missing(wanted)
+            except Exception:
+                pass
+            self._reserve_channels()
+
+        with self._lock:
+            self._index = index
+            self._pools = pools
+            self._loaded = loaded
+            self._stamp = stamp
+        # שיתוף האינדקס עם SoundManager.resolve_sound – בלי os.walk נוסף
+        self.manager._sound_index_cache = index
+        self.manager._sound_index_cache_ts = time.time()
+        self._ready.set()
+
+    def start(self) -> None:
+        """טעינה ראשונה + מעקב שינויים בתהליכון רקע"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name='sound-bank', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop = True
+
+    def _loop(self) -> None:
+        try:
+            self.reload()
+        except Exception as e:
+            print(f"[SOUND] preload failed: {e}")
+            self._ready.set()
+        while not self._stop:
+            time.sleep(self.watch_interval_sec)
+            try:
+                if self._version_stamp() != self._stamp:
+                    self.reload()
+            except Exception:
+                continue
+
+    # ------------------------------------------------------------------
+
+    def is_ready(self) -> bool:
+        return self._ready.is_set()
+
+    def resolve(self, keys) -> Optional[str]:
+        if not self._ready.is_set():
+            return self.manager.resolve_sound(keys)
+        with self._lock:
+            index = self._index
+        return self.manager.resolve_sound(keys, index=index)
+
+    def pick_from_folder(self, folder_name: str) -> str:
+        """קובץ אקראי מתת-תיקייה מתוך המאגר בזיכרון ('' אם לא ידוע)"""
+        if not self._ready.is_set():
+            return ''
+        with self._lock:
+            pool = self._pools.get(_norm_folder_name(folder_name)) or []
+        if not pool:
+            return ''
+        try:
+            import random
+            return random.choice(pool)
+        except Exception:
+            return pool[0]
+
+    def play(self, path: str) -> bool:
+        """השמעה מיידית של צליל טעון. False אם הצליל לא במאגר (המתקשר יפעל כרגיל)."""
+        if not path:
+            return False
+        if not self.manager.enabled:
+            # מושתק – אין מה להשמיע
+            return True
+        if not USE_PYGAME:
+            return False
+        with self._lock:
+            if path not in self._loaded:
+                return False
+            ch_id = self._next_channel
+            self._next_channel = (self._next_channel + 1) % self.channels
+        sound = self.manager.sound_cache.get(path)
+        if sound is None or isinstance(sound, tuple):
+            return False
+        try:
+            channel = pygame.mixer.Channel(ch_id) if self._reserved else pygame.mixer.find_channel(True)
+            if channel is None:
+                sound.play()
+            else:
+                channel.play(sound)
+            return True
+        except Exception:
+            return False
+
+
 # דוגמה לשימוש
 if __name__ == "__main__":
     # בדיקה
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+סנכרון תיקיית הצלילים המשותפת לפי מניפסט
+
+עמדת הניהול (או עמדה שזורעת צלילים לשיתוף) כותבת sounds_manifest.json בתיקיית
+sounds המשותפת: לכל קובץ – נתיב יחסי, גודל, mtime ו-sha1. העמדות משוות את רשימת
+הקבצים בשיתוף (גודל/mtime בלבד, בלי hash) למניפסט; אם קבצים נוספו או שונו מחוץ
+למסך הייבוא (למשל דרך סייר הקבצים) המניפסט נבנה מחדש. אחר כך מועתקים רק קבצים
+שהשתנו מול מה שכבר הותקן אצל העמדה.
+כל העתקה נכתבת לקובץ זמני באותה תיקייה ומוחלפת אטומית (os.replace), כך שצליל
+לעולם לא נקרא חצי-כתוב בזמן השמעה.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from typing import Dict, Optional, Tuple
+
+MANIFEST_NAME = 'sounds_manifest.json'
+# מה שהותקן בפועל במטמון המקומי של העמדה
+LOCAL_STATE_NAME = '.sounds_manifest.local.json'
+READY_MARKER_NAME = '.sounds_cache_ready'
+SOUND_EXTS = ('.wav', '.mp3', '.ogg')
+
+
+def _file_sha1(path: str) -> str:
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 256), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _read_json(path: str) -> Optional[dict]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else None
+    except Exception:
+        return None
+
+
+def _write_json_atomic(path: str, data: dict) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, path)
+    finally:
+        try:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        except Exception:
+            pass
+
+
+def read_manifest(sounds_dir: str) -> Optional[dict]:
+    return _read_json(os.path.join(sounds_dir, MANIFEST_NAME))
+
+
+def scan_dir(sounds_dir: str) -> Dict[str, Tuple[int, int]]:
+    """{נתיב יחסי: (size, mtime)} לכל קובץ צליל – רשימת תיקיות בלבד, בלי קריאת תוכן"""
+    out: Dict[str, Tuple[int, int]] = {}
+    stack = ['']
+    while stack:
+        rel_dir = stack.pop()
+        try:
+            entries = list(os.scandir(os.path.join(sounds_dir, rel_dir) if rel_dir else sounds_dir))
+        except Exception:
+            continue
+        for e in entries:
+            rel = f"{rel_dir}/{e.name}" if rel_dir else e.name
+            try:
+                if e.is_dir():
+                    stack.append(rel)
+                    continue
+                if not str(e.name).lower().endswith(SOUND_EXTS):
+                    continue
+                st = e.stat()
+            except Exception:
+                continue
+            out[rel] = (int(st.st_size), int(st.st_mtime))
+    return out
+
+
+def _listing_of(files: Dict[str, dict]) -> Dict[str, Tuple[int, int]]:
+    out: Dict[str, Tuple[int, int]] = {}
+    for rel, meta in (files or {}).items():
+        if isinstance(meta, dict):
+            try:
+                out[rel] = (int(meta.get('size', -1)), int(meta.get('mtime', -1)))
+            except Exception:
+                out[rel] = (-1, -1)
+    return out
+
+
+def build_manifest(sounds_dir: str, previous: Optional[dict] = None,
+                   listing: Optional[Dict[str, Tuple[int, int]]] = None) -> Dict[str, dict]:
+    """{נתיב יחסי: {size, mtime, sha1}} – hash מחושב מחדש רק לקבצים שגודלם/mtime השתנו"""
+    prev_files = (previous or {}).get('files') or {}
+    files: Dict[str, dict] = {}
+    if listing is None:
+        listing = scan_dir(sounds_dir)
+    for rel, (size, mtime) in listing.items():
+        prev = prev_files.get(rel) or {}
+        if prev.get('sha1') and int(prev.get('size', -1)) == size and int(prev.get('mtime', -1)) == mtime:
+            sha1 = prev['sha1']
+        else:
+            try:
+                sha1 = _file_sha1(os.path.join(sounds_dir, *rel.split('/')))
+            except Exception:
+                continue
+        files[rel] = {'size': size, 'mtime': mtime, 'sha1': sha1}
+    return files
+
+
+def _next_manifest(previous: Optional[dict], files: Dict[str, dict]) -> dict:
+    try:
+        version = int((previous or {}).get('version') or 0) + 1
+    except Exception:
+        version = 1
+    return {'version': version, 'generated_at': int(time.time()), 'files': files}
+
+
+def write_manifest(sounds_dir: str) -> bool:
+    """עדכון sounds_manifest.json בתיקייה המשותפת. True אם הקובץ נכתב (היה שינוי)."""
+    if not sounds_dir or not os.path.isdir(sounds_dir):
+        return False
+    previous = read_manifest(sounds_dir)
+    files = build_manifest(sounds_dir, previous)
+    if previous is not None and (previous.get('files') or {}) == files:
+        return False
+    _write_json_atomic(os.path.join(sounds_dir, MANIFEST_NAME), _next_manifest(previous, files))
+    return True
+
+
+def _refresh_stale_manifest(src_dir: str, manifest: dict) -> dict:
+    """המניפסט לא תואם את הקבצים בשיתוף – בנייה מחדש (hash רק לקבצים שהשתנו) וכתיבה לשיתוף.
+    אם אין הרשאת כתיבה – ממשיכים עם המניפסט שנבנה בזיכרון."""
+    listing = scan_dir(src_dir)
+    if _listing_of(manifest.get('files') or {}) == listing:
+        return manifest
+    print("[SOUNDS] manifest out of date, rebuilding")
+    fresh = _next_manifest(manifest, build_manifest(src_dir, manifest, listing))
+    try:
+        _write_json_atomic(os.path.join(src_dir, MANIFEST_NAME), fresh)
+    except Exception as e:
+        print(f"[SOUNDS] manifest write failed: {e}")
+    return fresh
+
+
+def copy_atomic(src: str, dst: str) -> None:
+    """העתקה לקובץ זמני באותה תיקייה והחלפה אטומית"""
+    tmp = f"{dst}.{os.getpid()}.part"
+    try:
+        shutil.copy2(src, tmp)
+        os.replace(tmp, dst)
+    finally:
+        try:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        except Exception:
+            pass
+
+
+def sync_from_manifest(src_dir: str, cache_dir: str) -> Optional[Tuple[int, int]]:
+    """סנכרון המטמון המקומי מול המניפסט שבשיתוף.
+    מחזיר (הועתקו, נמחקו), או None אם אין מניפסט בשיתוף (המתקשר יחזור לסריקה מלאה)."""
+    manifest = read_manifest(src_dir)
+    if manifest is None or not isinstance(manifest.get('files'), dict):
+        return None
+    manifest = _refresh_stale_manifest(src_dir, manifest)
+
+    state_path = os.path.join(cache_dir, LOCAL_STATE_NAME)
+    local = _read_json(state_path) or {}
+    local_files = local.get('files') or {}
+    remote_files = manifest.get('files') or {}
+
+    # מקרה נפוץ: אותה גרסה בדיוק והקבצים במקומם – קריאת קובץ קטן אחד וזהו
+    if local.get('version') == manifest.get('version') and local_files == remote_files:
+        return 0, 0
+
+    copied = 0
+    installed: Dict[str, dict] = {}
+    for rel, meta in remote_files.items():
+        if not isinstance(meta, dict):
+            continue
+        parts = [p for p in str(rel).split('/') if p and p not in ('.', '..')]
+        if not parts:
+            continue
+        dst = os.path.join(cache_dir, *parts)
+        have = local_files.get(rel) or {}
+        up_to_date = False
+        if have.get('sha1') and have.get('sha1') == meta.get('sha1'):
+            try:
+                up_to_date = int(os.path.getsize(dst)) == int(meta.get('size', -1))
+            except Exception:
+                up_to_date = False
+        if not up_to_date:
+            try:
+                os.makedirs(os.path.dirname(dst), exist_ok=True)
+                copy_atomic(os.path.join(src_dir, *parts), dst)
+                copied += 1
+            except Exception as e:
+                print(f"[SOUNDS] copy failed {rel}: {e}")
+                continue
+        installed[rel] = dict(meta)
+
+    # קבצים שהותקנו בעבר מהמניפסט ונמחקו ממנו – מוסרים גם מהמטמון
+    removed = 0
+    for rel in local_files:
+        if rel in remote_files:
+            continue
+        parts = [p for p in str(rel).split('/') if p and p not in ('.', '..')]
+        if not parts:
+            continue
+        try:
+            os.remove(os.path.join(cache_dir, *parts))
+            removed += 1
+        except Exception:
+            pass
+
+    _write_json_atomic(state_path, {'version': manifest.get('version'), 'files': installed})
+    if copied or removed or not os.path.exists(os.path.join(cache_dir, READY_MARKER_NAME)):
+        with open(os.path.join(cache_dir, READY_MARKER_NAME), 'w', encoding='utf-8') as mf:
+            mf.write(str(int(time.time())))
+    return copied, removed
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+מדידת זמני עלייה של העמדות (--profile-startup)
+
+מיובא ראשון בקובץ הכניסה של כל עמדה. כשהדגל מופיע בשורת הפקודה:
+- נמדד זמן הייבוא (כולל) של כל מודול עליון בפעם הראשונה שנטען;
+- phase(name) רושם נקודות זמן לשלבי האתחול;
+- report() מדפיס טבלת שלבים, את הייבואים הכבדים, והאם pandas נטען.
+בלי הדגל – כל הפונקציות לא עושות כלום.
+"""
+
+import builtins
+import sys
+import time
+
+ENABLED = '--profile-startup' in sys.argv
+
+# מודולים כבדים שלא אמורים להיטען לפני השימוש הראשון בהם
+HEAVY_MODULES = ('pandas', 'numpy', 'openpyxl', 'pygame')
+
+_T0 = time.perf_counter()
+_phases = []
+_imports = {}
+_reported = False
+_orig_import = builtins.__import__
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    top = str(name or '').split('.', 1)[0]
+    if level or not top or top in sys.modules or top in _imports:
+        return _orig_import(name, globals, locals, fromlist, level)
+    _imports[top] = None
+    t = time.perf_counter()
+    try:
+        return _orig_import(name, globals, locals, fromlist, level)
+    finally:
+        _imports[top] = time.perf_counter() - t
+
+
+if ENABLED:
+    try:
+        sys.argv.remove('--profile-startup')
+    except ValueError:
+        pass
+    builtins.__import__ = _timed_import
+
+
+def phase(name: str) -> None:
+    if ENABLED:
+        _phases.append((str(name), time.perf_counter()))
+
+
+def heavy_modules_loaded() -> list:
+    return [m for m in HEAVY_MODULES if m in sys.modules]
+
+
+def report(station: str = '') -> None:
+    """הדפסת הדוח (פעם אחת) והחזרת מנגנון הייבוא המקורי"""
+    global _reported
+    if not ENABLED or _reported:
+        return
+    _reported = True
+    builtins.__import__ = _orig_import
+    now = time.perf_counter()
+
+    print(f"[STARTUP] ===== {station or 'station'}: {now - _T0:.3f}s עד הפריים הראשון =====")
+    prev = _T0
+    for name, ts in _phases:
+        print(f"[STARTUP] {ts - _T0:8.3f}s  (+{ts - prev:6.3f}s)  {name}")
+        prev = ts
+
+    slow = sorted(((t, m) for m, t in _imports.items() if t), reverse=True)[:15]
+    if slow:
+        print("[STARTUP] ייבואים כבדים (כולל תלויות):")
+        for t, m in slow:
+            print(f"[STARTUP]   {t:7.3f}s  {m}")
+
+    heavy = heavy_modules_loaded()
+    print(f"[STARTUP] מודולים כבדים שנטענו: {', '.join(heavy) if heavy else 'אין'}")
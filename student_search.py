@@ -0,0 +1,288 @@
+# -*- coding: utf-8 -*-
+"""
+אינדקס חיפוש תלמידים בזיכרון (עמדת ניהול)
+
+במקום שאילתת LIKE לכל הקשה בתיבת החיפוש / לכל שורה בסינכרון מאקסל,
+התלמידים נשמרים בזיכרון עם טוקנים מנורמלים (שם פרטי, שם משפחה, כיתה,
+כרטיס, ת"ז). הנרמול מתאים לעברית: אותיות סופיות, ניקוד וטעמים, גרש/גרשיים,
+סימני כיווניות והערות בכוכביות (*...*) מוסרים.
+
+חיפוש: כל מילה בשאילתה צריכה להיות תחילית של אחד הטוקנים של התלמיד
+(AND בין המילים). אם אין תוצאות – נסיון שני כהכלה בכל הטקסט של התלמיד,
+כמו ה-LIKE הישן.
+"""
+
+import bisect
+import re
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+_FINAL_LETTERS = str.maketrans({'ך': 'כ', 'ם': 'מ', 'ן': 'נ', 'ף': 'פ', 'ץ': 'צ'})
+# ניקוד וטעמים (U+0591-U+05C7) – מלבד מקף עברי (U+05BE) שהופך לרווח
+_NIQQUD_RE = re.compile('[\u0591-\u05BD\u05BF-\u05C7]')
+# סימני כיווניות (LRM/RLM, embedding/override, isolates)
+_BIDI_RE = re.compile('[\u200E\u200F\u202A-\u202E\u2066-\u2069\uFEFF]')
+_QUOTES_RE = re.compile('[\u05F3\u05F4\'"`\u2018\u2019\u201C\u201D]')
+_ASTERISK_RE = re.compile(r'\*[^*]*\*')
+_SEPARATORS_RE = re.compile(r'[\s\u05BE\-_/\\.,;:()\[\]{}]+')
+
+# שדות שנכנסים לאינדקס
+_FIELDS = ('first_name', 'last_name', 'class_name', 'card_number', 'id_number')
+
+
+def normalize_hebrew(text) -> str:
+    """נרמול טקסט לחיפוש: בלי ניקוד/גרשיים/כיווניות/הערות, אותיות סופיות -> רגילות"""
+    if text is None:
+        return ''
+    s = str(text)
+    if not s:
+        return ''
+    s = _ASTERISK_RE.sub(' ', s)
+    s = _BIDI_RE.sub('', s)
+    s = _NIQQUD_RE.sub('', s)
+    s = _QUOTES_RE.sub('', s)
+    s = s.translate(_FINAL_LETTERS).lower()
+    s = _SEPARATORS_RE.sub(' ', s)
+    return s.strip()
+
+
+def tokenize(text) -> List[str]:
+    n = normalize_hebrew(text)
+    return n.split() if n else []
+
+
+def _student_sort_key(s: Dict[str, Any]):
+    return (
+        str(s.get('class_name') or ''),
+        str(s.get('last_name') or ''),
+        str(s.get('first_name') or ''),
+        int(s.get('id') or 0),
+    )
+
+
+class StudentSearchIndex:
+    """אינדקס תחיליות בזיכרון + עדכון אינקרמנטלי"""
+
+    def __init__(self, db=None, staleness_check_sec: float = 2.0):
+        self.db = db
+        self.staleness_check_sec = float(staleness_check_sec or 2.0)
+        self._lock = threading.RLock()
+        self._students: Dict[int, Dict[str, Any]] = {}
+        # student_id -> (טוקנים, טקסט מלא מנורמל, מפתח שם מלא)
+        self._doc: Dict[int, Tuple[Tuple[str, ...], str, str]] = {}
+        # רשימה ממוינת של (token, student_id) לחיפוש תחיליות ב-bisect
+        self._postings: List[Tuple[str, int]] = []
+        # "פרטי משפחה" מנורמל -> {student_id}
+        self._by_full_name: Dict[str, Set[int]] = {}
+        self._loaded = False
+        self._signature = None
+        self._last_check_ts = 0.0
+
+    # ------------------------------------------------------------------
+    # טעינה ועדכון
+    # ------------------------------------------------------------------
+
+    def _read_signature(self):
+        conn = self.db.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT COUNT(1), MAX(id), MAX(updated_at) FROM students')
+            return tuple(cursor.fetchone() or ())
+        finally:
+            conn.close()
+
+    def load(self) -> None:
+        """טעינה מלאה מה-DB"""
+        if self.db is None:
+            return
+        try:
+            sig = self._read_signature()
+        except Exception:
+            sig = None
+        students = self.db.get_all_students() or []
+        self.replace_all(students)
+        self._signature = sig
+        self._last_check_ts = time.time()
+
+    def ensure_fresh(self, force: bool = False) -> None:
+        """בדיקה זולה (לכל היותר פעם ב-staleness_check_sec) אם טבלת התלמידים השתנתה"""
+        if self.db is None:
+            return
+        now = time.time()
+        if not force and self._loaded and (now - self._last_check_ts) < self.staleness_check_sec:
+            return
+        self._last_check_ts = now
+        if not self._loaded:
+            self.load()
+            return
+        try:
+            sig = self._read_signature()
+        except Exception:
+            return
+        if sig != self._signature:
+            self.load()
+
+    def replace_all(self, students: Iterable[Dict[str, Any]]) -> None:
+        """החלפת כל התוכן (רשימה מלאה של תלמידים) – רק שורות שהשתנו מחושבות מחדש"""
+        incoming = {}
+        for s in (students or []):
+            try:
+                incoming[int(s['id'])] = dict(s)
+            except Exception:
+                continue
+        with self._lock:
+            for sid in [sid for sid in self._students if sid not in incoming]:
+                self._remove_locked(sid)
+            for sid, s in incoming.items():
+                self._upsert_locked(sid, s)
+            self._loaded = True
+
+    def upsert(self, student: Dict[str, Any]) -> None:
+        """הוספה/עדכון של תלמיד בודד (אחרי עריכה מהעמדה)"""
+        try:
+            sid = int(student['id'])
+        except Exception:
+            return
+        with self._lock:
+            self._upsert_locked(sid, dict(student))
+
+    def update_many(self, students: Iterable[Dict[str, Any]]) -> None:
+        """עדכון חלקי (למשל רשימת תלמידים של מורה) – בלי מחיקות"""
+        with self._lock:
+            for s in (students or []):
+                try:
+                    self._upsert_locked(int(s['id']), dict(s))
+                except Exception:
+                    continue
+
+    def remove(self, student_id) -> None:
+        try:
+            sid = int(student_id)
+        except Exception:
+            return
+        with self._lock:
+            self._remove_locked(sid)
+
+    def update_fields(self, student_id, **fields) -> None:
+        """עדכון שדות בודדים (למשל card_number אחרי update_card_number)"""
+        try:
+            sid = int(student_id)
+        except Exception:
+            return
+        with self._lock:
+            cur = self._students.get(sid)
+            if cur is None:
+                return
+            s = dict(cur)
+            s.update(fields)
+            self._upsert_locked(sid, s)
+
+    def _build_doc(self, s: Dict[str, Any]) -> Tuple[Tuple[str, ...], str, str]:
+        tokens: List[str] = []
+        parts: List[str] = []
+        for f in _FIELDS:
+            n = normalize_hebrew(s.get(f))
+            if n:
+                parts.append(n)
+                tokens.extend(n.split())
+        full = ' '.join(tokenize(s.get('first_name')) + tokenize(s.get('last_name')))
+        return tuple(sorted(set(tokens))), ' '.join(parts), full
+
+    def _upsert_locked(self, sid: int, s: Dict[str, Any]) -> None:
+        prev = self._students.get(sid)
+        self._students[sid] = s
+        if prev is not None and all(prev.get(f) == s.get(f) for f in _FIELDS):
+            return
+        doc = self._build_doc(s)
+        old = self._doc.get(sid)
+        if old is not None:
+            self._drop_postings(sid, old)
+        self._doc[sid] = doc
+        for tok in doc[0]:
+            bisect.insort(self._postings, (tok, sid))
+        if doc[2]:
+            self._by_full_name.setdefault(doc[2], set()).add(sid)
+
+    def _remove_locked(self, sid: int) -> None:
+        self._students.pop(sid, None)
+        old = self._doc.pop(sid, None)
+        if old is not None:
+            self._drop_postings(sid, old)
+
+    def _drop_postings(self, sid: int, doc) -> None:
+        for tok in doc[0]:
+            i = bisect.bisect_left(self._postings, (tok, sid))
+            if i < len(self._postings) and self._postings[i] == (tok, sid):
+                del self._postings[i]
+        ids = self._by_full_name.get(doc[2])
+        if ids is not None:
+            ids.discard(sid)
+            if not ids:
+                self._by_full_name.pop(doc[2], None)
+
+    # ------------------------------------------------------------------
+    # חיפוש
+    # ------------------------------------------------------------------
+
+    def _prefix_ids(self, prefix: str) -> Set[int]:
+        out: Set[int] = set()
+        i = bisect.bisect_left(self._postings, (prefix, -1))
+        n = len(self._postings)
+        while i < n:
+            tok, sid = self._postings[i]
+            if not tok.startswith(prefix):
+                break
+            out.add(sid)
+            i += 1
+        return out
+
+    def search_ids(self, query) -> List[int]:
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        with self._lock:
+            result: Optional[Set[int]] = None
+            # קודם הטוקן הארוך ביותר – בדרך כלל הכי סלקטיבי
+            for tok in sorted(tokens, key=len, reverse=True):
+                ids = self._prefix_ids(tok)
+                result = ids if result is None else (result & ids)
+                if not result:
+                    break
+            if not result:
+                # כמו LIKE '%...%' – הכלה בטקסט המלא
+                needle = ' '.join(tokens)
+                result = {sid for sid, doc in self._doc.items() if needle in doc[1]}
+            students = [self._students[sid] for sid in result if sid in self._students]
+        students.sort(key=_student_sort_key)
+        return [int(s['id']) for s in students]
+
+    def search(self, query) -> List[Dict[str, Any]]:
+        """תחליף ל-Database.search_students – מחזיר רשימת dict"""
+        self.ensure_fresh()
+        ids = self.search_ids(query)
+        with self._lock:
+            return [dict(self._students[sid]) for sid in ids if sid in self._students]
+
+    def find_by_name(self, first_name, last_name) -> List[Dict[str, Any]]:
+        """התאמה מדויקת (מנורמלת) של שם פרטי + משפחה בלבד; אם אין – רשימה ריקה
+        (לא חיפוש חלקי – המתקשרים מעדכנים את התלמיד שנמצא)"""
+        key = ' '.join(tokenize(first_name) + tokenize(last_name))
+        if not key:
+            return []
+        self.ensure_fresh()
+        with self._lock:
+            ids = self._by_full_name.get(key)
+            if ids:
+                found = [dict(self._students[sid]) for sid in ids if sid in self._students]
+                found.sort(key=_student_sort_key)
+                return found
+        return []
+
+    def get(self, student_id) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            s = self._students.get(int(student_id or 0))
+            return dict(s) if s is not None else None
+
+    def __len__(self) -> int:
+        return len(self._students)
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+מודל טבלת תלמידים לעמדת הניהול
+
+במקום למחוק את כל שורות ה-Treeview ולהכניס מחדש בכל רענון, המודל שומר
+בזיכרון את השורות שכבר מוצגות (לפי מזהה תלמיד) ומחיל רק הפרשים:
+שורות שהשתנו מתעדכנות במקום, שורות חדשות נכנסות, שורות שנעלמו נמחקות,
+וסדר השורות מתוקן רק אם השתנה. מזהי השורות (iid) קבועים לכל תלמיד ולכן
+הבחירה ומיקום הגלילה נשמרים מעצמם.
+
+כשיש הרבה שורות חדשות (טעינה ראשונה / חזרה מחיפוש) – מוכנסות מיד רק
+השורות שבחלון הנראה + מרווח, והשאר מוכנסות ברקע במנות דרך after().
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+def row_iid(student_id) -> str:
+    return f"s{int(student_id)}"
+
+
+class StudentTableModel:
+    """הפרשים ברמת שורה עבור טבלת התלמידים"""
+
+    def __init__(self, tree, student_ids: Dict[str, int], *, viewport_margin: int = 40,
+                 chunk_size: int = 150, chunk_delay_ms: int = 1):
+        self.tree = tree
+        # אותו מילון שמשמש את כל הקוד הקיים: item_id -> student_id
+        self.student_ids = student_ids
+        self.viewport_margin = max(0, int(viewport_margin or 0))
+        self.chunk_size = max(10, int(chunk_size or 150))
+        self.chunk_delay_ms = max(1, int(chunk_delay_ms or 1))
+        # iid -> (values, tag) כפי שנכתבו לאחרונה לטבלה
+        self._rows: Dict[str, Tuple[tuple, str]] = {}
+        self._pending: List[Tuple[int, str, int, tuple, str]] = []
+        self._fill_job = None
+        self._generation = 0
+
+    # ------------------------------------------------------------------
+
+    def _viewport_rows(self) -> int:
+        """כמה שורות נכנסות בחלון הנראה (לפי גובה בפועל, אחרת height של ה-Treeview)"""
+        rows = 0
+        try:
+            rows = int(self.tree.cget('height') or 0)
+        except Exception:
+            rows = 0
+        try:
+            h = int(self.tree.winfo_height() or 0)
+            if h > 1:
+                rows = max(rows, h // 20 + 1)
+        except Exception:
+            pass
+        return max(20, rows)
+
+    def _cancel_fill(self) -> None:
+        if self._fill_job is not None:
+            try:
+                self.tree.after_cancel(self._fill_job)
+            except Exception:
+                pass
+            self._fill_job = None
+        self._pending = []
+
+    def invalidate(self, student_id=None) -> None:
+        """לקרוא כשקוד אחר כתב ישירות לשורה (למשל עריכה בתא) – הרענון הבא יכתוב אותה מחדש"""
+        if student_id is None:
+            self._rows.clear()
+        else:
+            self._rows.pop(row_iid(student_id), None)
+
+    def clear(self) -> None:
+        self._cancel_fill()
+        self._generation += 1
+        try:
+            self.tree.delete(*self.tree.get_children(''))
+        except Exception:
+            for item in self.tree.get_children(''):
+                try:
+                    self.tree.delete(item)
+                except Exception:
+                    pass
+        self._rows.clear()
+        self.student_ids.clear()
+
+    # ------------------------------------------------------------------
+
+    def apply(self, rows: Iterable[Tuple[int, tuple]], select_student_id=None) -> Dict[str, int]:
+        """החלת רשימת שורות (student_id, values) בסדר הרצוי.
+        מחזיר מונים: updated / inserted / deleted / moved / deferred."""
+        self._cancel_fill()
+        self._generation += 1
+        tree = self.tree
+
+        desired: List[Tuple[str, int, tuple, str]] = []
+        seen = set()
+        for idx, (sid, values) in enumerate(rows):
+            iid = row_iid(sid)
+            if iid in seen:
+                continue
+            seen.add(iid)
+            tag = 'evenrow' if len(desired) % 2 == 0 else 'oddrow'
+            desired.append((iid, int(sid), tuple(values), tag))
+
+        stats = {'updated': 0, 'inserted': 0, 'deleted': 0, 'moved': 0, 'deferred': 0}
+
+        # 1) מחיקת שורות שאינן ברשימה (כולל שורות ישנות שלא נוצרו ע"י המודל)
+        current = list(tree.get_children(''))
+        stale = [iid for iid in current if iid not in seen]
+        if stale:
+            try:
+                tree.delete(*stale)
+            except Exception:
+                for iid in stale:
+                    try:
+                        tree.delete(iid)
+                    except Exception:
+                        pass
+            for iid in stale:
+                self._rows.pop(iid, None)
+                self.student_ids.pop(iid, None)
+            stats['deleted'] = len(stale)
+        present = set(current) - set(stale)
+
+        # 2) עדכון שורות קיימות שהשתנו + תיקון סדר יחסי
+        expected = []
+        for iid, sid, values, tag in desired:
+            if iid not in present:
+                continue
+            expected.append(iid)
+            if self._rows.get(iid) != (values, tag):
+                tree.item(iid, values=values, tags=(tag,))
+                self._rows[iid] = (values, tag)
+                stats['updated'] += 1
+            self.student_ids[iid] = sid
+        remaining = [iid for iid in current if iid in present]
+        if remaining != expected:
+            # מזיזים רק מהמקום הראשון שבו הסדר שונה
+            first = 0
+            while first < len(expected) and remaining[first] == expected[first]:
+                first += 1
+            for k in range(first, len(expected)):
+                tree.move(expected[k], '', k)
+                stats['moved'] += 1
+
+        # 3) הכנסת שורות חדשות – החלון הנראה מיד, השאר ברקע
+        immediate_limit = self._viewport_rows() + self.viewport_margin
+        first_visible = 0
+        try:
+            top = tree.identify_row(1)
+            if top:
+                first_visible = tree.index(top)
+        except Exception:
+            first_visible = 0
+        immediate_limit += first_visible
+
+        new_rows = [(pos, iid, sid, values, tag)
+                    for pos, (iid, sid, values, tag) in enumerate(desired) if iid not in present]
+        for pos, iid, sid, values, tag in new_rows:
+            if pos < immediate_limit:
+                self._insert(pos, iid, sid, values, tag)
+                stats['inserted'] += 1
+            else:
+                self._pending.append((pos, iid, sid, values, tag))
+        if self._pending:
+            stats['deferred'] = len(self._pending)
+            self._schedule_fill(self._generation)
+
+        if select_student_id:
+            self.select(select_student_id)
+        return stats
+
+    def _insert(self, pos: int, iid: str, sid: int, values: tuple, tag: str) -> None:
+        self.tree.insert('', pos, iid=iid, values=values, tags=(tag,))
+        self._rows[iid] = (values, tag)
+        self.student_ids[iid] = sid
+
+    def _schedule_fill(self, generation: int) -> None:
+        try:
+            self._fill_job = self.tree.after(self.chunk_delay_ms, lambda g=generation: self._fill_chunk(g))
+        except Exception:
+            # אין לולאת אירועים – הכנסה מיידית של הכל
+            self._fill_job = None
+            self._fill_chunk(generation, everything=True)
+
+    def _fill_chunk(self, generation: int, everything: bool = False) -> None:
+        self._fill_job = None
+        if generation != self._generation:
+            return
+        # הכנסה לפי סדר עולה: כל השורות שלפני pos כבר קיימות, ולכן המיקום מדויק
+        batch = self._pending if everything else self._pending[:self.chunk_size]
+        self._pending = [] if everything else self._pending[self.chunk_size:]
+        for pos, iid, sid, values, tag in batch:
+            try:
+                if self.tree.exists(iid):
+                    continue
+                self._insert(pos, iid, sid, values, tag)
+            except Exception:
+                continue
+        if self._pending:
+            self._schedule_fill(generation)
+
+    # ------------------------------------------------------------------
+
+    def is_filling(self) -> bool:
+        return bool(self._pending)
+
+    def select(self, student_id) -> bool:
+        """בחירת שורת תלמיד (גם אם עדיין ממתינה להכנסה ברקע)"""
+        iid = row_iid(student_id)
+        try:
+            if not self.tree.exists(iid) and self._pending:
+                # מכניסים מיד את כל מה שממתין עד השורה הזו
+                while self._pending and not self.tree.exists(iid):
+                    pos, p_iid, sid, values, tag = self._pending.pop(0)
+                    if not self.tree.exists(p_iid):
+                        self._insert(pos, p_iid, sid, values, tag)
+            if self.tree.exists(iid):
+                self.tree.selection_set(iid)
+                self.tree.see(iid)
+                return True
+        except Exception:
+            pass
+        return False
+
+    def values_for(self, student_id) -> Optional[tuple]:
+        row = self._rows.get(row_iid(student_id))
+        return row[0] if row else None
+
+    def stats(self) -> Dict[str, Any]:
+        return {'rows': len(self._rows), 'pending': len(self._pending)}
@@ -329,6 +329,10 @@ def apply_snapshot(conn: sqlite3.Connection, snapshot: Dict[str, Any]) -> Dict[s
         'change_log',
         'applied_events',
         'purchase_holds',
+        # נגזרת ע"י טריגרים מ-purchase_holds של המחשב עצמו
+        'product_hold_totals',
+        # מנעול הענקת בונוס זמנים של המסד המשותף – נגזר מ-time_bonus_given
+        'time_bonus_group_claims',
         'sync_state',
         'sqlite_sequence',
     }
@@ -726,6 +730,10 @@ def build_snapshot(conn: sqlite3.Connection) -> Dict[str, Any]:
         'change_log',
         'applied_events',
         'purchase_holds',
+        # נגזרת ע"י טריגרים מ-purchase_holds של המחשב עצמו
+        'product_hold_totals',
+        # מנעול הענקת בונוס זמנים של המסד המשותף – נגזר מ-time_bonus_given
+        'time_bonus_group_claims',
         'sync_state',
         'sqlite_sequence',
     }
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""מקרי בדיקה משותפים לקבצי ה-golden של ESC/POS (יצירה ובדיקה)"""
+
+import datetime as _dt
+import sys
+import types
+
+FIXED_NOW = _dt.datetime(2026, 3, 15, 10, 20, 30)
+
+WINDOWS_ONLY = ('win32print', 'win32ui', 'win32con', 'win32api', 'win32gui', 'winsound', 'pywintypes')
+
+
+def install_windows_stubs() -> None:
+    """מודולים של Windows בלבד – מודול ריק כשאינם מותקנים"""
+    class _Stub(types.ModuleType):
+        def __getattr__(self, name):
+            if name.startswith('__'):
+                raise AttributeError(name)
+            return 0
+
+    for name in WINDOWS_ONLY:
+        try:
+            __import__(name)
+        except ImportError:
+            sys.modules[name] = _Stub(name)
+
+
+class FixedDateTime(_dt.datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return FIXED_NOW
+
+
+def stub_segments(station, with_segments: bool) -> None:
+    """קטעים גרפיים קבועים במקום רינדור (לא תלוי בגרסת Pillow/FreeType)"""
+    if with_segments:
+        station._get_cached_text_title_bytes = lambda title: b'<T:' + str(title).encode('utf-8') + b'>'
+        station._get_cached_text_decoration = lambda name: b'<D:' + str(name).encode('ascii') + b'>'
+    else:
+        station._get_cached_text_title_bytes = lambda title: b''
+        station._get_cached_text_decoration = lambda name: b''
+    station._get_cached_text_logo_bytes = lambda path: b'<LOGO>' if path else b''
+
+
+_ITEMS = [
+    {'name': 'עט כחול', 'quantity': 2, 'price': 5},
+    {'name': 'מחברת משובצת גדולה במיוחד עם שם ארוך', 'qty': 1, 'price': '12.0', 'total_points': 12},
+    {'name': 'Sticker ★', 'quantity': 3, 'price': 1},
+]
+
+
+def receipt_cases():
+    out = []
+    for with_segments in (True, False):
+        for send_codepage in (True, False):
+            for logo in ('', 'logo.png'):
+                out.append({
+                    'kind': 'receipt',
+                    'segments': with_segments,
+                    'kwargs': {'encoding': 'cp862', 'codepage': 0x08, 'send_codepage': send_codepage,
+                               'logo_path': logo, 'closing_message': 'תודה ולהתראות' if logo else None},
+                    'data': {'student_name': 'ישראל ישראלי', 'class_name': 'ז3', 'items': _ITEMS,
+                             'balance_before': 120, 'balance_after': 91},
+                })
+    out.append({'kind': 'receipt', 'segments': True,
+                'kwargs': {'encoding': 'cp862', 'codepage': 0x0F, 'send_codepage': True},
+                'data': {'student_name': '', 'items': [], 'closing_message': 'שנה טובה'}})
+    out.append({'kind': 'receipt', 'segments': False,
+                'kwargs': {'encoding': 'utf-8', 'codepage': 0x08, 'send_codepage': False},
+                'data': {'student_name': 'דנה', 'class_name': '', 'items': _ITEMS[:1], 'balance_before': None}})
+    return out
+
+
+def voucher_cases():
+    out = []
+    base = {'student_name': 'ישראל ישראלי', 'class_name': 'ז3', 'item_name': 'כדור כדורגל', 'qty': 1,
+            'price': 40, 'points_before': 100, 'points_after': 60}
+    service = dict(base, item_name='שיעור פרטי', slot_text='יום ג', service_date='2026-03-17',
+                   slot_time='10:30', duration_minutes=45)
+    for with_segments in (True, False):
+        for send_codepage in (True, False):
+            for data in (base, service):
+                out.append({
+                    'kind': 'voucher',
+                    'segments': with_segments,
+                    'kwargs': {'encoding': 'cp862', 'codepage': 0x08, 'send_codepage': send_codepage},
+                    'data': data,
+                })
+    out.append({'kind': 'voucher', 'segments': True,
+                'kwargs': {'encoding': 'cp862', 'codepage': 0x08, 'send_codepage': True, 'logo_path': 'logo.png'},
+                'data': {'item_name': 'Pizza ₪', 'qty': '3', 'price': '7.5'}})
+    return out
+
+
+def build(station, case) -> bytes:
+    stub_segments(station, case['segments'])
+    if case['kind'] == 'receipt':
+        return station._build_thermal_text_receipt_bytes(case['data'], **case['kwargs'])
+    return station._build_thermal_text_voucher_bytes(case['data'], **case['kwargs'])
+
+
+HEBREW_TO_CP862_CASES = [
+    'שלום עולם',
+    'abc, def!',
+    'מחיר: 12.50 ₪',
+    'תאריך 15/03/2026 - 10:20',
+    'שורה\nשנייה',
+    'ךםןףץ "ציטוט" (סוגריים)',
+    '',
+]
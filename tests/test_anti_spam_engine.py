@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""AntiSpamEngine.flush מול מסד זמני: שורה פסולה לא מפילה את שאר המנה, כשל זמני מחזיר לתור"""
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from anti_spam_engine import AntiSpamEngine, _utc_str  # noqa: E402
+from database import Database  # noqa: E402
+
+SCHEMA = '''
+CREATE TABLE students (id INTEGER PRIMARY KEY, name TEXT);
+CREATE TABLE card_validations (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                               student_id INTEGER NOT NULL REFERENCES students(id),
+                               card_number TEXT, validated_at TEXT);
+CREATE TABLE card_blocks (id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER NOT NULL REFERENCES students(id),
+                          card_number TEXT, block_start TEXT, block_end TEXT, block_reason TEXT,
+                          violation_count INTEGER);
+CREATE TABLE anti_spam_events (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                               student_id INTEGER NOT NULL REFERENCES students(id), card_number TEXT,
+                               event_type TEXT, rule_count INTEGER, rule_minutes INTEGER, duration_minutes INTEGER,
+                               recent_count INTEGER, message TEXT, created_at TEXT);
+INSERT INTO students (id, name) VALUES (1, 'דנה');
+'''
+
+
+class FlushTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix='anti_spam_')
+        self.path = os.path.join(self.tmp, 'school_points.db')
+        conn = sqlite3.connect(self.path)
+        conn.executescript(SCHEMA)
+        conn.commit()
+        conn.close()
+        self.db = Database(self.path)
+        self.engine = AntiSpamEngine(self.db)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def count(self, table):
+        conn = sqlite3.connect(self.path)
+        try:
+            return conn.execute(f'SELECT COUNT(1) FROM {table}').fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_bad_row_does_not_drop_block(self):
+        self.engine.record_validation(99, 'GONE')
+        self.engine.record_validation(1, 'C1')
+        self.engine.block_card(1, 'C1', 10, 'ספאם', 1)
+        self.engine.log_event(student_id=1, card_number='C1', event_type='block')
+        self.assertTrue(self.engine.flush())
+        self.assertEqual(self.count('card_validations'), 1)
+        self.assertEqual(self.count('card_blocks'), 1)
+        self.assertEqual(self.count('anti_spam_events'), 1)
+
+        # הרענון מה-DB לא משחרר את הכרטיס
+        self.engine._resync_blocks()
+        self.assertTrue(self.engine.is_card_blocked(1)[0])
+
+    def test_transient_failure_requeues_everything(self):
+        self.engine.record_validation(1, 'C1')
+        self.engine.block_card(1, 'C1', 10, 'ספאם', 1)
+        with mock.patch.object(self.db, 'write_anti_spam_batch', side_effect=sqlite3.OperationalError('locked')):
+            self.assertFalse(self.engine.flush())
+        self.assertEqual(self.engine.stats()['pending'], 2)
+        self.assertTrue(self.engine.flush())
+        self.assertEqual(self.count('card_blocks'), 1)
+
+    def test_utc_str(self):
+        self.assertEqual(_utc_str(0), '1970-01-01 00:00:00')
+        self.assertEqual(_utc_str(86400 + 3661), '1970-01-02 01:01:01')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""CustomerDisplay מול LoopbackSerial: איחוד פריימים, חיבור מחדש ושליחה חוזרת, close לא חוסם"""
+
+import os
+import sys
+import threading
+import time
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from customer_display import CustomerDisplay, LoopbackSerial  # noqa: E402
+
+
+class FastDisplay(CustomerDisplay):
+    SEND_DELAY = 0.005
+    CLEAR_DELAY = 0.01
+    CONNECT_SETTLE = 0.0
+    RECONNECT_MIN_SEC = 0.02
+    RECONNECT_MAX_SEC = 0.05
+
+
+class FlakySerial(LoopbackSerial):
+    """הכתיבה הראשונה אחרי ה-N נכשלת (כמו ניתוק כבל)"""
+
+    def __init__(self, fail_after=None, **kw):
+        super().__init__(**kw)
+        self.fail_after = fail_after
+        self.writes = 0
+
+    def write(self, data):
+        self.writes += 1
+        if self.fail_after is not None and self.writes > self.fail_after:
+            raise IOError('device gone')
+        return super().write(data)
+
+
+class SlowSerial(LoopbackSerial):
+    def __init__(self, block_sec, **kw):
+        super().__init__(**kw)
+        self.block_sec = block_sec
+        self.writing = threading.Event()
+
+    def write(self, data):
+        self.writing.set()
+        time.sleep(self.block_sec)
+        return super().write(data)
+
+
+def _wait(predicate, timeout=5.0):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def _idle(display):
+    with display._cond:
+        return display._pending is None
+
+
+class CustomerDisplayTest(unittest.TestCase):
+
+    def test_rapid_updates_coalesce_to_latest_frame(self):
+        port = LoopbackSerial(baudrate=9600, simulate_baud=True)
+        d = FastDisplay(enabled=True, serial_factory=lambda: port)
+        try:
+            self.assertTrue(_wait(lambda: d.connected))
+            for i in range(40):
+                d.show_item(f"פריט {i}", i)
+            self.assertTrue(_wait(lambda: _idle(d) and port.written.endswith(d._encode('39 נקודות'))))
+            time.sleep(0.1)
+            clears = bytes(port.written).count(b'\x0C')
+            # ניקוי החיבור + מעט פריימים – לא 40
+            self.assertLess(clears, 10)
+            self.assertTrue(bytes(port.written).endswith(d._encode('פריט 39') + b'\n' + d._encode('39 נקודות')))
+        finally:
+            d.close()
+
+    def test_reconnect_and_resend_after_write_error(self):
+        ports = []
+
+        def factory():
+            # החיבור הראשון נופל אחרי ניקוי החיבור; השני תקין
+            port = FlakySerial(fail_after=1 if not ports else None, simulate_baud=False)
+            ports.append(port)
+            return port
+
+        d = FastDisplay(enabled=True, serial_factory=factory)
+        try:
+            self.assertTrue(_wait(lambda: d.connected))
+            d.show_student('דנה', 12)
+            expected = d._encode('ברוך הבא דנה') + b'\n' + d._encode('יש לך 12 נקודות')
+            self.assertTrue(_wait(lambda: len(ports) >= 2 and ports[-1].written.endswith(expected)))
+            self.assertNotIn(expected, bytes(ports[0].written))
+        finally:
+            d.close()
+
+    def test_close_does_not_wait_for_a_slow_port(self):
+        port = SlowSerial(block_sec=0.8, simulate_baud=False)
+        d = FastDisplay(enabled=True, serial_factory=lambda: port)
+        self.assertTrue(port.writing.wait(2.0))
+        t0 = time.monotonic()
+        d.close()
+        self.assertLess(time.monotonic() - t0, 0.2)
+        # תהליכון הכתיבה סוגר את הפורט בעצמו אחרי שה-write הנוכחי מסתיים
+        self.assertTrue(_wait(lambda: not port.is_open, timeout=3.0))
+        self.assertTrue(_wait(lambda: not d._thread.is_alive(), timeout=3.0))
+
+    def test_disabled_display_posts_nothing(self):
+        d = FastDisplay(enabled=False, serial_factory=lambda: self.fail('should not open'))
+        self.assertFalse(d._post(d._frame('x')))
+        d.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
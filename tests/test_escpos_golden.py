@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""קבלות/שוברים במצב טקסט – בתים זהים לבונים הקודמים (fixtures/escpos_golden.json)"""
+
+import json
+import os
+import sys
+import unittest
+from unittest import mock
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+for _p in (ROOT, HERE):
+    if _p not in sys.path:
+        sys.path.insert(0, _p)
+
+import escpos_cases as cases  # noqa: E402
+
+cases.install_windows_stubs()
+
+import cashier_station  # noqa: E402
+import escpos_builder  # noqa: E402
+import fast_logo_printer  # noqa: E402
+
+with open(os.path.join(HERE, 'fixtures', 'escpos_golden.json'), 'r', encoding='utf-8') as _f:
+    GOLDEN = json.load(_f)
+
+
+class EscPosGoldenTest(unittest.TestCase):
+
+    def setUp(self):
+        self.station = cashier_station.CashierStation.__new__(cashier_station.CashierStation)
+
+    def _check(self, case_list, expected):
+        self.assertEqual(len(case_list), len(expected))
+        with mock.patch('datetime.datetime', cases.FixedDateTime):
+            for i, (case, hex_bytes) in enumerate(zip(case_list, expected)):
+                with self.subTest(i=i, kind=case['kind']):
+                    self.assertEqual(cases.build(self.station, case), bytes.fromhex(hex_bytes))
+
+    def test_receipts(self):
+        self._check(cases.receipt_cases(), GOLDEN['receipts'])
+
+    def test_vouchers(self):
+        self._check(cases.voucher_cases(), GOLDEN['vouchers'])
+
+    def test_hebrew_to_cp862(self):
+        for text, expected in zip(cases.HEBREW_TO_CP862_CASES, GOLDEN['hebrew_to_cp862']):
+            with self.subTest(text=text):
+                self.assertEqual(fast_logo_printer.hebrew_to_cp862(text), expected)
+
+
+class EncodingTest(unittest.TestCase):
+
+    def test_charmap_encode_matches_str_encode(self):
+        text = 'שלום abc ₪ 123 ★ "ציטוט"'
+        for enc in ('cp862', 'cp1255', 'utf-8'):
+            for errors in ('replace', 'ignore'):
+                with self.subTest(enc=enc, errors=errors):
+                    self.assertEqual(escpos_builder.encode(text, enc, errors), text.encode(enc, errors=errors))
+
+
+class RasterTest(unittest.TestCase):
+
+    @staticmethod
+    def _reference(img) -> bytes:
+        """הלולאה פיקסל-פיקסל של הבונה הקודם"""
+        w, h = img.size
+        width_bytes = (w + 7) // 8
+        data = bytearray(b'\x1D\x76\x30\x00' + bytes([width_bytes & 0xFF, (width_bytes >> 8) & 0xFF, h & 0xFF, (h >> 8) & 0xFF]))
+        for y in range(h):
+            for x in range(0, w, 8):
+                byte_val = 0
+                for bit in range(8):
+                    if x + bit < w and img.getpixel((x + bit, y)) == 0:
+                        byte_val |= (1 << (7 - bit))
+                data.append(byte_val)
+        return bytes(data)
+
+    def test_mode_1_fast_path_matches_pixel_loop(self):
+        from PIL import Image, ImageDraw
+        for width in (384, 100, 13):
+            img = Image.new('1', (width, 21), 1)
+            draw = ImageDraw.Draw(img)
+            draw.ellipse([2, 2, width - 3, 18], fill=0)
+            draw.line([(0, 0), (width - 1, 20)], fill=1, width=2)
+            with self.subTest(width=width):
+                self.assertEqual(escpos_builder.raster_bytes(img), self._reference(img))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""excel_import_engine: שמות כפולים בקובץ מוחלים לפי הסדר, ויומן/אירועים רק לכתיבות שהצליחו"""
+
+import os
+import sqlite3
+import sys
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+try:
+    import pandas as pd
+except Exception:  # pragma: no cover
+    pd = None
+
+from excel_import_engine import (  # noqa: E402
+    COL_CARD, COL_CLASS, COL_FIRST_NAME, COL_LAST_NAME, COL_POINTS,
+    apply_import_plan, build_import_plan, fetch_existing_students, normalize_import_frame,
+)
+
+SCHEMA = '''
+CREATE TABLE students (id INTEGER PRIMARY KEY AUTOINCREMENT, first_name TEXT, last_name TEXT, points INTEGER DEFAULT 0,
+                       card_number TEXT UNIQUE, serial_number INTEGER, photo_number TEXT, private_message TEXT,
+                       id_number TEXT, class_name TEXT, updated_at TEXT);
+CREATE TABLE points_log (id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER, old_points INTEGER,
+                         new_points INTEGER, delta INTEGER, reason TEXT, actor_name TEXT, action_type TEXT);
+'''
+
+
+@unittest.skipIf(pd is None, 'pandas not installed')
+class ImportEngineTests(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(':memory:')
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+        self.conn.execute("INSERT INTO students (id, first_name, last_name, points, serial_number, class_name) "
+                          "VALUES (1, 'דנה', 'כהן', 10, 1, 'א1'), (2, 'יואב', 'לוי', 20, 2, 'א2')")
+        self.conn.commit()
+
+    def tearDown(self):
+        self.conn.close()
+
+    def run_import(self, rows, mode='import'):
+        df = pd.DataFrame(rows)
+        frame = normalize_import_frame(df)
+        cur = self.conn.cursor()
+        plan = build_import_plan(frame, fetch_existing_students(cur), mode=mode)
+        result = apply_import_plan(cur, plan)
+        self.conn.commit()
+        return plan, result
+
+    def student(self, first, last):
+        return dict(self.conn.execute('SELECT * FROM students WHERE first_name = ? AND last_name = ?',
+                                      (first, last)).fetchone())
+
+    def test_duplicate_existing_name_last_row_wins(self):
+        plan, _ = self.run_import([
+            {COL_FIRST_NAME: 'דנה', COL_LAST_NAME: 'כהן', COL_POINTS: 15},
+            {COL_FIRST_NAME: 'יואב', COL_LAST_NAME: 'לוי', COL_POINTS: 20},
+            {COL_FIRST_NAME: 'דנה', COL_LAST_NAME: 'כהן', COL_POINTS: 10},
+        ])
+        # מס' סידורי לפי סדר השורות: 1 ואז 3 – האחרון קובע
+        self.assertEqual(self.student('דנה', 'כהן')['serial_number'], 3)
+        self.assertNotIn(1, plan['points_changes'])
+
+    def test_duplicate_serial_flip_back_is_no_change(self):
+        plan, _ = self.run_import([
+            {COL_FIRST_NAME: 'דנה', COL_LAST_NAME: 'כהן', COL_POINTS: 10, 'מס\' סידורי': 7},
+            {COL_FIRST_NAME: 'דנה', COL_LAST_NAME: 'כהן', COL_POINTS: 10, 'מס\' סידורי': 1},
+            {COL_FIRST_NAME: 'יואב', COL_LAST_NAME: 'לוי', COL_POINTS: 20, 'מס\' סידורי': 2},
+        ])
+        self.assertEqual(self.student('דנה', 'כהן')['serial_number'], 1)
+        self.assertNotIn('serial_number', plan['updates'].get(1, {}))
+
+    def test_duplicate_new_name_inserted_once_keeps_first_class(self):
+        self.run_import([
+            {COL_FIRST_NAME: 'נועה', COL_LAST_NAME: 'בר', COL_CLASS: 'ב3', COL_POINTS: 5, COL_CARD: '111'},
+            {COL_FIRST_NAME: 'נועה', COL_LAST_NAME: 'בר', COL_CLASS: '', COL_POINTS: 8, COL_CARD: ''},
+        ])
+        rows = self.conn.execute("SELECT class_name, points, card_number FROM students WHERE first_name = 'נועה'").fetchall()
+        self.assertEqual([tuple(r) for r in rows], [('ב3', 8, '111')])
+
+    def test_failed_points_update_has_no_log_or_event(self):
+        self.conn.execute(
+            "CREATE TRIGGER lock_yoav BEFORE UPDATE OF points ON students WHEN NEW.id = 2 "
+            "BEGIN SELECT RAISE(ABORT, 'locked'); END"
+        )
+        _, result = self.run_import([
+            {COL_FIRST_NAME: 'דנה', COL_LAST_NAME: 'כהן', COL_POINTS: 11},
+            {COL_FIRST_NAME: 'יואב', COL_LAST_NAME: 'לוי', COL_POINTS: 25},
+        ])
+        self.assertTrue(any('2' in e for e in result['errors']))
+        logged = [r[0] for r in self.conn.execute('SELECT student_id FROM points_log')]
+        self.assertEqual(logged, [1])
+        point_events = [e[1] for e in result['events'] if e[0] == 'student_points']
+        self.assertEqual(point_events, ['1'])
+        self.assertEqual(result['points_changed'], 1)
+
+    def test_failed_field_update_has_no_event(self):
+        self.conn.execute("UPDATE students SET card_number = '999' WHERE id = 2")
+        self.conn.commit()
+        _, result = self.run_import([
+            {COL_FIRST_NAME: 'דנה', COL_LAST_NAME: 'כהן', COL_POINTS: 10, COL_CARD: '999'},
+            {COL_FIRST_NAME: 'יואב', COL_LAST_NAME: 'לוי', COL_POINTS: 20, COL_CARD: '555'},
+        ], mode='quick')
+        updated = [e[1] for e in result['events'] if e[0] == 'student']
+        self.assertEqual(updated, ['2'])
+        self.assertEqual(result['updated'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""ReplicaDatabase מול מסד משותף ועותק מקומי זמניים: spool/שידור חוזר, dead letter, רענון"""
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from read_replica import MAX_REFUSED_ATTEMPTS, ReplicaDatabase  # noqa: E402
+
+SHARED_SCHEMA = '''
+CREATE TABLE students (id INTEGER PRIMARY KEY, name TEXT, points INTEGER DEFAULT 0, updated_at TEXT);
+CREATE TABLE change_log (id INTEGER PRIMARY KEY AUTOINCREMENT, entity_type TEXT, entity_id TEXT);
+CREATE TABLE swipe_log (id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER, card_number TEXT,
+                        station_type TEXT, swiped_at TEXT);
+CREATE TABLE card_validations (id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER NOT NULL,
+                               card_number TEXT, validated_at TEXT);
+CREATE TABLE card_blocks (id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER, card_number TEXT,
+                          block_start TEXT, block_end TEXT, block_reason TEXT, violation_count INTEGER);
+CREATE TABLE anti_spam_events (id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER, card_number TEXT,
+                               event_type TEXT, rule_count INTEGER, rule_minutes INTEGER,
+                               duration_minutes INTEGER, recent_count INTEGER, message TEXT, created_at TEXT);
+CREATE TABLE time_bonus_given (id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER, bonus_schedule_id INTEGER,
+                               given_date TEXT, given_at TEXT, UNIQUE (student_id, bonus_schedule_id, given_date));
+CREATE TABLE classes (name TEXT PRIMARY KEY, teacher TEXT);
+'''
+
+
+class SlowReplica(ReplicaDatabase):
+    """העתקות מלאות רק כשהבדיקה מאפשרת במפורש"""
+    FULL_REFRESH_SEC = 1e9
+
+
+class ReplicaTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix='replica_test_')
+        self.shared_path = os.path.join(self.tmp, 'shared', 'school_points.db')
+        os.makedirs(os.path.dirname(self.shared_path))
+        conn = sqlite3.connect(self.shared_path)
+        conn.executescript(SHARED_SCHEMA)
+        conn.execute("INSERT INTO students (id, name, points, updated_at) VALUES (1, 'דנה', 10, '2026-01-01 08:00:00')")
+        conn.execute("INSERT INTO classes (name, teacher) VALUES ('א1', 'רות')")
+        conn.commit()
+        conn.close()
+        self.replica_dir = os.path.join(self.tmp, 'local')
+        os.makedirs(self.replica_dir)
+        self.db = SlowReplica(self.shared_path, replica_dir=self.replica_dir, autostart=False)
+
+    def tearDown(self):
+        self.db.stop_replica(flush_timeout=0.5)
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def shared_exec(self, sql, params=()):
+        conn = sqlite3.connect(self.shared_path)
+        try:
+            conn.execute(sql, params)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def shared_rows(self, sql, params=()):
+        conn = sqlite3.connect(self.shared_path)
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def local_rows(self, sql, params=()):
+        conn = self.db.get_connection()
+        try:
+            return [tuple(r) for r in conn.execute(sql, params).fetchall()]
+        finally:
+            conn.close()
+
+
+class SpoolTests(ReplicaTestCase):
+    def test_write_is_local_at_once_and_reaches_shared_on_flush(self):
+        self.assertTrue(self.db.log_swipe(1, 'C1', 'public'))
+        self.assertEqual(len(self.local_rows('SELECT id FROM swipe_log')), 1)
+        self.assertEqual(self.shared_rows('SELECT COUNT(1) FROM swipe_log')[0][0], 0)
+        self.assertEqual(self.db.pending_writes(), 1)
+
+        self.assertEqual(self.db._flush(), 0)
+        shared = self.shared_rows('SELECT student_id, card_number, swiped_at FROM swipe_log')
+        local = self.local_rows('SELECT student_id, card_number, swiped_at FROM swipe_log')
+        self.assertEqual(shared, local)
+
+    def test_false_result_keeps_entry_while_shared_is_not_writable(self):
+        self.db.log_swipe(1, 'C1', 'public')
+        self.db.log_swipe(1, 'C2', 'public')
+        with mock.patch.object(self.db.shared, 'log_swipe', return_value=False) as failing, \
+                mock.patch.object(self.db, '_shared_writable', return_value=False):
+            for _ in range(12):
+                with self.assertRaises(Exception):
+                    self.db._flush()
+            # הסדר נשמר – רק הראשונה נוסתה
+            self.assertTrue(all(c.args[1] == 'C1' for c in failing.call_args_list))
+        self.assertEqual(self.db.pending_writes(), 2)
+        self.assertEqual(self.db.failed_writes(), 0)
+
+        self.assertEqual(self.db._flush(), 0)
+        self.assertEqual(self.shared_rows('SELECT card_number FROM swipe_log ORDER BY id'), [('C1',), ('C2',)])
+
+    def test_refused_write_does_not_block_the_queue(self):
+        self.db.log_swipe(1, 'C1', 'public')
+        self.db.log_swipe(1, 'C2', 'public')
+        real = self.db.shared.log_swipe
+
+        def refuse_c1(*args, **kwargs):
+            return False if args[1] == 'C1' else real(*args, **kwargs)
+
+        with mock.patch.object(self.db.shared, 'log_swipe', side_effect=refuse_c1):
+            for _ in range(MAX_REFUSED_ATTEMPTS - 1):
+                with self.assertRaises(Exception):
+                    self.db._flush()
+            self.assertEqual(self.db.failed_writes(), 0)
+            self.assertEqual(self.db._flush(), 0)
+        self.assertEqual(self.db.failed_writes(), 1)
+        self.assertEqual(self.shared_rows('SELECT card_number FROM swipe_log'), [('C2',)])
+
+    def test_shared_unavailable_keeps_entry(self):
+        self.db.log_swipe(1, 'C1', 'public')
+        with mock.patch.object(self.db.shared, 'log_swipe', side_effect=sqlite3.OperationalError('database is locked')):
+            with self.assertRaises(Exception):
+                self.db._flush()
+        self.assertEqual(self.db.pending_writes(), 1)
+        self.assertEqual(self.db._flush(), 0)
+        self.assertEqual(self.shared_rows('SELECT COUNT(1) FROM swipe_log')[0][0], 1)
+
+    def test_integrity_error_goes_to_dead_letter_and_queue_continues(self):
+        self.db.write_anti_spam_batch(validations=[(None, 'C1', '2026-01-01 08:00:00')])
+        self.db.log_swipe(1, 'C2', 'public')
+        self.assertEqual(self.db._flush(), 0)
+        self.assertEqual(self.db.failed_writes(), 1)
+        self.assertEqual(self.shared_rows('SELECT card_number FROM swipe_log'), [('C2',)])
+        method, error = self.db._spool._conn.execute('SELECT method, error FROM write_spool_dead').fetchone()
+        self.assertEqual(method, 'write_anti_spam_batch')
+        self.assertIn('IntegrityError', error)
+
+    def test_batch_with_bad_row_keeps_the_other_rows(self):
+        self.db.write_anti_spam_batch(
+            validations=[(None, 'C1', '2026-01-01 08:00:00'), (1, 'C2', '2026-01-01 08:00:01')],
+            blocks=[(1, 'C2', '2026-01-01 08:00:01', '2099-01-01 00:00:00', 'ספאם', 1)],
+        )
+        self.assertEqual(self.db._flush(), 0)
+        self.assertEqual(self.db.failed_writes(), 1)
+        self.assertEqual(self.shared_rows('SELECT card_number FROM card_validations'), [('C2',)])
+        self.assertEqual(self.shared_rows('SELECT card_number FROM card_blocks'), [('C2',)])
+        payload = self.db._spool._conn.execute('SELECT payload FROM write_spool_dead').fetchone()[0]
+        self.assertIn('C1', payload)
+        self.assertNotIn('C2', payload)
+
+    def test_batch_split_resumes_after_transient_failure(self):
+        self.db.write_anti_spam_batch(
+            validations=[(None, 'C1', '2026-01-01 08:00:00'), (1, 'C2', '2026-01-01 08:00:01')],
+            events=[(1, 'C2', 'block', 3, 1, 10, 3, '', '2026-01-01 08:00:01')],
+        )
+        real = self.db.shared.write_anti_spam_batch
+
+        def fail_events(**kwargs):
+            if kwargs.get('events') and not kwargs.get('validations'):
+                raise sqlite3.OperationalError('database is locked')
+            return real(**kwargs)
+
+        with mock.patch.object(self.db.shared, 'write_anti_spam_batch', side_effect=fail_events):
+            with self.assertRaises(Exception):
+                self.db._flush()
+        self.assertEqual(self.db.pending_writes(), 1)
+        self.assertEqual(self.db._flush(), 0)
+        self.assertEqual(self.shared_rows('SELECT card_number FROM card_validations'), [('C2',)])
+        self.assertEqual(self.shared_rows('SELECT COUNT(1) FROM anti_spam_events')[0][0], 1)
+
+    def test_time_bonus_claim_goes_straight_to_shared(self):
+        self.assertTrue(self.db.claim_time_bonus(1, 7))
+        self.assertEqual(self.db.pending_writes(), 0)
+        self.assertEqual(self.shared_rows('SELECT student_id, bonus_schedule_id FROM time_bonus_given'), [(1, 7)])
+        self.assertEqual(self.local_rows('SELECT student_id, bonus_schedule_id FROM time_bonus_given'), [(1, 7)])
+        # תפיסה שנייה – גם מעמדה שהעותק שלה עוד לא ראה את הראשונה – נכשלת
+        self.assertFalse(self.db.claim_time_bonus(1, 7))
+
+    def test_bad_payload_goes_to_dead_letter(self):
+        self.db._spool.push('log_swipe', 'not json')
+        self.db.log_swipe(1, 'C1', 'public')
+        self.assertEqual(self.db._flush(), 0)
+        self.assertEqual(self.db.failed_writes(), 1)
+        self.assertEqual(self.shared_rows('SELECT COUNT(1) FROM swipe_log')[0][0], 1)
+
+    def test_spool_survives_restart(self):
+        self.db.log_swipe(1, 'C1', 'public')
+        self.db.stop_replica(flush_timeout=0.1)
+        again = SlowReplica(self.shared_path, replica_dir=self.replica_dir, autostart=False)
+        self.assertEqual(again.pending_writes(), 1)
+        self.assertEqual(again._flush(), 0)
+        self.assertEqual(self.shared_rows('SELECT card_number FROM swipe_log'), [('C1',)])
+
+
+class RefreshTests(ReplicaTestCase):
+    def test_log_tables_are_pulled_by_id_without_full_copy(self):
+        self.assertFalse(self.db._refresh())
+        self.shared_exec("INSERT INTO time_bonus_given (student_id, bonus_schedule_id, given_date) VALUES (1, 7, '2026-01-01')")
+        self.shared_exec("INSERT INTO card_validations (student_id, card_number, validated_at) "
+                         "VALUES (1, 'C1', '2026-01-01 08:00:00')")
+        self.shared_exec("INSERT INTO anti_spam_events (student_id, event_type) VALUES (1, 'block')")
+        self.shared_exec("INSERT INTO card_blocks (student_id, card_number, block_end) VALUES (1, 'C1', '2099-01-01')")
+        self.assertTrue(self.db._refresh())
+        for table in ('time_bonus_given', 'card_validations', 'anti_spam_events', 'card_blocks'):
+            self.assertEqual(self.local_rows(f'SELECT COUNT(1) FROM {table}')[0][0], 1, table)
+
+    def test_card_block_delete_propagates(self):
+        self.shared_exec("INSERT INTO card_blocks (student_id, card_number, block_end) VALUES (1, 'C1', '2099-01-01')")
+        self.db._refresh()
+        self.assertEqual(self.local_rows('SELECT COUNT(1) FROM card_blocks')[0][0], 1)
+        self.shared_exec('DELETE FROM card_blocks WHERE student_id = 1')
+        # מחיקה נבדקת רק כשהמגבלה מאפשרת – עד אז המונה לא מסומן כמטופל
+        self.db._refresh()
+        self.assertIsNone(self.db._last_counter)
+        self.db.FULL_REFRESH_SEC = 0.0
+        self.assertTrue(self.db._refresh())
+        self.assertEqual(self.local_rows('SELECT COUNT(1) FROM card_blocks')[0][0], 0)
+
+    def test_archived_log_rows_are_dropped(self):
+        for i in range(3):
+            self.shared_exec("INSERT INTO card_validations (student_id, card_number, validated_at) "
+                             "VALUES (1, 'C1', ?)", (f'2026-01-0{i + 1} 08:00:00',))
+        self.db._refresh()
+        self.shared_exec("DELETE FROM card_validations WHERE validated_at < '2026-01-03'")
+        self.db._refresh()
+        self.assertEqual(self.local_rows('SELECT validated_at FROM card_validations'), [('2026-01-03 08:00:00',)])
+
+    def test_throttled_table_is_copied_later_without_new_changes(self):
+        self.shared_exec("UPDATE classes SET teacher = 'מיכל' WHERE name = 'א1'")
+        self.db._refresh()
+        self.assertEqual(self.local_rows('SELECT teacher FROM classes'), [('רות',)])
+        self.assertIsNone(self.db._last_counter)
+
+        # אין שינוי נוסף במשותף – הרענון הבא עדיין מעתיק
+        self.db.FULL_REFRESH_SEC = 0.0
+        self.assertTrue(self.db._refresh())
+        self.assertEqual(self.local_rows('SELECT teacher FROM classes'), [('מיכל',)])
+        self.assertIsNotNone(self.db._last_counter)
+        self.assertFalse(self.db._refresh())
+
+    def test_change_log_refetches_student(self):
+        # עדכון שלא קידם updated_at – מגיע דרך change_log
+        self.shared_exec("UPDATE students SET points = 25 WHERE id = 1")
+        self.shared_exec("INSERT INTO change_log (entity_type, entity_id) VALUES ('student', '1')")
+        self.db._refresh()
+        self.assertEqual(self.local_rows('SELECT points FROM students WHERE id = 1'), [(25,)])
+
+    def test_local_swipe_replaced_by_shared_row_after_flush(self):
+        self.shared_exec("INSERT INTO swipe_log (student_id, card_number, station_type, swiped_at) "
+                         "VALUES (1, 'OTHER', 'public', '2026-01-01 08:00:00')")
+        self.db.log_swipe(1, 'MINE', 'public')
+        self.db._flush()
+        self.db._refresh()
+        self.assertEqual(self.local_rows('SELECT id, card_number FROM swipe_log ORDER BY id'),
+                         [tuple(r) for r in self.shared_rows('SELECT id, card_number FROM swipe_log ORDER BY id')])
+
+
+if __name__ == '__main__':
+    unittest.main()
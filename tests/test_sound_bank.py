@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""SoundBank.reload: קובץ שהוחלף באותו נתיב מפוענח מחדש, קובץ שנמחק יוצא מהמטמון"""
+
+import os
+import shutil
+import sys
+import tempfile
+import types
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from tests.escpos_cases import install_windows_stubs  # noqa: E402
+
+install_windows_stubs()
+
+import sound_manager  # noqa: E402
+
+
+class FakeSound:
+    """pygame.mixer.Sound מזויף – "מפענח" את תוכן הקובץ"""
+    decoded = []
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.data = f.read()
+        FakeSound.decoded.append(path)
+
+    def set_volume(self, _v):
+        pass
+
+
+def _fake_pygame():
+    mixer = types.SimpleNamespace(
+        Sound=FakeSound,
+        get_num_channels=lambda: 8,
+        set_num_channels=lambda n: None,
+        set_reserved=lambda n: None,
+        music=types.SimpleNamespace(set_volume=lambda v: None),
+    )
+    return types.SimpleNamespace(mixer=mixer)
+
+
+class SoundBankReloadTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix='sound_bank_')
+        self.sounds = os.path.join(self.tmp, 'sounds')
+        os.makedirs(os.path.join(self.sounds, 'bonus'))
+        self.path = os.path.join(self.sounds, 'bonus', 'ding.wav')
+        self.write(self.path, b'old-audio')
+        patches = [
+            mock.patch.object(sound_manager, 'USE_PYGAME', True),
+            mock.patch.object(sound_manager, 'pygame', _fake_pygame(), create=True),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        FakeSound.decoded = []
+        self.manager = sound_manager.SoundManager(self.tmp, sounds_dir=self.sounds)
+        self.bank = sound_manager.SoundBank(self.manager)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    @staticmethod
+    def write(path, data):
+        with open(path, 'wb') as f:
+            f.write(data)
+
+    def test_unchanged_file_is_not_decoded_again(self):
+        self.bank.reload()
+        self.bank.reload()
+        self.assertEqual(FakeSound.decoded, [self.path])
+
+    def test_replaced_file_is_decoded_again(self):
+        self.bank.reload()
+        st = os.stat(self.path)
+        # העתקה אטומית: קובץ זמני + os.replace, עם אותו mtime
+        tmp = self.path + '.tmp'
+        self.write(tmp, b'new-audio')
+        os.utime(tmp, ns=(st.st_atime_ns, st.st_mtime_ns))
+        os.replace(tmp, self.path)
+        self.bank.reload()
+        self.assertEqual(FakeSound.decoded, [self.path, self.path])
+        self.assertEqual(self.manager.sound_cache[self.path].data, b'new-audio')
+
+    def test_removed_file_leaves_the_cache(self):
+        self.bank.reload()
+        os.remove(self.path)
+        self.bank.reload()
+        self.assertNotIn(self.path, self.manager.sound_cache)
+
+
+if __name__ == '__main__':
+    unittest.main()
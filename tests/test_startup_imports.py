@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""ייבוא קבצי הכניסה של העמדות לא טוען pandas/numpy/openpyxl (ראו startup_profile)"""
+
+import os
+import subprocess
+import sys
+import textwrap
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENTRY_POINTS = ('admin_station', 'cashier_station', 'public_station')
+HEAVY = ('pandas', 'numpy', 'openpyxl')
+
+# מודולים של Windows בלבד – מוחלפים במודול ריק כדי שהייבוא יעבור גם ב-Linux/CI
+WINDOWS_ONLY = ('win32print', 'win32ui', 'win32con', 'win32api', 'win32gui', 'winsound', 'winreg', 'pywintypes')
+
+_PROBE = textwrap.dedent('''
+    import sys, types
+
+    class _Stub(types.ModuleType):
+        def __getattr__(self, name):
+            if name.startswith('__'):
+                raise AttributeError(name)
+            return 0
+
+    for name in {stubs!r}:
+        try:
+            __import__(name)
+        except ImportError:
+            sys.modules[name] = _Stub(name)
+
+    import {module}
+    print(','.join(m for m in {heavy!r} if m in sys.modules))
+''')
+
+
+class EntryPointImportTest(unittest.TestCase):
+
+    def _loaded_heavy(self, module: str) -> str:
+        code = _PROBE.format(module=module, stubs=WINDOWS_ONLY, heavy=HEAVY)
+        proc = subprocess.run(
+            [sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, timeout=180,
+        )
+        self.assertEqual(proc.returncode, 0, f"import {module} failed:\n{proc.stderr[-2000:]}")
+        lines = [ln for ln in proc.stdout.splitlines() if ln is not None]
+        return lines[-1].strip() if lines else ''
+
+    def test_entry_points_do_not_import_heavy_modules(self):
+        for module in ENTRY_POINTS:
+            with self.subTest(module=module):
+                self.assertEqual(self._loaded_heavy(module), '', f"{module} imported heavy modules at start-up")
+
+
+if __name__ == '__main__':
+    unittest.main()
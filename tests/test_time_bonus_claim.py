@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""תפיסת בונוס זמנים במסד (claim_time_bonus) וזיכרון "כבר קיבל" של TimeBonusSchedule"""
+
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import unittest
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from database import Database  # noqa: E402
+from time_bonus_schedule import TimeBonusSchedule  # noqa: E402
+
+SCHEMA = '''
+CREATE TABLE students (id INTEGER PRIMARY KEY, name TEXT, class_name TEXT);
+CREATE TABLE time_bonus_schedules (id INTEGER PRIMARY KEY, name TEXT, group_name TEXT, start_time TEXT,
+                                   end_time TEXT, bonus_points INTEGER, is_active INTEGER DEFAULT 1,
+                                   is_general INTEGER DEFAULT 1, classes TEXT, days_of_week TEXT,
+                                   is_shown_public INTEGER DEFAULT 1, updated_at TEXT);
+CREATE TABLE time_bonus_given (id INTEGER PRIMARY KEY AUTOINCREMENT, student_id INTEGER NOT NULL,
+                               bonus_schedule_id INTEGER NOT NULL, given_date TEXT NOT NULL, given_at TEXT,
+                               UNIQUE (student_id, bonus_schedule_id, given_date));
+INSERT INTO students (id, name, class_name) VALUES (1, 'דנה', 'א1'), (2, 'יואב', 'א2');
+INSERT INTO time_bonus_schedules (id, name, group_name, start_time, end_time, bonus_points)
+VALUES (10, 'מוקדם', 'בוקר', '07:00', '07:30', 5), (11, 'בזמן', 'בוקר', '07:31', '08:00', 3),
+       (12, 'צהריים', '', '12:00', '13:00', 2);
+'''
+
+
+class ClaimTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp(prefix='tb_claim_')
+        self.path = os.path.join(self.tmp, 'school_points.db')
+        conn = sqlite3.connect(self.path)
+        conn.executescript(SCHEMA)
+        conn.commit()
+        conn.close()
+        self.db = Database(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def given(self):
+        conn = sqlite3.connect(self.path)
+        try:
+            return conn.execute('SELECT student_id, bonus_schedule_id FROM time_bonus_given ORDER BY id').fetchall()
+        finally:
+            conn.close()
+
+
+class ClaimTests(ClaimTestCase):
+    def test_second_claim_for_same_bonus_fails(self):
+        self.assertTrue(self.db.claim_time_bonus(1, 10, 'בוקר'))
+        self.assertFalse(Database(self.path).claim_time_bonus(1, 10, 'בוקר'))
+        self.assertEqual(self.given(), [(1, 10)])
+
+    def test_group_allows_one_bonus_per_day(self):
+        self.assertTrue(self.db.claim_time_bonus(1, 10, 'בוקר'))
+        self.assertFalse(self.db.claim_time_bonus(1, 11, 'בוקר'))
+        self.assertTrue(self.db.claim_time_bonus(2, 11, 'בוקר'))
+        self.assertEqual(self.given(), [(1, 10), (2, 11)])
+
+    def test_group_rule_sees_grants_made_without_claim(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute("INSERT INTO time_bonus_given (student_id, bonus_schedule_id, given_date) VALUES (1, 10, ?)",
+                     (date.today().isoformat(),))
+        conn.commit()
+        conn.close()
+        self.assertFalse(self.db.claim_time_bonus(1, 11, 'בוקר'))
+
+    def test_concurrent_stations_grant_once(self):
+        results = []
+        start = threading.Barrier(6)
+
+        def station(schedule_id):
+            db = Database(self.path)
+            start.wait()
+            results.append(db.claim_time_bonus(1, schedule_id, 'בוקר'))
+
+        threads = [threading.Thread(target=station, args=(10 + (i % 2),)) for i in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(results.count(True), 1)
+        self.assertEqual(len(self.given()), 1)
+
+    def test_release_lets_next_swipe_claim(self):
+        self.assertTrue(self.db.claim_time_bonus(1, 10, 'בוקר'))
+        self.assertTrue(self.db.release_time_bonus_claim(1, 10, 'בוקר'))
+        self.assertEqual(self.given(), [])
+        self.assertTrue(self.db.claim_time_bonus(1, 11, 'בוקר'))
+
+
+class ScheduleMemoryTests(ClaimTestCase):
+    def test_local_grant_survives_forced_refresh_until_seen_in_db(self):
+        sched = TimeBonusSchedule(self.db)
+        sched.refresh(force=True)
+        # הענקה שעוד לא נראית בקריאה (למשל עותק מקומי שמתעדכן באיחור)
+        sched.mark_given(1, 10, 'א1')
+        sched.refresh(force=True)
+        self.assertTrue(sched.has_received_group(1, 'בוקר'))
+        self.assertTrue(sched.has_received_exact(1, 10))
+
+        self.db.claim_time_bonus(1, 10, 'בוקר')
+        sched.refresh()
+        self.assertEqual(sched._local_given, {})
+        sched.refresh(force=True)
+        self.assertTrue(sched.has_received_exact(1, 10))
+        self.assertEqual(sched.group_given_count('בוקר', 'א1'), 1)
+
+    def test_forget_given_after_release(self):
+        sched = TimeBonusSchedule(self.db)
+        sched.refresh(force=True)
+        sched.mark_given(2, 11, 'א2')
+        sched.forget_given(2, 11)
+        self.assertFalse(sched.has_received_group(2, 'בוקר'))
+        self.assertFalse(sched.has_received_exact(2, 11))
+        sched.refresh(force=True)
+        self.assertFalse(sched.has_received_group(2, 'בוקר'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+"""
+לוח בונוס זמנים מחושב מראש לעמדה הציבורית
+
+time_bonus_schedules מקומפלים פעם ביום (או כשהטבלה משתנה) לטבלת דקות של
+היום: לכל דקה – רשימת הבונוסים הפעילים בה, ממוינת לפי עדיפות (שעת התחלה
+מאוחרת ואז ניקוד גבוה – כמו get_active_time_bonus_now). בנוסף נשמרים
+בזיכרון מי כבר קיבל היום בונוס מכל קבוצה, כך שבדיקת זכאות בזמן תיקוף לא
+דורשת קריאה מה-DB. רענון מה-DB (שינוי לוח זמנים / הענקות מעמדות אחרות)
+נעשה בתהליכון רקע. הזיכרון רק חוסך ניסיונות – ההענקה עצמה נקבעת בתפיסה
+במסד (Database.claim_time_bonus) לפני הוספת הנקודות.
+"""
+
+import threading
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+_WEEKDAY_HE = {0: 'ב', 1: 'ג', 2: 'ד', 3: 'ה', 4: 'ו', 5: 'ש', 6: 'א'}
+_ALL_DAYS = {'א', 'ב', 'ג', 'ד', 'ה', 'ו', 'ש'}
+
+
+def _time_to_minutes(t) -> Optional[int]:
+    try:
+        s = str(t or '').strip().replace('.', ':')
+        parts = s.split(':')
+        if len(parts) < 2:
+            return None
+        hh = int(parts[0])
+        mm = int(parts[1])
+        if not (0 <= hh <= 23 and 0 <= mm <= 59):
+            return None
+        return hh * 60 + mm
+    except Exception:
+        return None
+
+
+def _parse_days(text) -> Set[str]:
+    """'א,ג,ה' -> {'א','ג','ה'}; ריק/'כל' = כל הימים"""
+    s = str(text or '').strip()
+    if not s or s == 'כל':
+        return set(_ALL_DAYS)
+    s = s.replace(';', ',').replace('׳', ',').replace('״', ',')
+    out = set()
+    for p in s.split(','):
+        p = p.replace("'", '').replace('"', '').strip()
+        if not p:
+            continue
+        if p == 'כל':
+            return set(_ALL_DAYS)
+        if p[0] in _ALL_DAYS:
+            out.add(p[0])
+    return out or set(_ALL_DAYS)
+
+
+def _parse_classes(text) -> Set[str]:
+    s = str(text or '').replace('׳', ',').replace('״', ',').replace(';', ',')
+    return {p.strip() for p in s.split(',') if p.strip()}
+
+
+def _group_of(row: Dict[str, Any]) -> str:
+    return str(row.get('group_name') or row.get('name') or '').strip()
+
+
+class TimeBonusSchedule:
+    """לוח בונוסי זמנים יומי + "כבר קיבל היום" בזיכרון"""
+
+    def __init__(self, db, refresh_interval_sec: float = 5.0):
+        self.db = db
+        # גם מרווח משיכת ההענקות של עמדות אחרות – "כבר קיבל היום" נענה מהזיכרון בלבד
+        self.refresh_interval_sec = max(2.0, float(refresh_interval_sec or 5.0))
+        self._lock = threading.RLock()
+        self._day: Optional[str] = None
+        self._signature = None
+        self._schedules: Dict[int, Dict[str, Any]] = {}
+        # דקה ביום -> רשימת (row, classes|None) ממוינת לפי עדיפות
+        self._timeline: List[Tuple] = [()] * 1440
+        # group -> {student_id}
+        self._given_group: Dict[str, Set[int]] = {}
+        # group -> {class_name: {student_id}}
+        self._given_group_class: Dict[str, Dict[str, Set[int]]] = {}
+        # {(student_id, schedule_id)}
+        self._given_exact: Set[Tuple[int, int]] = set()
+        self._last_given_id = 0
+        # הענקות של העמדה הזו שעוד לא נראו בקריאה מה-DB (עותק מקומי מתעדכן באיחור):
+        # (day, student_id, schedule_id) -> class_name; נשמרות גם על פני רענון מלא
+        self._local_given: Dict[Tuple[str, int, int], str] = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ------------------------------------------------------------------
+    # טעינה וקומפילציה
+    # ------------------------------------------------------------------
+
+    def start(self) -> None:
+        self.refresh(force=True)
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._refresh_loop, name='time-bonus-refresh', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def invalidate(self) -> None:
+        """לקרוא אחרי עריכת לוח הזמנים מהעמדה עצמה"""
+        self.refresh(force=True)
+
+    def _refresh_loop(self) -> None:
+        while not self._stop.wait(self.refresh_interval_sec):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"[TIME-BONUS] refresh failed: {e}")
+
+    def _read_signature(self, cursor):
+        cursor.execute(
+            'SELECT COUNT(1), MAX(id), MAX(updated_at), SUM(is_active), SUM(bonus_points) FROM time_bonus_schedules'
+        )
+        return tuple(cursor.fetchone() or ())
+
+    def refresh(self, force: bool = False) -> None:
+        """קומפילציה מחדש אם היום התחלף או שהטבלה השתנתה + משיכת הענקות חדשות"""
+        today = date.today().isoformat()
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+        try:
+            sig = self._read_signature(cursor)
+            with self._lock:
+                day_changed = (today != self._day)
+                recompile = force or day_changed or sig != self._signature
+                reset = force or day_changed
+                since = 0 if reset else int(self._last_given_id or 0)
+            rows = None
+            if recompile:
+                cursor.execute('SELECT * FROM time_bonus_schedules')
+                rows = [dict(r) for r in (cursor.fetchall() or [])]
+            cursor.execute(
+                '''
+                SELECT g.id, g.student_id, g.bonus_schedule_id, COALESCE(s.class_name, '') AS class_name
+                  FROM time_bonus_given g
+                  LEFT JOIN students s ON s.id = g.student_id
+                 WHERE g.given_date = ? AND g.id > ?
+                 ORDER BY g.id
+                ''',
+                (today, since)
+            )
+            given = cursor.fetchall() or []
+        finally:
+            conn.close()
+
+        # ה-Tk (active_now) ותהליכון הרקע מרעננים במקביל – כל עדכון המצב תחת המנעול
+        with self._lock:
+            if rows is not None:
+                self._compile(rows, today)
+                self._signature = sig
+            if reset:
+                self._given_group = {}
+                self._given_group_class = {}
+                self._given_exact = set()
+                self._last_given_id = 0
+                self._local_given = {k: v for k, v in self._local_given.items() if k[0] == today}
+            for r in given:
+                sid = int(r['student_id'] or 0)
+                bid = int(r['bonus_schedule_id'] or 0)
+                self._remember(sid, bid, str(r['class_name'] or ''))
+                self._local_given.pop((today, sid, bid), None)
+                self._last_given_id = max(int(self._last_given_id or 0), int(r['id'] or 0))
+            if reset:
+                for (_day, sid, bid), cls in self._local_given.items():
+                    self._remember(sid, bid, cls)
+
+    def _compile(self, rows: List[Dict[str, Any]], today: str) -> None:
+        weekday = _WEEKDAY_HE.get(date.fromisoformat(today).weekday(), '')
+        timeline: List[List[Tuple]] = [[] for _ in range(1440)]
+        schedules: Dict[int, Dict[str, Any]] = {}
+        for r in rows:
+            try:
+                schedules[int(r.get('id') or 0)] = r
+            except Exception:
+                continue
+            try:
+                if int(r.get('is_active', 1) or 0) != 1:
+                    continue
+            except Exception:
+                continue
+            if weekday not in _parse_days(r.get('days_of_week')):
+                continue
+            s_min = _time_to_minutes(r.get('start_time'))
+            e_min = _time_to_minutes(r.get('end_time'))
+            if s_min is None or e_min is None or e_min < s_min:
+                continue
+            try:
+                is_general = int(r.get('is_general', 1) if r.get('is_general') is not None else 1)
+            except Exception:
+                is_general = 1
+            classes = None if is_general == 1 else frozenset(_parse_classes(r.get('classes')))
+            entry = (r, classes)
+            # שעת הסיום כוללת (כמו בלוגיקת ה-DB)
+            for m in range(s_min, e_min + 1):
+                timeline[m].append(entry)
+        prio = lambda e: (str(e[0].get('start_time') or ''), int(e[0].get('bonus_points') or 0))
+        compiled = [tuple(sorted(lst, key=prio, reverse=True)) for lst in timeline]
+        with self._lock:
+            self._schedules = schedules
+            self._timeline = compiled
+            self._day = today
+
+    # ------------------------------------------------------------------
+    # שאילתות בזמן תיקוף
+    # ------------------------------------------------------------------
+
+    def active_now(self, class_name: Optional[str] = None, only_shown_public: bool = False,
+                   now: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+        """הבונוס הפעיל כעת (תחליף ל-Database.get_active_time_bonus_now).
+        class_name=None – ללא סינון כיתה (לתצוגה הכללית)."""
+        if now is None:
+            now = datetime.now()
+        if now.date().isoformat() != self._day:
+            try:
+                self.refresh()
+            except Exception:
+                pass
+        minute = now.hour * 60 + now.minute
+        with self._lock:
+            candidates = self._timeline[minute]
+        cls = None if class_name is None else str(class_name or '').strip()
+        for row, classes in candidates:
+            if only_shown_public:
+                try:
+                    if int(row.get('is_shown_public', 1) if row.get('is_shown_public') is not None else 1) != 1:
+                        continue
+                except Exception:
+                    pass
+            if cls is not None and classes is not None and cls not in classes:
+                continue
+            return dict(row)
+        return None
+
+    def group_for_schedule(self, schedule_id) -> str:
+        with self._lock:
+            row = self._schedules.get(int(schedule_id or 0))
+        return _group_of(row) if row else ''
+
+    def has_received_group(self, student_id, group: str) -> bool:
+        with self._lock:
+            return int(student_id or 0) in self._given_group.get(str(group or '').strip(), ())
+
+    def has_received_exact(self, student_id, schedule_id) -> bool:
+        with self._lock:
+            return (int(student_id or 0), int(schedule_id or 0)) in self._given_exact
+
+    def group_given_count(self, group: str, class_name: Optional[str] = None) -> int:
+        """מספר התלמידים שקיבלו היום בונוס מהקבוצה (כולל/לפי כיתה)"""
+        g = str(group or '').strip()
+        with self._lock:
+            if class_name is None:
+                return len(self._given_group.get(g, ()))
+            return len(self._given_group_class.get(g, {}).get(str(class_name or '').strip(), ()))
+
+    def mark_given(self, student_id, schedule_id, class_name: str = '') -> None:
+        """לקרוא אחרי claim_time_bonus כדי שהזיכרון יתעדכן מיד"""
+        sid = int(student_id or 0)
+        bid = int(schedule_id or 0)
+        with self._lock:
+            self._local_given[(date.today().isoformat(), sid, bid)] = str(class_name or '')
+            self._remember(sid, bid, str(class_name or ''))
+
+    def forget_given(self, student_id, schedule_id) -> None:
+        """אחרי release_time_bonus_claim – ההענקה בוטלה"""
+        sid = int(student_id or 0)
+        bid = int(schedule_id or 0)
+        with self._lock:
+            self._local_given.pop((date.today().isoformat(), sid, bid), None)
+            self._given_exact.discard((sid, bid))
+            row = self._schedules.get(bid)
+            group = _group_of(row) if row else ''
+            if not group:
+                return
+            self._given_group.get(group, set()).discard(sid)
+            for members in self._given_group_class.get(group, {}).values():
+                members.discard(sid)
+
+    def _remember(self, student_id: int, schedule_id: int, class_name: str) -> None:
+        if not student_id:
+            return
+        with self._lock:
+            self._given_exact.add((student_id, schedule_id))
+            row = self._schedules.get(schedule_id)
+            group = _group_of(row) if row else ''
+            if not group:
+                return
+            self._given_group.setdefault(group, set()).add(student_id)
+            self._given_group_class.setdefault(group, {}).setdefault(class_name.strip(), set()).add(student_id)
@@ -22,65 +22,59 @@ def reverse_hebrew_for_image(text):
     return ' '.join(reversed_words)
 
 
-def create_voucher_image(voucher_data: dict, logo_path: str = None) -> Image.Image:
-    """
-    Create simple voucher image (not full receipt)
-    
-    Args:
-        voucher_data: Dictionary with voucher information:
-            - student_name: str
-            - class_name: str
-            - item_name: str (single item)
-            - qty: int
-            - price: float
-            - slot_text: str (for scheduled services)
-            - duration_minutes: int (for scheduled services)
-        logo_path: Path to logo image file (optional)
-    
-    Returns:
-        PIL Image object
-    """
-    
-    # Voucher dimensions (smaller than receipt)
-    width = 576
-    height = 1000
-    
-    # Create white background
-    img = Image.new('RGB', (width, height), 'white')
-    draw = ImageDraw.Draw(img)
-    
-    # Load fonts
+_FONTS = None
+# (logo_path, mtime) -> תמונת הכותרת הקבועה (לוגו + "שובר" + קו)
+_HEADER_CACHE = {}
+
+
+def _load_fonts():
+    """הגופנים נטענים פעם אחת לתהליך"""
+    global _FONTS
+    if _FONTS is not None:
+        return _FONTS
     font_paths = [
         ('C:/Windows/Fonts/arialbd.ttf', 'C:/Windows/Fonts/arial.ttf'),
         ('C:/Windows/Fonts/tahomabd.ttf', 'C:/Windows/Fonts/tahoma.ttf'),
     ]
-    
-    font_extra_large_bold = None
-    font_large_bold = None
-    font_medium_bold = None
-    font_medium = None
-    font_small = None
-    
+    fonts = None
     for bold_path, regular_path in font_paths:
         try:
-            if os.path.exists(bold_path):
-                font_extra_large_bold = ImageFont.truetype(bold_path, 60)
-                font_large_bold = ImageFont.truetype(bold_path, 48)
-                font_medium_bold = ImageFont.truetype(bold_path, 32)
-            if os.path.exists(regular_path):
-                font_medium = ImageFont.truetype(regular_path, 28)
-                font_small = ImageFont.truetype(regular_path, 24)
+            if os.path.exists(bold_path) and os.path.exists(regular_path):
+                fonts = {
+                    'extra_large_bold': ImageFont.truetype(bold_path, 60),
+                    'large_bold': ImageFont.truetype(bold_path, 48),
+                    'medium_bold': ImageFont.truetype(bold_path, 32),
+                    'medium': ImageFont.truetype(regular_path, 28),
+                    'small': ImageFont.truetype(regular_path, 24),
+                }
                 break
         except:
             pass
-    
-    if not font_extra_large_bold:
-        font_extra_large_bold = font_large_bold = font_medium_bold = font_medium = font_small = ImageFont.load_default()
-    
-    y = 30
-    
-    # Add small logo if provided
+    if not fonts:
+        f = ImageFont.load_default()
+        fonts = {k: f for k in ('extra_large_bold', 'large_bold', 'medium_bold', 'medium', 'small')}
+    _FONTS = fonts
+    return fonts
+
+
+def _voucher_header(logo_path: str = None, width: int = 576) -> Image.Image:
+    """החלק הקבוע של השובר (לוגו, כותרת, קו מפריד) – מחושב פעם אחת לכל לוגו"""
+    mtime = None
     if logo_path and os.path.exists(logo_path):
+        try:
+            mtime = os.path.getmtime(logo_path)
+        except Exception:
+            mtime = None
+    key = (str(logo_path or ''), mtime, width)
+    hit = _HEADER_CACHE.get(key)
+    if hit is not None:
+        return hit
+
+    fonts = _load_fonts()
+
+    # Add small logo if provided
+    logo_img = None
+    if mtime is not None:
         try:
             with Image.open(logo_path) as logo:
                 logo.load()
@@ -89,32 +83,43 @@ def create_voucher_image(voucher_data: dict, logo_path: str = None) -> Image.Ima
                     ratio = max_width / logo.size[0]
                     new_size = (max_width, int(logo.size[1] * ratio))
                     logo = logo.resize(new_size, Image.Resampling.LANCZOS)
-                logo = logo.convert('1')
-                
-                logo_x = (width - logo.size[0]) // 2
-                img.paste(logo, (logo_x, y))
-                y += logo.size[1] + 20
+                logo_img = logo.convert('1')
         except:
-            pass
-    
+            logo_img = None
+
+    logo_h = (logo_img.size[1] + 20) if logo_img is not None else 0
+    img = Image.new('RGB', (width, 30 + logo_h + 85), 'white')
+    draw = ImageDraw.Draw(img)
+    y = 30
+    if logo_img is not None:
+        logo_x = (width - logo_img.size[0]) // 2
+        img.paste(logo_img, (logo_x, y))
+        y += logo_h
+
     # Header - "שובר"
     text = reverse_hebrew_for_image("שובר")
-    bbox = draw.textbbox((0, 0), text, font=font_large_bold)
+    bbox = draw.textbbox((0, 0), text, font=fonts['large_bold'])
     text_width = bbox[2] - bbox[0]
     x = (width - text_width) // 2
-    draw.text((x, y), text, fill='black', font=font_large_bold)
+    draw.text((x, y), text, fill='black', font=fonts['large_bold'])
     y += 60
-    
+
     # Line separator
     draw.line([(40, y), (width-40, y)], fill='black', width=2)
     y += 25
-    
-    # Student info
+
+    header = img.crop((0, 0, width, y))
+    if len(_HEADER_CACHE) > 8:
+        _HEADER_CACHE.clear()
+    _HEADER_CACHE[key] = header
+    return header
+
+
+def _current_date_lines():
+    """שעה ותאריך עברי של עכשיו – פעם אחת לכל אצווה"""
     from datetime import datetime
     now = datetime.now()
     time_str = now.strftime("%H:%M")
-    
-    # Hebrew date
     hebrew_date = ""
     greg_date = now.strftime('%Y-%m-%d')
     try:
@@ -123,7 +128,58 @@ def create_voucher_image(voucher_data: dict, logo_path: str = None) -> Image.Ima
     except Exception as e:
         print(f"[VOUCHER] jewish_calendar error: {e}")
         hebrew_date = ''
+    return hebrew_date, time_str
+
+
+def create_voucher_images(vouchers: list, logo_path: str = None) -> list:
+    """
+    Render several vouchers at once (one print job of N vouchers).
+    Fonts, the logo/title header and the current date are computed once.
+    """
+    date_lines = _current_date_lines()
+    return [create_voucher_image(v, logo_path, _date_lines=date_lines) for v in (vouchers or [])]
+
+
+def create_voucher_image(voucher_data: dict, logo_path: str = None, _date_lines=None) -> Image.Image:
+    """
+    Create simple voucher image (not full receipt)
     
+    Args:
+        voucher_data: Dictionary with voucher information:
+            - student_name: str
+            - class_name: str
+            - item_name: str (single item)
+            - qty: int
+            - price: float
+            - slot_text: str (for scheduled services)
+            - duration_minutes: int (for scheduled services)
+        logo_path: Path to logo image file (optional)
+    
+    Returns:
+        PIL Image object
+    """
+    
+    # Voucher dimensions (smaller than receipt)
+    width = 576
+    height = 1000
+
+    fonts = _load_fonts()
+    font_extra_large_bold = fonts['extra_large_bold']
+    font_medium = fonts['medium']
+    font_small = fonts['small']
+
+    # Create white background with the cached static header on top
+    img = Image.new('RGB', (width, height), 'white')
+    header = _voucher_header(logo_path, width)
+    img.paste(header, (0, 0))
+    draw = ImageDraw.Draw(img)
+    y = header.size[1]
+
+    # Student info
+    if _date_lines is None:
+        _date_lines = _current_date_lines()
+    hebrew_date, time_str = _date_lines
+
     texts = []
     if voucher_data.get('student_name'):
         texts.append(reverse_hebrew_for_image(f"תלמיד: {voucher_data['student_name']}"))